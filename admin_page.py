@@ -15,6 +15,42 @@ from PySide6.QtWidgets import (
 from PySide6.QtGui import QFont, QIcon, QPixmap, QColor
 from PySide6.QtCore import Qt, QSize, QTimer, QEvent
 
+# ✅ إشعارات تغير البيانات بدلاً من مؤقتات التحديث الدورية
+try:
+    from pages.data_versions import bump_version, subscribe_domains
+except ImportError:
+    from data_versions import bump_version, subscribe_domains
+
+# ✅ اتصال SQLite المشترك (اتصال واحد لكل خيط)
+try:
+    from pages.db_connection import get_db
+except ImportError:
+    from db_connection import get_db
+
+# ✅ مستودع ملفات JSON المشترك
+try:
+    from pages.json_repository import get_json_repository
+except ImportError:
+    from json_repository import get_json_repository
+
+# ✅ كتالوج الأصناف المشترك - تحديث وحدات المبيع المخزنة فيه بعد تعديلها هنا
+try:
+    from pages.product_catalog import get_product_catalog
+except ImportError:
+    from product_catalog import get_product_catalog
+
+# ✅ جداول افتراضية (نموذج/عرض) بدلاً من عنصر لكل خانة
+try:
+    from pages.table_models import Column, RecordTableView, shared_font
+except ImportError:
+    from table_models import Column, RecordTableView, shared_font
+
+# ✅ بحث مؤجل في خيط خلفي بدلاً من التصفية مع كل حرف
+try:
+    from pages.search_controller import table_text_search
+except ImportError:
+    from search_controller import table_text_search
+
 DB_PATH = "chbib_materials.db"
 DEFAULT_USD_TO_LBP = 89000
 
@@ -85,11 +121,9 @@ class AdminPage(QWidget):
     def load_exchange_rate(self):
         """✅ تحميل سعر الصرف من ملف الإعدادات"""
         try:
-            settings_file = "data/exchange_rate.json"
-            if os.path.exists(settings_file):
-                with open(settings_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return int(data.get('exchange_rate', DEFAULT_USD_TO_LBP))
+            data = get_json_repository().read("data/exchange_rate.json")
+            if data:
+                return int(data.get('exchange_rate', DEFAULT_USD_TO_LBP))
         except Exception as e:
             print(f"❌ خطأ في تحميل سعر الصرف: {e}")
         return DEFAULT_USD_TO_LBP
@@ -97,73 +131,36 @@ class AdminPage(QWidget):
     def save_exchange_rate_to_file(self, rate):
         """✅ حفظ سعر الصرف في ملف"""
         try:
-            os.makedirs("data", exist_ok=True)
-            settings_file = "data/exchange_rate.json"
             data = {
                 "exchange_rate": rate, 
                 "last_updated": datetime.now().isoformat()
             }
             
-            with open(settings_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            get_json_repository().save("data/exchange_rate.json", data)
                 
             print(f"✅ [سعر الصرف] تم الحفظ في الملف: {rate}")
         except Exception as e:
             print(f"❌ [سعر الصرف] خطأ في حفظ الملف: {e}")
 
     def _ensure_db(self):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS Items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT,
-                buy_unit TEXT,
-                sell_unit TEXT,
-                buy_price REAL,
-                sell_price REAL,
-                quantity REAL,
-                currency TEXT,
-                capital_value_lbp REAL
-            )
-        """)
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS Units (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                unit TEXT,
-                kind TEXT
-            )
-        """)
-        
-        # ✅ جدول جديد لوحدات المبيع لكل صنف
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS ItemSellUnits (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                item_id INTEGER,
-                sell_unit TEXT,
-                FOREIGN KEY (item_id) REFERENCES Items (id) ON DELETE CASCADE
-            )
-        """)
-        
-        default_buy = ["طن", "شوال 25كغ", "شوال 50كغ", "كيلو", "متر", "بالحبة/العدد"]
-        default_sell = ["طن", "شوال", "كيلو", "شحنة", "متر", "بالحبة/العدد"]
-        for u in default_buy:
-            c.execute("INSERT INTO Units(unit, kind) SELECT ?, 'buy' WHERE NOT EXISTS (SELECT 1 FROM Units WHERE unit=? AND kind='buy')", (u, u))
-        for u in default_sell:
-            c.execute("INSERT INTO Units(unit, kind) SELECT ?, 'sell' WHERE NOT EXISTS (SELECT 1 FROM Units WHERE unit=? AND kind='sell')", (u, u))
+        # ✅ جداول المخزون تنشأ في ترحيلات db_connection.MIGRATIONS
+        with get_db(self.db_path).transaction() as conn:
+            c = conn.cursor()
 
-        conn.commit()
-        conn.close()
+            default_buy = ["طن", "شوال 25كغ", "شوال 50كغ", "كيلو", "متر", "بالحبة/العدد"]
+            default_sell = ["طن", "شوال", "كيلو", "شحنة", "متر", "بالحبة/العدد"]
+            for u in default_buy:
+                c.execute("INSERT INTO Units(unit, kind) SELECT ?, 'buy' WHERE NOT EXISTS (SELECT 1 FROM Units WHERE unit=? AND kind='buy')", (u, u))
+            for u in default_sell:
+                c.execute("INSERT INTO Units(unit, kind) SELECT ?, 'sell' WHERE NOT EXISTS (SELECT 1 FROM Units WHERE unit=? AND kind='sell')", (u, u))
 
     def _load_units_cache(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = get_db(self.db_path).connection()
         c = conn.cursor()
         c.execute("SELECT unit FROM Units WHERE kind='buy' ORDER BY unit")
         self.units_buy = [r[0] for r in c.fetchall()]
         c.execute("SELECT unit FROM Units WHERE kind='sell' ORDER BY unit")
         self.units_sell = [r[0] for r in c.fetchall()]
-        conn.close()
 
     def _build_ui(self):
         # ✅ تحسين الخطوط وجعلها أكبر وأكثر سماكة
@@ -199,7 +196,7 @@ class AdminPage(QWidget):
                 background-color: #2E4057; 
                 border: 2px solid #778DA9;
             }
-            QTableWidget {
+            QTableView {
                 font-size: 15px;
                 font-weight: bold;
             }
@@ -316,26 +313,30 @@ class AdminPage(QWidget):
         self.search_input.setPlaceholderText("🔍 ابحث باسم الصنف...")
         self.search_input.setFixedHeight(55)  # ✅ زيادة ارتفاع شريط البحث
         self.search_input.setFont(QFont("Arial", 16, QFont.Bold))  # ✅ زيادة حجم خط البحث
-        self.search_input.textChanged.connect(self._on_search_text_changed)
         search_row.addWidget(self.search_input)
         main.addLayout(search_row)
 
         # جدول الأصناف
-        self.table = QTableWidget(0, 11)
-        self.table.setHorizontalHeaderLabels([
-            "ID", "الاسم", "وحدة الشراء", "وحدة المبيع",
-            "سعر الشراء (ل.ل)", "سعر الشراء ($)",
-            "سعر المبيع مفرق (ل.ل)", "سعر المبيع مفرق ($)",
-            "الكمية", "رأس المال (ل.ل)", "رأس المال ($)"
-        ])
+        # (السجل = صف all_rows: id, name, buy_u, sell_u, buy_lbp, buy_usd, sell_lbp, sell_usd, qty, cap_lbp, cap_usd)
+        def cell(title, index, fmt=str):
+            return Column(title, lambda r, row: fmt(r[index]), align=Qt.AlignCenter,
+                          foreground="black", font=shared_font("Arial", 13))
+
+        self.table = RecordTableView([
+            Column("ID", 0, align=Qt.AlignCenter),
+            cell("الاسم", 1), cell("وحدة الشراء", 2), cell("وحدة المبيع", 3),
+            cell("سعر الشراء (ل.ل)", 4, fmt_lbp), cell("سعر الشراء ($)", 5, fmt_usd),
+            cell("سعر المبيع مفرق (ل.ل)", 6, fmt_lbp), cell("سعر المبيع مفرق ($)", 7, fmt_usd),
+            cell("الكمية", 8, fmt_qty), cell("رأس المال (ل.ل)", 9, fmt_lbp), cell("رأس المال ($)", 10, fmt_usd),
+        ], search_columns=(1,))  # ✅ البحث باسم الصنف (مفتاح موحد يحسب عند التحميل)
+        self.search_controller = table_text_search(self.table, self.search_input)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(RecordTableView.SelectRows)
         self.table.setColumnHidden(0, True)
         
         # ✅ تحسين التحديد في الجدول - إزالة النقاط واستخدام اللون الأزرق
         self.table.setStyleSheet("""
-            QTableWidget { 
+            QTableView { 
                 background-color: #FFFFFF; 
                 color: black; 
                 gridline-color: #dcdcdc;
@@ -352,12 +353,12 @@ class AdminPage(QWidget):
                 font-size: 14px;
                 font-weight: bold;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 10px;
                 font-weight: bold;
                 font-size: 14px;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #2196F3;
                 color: white;
             }
@@ -365,7 +366,7 @@ class AdminPage(QWidget):
         
         main.addWidget(self.table)
 
-        self.table.itemDoubleClicked.connect(self._on_table_double_click)
+        self.table.doubleClicked.connect(self._on_table_double_click)
         
         # ✅ إضافة حدث النقر على الخلفية لإزالة التحديد
         self.table.viewport().installEventFilter(self)
@@ -405,113 +406,113 @@ class AdminPage(QWidget):
             return True
         return super().eventFilter(source, event)
 
+    def _item_row(self, rowd):
+        """✅ صف الجدول لصنف واحد من قاموس أعمدة Items"""
+        item_id = rowd.get("id")
+        name = rowd.get("name") or ""
+        buy_unit = rowd.get("buy_unit") or ""
+        sell_unit = rowd.get("sell_unit") or ""
+        
+        if "buy_price" in rowd and rowd.get("buy_price") is not None:
+            buy_price_raw = Decimal(rowd.get("buy_price") or 0)
+        elif "buy_price_lbp" in rowd and rowd.get("buy_price_lbp") is not None:
+            buy_price_raw = Decimal(rowd.get("buy_price_lbp") or 0)
+        else:
+            buy_price_raw = Decimal(0)
+
+        if "sell_price" in rowd and rowd.get("sell_price") is not None:
+            sell_price_raw = Decimal(rowd.get("sell_price") or 0)
+        elif "sell_price_lbp" in rowd and rowd.get("sell_price_lbp") is not None:
+            sell_price_raw = Decimal(rowd.get("sell_price_lbp") or 0)
+        else:
+            sell_price_raw = Decimal(0)
+
+        qty = Decimal(rowd.get("quantity") or 0)
+        currency = (rowd.get("currency") or "LBP").upper()
+        
+        cap_lbp = None
+        if "capital_value_lbp" in rowd and rowd.get("capital_value_lbp") is not None:
+            cap_lbp = Decimal(rowd.get("capital_value_lbp") or 0)
+        else:
+            if currency in ("USD", "US$"):
+                cap_lbp = (buy_price_raw * qty * Decimal(self.usd_to_lbp)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+            else:
+                cap_lbp = (buy_price_raw * qty).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+        if currency in ("USD", "US$"):
+            buy_usd = buy_price_raw
+            buy_lbp = (buy_price_raw * Decimal(self.usd_to_lbp)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+            sell_usd = sell_price_raw
+            sell_lbp = (sell_price_raw * Decimal(self.usd_to_lbp)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        else:
+            buy_lbp = buy_price_raw
+            buy_usd = (buy_price_raw / Decimal(self.usd_to_lbp)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+            sell_lbp = sell_price_raw
+            sell_usd = (sell_price_raw / Decimal(self.usd_to_lbp)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+        cap_usd = (cap_lbp / Decimal(self.usd_to_lbp)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+        return (item_id, name, buy_unit, sell_unit, buy_lbp, buy_usd, sell_lbp, sell_usd, qty, cap_lbp, cap_usd)
+
     def load_items(self):
-        conn = sqlite3.connect(self.db_path)
+        if hasattr(self, 'data_subscription'):
+            self.data_subscription.mark_seen()
+        conn = get_db(self.db_path).connection()
         c = conn.cursor()
-        c.execute("PRAGMA table_info(Items)")
-        cols = [r[1] for r in c.fetchall()]
-
         c.execute("SELECT * FROM Items ORDER BY name")
+        cols = [d[0] for d in c.description]
         rows = c.fetchall()
-        col_indices = {name: idx for idx, name in enumerate(cols)}
 
-        self.all_rows = []
-        self.table.setRowCount(0)
+        self.all_rows = [self._item_row(dict(zip(cols, r))) for r in rows]
+        # ✅ موقع كل صنف في الجدول - لتحديث صف واحد عند تغير كميته
+        self._row_positions = {r[0]: position for position, r in enumerate(self.all_rows)}
 
-        for r in rows:
-            rowd = {}
-            for i, colname in enumerate(cols):
-                rowd[colname] = r[i]
-
-            item_id = rowd.get("id")
-            name = rowd.get("name") or ""
-            buy_unit = rowd.get("buy_unit") or ""
-            sell_unit = rowd.get("sell_unit") or ""
-            
-            if "buy_price" in rowd and rowd.get("buy_price") is not None:
-                buy_price_raw = Decimal(rowd.get("buy_price") or 0)
-            elif "buy_price_lbp" in rowd and rowd.get("buy_price_lbp") is not None:
-                buy_price_raw = Decimal(rowd.get("buy_price_lbp") or 0)
-            else:
-                buy_price_raw = Decimal(0)
-
-            if "sell_price" in rowd and rowd.get("sell_price") is not None:
-                sell_price_raw = Decimal(rowd.get("sell_price") or 0)
-            elif "sell_price_lbp" in rowd and rowd.get("sell_price_lbp") is not None:
-                sell_price_raw = Decimal(rowd.get("sell_price_lbp") or 0)
-            else:
-                sell_price_raw = Decimal(0)
+        self._populate_table(self.all_rows)
 
-            qty = Decimal(rowd.get("quantity") or 0)
-            currency = (rowd.get("currency") or "LBP").upper()
-            
-            cap_lbp = None
-            if "capital_value_lbp" in rowd and rowd.get("capital_value_lbp") is not None:
-                cap_lbp = Decimal(rowd.get("capital_value_lbp") or 0)
-            else:
-                if currency in ("USD", "US$"):
-                    cap_lbp = (buy_price_raw * qty * Decimal(self.usd_to_lbp)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-                else:
-                    cap_lbp = (buy_price_raw * qty).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    def patch_items(self, item_ids):
+        """✅ تحديث صفوف أصناف محددة فقط وتعديل إجمالي رأس المال بالفرق
 
-            if currency in ("USD", "US$"):
-                buy_usd = buy_price_raw
-                buy_lbp = (buy_price_raw * Decimal(self.usd_to_lbp)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-                sell_usd = sell_price_raw
-                sell_lbp = (sell_price_raw * Decimal(self.usd_to_lbp)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-            else:
-                buy_lbp = buy_price_raw
-                buy_usd = (buy_price_raw / Decimal(self.usd_to_lbp)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-                sell_lbp = sell_price_raw
-                sell_usd = (sell_price_raw / Decimal(self.usd_to_lbp)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        ترجع False إذا لم يكن التحديث الجزئي ممكناً (صنف جديد أو محذوف أو لم يحمل
+        الجدول بعد) - عندها يجب استدعاء load_items.
+        """
+        positions = getattr(self, '_row_positions', None)
+        total_lbp = getattr(self, 'total_capital_lbp', None)
+        if positions is None or total_lbp is None:
+            return False
+        item_ids = list(item_ids)
+        if not item_ids:
+            return True
+        if any(item_id not in positions for item_id in item_ids):
+            return False
 
-            cap_usd = (cap_lbp / Decimal(self.usd_to_lbp)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        conn = get_db(self.db_path).connection()
+        c = conn.cursor()
+        c.execute(f"SELECT * FROM Items WHERE id IN ({','.join('?' * len(item_ids))})", item_ids)
+        cols = [d[0] for d in c.description]
+        rows = c.fetchall()
+        if len(rows) != len(item_ids):
+            return False
 
-            self.all_rows.append((item_id, name, buy_unit, sell_unit, buy_lbp, buy_usd, sell_lbp, sell_usd, qty, cap_lbp, cap_usd))
+        for r in rows:
+            new_row = self._item_row(dict(zip(cols, r)))
+            position = positions[new_row[0]]
+            old_row = self.all_rows[position]
+            if new_row[1] != old_row[1]:
+                # ✅ تغير الاسم يغير ترتيب الجدول
+                return False
+            self.all_rows[position] = new_row
+            self.table.update_record(position, new_row)
+            total_lbp += new_row[9] - old_row[9]
 
-        conn.close()
-        self._populate_table(self.all_rows)
+        self.total_capital_lbp = total_lbp
+        self._show_total_capital()
+        return True
 
     def _populate_table(self, rows):
-        self.table.setRowCount(0)
-        for r in rows:
-            item_id, name, buy_u, sell_u, buy_lbp, buy_usd, sell_lbp, sell_usd, qty, cap_lbp, cap_usd = r
-            row = self.table.rowCount()
-            self.table.insertRow(row)
-
-            id_item = QTableWidgetItem(str(item_id))
-            id_item.setTextAlignment(Qt.AlignCenter)
-            self.table.setItem(row, 0, id_item)
-
-            def qitem(text):
-                it = QTableWidgetItem(text)
-                it.setTextAlignment(Qt.AlignCenter)
-                it.setForeground(QColor("black"))
-                font = QFont("Arial", 13, QFont.Bold)
-                it.setFont(font)
-                return it
-
-            self.table.setItem(row, 1, qitem(str(name)))
-            self.table.setItem(row, 2, qitem(str(buy_u)))
-            self.table.setItem(row, 3, qitem(str(sell_u)))
-            self.table.setItem(row, 4, qitem(fmt_lbp(buy_lbp)))
-            self.table.setItem(row, 5, qitem(fmt_usd(buy_usd)))
-            self.table.setItem(row, 6, qitem(fmt_lbp(sell_lbp)))
-            self.table.setItem(row, 7, qitem(fmt_usd(sell_usd)))
-            self.table.setItem(row, 8, qitem(fmt_qty(qty)))
-            self.table.setItem(row, 9, qitem(fmt_lbp(cap_lbp)))
-            self.table.setItem(row, 10, qitem(fmt_usd(cap_usd)))
-
-    def _on_search_text_changed(self):
-        q = self.search_input.text().strip().lower()
-        if not q:
-            rows = self.all_rows
-        else:
-            rows = [r for r in self.all_rows if q in str(r[1]).lower()]
-        self._populate_table(rows)
+        self.table.set_records(rows)
 
     def update_total_capital(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = get_db(self.db_path).connection()
         c = conn.cursor()
         try:
             c.execute("SELECT SUM(capital_value_lbp) FROM Items")
@@ -529,8 +530,12 @@ class AdminPage(QWidget):
                     total_lbp += (b * q * Decimal(self.usd_to_lbp))
                 else:
                     total_lbp += (b * q)
-        conn.close()
 
+        self.total_capital_lbp = total_lbp
+        self._show_total_capital()
+
+    def _show_total_capital(self):
+        total_lbp = self.total_capital_lbp
         total_usd = (total_lbp / Decimal(self.usd_to_lbp)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
         if self.capital_hidden:
             self.total_value.setText("******")
@@ -549,7 +554,7 @@ class AdminPage(QWidget):
                 self.eye_btn.setIcon(QIcon("icons/eye.png"))
             else:
                 self.eye_btn.setText("👁")
-        self.update_total_capital()
+        self._show_total_capital()
 
     def open_add_dialog(self):
         dlg = ItemDialog(self.units_buy, self.units_sell, parent=self)
@@ -569,22 +574,23 @@ class AdminPage(QWidget):
             else:
                 cap_lbp = (buy_price * qty).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute("""
-                INSERT INTO Items (name, buy_unit, sell_unit, buy_price, sell_price, quantity, currency, capital_value_lbp)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (data["name"], data["buy_unit"], data["sell_unit"], float(buy_price), float(sell_price), float(qty), currency.upper(), float(cap_lbp)))
+            with get_db(self.db_path).transaction() as conn:
+                c = conn.cursor()
+                c.execute("""
+                    INSERT INTO Items (name, buy_unit, sell_unit, buy_price, sell_price, quantity, currency, capital_value_lbp)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (data["name"], data["buy_unit"], data["sell_unit"], float(buy_price), float(sell_price), float(qty), currency.upper(), float(cap_lbp)))
             
-            item_id = c.lastrowid
+                item_id = c.lastrowid
             
-            # ✅ حفظ وحدات المبيع المتعددة للصنف
-            if "sell_units" in data:
-                for unit in data["sell_units"]:
-                    c.execute("INSERT INTO ItemSellUnits (item_id, sell_unit) VALUES (?, ?)", (item_id, unit))
+                # ✅ حفظ وحدات المبيع المتعددة للصنف
+                if "sell_units" in data:
+                    for unit in data["sell_units"]:
+                        c.execute("INSERT INTO ItemSellUnits (item_id, sell_unit) VALUES (?, ?)", (item_id, unit))
             
-            conn.commit()
-            conn.close()
+            get_product_catalog().refresh_sell_units((item_id,))
+            # ✅ صنف جديد - patch_items ترجع False والصفحات تعيد التحميل
+            bump_version('stock', keys=(item_id,))
             self._load_units_cache()
             self.load_items()
             self.update_total_capital()
@@ -593,26 +599,24 @@ class AdminPage(QWidget):
             self.send_to_reports_page("add", item_id, data["name"])
 
     def open_edit_dialog(self):
-        row = self.table.currentRow()
-        if row < 0:
+        record = self.table.current_record()
+        if record is None:
             QMessageBox.warning(self, "تحذير", "يرجى اختيار صنف أولاً")
             return
         try:
-            item_id = int(self.table.item(row, 0).text())
+            item_id = int(record[0])
         except Exception:
             QMessageBox.warning(self, "خطأ", "لا يمكن الحصول على هوية الصنف.")
             return
 
-        conn = sqlite3.connect(self.db_path)
+        conn = get_db(self.db_path).connection()
         c = conn.cursor()
         c.execute("SELECT id, name, buy_unit, sell_unit, buy_price, sell_price, quantity, currency FROM Items WHERE id=?", (item_id,))
         rec = c.fetchone()
         
         # ✅ جلب وحدات المبيع الخاصة بالصنف
-        c.execute("SELECT sell_unit FROM ItemSellUnits WHERE item_id=?", (item_id,))
-        item_sell_units = [row[0] for row in c.fetchall()]
+        item_sell_units = self.get_item_sell_units(item_id)
         
-        conn.close()
         if not rec:
             QMessageBox.warning(self, "خطأ", "الصنف غير موجود.")
             return
@@ -646,21 +650,22 @@ class AdminPage(QWidget):
             else:
                 cap_lbp = (buy_price * qty).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute("""
-                UPDATE Items SET name=?, buy_unit=?, sell_unit=?, buy_price=?, sell_price=?, quantity=?, currency=?, capital_value_lbp=?
-                WHERE id=?
-            """, (data["name"], data["buy_unit"], data["sell_unit"], float(buy_price), float(sell_price), float(qty), currency.upper(), float(cap_lbp), item_id))
+            with get_db(self.db_path).transaction() as conn:
+                c = conn.cursor()
+                c.execute("""
+                    UPDATE Items SET name=?, buy_unit=?, sell_unit=?, buy_price=?, sell_price=?, quantity=?, currency=?, capital_value_lbp=?
+                    WHERE id=?
+                """, (data["name"], data["buy_unit"], data["sell_unit"], float(buy_price), float(sell_price), float(qty), currency.upper(), float(cap_lbp), item_id))
             
-            # ✅ تحديث وحدات المبيع المتعددة للصنف
-            c.execute("DELETE FROM ItemSellUnits WHERE item_id=?", (item_id,))
-            if "sell_units" in data:
-                for unit in data["sell_units"]:
-                    c.execute("INSERT INTO ItemSellUnits (item_id, sell_unit) VALUES (?, ?)", (item_id, unit))
+                # ✅ تحديث وحدات المبيع المتعددة للصنف
+                c.execute("DELETE FROM ItemSellUnits WHERE item_id=?", (item_id,))
+                if "sell_units" in data:
+                    for unit in data["sell_units"]:
+                        c.execute("INSERT INTO ItemSellUnits (item_id, sell_unit) VALUES (?, ?)", (item_id, unit))
             
-            conn.commit()
-            conn.close()
+            # ✅ الكتالوج يحدث صف الصنف ووحدات مبيعه فقط (أو يعيد التحميل إذا تغير الاسم)
+            get_product_catalog().refresh_sell_units((item_id,))
+            bump_version('stock', keys=(item_id,))
             self._load_units_cache()
             self.load_items()
             self.update_total_capital()
@@ -669,13 +674,13 @@ class AdminPage(QWidget):
             self.send_to_reports_page("edit", item_id, data["name"])
 
     def delete_selected_item(self):
-        row = self.table.currentRow()
-        if row < 0:
+        record = self.table.current_record()
+        if record is None:
             QMessageBox.warning(self, "تحذير", "اختر صنفًا للحذف.")
             return
         try:
-            item_id = int(self.table.item(row, 0).text())
-            name = self.table.item(row, 1).text()
+            item_id = int(record[0])
+            name = str(record[1])
         except Exception:
             QMessageBox.warning(self, "خطأ", "حدث خطأ في تحديد الصنف.")
             return
@@ -683,12 +688,13 @@ class AdminPage(QWidget):
         r = QMessageBox.question(self, "تأكيد الحذف", f"هل تريد حذف الصنف '{name}'؟", QMessageBox.Yes | QMessageBox.No)
         if r != QMessageBox.Yes:
             return
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("DELETE FROM Items WHERE id=?", (item_id,))
-        c.execute("DELETE FROM ItemSellUnits WHERE item_id=?", (item_id,))
-        conn.commit()
-        conn.close()
+        with get_db(self.db_path).transaction() as conn:
+            c = conn.cursor()
+            c.execute("DELETE FROM Items WHERE id=?", (item_id,))
+            c.execute("DELETE FROM ItemSellUnits WHERE item_id=?", (item_id,))
+        get_product_catalog().refresh_sell_units((item_id,))
+        # ✅ صنف محذوف - patch_items ترجع False والصفحات تعيد التحميل
+        bump_version('stock', keys=(item_id,))
         self.load_items()
         self.update_total_capital()
         
@@ -769,32 +775,35 @@ class AdminPage(QWidget):
 
     def update_lbp_prices_and_capital(self):
         """✅ تحديث الأسعار بالليرة اللبنانية ورأس المال"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
+        with get_db(self.db_path).transaction() as conn:
+            c = conn.cursor()
         
-        # تحديث رأس المال بالليرة اللبنانية لكل صنف
-        c.execute("SELECT id, buy_price, quantity, currency FROM Items")
-        items = c.fetchall()
+            # تحديث رأس المال بالليرة اللبنانية لكل صنف
+            c.execute("SELECT id, buy_price, quantity, currency FROM Items")
+            items = c.fetchall()
+            updates = []
         
-        for item_id, buy_price, quantity, currency in items:
-            try:
-                buy_price_dec = Decimal(str(buy_price)) if buy_price else Decimal(0)
-                quantity_dec = Decimal(str(quantity)) if quantity else Decimal(0)
+            for item_id, buy_price, quantity, currency in items:
+                try:
+                    buy_price_dec = Decimal(str(buy_price)) if buy_price else Decimal(0)
+                    quantity_dec = Decimal(str(quantity)) if quantity else Decimal(0)
                 
-                if (currency or "LBP").upper() in ("USD", "US$"):
-                    capital_value_lbp = (buy_price_dec * quantity_dec * Decimal(self.usd_to_lbp)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-                else:
-                    capital_value_lbp = (buy_price_dec * quantity_dec).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+                    if (currency or "LBP").upper() in ("USD", "US$"):
+                        capital_value_lbp = (buy_price_dec * quantity_dec * Decimal(self.usd_to_lbp)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+                    else:
+                        capital_value_lbp = (buy_price_dec * quantity_dec).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
                 
-                c.execute("UPDATE Items SET capital_value_lbp = ? WHERE id = ?", (float(capital_value_lbp), item_id))
+                    updates.append((float(capital_value_lbp), item_id))
                 
-            except Exception as e:
-                print(f"خطأ في تحديث رأس المال للصنف {item_id}: {e}")
+                except Exception as e:
+                    print(f"خطأ في تحديث رأس المال للصنف {item_id}: {e}")
+            
+            # ✅ استعلام محضر واحد لكل الأصناف
+            c.executemany("UPDATE Items SET capital_value_lbp = ? WHERE id = ?", updates)
         
-        conn.commit()
-        conn.close()
+        bump_version('stock', keys=[item_id for _, item_id in updates])
         
-        # إعادة تحميل العناصر لتحديث العرض
+        # ✅ سعر الصرف يغير أسعار كل الصفوف - إعادة تحميل كاملة (وليس تحديث صفوف)
         self.load_items()
         self.update_total_capital()
         print("✅ [رأس المال] تم تحديث الأسعار ورأس المال")
@@ -802,15 +811,18 @@ class AdminPage(QWidget):
     def update_item_quantity(self, item_name, quantity_change, operation_type="subtract"):
         """✅ تحديث كمية الصنف تلقائياً - فعالة ومباشرة"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            
-            # البحث عن الصنف بالاسم
-            c.execute("SELECT id, quantity, name FROM Items WHERE name=?", (item_name,))
-            item = c.fetchone()
-            
-            if item:
-                item_id, current_quantity, item_name = item
+            with get_db(self.db_path).transaction() as conn:
+                c = conn.cursor()
+                
+                # البحث عن الصنف بالاسم
+                c.execute("SELECT id, quantity, name, buy_price, currency FROM Items WHERE name=?", (item_name,))
+                item = c.fetchone()
+                
+                if not item:
+                    print(f"❌ [المخزون] لم يتم العثور على الصنف {item_name}")
+                    return False
+                
+                item_id, current_quantity, item_name, buy_price, currency = item
                 current_qty_dec = Decimal(str(current_quantity))
                 change_qty_dec = Decimal(str(quantity_change))
                 
@@ -822,38 +834,27 @@ class AdminPage(QWidget):
                 # التأكد من أن الكمية لا تصبح سالبة
                 if new_quantity < Decimal(0):
                     print(f"⚠️ [المخزون] الكمية غير كافية للصنف {item_name}")
-                    conn.close()
                     return False
                 
-                # تحديث الكمية في قاعدة البيانات
-                c.execute("UPDATE Items SET quantity=? WHERE id=?", (float(new_quantity), item_id))
-                print(f"✅ [المخزون] تم تحديث {item_name}: {current_quantity} → {new_quantity} ({operation_type} {quantity_change})")
-                
                 # إعادة حساب رأس المال
-                c.execute("SELECT buy_price, currency FROM Items WHERE id=?", (item_id,))
-                buy_price, currency = c.fetchone()
                 buy_price_dec = Decimal(str(buy_price)) if buy_price else Decimal(0)
-                
                 if (currency or "LBP").upper() in ("USD", "US$"):
                     capital_value_lbp = (buy_price_dec * new_quantity * Decimal(self.usd_to_lbp)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
                 else:
                     capital_value_lbp = (buy_price_dec * new_quantity).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
                 
-                c.execute("UPDATE Items SET capital_value_lbp=? WHERE id=?", (float(capital_value_lbp), item_id))
-                
-                conn.commit()
-                conn.close()
-                
-                # ✅ تحديث العرض مباشرة
-                self.load_items()
-                self.update_total_capital()
-                
-                print(f"✅ [المخزون] تم التحديث بنجاح للصنف {item_name}")
-                return True
-            else:
-                print(f"❌ [المخزون] لم يتم العثور على الصنف {item_name}")
-                conn.close()
-                return False
+                # ✅ تحديث الكمية ورأس المال في استعلام واحد
+                c.execute("UPDATE Items SET quantity=?, capital_value_lbp=? WHERE id=?",
+                          (float(new_quantity), float(capital_value_lbp), item_id))
+                print(f"✅ [المخزون] تم تحديث {item_name}: {current_quantity} → {new_quantity} ({operation_type} {quantity_change})")
+            
+            bump_version('stock', keys=(item_id,))
+            
+            # ✅ تحديث صف الصنف وإجمالي رأس المال فقط (check_for_data_changes)
+            self.data_subscription.refresh_if_stale()
+            
+            print(f"✅ [المخزون] تم التحديث بنجاح للصنف {item_name}")
+            return True
                 
         except Exception as e:
             print(f"❌ [المخزون] خطأ في تحديث كمية الصنف: {e}")
@@ -885,35 +886,28 @@ class AdminPage(QWidget):
     def setup_data_monitoring(self):
         """✅ إعداد نظام مراقبة التغييرات في البيانات"""
         try:
-            # مؤقت للمراقبة الدورية (اختياري)
-            self.monitor_timer = QTimer()
-            self.monitor_timer.timeout.connect(self.check_for_data_changes)
-            self.monitor_timer.start(5000)  # التحقق كل 5 ثواني
+            # التحديث عند تغير إصدار المخزون فقط (عند الظهور إذا كانت الصفحة مخفية)
+            self.data_subscription = subscribe_domains(self, ('stock',), self.check_for_data_changes)
             
             print("✅ [المراقبة] تم إعداد نظام مراقبة التغييرات")
         except Exception as e:
             print(f"❌ [المراقبة] خطأ في إعداد النظام: {e}")
 
     def check_for_data_changes(self):
-        """✅ التحقق من التغييرات في البيانات إذا كانت الصفحة مرئية"""
-        if self.isVisible():
-            try:
-                # يمكن إضافة منطق للتحقق من آخر وقت تحديث
-                # للتأكد من أن البيانات محدثة
-                pass
-            except Exception as e:
-                print(f"❌ [المراقبة] خطأ في التحقق من التغييرات: {e}")
-
-    def showEvent(self, event):
-        """✅ عند إظهار الصفحة، تأكد من تحديث البيانات"""
-        super().showEvent(event)
-        print("🔄 [عرض الصفحة] تحديث بيانات الإدارة...")
-        self.load_items()
-        self.update_total_capital()
+        """✅ تحديث الأصناف بعد تغير المخزون - الصفوف المعدلة فقط إذا كانت معروفة"""
+        try:
+            item_ids = self.data_subscription.changed_keys('stock')
+            if item_ids is not None and self.patch_items(item_ids):
+                print(f"🔄 [المراقبة] تم تحديث {len(item_ids)} صنف في جدول الإدارة")
+                return
+            print("🔄 [المراقبة] تغير المخزون - تحديث بيانات الإدارة...")
+            self.load_items()
+            self.update_total_capital()
+        except Exception as e:
+            print(f"❌ [المراقبة] خطأ في التحقق من التغييرات: {e}")
 
-    def _on_table_double_click(self, item):
-        row = item.row()
-        self.table.setCurrentCell(row, 1)
+    def _on_table_double_click(self, index):
+        self.table.setCurrentIndex(index.siblingAtColumn(1))
         self.open_edit_dialog()
 
     def keyPressEvent(self, event):
@@ -939,12 +933,11 @@ class AdminPage(QWidget):
             self.controller.show_main_page()
 
     def get_item_sell_units(self, item_id):
-        """✅ جلب وحدات المبيع الخاصة بصنف معين"""
-        conn = sqlite3.connect(self.db_path)
+        """✅ جلب وحدات المبيع الخاصة بصنف معين (بدون الوحدة الافتراضية)"""
+        conn = get_db(self.db_path).connection()
         c = conn.cursor()
         c.execute("SELECT sell_unit FROM ItemSellUnits WHERE item_id=? ORDER BY sell_unit", (item_id,))
         units = [row[0] for row in c.fetchall()]
-        conn.close()
         return units
 
     def send_to_reports_page(self, action, item_id, item_name):
@@ -993,7 +986,7 @@ class ManageUnitsDialog(QDialog):
 
         def refresh():
             self.units_list.clear()
-            conn = sqlite3.connect(self.db_path)
+            conn = get_db(self.db_path).connection()
             c = conn.cursor()
             try:
                 c.execute("SELECT DISTINCT unit FROM Units ORDER BY unit")
@@ -1001,7 +994,6 @@ class ManageUnitsDialog(QDialog):
                     self.units_list.addItem(unit)
             except Exception:
                 pass
-            conn.close()
 
         def add_unit():
             name_str = unit_input.text().strip()
@@ -1009,23 +1001,21 @@ class ManageUnitsDialog(QDialog):
                 QMessageBox.warning(self, "خطأ", "أدخل اسم وحدة صالح.")
                 return
             
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
+            with get_db(self.db_path).transaction() as conn:
+                c = conn.cursor()
             
-            c.execute("INSERT INTO Units(unit, kind) SELECT ?, 'buy' WHERE NOT EXISTS (SELECT 1 FROM Units WHERE unit=? AND kind='buy')", 
-                     (name_str, name_str))
+                c.execute("INSERT INTO Units(unit, kind) SELECT ?, 'buy' WHERE NOT EXISTS (SELECT 1 FROM Units WHERE unit=? AND kind='buy')", 
+                         (name_str, name_str))
             
-            c.execute("INSERT INTO Units(unit, kind) SELECT ?, 'sell' WHERE NOT EXISTS (SELECT 1 FROM Units WHERE unit=? AND kind='sell')", 
-                     (name_str, name_str))
-            
-            conn.commit()
-            conn.close()
+                c.execute("INSERT INTO Units(unit, kind) SELECT ?, 'sell' WHERE NOT EXISTS (SELECT 1 FROM Units WHERE unit=? AND kind='sell')", 
+                         (name_str, name_str))
             
             refresh()
             unit_input.clear()
             
             if self.parent:
                 self.parent._load_units_cache()
+            get_product_catalog().refresh_sell_units()
             
             QMessageBox.information(self, "تم", f"تمت إضافة الوحدة '{name_str}' بنجاح")
 
@@ -1041,16 +1031,15 @@ class ManageUnitsDialog(QDialog):
             if r != QMessageBox.Yes:
                 return
             
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute("DELETE FROM Units WHERE unit=?", (unit_name,))
-            conn.commit()
-            conn.close()
+            with get_db(self.db_path).transaction() as conn:
+                c = conn.cursor()
+                c.execute("DELETE FROM Units WHERE unit=?", (unit_name,))
             
             refresh()
             
             if self.parent:
                 self.parent._load_units_cache()
+            get_product_catalog().refresh_sell_units()
 
         add_btn.clicked.connect(add_unit)
         del_btn.clicked.connect(delete_unit)
@@ -0,0 +1,115 @@
+"""✅ قياس كتابة ملفات البيانات: json.dump بمسافات مقابل json_text المضغوط
+
+فواتير عشوائية (ثابتة بالبذرة) بأصناف عربية، ويقاس لكل طريقة: زمن الكتابة، حجم
+الملف، وزمن القراءة. ثم زمن JsonRepository.save كاملاً (مع fsync وملف اللقطة).
+
+    python benchmarks/bench_json_write.py --invoices 20000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_repository import JsonRepository, json_text
+
+PRODUCTS = ["حديد مبروم", "إسمنت أبيض", "بلاط سيراميك", "رمل ناعم", "بحص", "خشب سويدي",
+            "دهان مائي", "أنابيب بلاستيك", "أسلاك كهرباء", "مسامير فولاذ"]
+UNITS = ["طن", "كيس", "متر", "قطعة", "علبة"]
+CUSTOMERS = ["أحمد الخطيب", "سامي حداد", "محمد شبيب", "علي يوسف", "خالد منصور"]
+
+
+def make_invoices(count, seed=1):
+    rng = random.Random(seed)
+    invoices = []
+    for number in range(1, count + 1):
+        items = []
+        for _ in range(rng.randint(1, 8)):
+            quantity = rng.randint(1, 50)
+            price = round(rng.uniform(1, 200), 2)
+            items.append({
+                'product_id': rng.randint(1, 500),
+                'product_name': rng.choice(PRODUCTS),
+                'unit': rng.choice(UNITS),
+                'quantity': quantity,
+                'unit_price_usd': price,
+                'unit_price_lbp': price * 89500,
+                'total_usd': round(quantity * price, 2),
+                'total_lbp': round(quantity * price * 89500),
+            })
+        total = round(sum(item['total_usd'] for item in items), 2)
+        invoices.append({
+            'invoice_number': number,
+            'invoice_uuid': f"{rng.getrandbits(128):032x}",
+            'customer_name': rng.choice(CUSTOMERS),
+            'customer_phone': f"70{rng.randint(100000, 999999)}",
+            'type': rng.choice(['نقدي', 'تقسيط']),
+            'date': f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-2026",
+            'address': "بيروت - الحمرا",
+            'total_usd': total,
+            'total_lbp': round(total * 89500),
+            'exchange_rate': 89500,
+            'items': items,
+        })
+    return invoices
+
+
+def _timed(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _write(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def _parse(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--invoices', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    invoices = make_invoices(args.invoices)
+    methods = (
+        ("json.dump indent=2", lambda: json.dumps(invoices, ensure_ascii=False, indent=2)),
+        ("compact json_text", lambda: json_text(invoices, pretty=False)),
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{args.invoices} فاتورة، أفضل زمن من {args.repeat} محاولات")
+        print(f"  {'':<22}{'write':>10}{'size':>10}{'parse':>10}")
+        for name, serialize in methods:
+            path = os.path.join(directory, "invoices.json")
+            write_time, _ = _timed(lambda: _write(path, serialize()), args.repeat)
+            size = os.path.getsize(path)
+            parse_time, _ = _timed(lambda: _parse(path), args.repeat)
+            print(f"  {name:<22}{write_time * 1000:>7.0f} ms{size / 1e6:>7.1f} MB"
+                  f"{parse_time * 1000:>7.0f} ms")
+
+        repository = JsonRepository()
+        path = os.path.join(directory, "data", "invoices.json")
+
+        def save():
+            repository.save(path, invoices)
+            repository.flush(path)
+
+        save_time, _ = _timed(save, args.repeat)
+        print(f"  JsonRepository.save + flush: {save_time * 1000:.0f} ms (مع fsync وملف اللقطة)")
+
+
+if __name__ == '__main__':
+    main()
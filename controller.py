@@ -10,6 +10,12 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.append(current_dir)
 
+# ✅ كتابة الملفات عبر ملف مؤقت ثم استبدال (لا يبقى ملف إعدادات نصف مكتوب)
+try:
+    from pages.json_repository import atomic_write_text, json_text
+except ImportError:
+    from json_repository import atomic_write_text, json_text
+
 class MainController(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -417,10 +423,10 @@ class MainController(QMainWindow):
     def _save_settings(self):
         """حفظ الإعدادات"""
         try:
-            with open(self.settings_file, 'w', encoding='utf-8') as f:
-                json.dump(self.logo_settings, f, ensure_ascii=False, indent=4)
-        except:
-            pass
+            # ✅ ملف إعدادات يعدل يدوياً - يبقى مقروءاً (نفس مسافات ملفات البيانات المقروءة)
+            atomic_write_text(self.settings_file, json_text(self.logo_settings, pretty=True))
+        except Exception as e:
+            print(f"❌ خطأ في حفظ الإعدادات: {e}")
 
     def refresh_logo(self, page_name):
         """تحديث الشعار"""
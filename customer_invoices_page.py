@@ -1,6 +1,5 @@
 import os
 import json
-import sqlite3
 from datetime import datetime
 from decimal import Decimal, ROUND_HALF_UP
 import uuid
@@ -19,6 +18,65 @@ from pages.customer_payments_page import CustomerPaymentsPage
 
 DB_PATH = "chbib_materials.db"
 
+# ✅ مخزن الزبائن والفواتير (SQLite)
+try:
+    from pages.customer_store import get_customer_store
+except ImportError:
+    from customer_store import get_customer_store
+
+# ✅ اتصال SQLite المشترك (اتصال واحد لكل خيط)
+try:
+    from pages.db_connection import get_db
+except ImportError:
+    from db_connection import get_db
+
+# ✅ مستودع ملفات JSON المشترك
+try:
+    from pages.json_repository import get_json_repository
+except ImportError:
+    from json_repository import get_json_repository
+
+# ✅ دفعات الزبائن: ملف لكل زبون + فهرس صغير
+try:
+    from pages.customer_payments_store import get_customer_payments_store
+except ImportError:
+    from customer_payments_store import get_customer_payments_store
+
+# ✅ إشعارات تغير البيانات بدلاً من مؤقتات التحديث الدورية
+try:
+    from pages.data_versions import bump_version, subscribe_domains
+except ImportError:
+    from data_versions import bump_version, subscribe_domains
+
+# ✅ جداول افتراضية (نموذج/عرض) بدلاً من عنصر لكل خانة
+try:
+    from pages.table_models import Column, RecordTableView, shared_font
+except ImportError:
+    from table_models import Column, RecordTableView, shared_font
+
+# ✅ توحيد النص العربي للبحث
+try:
+    from pages.text_normalize import normalize_text
+    from pages.inverted_index import InvertedIndex
+except ImportError:
+    from text_normalize import normalize_text
+    from inverted_index import InvertedIndex
+
+# ✅ بحث مؤجل في خيط خلفي بدلاً من التصفية مع كل حرف
+try:
+    from pages.search_controller import SearchController, matching_rows
+except ImportError:
+    from search_controller import SearchController, matching_rows
+
+# ✅ كتالوج الأصناف المشترك (يحمل مرة واحدة مع فهارس بالاسم والرقم) والإكمال التلقائي
+# وتعبئة القائمة المنسدلة بالأصناف بدون نسخها إلى عناصر Qt
+try:
+    from pages.product_catalog import get_product_catalog
+    from pages.product_search import ProductCompleter, set_product_items
+except ImportError:
+    from product_catalog import get_product_catalog
+    from product_search import ProductCompleter, set_product_items
+
 # ✅ استيراد الصفحات من مجلد pages
 print("✅ تحميل صفحة فواتير الزبون...")
 # ✅ استيراد صفحة الدفعات
@@ -209,66 +267,17 @@ class ReservationDialog(QDialog):
             enter_shortcut.setEnabled(False)
 
     def load_products_from_database(self):
-        """✅ تحميل الأصناف من قاعدة البيانات"""
+        """✅ الأصناف من الكتالوج المشترك (يحمل من قاعدة البيانات عند التغيير فقط)"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            
-            c.execute("""
-                SELECT 
-                    id, name, buy_unit, sell_unit, buy_price, sell_price, 
-                    quantity, currency 
-                FROM Items 
-                ORDER BY name
-            """)
-            
-            products = []
-            for row in c.fetchall():
-                product = {
-                    'id': row[0],
-                    'name': row[1],
-                    'buy_unit': row[2],
-                    'sell_unit': row[3],
-                    'buy_price': float(row[4]),
-                    'sell_price': float(row[5]),
-                    'stock': float(row[6]),
-                    'currency': row[7]
-                }
-                
-                # ✅ تحويل الأسعار بناءً على العملة وسعر الصرف الحالي
-                if product['currency'].upper() == 'LBP':
-                    product['buy_price_usd'] = product['buy_price'] / self.exchange_rate
-                    product['sell_price_usd'] = product['sell_price'] / self.exchange_rate
-                else:
-                    product['buy_price_usd'] = product['buy_price']
-                    product['sell_price_usd'] = product['sell_price']
-                
-                products.append(product)
-            
-            conn.close()
-            return products
-            
+            return get_product_catalog().products(self.exchange_rate)
         except Exception as e:
             print(f"❌ خطأ في تحميل الأصناف من قاعدة البيانات: {e}")
             return []
 
     def get_item_sell_units(self, item_id):
-        """✅ جلب وحدات المبيع الخاصة بصنف معين من قاعدة البيانات"""
+        """✅ وحدات المبيع الخاصة بصنف معين من الكتالوج المشترك"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            c.execute("SELECT sell_unit FROM ItemSellUnits WHERE item_id=? ORDER BY sell_unit", (item_id,))
-            units = [row[0] for row in c.fetchall()]
-            conn.close()
-            
-            if not units:
-                c.execute("SELECT sell_unit FROM Items WHERE id=?", (item_id,))
-                default_unit = c.fetchone()
-                if default_unit and default_unit[0]:
-                    units = [default_unit[0]]
-            
-            return units if units else ["قطعة"]
-            
+            return get_product_catalog().sell_units(item_id)
         except Exception as e:
             print(f"❌ خطأ في جلب وحدات المبيع للصنف {item_id}: {e}")
             return ["قطعة"]
@@ -449,10 +458,14 @@ class ReservationDialog(QDialog):
             }
         """)
         if self.products:
-            self.product_combo.addItems([p['name'] for p in self.products])
+            set_product_items(self.product_combo, self.products)
         else:
             self.product_combo.addItems(["لا توجد أصناف - الرجاء إضافة أصناف من صفحة الإدارة"])
         self.product_combo.currentIndexChanged.connect(self.on_product_changed)
+        if self.products:
+            # ✅ بحث سريع بالكتابة (أفضل النتائج من فهرس البادئات)
+            self.product_completer = ProductCompleter(
+                self.product_combo, get_product_catalog().search_index(self.products))
         
         # ✅ حقل وحدات المبيع
         self.unit_combo = QComboBox()
@@ -821,23 +834,20 @@ class ReservationDialog(QDialog):
                 self.items_table.blockSignals(False)
 
     def get_product_by_name(self, product_name):
-        """الحصول على بيانات المنتج بالاسم"""
-        for product in self.products:
-            if product['name'] == product_name:
-                return product
-        return None
+        """الحصول على بيانات المنتج بالاسم (فهرس الكتالوج بدلاً من البحث الخطي)"""
+        return get_product_catalog().get_by_name(product_name)
 
     def check_stock_availability(self, product_name, quantity):
         """التحقق من توفر المخزون"""
-        for product in self.products:
-            if product['name'] == product_name:
-                if quantity > product['stock']:
-                    reply = self.show_message("المخزون تحذير", 
-                        f"المتاح المخزون ({product['stock']}) {product_name} لأصناف ({quantity}) المطلوبة الكمية تتجاوز",
-                        "warning", True)
-                    return reply == QMessageBox.Yes
-                return True
-        return False
+        product = self.get_product_by_name(product_name)
+        if product is None:
+            return False
+        if quantity > product['stock']:
+            reply = self.show_message("المخزون تحذير", 
+                f"المتاح المخزون ({product['stock']}) {product_name} لأصناف ({quantity}) المطلوبة الكمية تتجاوز",
+                "warning", True)
+            return reply == QMessageBox.Yes
+        return True
 
     def add_item(self):
         """✅ ✅ ✅ إضافة صنف إلى الحجز مع وحدة المبيع المحددة"""
@@ -1030,23 +1040,8 @@ class ReservationDialog(QDialog):
         try:
             reservations_file = "data/customer_reservations.json"
             
-            # ✅ التأكد من وجود المجلد والملف
-            os.makedirs(os.path.dirname(reservations_file), exist_ok=True)
-            
-            reservations = []
-            if os.path.exists(reservations_file):
-                try:
-                    with open(reservations_file, 'r', encoding='utf-8') as f:
-                        reservations = json.load(f)
-                except:
-                    reservations = []
-            
-            # ✅ إضافة الحجز الجديد
-            reservations.append(reservation_data)
-            
-            # ✅ حفظ الملف
-            with open(reservations_file, 'w', encoding='utf-8') as f:
-                json.dump(reservations, f, ensure_ascii=False, indent=2)
+            # ✅ إضافة الحجز الجديد (سجل واحد في ملف التعديلات)
+            get_json_repository().append(reservations_file, reservation_data, key='reservation_uuid')
                 
             print(f"✅ تم حفظ الحجز في customer_reservations.json:")
             print(f"   - رقم الحجز: {reservation_data['reservation_number']}")
@@ -1123,12 +1118,7 @@ class WithdrawalDialog(QDialog):
     def load_customer_reservations(self):
         """✅ تحميل حجوزات الزبون"""
         try:
-            reservations_file = "data/customer_reservations.json"
-            if not os.path.exists(reservations_file):
-                return []
-            
-            with open(reservations_file, 'r', encoding='utf-8') as f:
-                reservations = json.load(f)
+            reservations = get_json_repository().read("data/customer_reservations.json", [])
             
             customer_reservations = []
             for reservation in reservations:
@@ -1714,12 +1704,11 @@ class WithdrawalDialog(QDialog):
         """✅ تحديث ملف الحجوزات بعد السحب"""
         try:
             reservations_file = "data/customer_reservations.json"
-            if not os.path.exists(reservations_file):
+            repository = get_json_repository()
+            reservations = repository.load(reservations_file)
+            if reservations is None:
                 return
             
-            with open(reservations_file, 'r', encoding='utf-8') as f:
-                reservations = json.load(f)
-            
             # ✅ تحديث كل حجز بناءً على عمليات السحب
             for withdrawal_item in self.withdrawal_items:
                 for reservation in reservations:
@@ -1743,8 +1732,7 @@ class WithdrawalDialog(QDialog):
                     updated_reservations.append(reservation)
             
             # ✅ حفظ الملف المحدث
-            with open(reservations_file, 'w', encoding='utf-8') as f:
-                json.dump(updated_reservations, f, ensure_ascii=False, indent=2)
+            repository.save(reservations_file, updated_reservations)
             
             print(f"✅ تم تحديث الحجوزات بعد السحب - بقي {len(updated_reservations)} حجز")
                 
@@ -2111,30 +2099,25 @@ class PaymentDialog(QDialog):
     def calculate_real_remaining_amount(self):
         """✅ ✅ ✅ التعديل الهام: حساب المبلغ المتبقي الحقيقي من قاعدة البيانات"""
         try:
-            # ✅ الحصول على بيانات الفاتورة الحقيقية من ملف customers.json
-            with open("data/customers.json", 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-            
             invoice_uuid = self.invoice_data.get('invoice_uuid')
             if not invoice_uuid:
                 return self.invoice_data.get('remaining_amount', 0)
-            
-            for customer in customers:
-                invoices = customer.get('invoices', [])
-                for invoice in invoices:
-                    if invoice.get('invoice_uuid') == invoice_uuid:
-                        # ✅ حساب المبلغ المتبقي الحقيقي
-                        total_usd = invoice.get('total_usd', 0)
-                        paid_amount = invoice.get('paid_amount', 0)
-                        real_remaining = total_usd - paid_amount
-                        
-                        print(f"💰 حساب المبلغ المتبقي الحقيقي:")
-                        print(f"   - الإجمالي: {total_usd:.2f} $")
-                        print(f"   - المدفوع: {paid_amount:.2f} $")
-                        print(f"   - المتبقي: {real_remaining:.2f} $")
-                        
-                        return max(0, real_remaining)
-            
+
+            # ✅ الحصول على بيانات الفاتورة الحقيقية من مخزن الزبائن
+            invoice = get_customer_store().get_invoice(invoice_uuid)
+            if invoice:
+                # ✅ حساب المبلغ المتبقي الحقيقي
+                total_usd = invoice.get('total_usd', 0)
+                paid_amount = invoice.get('paid_amount', 0)
+                real_remaining = total_usd - paid_amount
+
+                print(f"💰 حساب المبلغ المتبقي الحقيقي:")
+                print(f"   - الإجمالي: {total_usd:.2f} $")
+                print(f"   - المدفوع: {paid_amount:.2f} $")
+                print(f"   - المتبقي: {real_remaining:.2f} $")
+
+                return max(0, real_remaining)
+
             # ✅ إذا لم نجد الفاتورة، نستخدم القيمة المخزنة
             return self.invoice_data.get('remaining_amount', 0)
             
@@ -2148,19 +2131,12 @@ class PaymentDialog(QDialog):
             # ✅ الوصول إلى parent (CustomerInvoicesPage) الذي يحتوي على البيانات
             parent = self.parent()
             if hasattr(parent, 'customer_name') and hasattr(parent, 'phone_number'):
-                with open("data/customers.json", 'r', encoding='utf-8') as f:
-                    customers = json.load(f)
-            
-                for customer in customers:
-                    if (customer.get('name') == parent.customer_name and 
-                        customer.get('phone') == parent.phone_number):
-                    
-                        invoices = customer.get('invoices', [])
-                        for index, invoice in enumerate(invoices):
-                            if invoice.get('invoice_uuid') == invoice_uuid:
-                            # ✅ الرقم الحقيقي هو index + 1 (نفس آلية صفحة الفواتير)
-                                return str(index + 1)
-        
+                # ✅ الرقم الحقيقي هو ترتيب الفاتورة بين فواتير الزبون (نفس آلية صفحة الفواتير)
+                display_number = get_customer_store().get_invoice_display_number(
+                    parent.customer_name, parent.phone_number, invoice_uuid)
+                if display_number is not None:
+                    return str(display_number)
+
             return self.invoice_data.get('invoice_number', '')
         except Exception as e:
             print(f"❌ خطأ في الحصول على رقم العرض: {e}")
@@ -2258,6 +2234,7 @@ class InstallmentInvoiceDialog(QDialog):
         self.is_editing = invoice_data is not None
         self.original_invoice_data = invoice_data
         self.parent = parent  # ✅ حفظ المرجع للوصول إلى دالة حفظ الدفعات
+        self.initial_payment = None  # ✅ الدفعة الأولى - ترسل بعد حفظ الفاتورة (send_initial_payment)
         
         # ✅ ضبط حجم النافذة
         screen = self.screen()
@@ -2340,66 +2317,17 @@ class InstallmentInvoiceDialog(QDialog):
             enter_shortcut.setEnabled(False)
 
     def load_products_from_database(self):
-        """✅ تحميل الأصناف من قاعدة البيانات مع تحديث الأسعار بناءً على سعر الصرف"""
+        """✅ الأصناف من الكتالوج المشترك (يحمل من قاعدة البيانات عند التغيير فقط)"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            
-            c.execute("""
-                SELECT 
-                    id, name, buy_unit, sell_unit, buy_price, sell_price, 
-                    quantity, currency 
-                FROM Items 
-                ORDER BY name
-            """)
-            
-            products = []
-            for row in c.fetchall():
-                product = {
-                    'id': row[0],
-                    'name': row[1],
-                    'buy_unit': row[2],
-                    'sell_unit': row[3],
-                    'buy_price': float(row[4]),
-                    'sell_price': float(row[5]),
-                    'stock': float(row[6]),
-                    'currency': row[7]
-                }
-                
-                # ✅ تحويل الأسعار بناءً على العملة وسعر الصرف الحالي
-                if product['currency'].upper() == 'LBP':
-                    product['buy_price_usd'] = product['buy_price'] / self.exchange_rate
-                    product['sell_price_usd'] = product['sell_price'] / self.exchange_rate
-                else:
-                    product['buy_price_usd'] = product['buy_price']
-                    product['sell_price_usd'] = product['sell_price']
-                
-                products.append(product)
-            
-            conn.close()
-            return products
-            
+            return get_product_catalog().products(self.exchange_rate)
         except Exception as e:
             print(f"❌ خطأ في تحميل الأصناف من قاعدة البيانات: {e}")
             return []
 
     def get_item_sell_units(self, item_id):
-        """✅ جلب وحدات المبيع الخاصة بصنف معين من قاعدة البيانات"""
+        """✅ وحدات المبيع الخاصة بصنف معين من الكتالوج المشترك"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            c.execute("SELECT sell_unit FROM ItemSellUnits WHERE item_id=? ORDER BY sell_unit", (item_id,))
-            units = [row[0] for row in c.fetchall()]
-            conn.close()
-            
-            if not units:
-                c.execute("SELECT sell_unit FROM Items WHERE id=?", (item_id,))
-                default_unit = c.fetchone()
-                if default_unit and default_unit[0]:
-                    units = [default_unit[0]]
-            
-            return units if units else ["قطعة"]
-            
+            return get_product_catalog().sell_units(item_id)
         except Exception as e:
             print(f"❌ خطأ في جلب وحدات المبيع للصنف {item_id}: {e}")
             return ["قطعة"]
@@ -2613,10 +2541,14 @@ class InstallmentInvoiceDialog(QDialog):
             }
         """)
         if self.products:
-            self.product_combo.addItems([p['name'] for p in self.products])
+            set_product_items(self.product_combo, self.products)
         else:
             self.product_combo.addItems(["لا توجد أصناف - الرجاء إضافة أصناف من صفحة الإدارة"])
         self.product_combo.currentIndexChanged.connect(self.on_product_changed)
+        if self.products:
+            # ✅ بحث سريع بالكتابة (أفضل النتائج من فهرس البادئات)
+            self.product_completer = ProductCompleter(
+                self.product_combo, get_product_catalog().search_index(self.products))
         
         # ✅ حقل وحدات المبيع
         self.unit_combo = QComboBox()
@@ -3115,38 +3047,30 @@ class InstallmentInvoiceDialog(QDialog):
     def update_stock_quantity_single(self, product_id, quantity, operation):
         """✅ تحديث كمية مخزون صنف واحد - فوري"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            
-            if operation == "subtract":
-                c.execute("UPDATE Items SET quantity = quantity - ? WHERE id = ?", (quantity, product_id))
-            elif operation == "add":
-                c.execute("UPDATE Items SET quantity = quantity + ? WHERE id = ?", (quantity, product_id))
-            
-            conn.commit()
-            conn.close()
+            sign = -1 if operation == "subtract" else 1
+            with get_db(DB_PATH).transaction() as conn:
+                conn.execute("UPDATE Items SET quantity = quantity + ? WHERE id = ?", (sign * quantity, product_id))
+            # ✅ رقم الصنف المعدل لكي تحدث الصفحات صفه فقط
+            bump_version('stock', keys=(product_id,))
             
         except Exception as e:
             print(f"❌ خطأ في تحديث المخزون: {e}")
 
     def get_product_by_name(self, product_name):
-        """الحصول على بيانات المنتج بالاسم"""
-        for product in self.products:
-            if product['name'] == product_name:
-                return product
-        return None
+        """الحصول على بيانات المنتج بالاسم (فهرس الكتالوج بدلاً من البحث الخطي)"""
+        return get_product_catalog().get_by_name(product_name)
 
     def check_stock_availability(self, product_name, quantity):
         """التحقق من توفر المخزون"""
-        for product in self.products:
-            if product['name'] == product_name:
-                if quantity > product['stock']:
-                    reply = self.show_message("المخزون تحذير", 
-                        f"المتاح المخزون ({product['stock']}) {product_name} لأصناف ({quantity}) المطلوبة الكمية تتجاوز",
-                        "warning", True)
-                    return reply == QMessageBox.Yes
-                return True
-        return False
+        product = self.get_product_by_name(product_name)
+        if product is None:
+            return False
+        if quantity > product['stock']:
+            reply = self.show_message("المخزون تحذير", 
+                f"المتاح المخزون ({product['stock']}) {product_name} لأصناف ({quantity}) المطلوبة الكمية تتجاوز",
+                "warning", True)
+            return reply == QMessageBox.Yes
+        return True
 
     def add_item(self):
         """✅ ✅ ✅ إضافة صنف إلى الفاتورة مع وحدة المبيع المحددة"""
@@ -3377,8 +3301,8 @@ class InstallmentInvoiceDialog(QDialog):
                 invoice_data['payments'].append(initial_payment)
                 print(f"✅ تم إضافة دفعة أولية: {paid_amount} $")
                 
-                # ✅ ✅ ✅ التعديل الجديد: إرسال الدفعة تلقائياً إلى صفحة الدفعات
-                self.send_payment_to_payments_page(invoice_data, initial_payment)
+                # ✅ ترسل إلى صفحة الدفعات بعد حفظ الفاتورة في القاعدة (send_initial_payment)
+                self.initial_payment = initial_payment
             
             self.invoice_data = invoice_data
             self.accept()
@@ -3386,6 +3310,16 @@ class InstallmentInvoiceDialog(QDialog):
         except Exception as e:
             self.show_message("خطأ", f"في الحفظ خطأ حدث: {e}", "error")
     
+    def send_initial_payment(self):
+        """✅ إرسال الدفعة الأولى إلى ملف دفعات الزبون بعد حفظ الفاتورة
+
+        الفاتورة (SQLite) والدفعة (ملف JSON) حفظان منفصلان - الفاتورة أولاً، لذلك
+        الانقطاع بينهما يترك فاتورة بدون دفعتها الأولى وليس دفعة لفاتورة غير موجودة.
+        """
+        if self.initial_payment is not None:
+            self.send_payment_to_payments_page(self.invoice_data, self.initial_payment)
+            self.initial_payment = None
+
     def send_payment_to_payments_page(self, invoice_data, payment_data):
         """✅ ✅ ✅ إرسال الدفعة تلقائياً إلى صفحة الدفعات عند حفظ فاتورة التقسيط"""
         try:
@@ -3395,18 +3329,9 @@ class InstallmentInvoiceDialog(QDialog):
                 customer_name = self.parent.customer_name
                 phone_number = self.parent.phone_number
                 
-                payments_file = "data/customer_payments.json"
-                
-                # ✅ التأكد من وجود المجلد والملف
-                os.makedirs(os.path.dirname(payments_file), exist_ok=True)
-                
-                payments = []
-                if os.path.exists(payments_file):
-                    try:
-                        with open(payments_file, 'r', encoding='utf-8') as f:
-                            payments = json.load(f)
-                    except:
-                        payments = []
+                # ✅ دفعات هذا الزبون فقط (من ملفه)
+                store = get_customer_payments_store()
+                payments = store.customer_payments(phone_number)
                 
                 # ✅ إنشاء معرف فريد للدفعة
                 payment_id = f"{customer_id}_{invoice_data.get('invoice_uuid', '')}_{payment_data['date']}_{payment_data['amount']}"
@@ -3431,6 +3356,7 @@ class InstallmentInvoiceDialog(QDialog):
                         'customer_phone': phone_number,
                         'invoice_number': invoice_data.get('invoice_number', ''),
                         'invoice_uuid': invoice_data.get('invoice_uuid', ''),  # ✅ إضافة UUID للفاتورة
+                        'payment_uuid': str(uuid.uuid4()),  # ✅ إضافة UUID للدفعة
                         'amount': payment_data['amount'],
                         'date': payment_data['date'],
                         'time': datetime.now().strftime('%H:%M:%S'),
@@ -3440,11 +3366,8 @@ class InstallmentInvoiceDialog(QDialog):
                         'type': 'دفعة أولى - فاتورة تقسيط'
                     }
                     
-                    payments.append(new_payment)
-                    
-                    # ✅ حفظ الملف
-                    with open(payments_file, 'w', encoding='utf-8') as f:
-                        json.dump(payments, f, ensure_ascii=False, indent=2)
+                    # ✅ حفظ الدفعة (سجل واحد في ملف التعديلات)
+                    store.add_payment(new_payment)
                         
                     print(f"✅ تم إرسال الدفعة تلقائياً إلى صفحة الدفعات:")
                     print(f"   - الزبون: {customer_name}")
@@ -3462,7 +3385,7 @@ class InstallmentInvoiceDialog(QDialog):
                             'date': payment_data['date']
                         })
                 else:
-                    print(f"⚠️ الدفعة موجودة مسبقاً في customer_payments.json")
+                    print(f"⚠️ الدفعة موجودة مسبقاً في ملف دفعات الزبون")
                     
             else:
                 print("❌ لم يتم العثور على بيانات الزبون في الـ parent")
@@ -3846,66 +3769,17 @@ class CashInvoiceDialog(QDialog):
             enter_shortcut.setEnabled(False)
 
     def load_products_from_database(self):
-        """✅ تحميل الأصناف من قاعدة البيانات مع تحديث الأسعار بناءً على سعر الصرف"""
+        """✅ الأصناف من الكتالوج المشترك (يحمل من قاعدة البيانات عند التغيير فقط)"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            
-            c.execute("""
-                SELECT 
-                    id, name, buy_unit, sell_unit, buy_price, sell_price, 
-                    quantity, currency 
-                FROM Items 
-                ORDER BY name
-            """)
-            
-            products = []
-            for row in c.fetchall():
-                product = {
-                    'id': row[0],
-                    'name': row[1],
-                    'buy_unit': row[2],
-                    'sell_unit': row[3],
-                    'buy_price': float(row[4]),
-                    'sell_price': float(row[5]),
-                    'stock': float(row[6]),
-                    'currency': row[7]
-                }
-                
-                # ✅ تحويل الأسعار بناءً على العملة وسعر الصرف الحالي
-                if product['currency'].upper() == 'LBP':
-                    product['buy_price_usd'] = product['buy_price'] / self.exchange_rate
-                    product['sell_price_usd'] = product['sell_price'] / self.exchange_rate
-                else:
-                    product['buy_price_usd'] = product['buy_price']
-                    product['sell_price_usd'] = product['sell_price']
-                
-                products.append(product)
-            
-            conn.close()
-            return products
-            
+            return get_product_catalog().products(self.exchange_rate)
         except Exception as e:
             print(f"❌ خطأ في تحميل الأصناف من قاعدة البيانات: {e}")
             return []
 
     def get_item_sell_units(self, item_id):
-        """✅ جلب وحدات المبيع الخاصة بصنف معين من قاعدة البيانات"""
+        """✅ وحدات المبيع الخاصة بصنف معين من الكتالوج المشترك"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            c.execute("SELECT sell_unit FROM ItemSellUnits WHERE item_id=? ORDER BY sell_unit", (item_id,))
-            units = [row[0] for row in c.fetchall()]
-            conn.close()
-            
-            if not units:
-                c.execute("SELECT sell_unit FROM Items WHERE id=?", (item_id,))
-                default_unit = c.fetchone()
-                if default_unit and default_unit[0]:
-                    units = [default_unit[0]]
-            
-            return units if units else ["قطعة"]
-            
+            return get_product_catalog().sell_units(item_id)
         except Exception as e:
             print(f"❌ خطأ في جلب وحدات المبيع للصنف {item_id}: {e}")
             return ["قطعة"]
@@ -4119,10 +3993,14 @@ class CashInvoiceDialog(QDialog):
             }
         """)
         if self.products:
-            self.product_combo.addItems([p['name'] for p in self.products])
+            set_product_items(self.product_combo, self.products)
         else:
             self.product_combo.addItems(["لا توجد أصناف - الرجاء إضافة أصناف من صفحة الإدارة"])
         self.product_combo.currentIndexChanged.connect(self.on_product_changed)
+        if self.products:
+            # ✅ بحث سريع بالكتابة (أفضل النتائج من فهرس البادئات)
+            self.product_completer = ProductCompleter(
+                self.product_combo, get_product_catalog().search_index(self.products))
         
         # ✅ حقل وحدات المبيع
         self.unit_combo = QComboBox()
@@ -4515,38 +4393,30 @@ class CashInvoiceDialog(QDialog):
     def update_stock_quantity_single(self, product_id, quantity, operation):
         """✅ تحديث كمية مخزون صنف واحد - فوري"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            
-            if operation == "subtract":
-                c.execute("UPDATE Items SET quantity = quantity - ? WHERE id = ?", (quantity, product_id))
-            elif operation == "add":
-                c.execute("UPDATE Items SET quantity = quantity + ? WHERE id = ?", (quantity, product_id))
-            
-            conn.commit()
-            conn.close()
+            sign = -1 if operation == "subtract" else 1
+            with get_db(DB_PATH).transaction() as conn:
+                conn.execute("UPDATE Items SET quantity = quantity + ? WHERE id = ?", (sign * quantity, product_id))
+            # ✅ رقم الصنف المعدل لكي تحدث الصفحات صفه فقط
+            bump_version('stock', keys=(product_id,))
             
         except Exception as e:
             print(f"❌ خطأ في تحديث المخزون: {e}")
 
     def get_product_by_name(self, product_name):
-        """الحصول على بيانات المنتج بالاسم"""
-        for product in self.products:
-            if product['name'] == product_name:
-                return product
-        return None
+        """الحصول على بيانات المنتج بالاسم (فهرس الكتالوج بدلاً من البحث الخطي)"""
+        return get_product_catalog().get_by_name(product_name)
 
     def check_stock_availability(self, product_name, quantity):
         """التحقق من توفر المخزون"""
-        for product in self.products:
-            if product['name'] == product_name:
-                if quantity > product['stock']:
-                    reply = self.show_message("المخزون تحذير", 
-                        f"المتاح المخزون ({product['stock']}) {product_name} لأصناف ({quantity}) المطلوبة الكمية تتجاوز",
-                        "warning", True)
-                    return reply == QMessageBox.Yes
-                return True
-        return False
+        product = self.get_product_by_name(product_name)
+        if product is None:
+            return False
+        if quantity > product['stock']:
+            reply = self.show_message("المخزون تحذير", 
+                f"المتاح المخزون ({product['stock']}) {product_name} لأصناف ({quantity}) المطلوبة الكمية تتجاوز",
+                "warning", True)
+            return reply == QMessageBox.Yes
+        return True
 
     def add_item(self):
         """✅ ✅ ✅ إضافة صنف إلى الفاتورة مع وحدة المبيع المحددة"""
@@ -5049,10 +4919,9 @@ class CustomerInvoicesPage(QWidget):
         self.customer_name = customer_name
         self.phone_number = phone_number
         self.exchange_rate = self.load_exchange_rate()
-        self.all_invoices = []  # ✅ تخزين جميع الفواتير للبحث
-        self.filtered_invoices = []  # ✅ تخزين الفواتير المصفاة للبحث
-        self.refresh_timer = QTimer()  # ✅ إضافة مؤقت للتحديث التلقائي
-        self.setup_refresh_timer()  # ✅ إعداد المؤقت
+        self.all_invoices = []  # ✅ تخزين جميع الفواتير (البحث يتم عبر proxy الجدول)
+        self.invoice_index = InvertedIndex()  # ✅ كلمات العنوان والأصناف -> UUID الفواتير
+        self.invoice_rows = {}  # ✅ UUID الفاتورة -> رقم صفها (يحدث مع الفهرس)
         
         # ✅ ضبط حجم النافذة ليكون بحجم الشاشة مع إمكانية التصغير
         screen = self.screen()
@@ -5065,6 +4934,7 @@ class CustomerInvoicesPage(QWidget):
         self.setup_ui()
         self.load_customer_data()
         self.setup_keyboard_shortcuts()  # ✅ ✅ ✅ إضافة اختصارات الكيبورد
+        self.setup_data_subscription()  # ✅ التحديث عند تغير البيانات فقط
         
     def setup_keyboard_shortcuts(self):
         """✅ ✅ ✅ إعداد اختصارات الكيبورد"""
@@ -5084,51 +4954,21 @@ class CustomerInvoicesPage(QWidget):
         if hasattr(self, 'delete_message_box') and self.delete_message_box.isVisible():
             self.delete_message_box.accept()
     
-    def setup_refresh_timer(self):
-        """✅ إعداد المؤقت للتحديث التلقائي"""
-        self.refresh_timer.timeout.connect(self.auto_refresh_data)
-        self.refresh_timer.start(2000)  # ✅ تحديث كل 2 ثانية
+    def setup_data_subscription(self):
+        """✅ إعادة التحميل فقط عند تغير إصدار بيانات الزبائن (بدلاً من الفحص كل 2 ثانية)"""
+        self.data_subscription = subscribe_domains(self, ('customers',), self.auto_refresh_data)
     
     def auto_refresh_data(self):
         """✅ التحديث التلقائي للبيانات"""
-        try:
-            # ✅ التحقق من وجود تغييرات في ملف customers.json
-            current_stats = self.get_current_customer_stats()
-            if hasattr(self, 'last_known_stats'):
-                if current_stats != self.last_known_stats:
-                    print("🔄 اكتشاف تغييرات في البيانات - إعادة التحميل...")
-                    self.load_customer_data()
-            
-            self.last_known_stats = current_stats
-        except Exception as e:
-            print(f"⚠️ خطأ في التحديث التلقائي: {e}")
-    
-    def get_current_customer_stats(self):
-        """✅ الحصول على الإحصائيات الحالية للزبون"""
-        try:
-            with open("data/customers.json", 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-            
-            for customer in customers:
-                if (customer.get('name') == self.customer_name and 
-                    customer.get('phone') == self.phone_number):
-                    return {
-                        'total_paid': customer.get('total_paid', 0),
-                        'total_remaining': customer.get('total_remaining', 0),
-                        'invoices_count': len(customer.get('invoices', []))
-                    }
-            return {}
-        except:
-            return {}
+        print("🔄 اكتشاف تغييرات في البيانات - إعادة التحميل...")
+        self.load_customer_data()
     
     def load_exchange_rate(self):
         """تحميل سعر الصرف"""
         try:
-            exchange_file = "data/exchange_rate.json"
-            if os.path.exists(exchange_file):
-                with open(exchange_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return data.get('exchange_rate', 89000)
+            data = get_json_repository().read("data/exchange_rate.json")
+            if data:
+                return data.get('exchange_rate', 89000)
             return 89000
         except:
             return 89000
@@ -5368,7 +5208,6 @@ class CustomerInvoicesPage(QWidget):
                 background-color: #f8f9fa;
             }
         """)
-        self.quick_search_input.textChanged.connect(self.search_invoices)
         
         # ✅ محرك البحث بالتاريخ
         self.date_search_input = QLineEdit()
@@ -5390,7 +5229,9 @@ class CustomerInvoicesPage(QWidget):
                 background-color: #f8f9fa;
             }
         """)
-        self.date_search_input.textChanged.connect(self.search_invoices)
+        
+        self.search_controller = SearchController(self, self.prepare_invoice_search, self.apply_invoice_search)
+        self.search_controller.connect_inputs(self.quick_search_input, self.date_search_input)
         
         self.search_layout.addWidget(self.quick_search_input)
         self.search_layout.addWidget(self.date_search_input)
@@ -5534,20 +5375,58 @@ class CustomerInvoicesPage(QWidget):
         self.stats_layout.addWidget(self.remaining_group)
         self.stats_layout.addStretch()
 
+    @staticmethod
+    def format_invoice_date(invoice, row):
+        """✅ التاريخ - تحويل التنسيق إذا كان yyyy-mm-dd إلى dd-mm-yyyy"""
+        date_str = invoice.get('date', '')
+        if date_str and '-' in date_str and len(date_str) == 10:
+            parts = date_str.split('-')
+            if len(parts[0]) == 4:  # إذا السنة أولاً
+                date_str = f"{parts[2]}-{parts[1]}-{parts[0]}"
+        return date_str
+
+    @staticmethod
+    def invoice_status(invoice):
+        """✅ الحالة بناءً على المبلغ المتبقي الحقيقي"""
+        if invoice.get('type', 'نقدي') == 'نقدي':
+            return "مكتمل"
+        remaining_amount = invoice.get('total_usd', 0) - invoice.get('paid_amount', 0)
+        # ✅ استخدام عتبة 0.009 بدلاً من 0.01 لتجنب مشاكل التقريب
+        return "مكتمل" if abs(remaining_amount) < 0.009 else "معلق"
+
+    @staticmethod
+    def invoice_payments_text(invoice, row):
+        if invoice.get('type', 'نقدي') != 'تقسيط':
+            return "---"
+        payments_count = len(invoice.get('payments', []))
+        return f"{payments_count} دفعة" if payments_count > 0 else "لا توجد دفعات"
+
+    @staticmethod
+    def format_usd(invoice, row):
+        total_usd = invoice.get('total_usd', 0)
+        return f"{int(total_usd)} $" if total_usd == int(total_usd) else f"{total_usd:.2f} $"
+
     def setup_invoices_table(self):
         """إنشاء جدول الفواتير - معدل"""
-        self.invoices_table = QTableWidget()
-        self.invoices_table.setColumnCount(6)  # ✅ إضافة عمود جديد للدفعات
-        self.invoices_table.setHorizontalHeaderLabels([
-    "رقم", "التاريخ", "النوع", "المبلغ ($)", "الحالة", "الدفعات"
-        ])
+        self.invoices_table = RecordTableView([
+            # ✅ رقم الفاتورة (الترتيب التلقائي) - يبدأ من 1 لكل زبون ولا يتغير عند البحث
+            Column("رقم", lambda invoice, row: str(row + 1), background="white"),
+            Column("التاريخ", self.format_invoice_date, align=Qt.AlignRight | Qt.AlignVCenter,
+                   foreground="#2c3e50", background="white", font=shared_font("Arial", 12)),
+            Column("النوع", lambda invoice, row: invoice.get('type', 'نقدي'), background="white",
+                   foreground=lambda invoice: '#e74c3c' if invoice.get('type', 'نقدي') == 'تقسيط' else '#27ae60'),
+            Column("المبلغ ($)", self.format_usd, background="white"),
+            Column("الحالة", lambda invoice, row: self.invoice_status(invoice), background="white",
+                   foreground=lambda invoice: '#e74c3c' if self.invoice_status(invoice) == "معلق" else '#27ae60'),
+            Column("الدفعات", self.invoice_payments_text, background="white"),
+        ], search_key=self.invoice_search_key)
 
         # ✅ محاذاة رأس عمود التاريخ لليمين (يسار الموظف)
         header = self.invoices_table.horizontalHeader()
         header.setDefaultAlignment(Qt.AlignRight)  # ✅ جميع العناوين تبدأ من اليمين
         
         self.invoices_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 background-color: white;
                 border: 2px solid #2c3e50;
                 border-radius: 8px;
@@ -5567,7 +5446,7 @@ class CustomerInvoicesPage(QWidget):
                 font-size: 16px;
                 font-family: Arial;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 12px;
                 border-bottom: 1px solid #ecf0f1;
                 font-size: 14px;
@@ -5575,7 +5454,7 @@ class CustomerInvoicesPage(QWidget):
                 font-family: Arial;
                 background-color: white;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #3498db;
                 color: white;
             }
@@ -5585,34 +5464,25 @@ class CustomerInvoicesPage(QWidget):
         self.invoices_table.setFocusPolicy(Qt.NoFocus)
         
         self.invoices_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.invoices_table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.invoices_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.invoices_table.setSelectionBehavior(RecordTableView.SelectRows)
         
         # ✅ تعديل: الضغط المزدوج على أي مكان في الصف لفتح الفاتورة
         self.invoices_table.doubleClicked.connect(self.open_invoice_details)
 
     def open_invoice_details(self, index):
         """✅ ✅ ✅ إصلاح: فتح تفاصيل الفاتورة الصحيحة بعد البحث"""
-        selected_row = self.invoices_table.currentRow()
-        if selected_row >= 0:
+        # ✅ الفاتورة من سجل الصف نفسه (صحيحة حتى أثناء البحث)
+        invoice = self.invoices_table.current_record()
+        if invoice:
             try:
                 # ✅ ✅ ✅ التعديل: إلغاء التحديد المخفي بعد فتح التفاصيل
                 self.clear_selection_after_operation()
                 
-                # ✅ استخدام الفواتير المصفاة إذا كان هناك بحث، وإلا استخدام جميع الفواتير
-                if hasattr(self, 'filtered_invoices') and self.filtered_invoices:
-                    invoices_to_use = self.filtered_invoices
+                # ✅ فتح نافذة تعديل الفاتورة مع إمكانية التعديل
+                if invoice.get('type') == 'نقدي':
+                    self.edit_cash_invoice(invoice)
                 else:
-                    invoices_to_use = self.all_invoices
-                
-                if selected_row < len(invoices_to_use):
-                    invoice = invoices_to_use[selected_row]
-                    
-                    # ✅ فتح نافذة تعديل الفاتورة مع إمكانية التعديل
-                    if invoice.get('type') == 'نقدي':
-                        self.edit_cash_invoice(invoice)
-                    else:
-                        self.edit_installment_invoice(invoice)
+                    self.edit_installment_invoice(invoice)
                     
             except Exception as e:
                 self.show_message("خطأ", f"حدث خطأ في فتح الفاتورة: {e}", "error")
@@ -5650,7 +5520,8 @@ class CustomerInvoicesPage(QWidget):
             
             if invoice_dialog.exec() == QDialog.Accepted:
                 new_invoice_data = invoice_dialog.get_invoice_data()
-                self.update_customer_invoice(invoice_data, new_invoice_data)
+                if self.update_customer_invoice(invoice_data, new_invoice_data):
+                    invoice_dialog.send_initial_payment()
                 
         except Exception as e:
             self.show_message("خطأ", f"حدث خطأ في تعديل الفاتورة: {e}", "error")
@@ -5658,34 +5529,20 @@ class CustomerInvoicesPage(QWidget):
     def update_customer_invoice(self, old_invoice_data, new_invoice_data):
         """✅ تحديث الفاتورة بعد التعديل"""
         try:
-            with open("data/customers.json", 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-            
-            for customer in customers:
-                if (customer.get('name') == self.customer_name and 
-                    customer.get('phone') == self.phone_number):
-                    
-                    invoices = customer.get('invoices', [])
-                    for i, invoice in enumerate(invoices):
-                        if invoice.get('invoice_uuid') == old_invoice_data.get('invoice_uuid'):
-                            # ✅ استعادة المخزون من الفاتورة القديمة
-                            self.update_stock_quantity(old_invoice_data.get('items', []), "add")
-                            
-                            # ✅ تحديث الفاتورة بالبيانات الجديدة
-                            invoices[i] = new_invoice_data
-                            
-                            # ✅ خصم المخزون للفاتورة الجديدة
-                            self.update_stock_quantity(new_invoice_data.get('items', []), "subtract")
-                            
-                            # ✅ تحديث إحصائيات الزبون
-                            self.update_customer_stats(customer, old_invoice_data, new_invoice_data)
-                            break
-                    
-                    break
-            
-            with open("data/customers.json", 'w', encoding='utf-8') as f:
-                json.dump(customers, f, ensure_ascii=False, indent=2)
-            
+            # ✅ الفاتورة والمخزون في معاملة واحدة - إما يحفظ الكل أو لا شيء
+            with get_db(DB_PATH).transaction():
+                # ✅ تحديث صف الفاتورة وأصنافها وإحصائيات الزبون فقط
+                updated = get_customer_store().update_invoice(
+                    self.customer_name, self.phone_number,
+                    old_invoice_data.get('invoice_uuid'), new_invoice_data)
+
+                if updated is not None:
+                    # ✅ استعادة المخزون من الفاتورة القديمة
+                    self.update_stock_quantity(old_invoice_data.get('items', []), "add")
+
+                    # ✅ خصم المخزون للفاتورة الجديدة
+                    self.update_stock_quantity(new_invoice_data.get('items', []), "subtract")
+
             # ✅ ✅ ✅ التعديل: إلغاء التحديد المخفي بعد التعديل
             self.clear_selection_after_operation()
             
@@ -5693,29 +5550,11 @@ class CustomerInvoicesPage(QWidget):
             self.load_customer_data()
             
             self.show_message("نجاح", "✅ تم تعديل الفاتورة بنجاح", "info")
+            return True
             
         except Exception as e:
             self.show_message("خطأ", f"حدث خطأ في تعديل الفاتورة: {e}", "error")
-
-    def update_customer_stats(self, customer, old_invoice, new_invoice):
-        """✅ تحديث إحصائيات الزبون بعد التعديل"""
-        try:
-            old_total = old_invoice.get('total_usd', 0)
-            new_total = new_invoice.get('total_usd', 0)
-            old_paid = old_invoice.get('paid_amount', 0)
-            new_paid = new_invoice.get('paid_amount', 0)
-            
-            difference_total = new_total - old_total
-            difference_paid = new_paid - old_paid
-            difference_remaining = (new_total - new_paid) - (old_total - old_paid)
-            
-            # ✅ تحديث الإجمالي
-            customer['total_amount'] = customer.get('total_amount', 0) + difference_total
-            customer['total_paid'] = customer.get('total_paid', 0) + difference_paid
-            customer['total_remaining'] = customer.get('total_remaining', 0) + difference_remaining
-            
-        except Exception as e:
-            print(f"❌ خطأ في تحديث إحصائيات الزبون: {e}")
+            return False
 
     def show_invoice_with_payments(self, invoice_data):
         """✅ عرض الفاتورة مع إمكانية إضافة الدفعات"""
@@ -5807,81 +5646,37 @@ class CustomerInvoicesPage(QWidget):
         try:
             print(f"💾 بدء حفظ الدفعة للفاتورة: {invoice_data.get('invoice_number', '')}")
             
-            # 1. حفظ الدفعة في ملف customers.json
-            with open("data/customers.json", 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-            
-            payment_saved = False
+            # ✅ ✅ ✅ التعديل: السماح بإضافة دفعات بنفس المبلغ
+            # ✅ استخدام UUID فريد لكل دفعة بدلاً من التحقق من التكرار
+            payment_data['payment_uuid'] = str(uuid.uuid4())
+            payment_data['invoice_uuid'] = invoice_data.get('invoice_uuid')
+            payment_data['timestamp'] = datetime.now().isoformat()  # ✅ إضافة الطابع الزمني
+
+            # 1. حفظ الدفعة في مخزن الزبائن - صف دفعة واحد وتحديث صف الفاتورة والزبون
+            invoice = get_customer_store().add_invoice_payment(
+                self.customer_name, self.phone_number,
+                invoice_data.get('invoice_uuid'), payment_data)
+
+            payment_saved = invoice is not None
             invoice_updated = False
-            
-            for customer in customers:
-                if (customer.get('name') == self.customer_name and 
-                    customer.get('phone') == self.phone_number):
-                    
-                    invoices = customer.get('invoices', [])
-                    for invoice in invoices:
-                        if invoice.get('invoice_uuid') == invoice_data.get('invoice_uuid'):
-                            # ✅ إضافة الدفعة للفاتورة
-                            if 'payments' not in invoice:
-                                invoice['payments'] = []
-                            
-                            # ✅ ✅ ✅ التعديل: السماح بإضافة دفعات بنفس المبلغ
-                            # ✅ استخدام UUID فريد لكل دفعة بدلاً من التحقق من التكرار
-                            payment_data['payment_uuid'] = str(uuid.uuid4())
-                            payment_data['invoice_uuid'] = invoice_data.get('invoice_uuid')
-                            payment_data['timestamp'] = datetime.now().isoformat()  # ✅ إضافة الطابع الزمني
-
-                            invoice['payments'].append(payment_data)
-                            
-                            # ✅ ✅ ✅ التعديل الهام: حساب المبلغ المتبقي الحقيقي
-                            total_amount = invoice.get('total_usd', 0)
-                            current_paid = invoice.get('paid_amount', 0)
-                            payment_amount = payment_data['amount']
-                            
-                            # ✅ حساب المبلغ المدفوع الجديد
-                            new_paid_amount = current_paid + payment_amount
-                            invoice['paid_amount'] = new_paid_amount
-                            
-                            # ✅ ✅ ✅ التعديل الهام: حساب المبلغ المتبقي مع التقريب الصحيح
-                            real_remaining = total_amount - new_paid_amount
-                            
-                            # ✅ ✅ ✅ التعديل: استخدام تقريب صحيح لتجنب -0.00
-                            if abs(real_remaining) < 0.009:  # إذا كان أقل من 0.01
-                                invoice['remaining_amount'] = 0.0  # ضبط على 0.00 بالضبط
-                            else:
-                                invoice['remaining_amount'] = round(real_remaining, 2)  # تقريب لرقمين عشريين
-                            
-                            print(f"💰 تحديث المبالغ بعد الدفعة:")
-                            print(f"   - الإجمالي: {total_amount:.2f} $")
-                            print(f"   - المدفوع السابق: {current_paid:.2f} $")
-                            print(f"   - الدفعة الجديدة: {payment_amount:.2f} $")
-                            print(f"   - المدفوع الجديد: {new_paid_amount:.2f} $")
-                            print(f"   - المتبقي الحقيقي: {real_remaining:.2f} $")
-                            print(f"   - المتبقي بعد التقريب: {invoice['remaining_amount']:.2f} $")
-                            
-                            # ✅ ✅ ✅ التعديل: التحقق مما إذا كانت الفاتورة اكتملت بعد هذه الدفعة
-                            if invoice['remaining_amount'] <= 0.009:
-                                invoice['remaining_amount'] = 0.0  # تأكيد ضبط المتبقي على صفر
-                                invoice_updated = True
-                                print(f"✅ الفاتورة اكتملت بعد الدفعة! المدفوع: {new_paid_amount}، الإجمالي: {total_amount}")
-                            
-                            # ✅ تحديث إحصائيات الزبون
-                            customer['total_paid'] = customer.get('total_paid', 0) + payment_amount
-                            customer['total_remaining'] = max(0, customer.get('total_remaining', 0) - payment_amount)
-                            
-                            payment_saved = True
-                            print(f"✅ تم تحديث الفاتورة في customers.json")
-                            break
-                    break
-            
-            with open("data/customers.json", 'w', encoding='utf-8') as f:
-                json.dump(customers, f, ensure_ascii=False, indent=2)
-            
+
+            if payment_saved:
+                print(f"💰 تحديث المبالغ بعد الدفعة:")
+                print(f"   - الإجمالي: {invoice.get('total_usd', 0):.2f} $")
+                print(f"   - الدفعة الجديدة: {payment_data['amount']:.2f} $")
+                print(f"   - المدفوع الجديد: {invoice['paid_amount']:.2f} $")
+                print(f"   - المتبقي بعد التقريب: {invoice['remaining_amount']:.2f} $")
+
+                # ✅ ✅ ✅ التعديل: التحقق مما إذا كانت الفاتورة اكتملت بعد هذه الدفعة
+                if invoice['completed']:
+                    invoice_updated = True
+                    print(f"✅ الفاتورة اكتملت بعد الدفعة! المدفوع: {invoice['paid_amount']}، الإجمالي: {invoice.get('total_usd', 0)}")
+
             # 2. حفظ الدفعة في صفحة المدفوعات
             if payment_saved:
                 success = self.save_payment_to_payments_page(invoice_data, payment_data)
                 if success:
-                    print(f"✅ تم حفظ الدفعة في customer_payments.json")
+                    print(f"✅ تم حفظ الدفعة في ملف دفعات الزبون")
                     
                     # ✅ إرسال إشعار بتحديث المدفوعات
                     self.send_payment_added_notification({
@@ -5893,7 +5688,7 @@ class CustomerInvoicesPage(QWidget):
                         'invoice_completed': invoice_updated  # ✅ إضافة علامة اكتمال الفاتورة
                     })
                 else:
-                    print("❌ فشل حفظ الدفعة في customer_payments.json")
+                    print("❌ فشل حفظ الدفعة في ملف دفعات الزبون")
             else:
                 print("⚠️ لم يتم العثور على الفاتورة لحفظ الدفعة")
             
@@ -5917,18 +5712,8 @@ class CustomerInvoicesPage(QWidget):
     def save_payment_to_payments_page(self, invoice_data, payment_data):
         """✅ ✅ ✅ حفظ الدفعة في صفحة المدفوعات - السماح بالدفعات المتكررة"""
         try:
-            payments_file = "data/customer_payments.json"
-            
-            # ✅ التأكد من وجود المجلد والملف
-            os.makedirs(os.path.dirname(payments_file), exist_ok=True)
-            
-            payments = []
-            if os.path.exists(payments_file):
-                try:
-                    with open(payments_file, 'r', encoding='utf-8') as f:
-                        payments = json.load(f)
-                except:
-                    payments = []
+            store = get_customer_payments_store()
+            payments = store.customer_payments(self.phone_number)
             
             # ✅ ✅ ✅ التعديل: استخدام UUID فريد لكل دفعة بدلاً من التحقق من التكرار
             payment_id = f"{self.customer_id}_{invoice_data.get('invoice_uuid', '')}_{payment_data['date']}_{payment_data['amount']}_{datetime.now().strftime('%H%M%S')}"
@@ -5942,6 +5727,7 @@ class CustomerInvoicesPage(QWidget):
                 'customer_phone': self.phone_number,
                 'invoice_number': invoice_data.get('invoice_number', ''),
                 'invoice_uuid': invoice_data.get('invoice_uuid', ''),  # ✅ إضافة UUID للفاتورة
+                'payment_uuid': payment_data.get('payment_uuid') or str(uuid.uuid4()),  # ✅ UUID الدفعة
                 'amount': payment_data['amount'],
                 'date': payment_data['date'],
                 'time': datetime.now().strftime('%H:%M:%S'),
@@ -5951,13 +5737,10 @@ class CustomerInvoicesPage(QWidget):
                 'type': 'دفعة فاتورة تقسيط'
             }
             
-            payments.append(new_payment)
-            
-            # ✅ حفظ الملف
-            with open(payments_file, 'w', encoding='utf-8') as f:
-                json.dump(payments, f, ensure_ascii=False, indent=2)
+            # ✅ حفظ الدفعة (سجل واحد في ملف التعديلات)
+            store.add_payment(new_payment)
                 
-            print(f"✅ تم حفظ الدفعة في customer_payments.json:")
+            print(f"✅ تم حفظ الدفعة في ملف دفعات الزبون:")
             print(f"   - الزبون: {self.customer_name}")
             print(f"   - الفاتورة: {invoice_data.get('invoice_number', '')}")
             print(f"   - المبلغ: {payment_data['amount']} $")
@@ -5973,20 +5756,12 @@ class CustomerInvoicesPage(QWidget):
     def load_customer_data(self):
         """تحميل بيانات الزبون"""
         try:
-            # تنظيف الدفعات المحذوفة أولاً
-            self.cleanup_deleted_customer_payments()
-            
-            # تحميل بيانات الزبون من ملف الزبائن
-            with open("data/customers.json", 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-            
-            customer_data = None
-            for customer in customers:
-                if (customer.get('name') == self.customer_name and 
-                    customer.get('phone') == self.phone_number):
-                    customer_data = customer
-                    break
+            if hasattr(self, 'data_subscription'):
+                self.data_subscription.mark_seen()
             
+            # تحميل بيانات هذا الزبون فقط من مخزن الزبائن
+            customer_data = get_customer_store().get_customer(self.customer_name, self.phone_number)
+
             if customer_data:
                 # تحديث الإحصائيات
                 total_paid = customer_data.get('total_paid', 0)
@@ -6005,24 +5780,8 @@ class CustomerInvoicesPage(QWidget):
                 self.remaining_usd_label.setText(remaining_usd_text)
                 self.remaining_lbp_label.setText(remaining_lbp_text)
                 
-                # تحميل الفواتير
-                self.all_invoices = customer_data.get('invoices', [])  
-                invoices_updated = False
-                for invoice in self.all_invoices:
-                    if 'invoice_uuid' not in invoice:
-                        invoice['invoice_uuid'] = str(uuid.uuid4())
-                        print(f"✅ تم إضافة UUID للفاتورة القديمة: {invoice['invoice_number']}")
-                        invoices_updated = True
-    
-                 # ✅ حفظ التعديلات إذا تم تحديث الفواتير
-                if invoices_updated:
-                    try:
-                        with open("data/customers.json", 'w', encoding='utf-8') as f:
-                            json.dump(customers, f, ensure_ascii=False, indent=2)
-                        print("✅ تم حفظ التعديلات في customers.json")
-                    except Exception as e:
-                        print(f"❌ خطأ في حفظ التعديلات: {e}")
-                self.filtered_invoices = self.all_invoices.copy()  # ✅ تهيئة الفواتير المصفاة
+                # تحميل الفواتير (UUID الفواتير القديمة يضاف أثناء الترحيل)
+                self.all_invoices = customer_data.get('invoices', [])
                 self.load_invoices_table(self.all_invoices)
                 
         except Exception as e:
@@ -6045,143 +5804,62 @@ class CustomerInvoicesPage(QWidget):
 
     def load_invoices_table(self, invoices):
         """تحميل الفواتير في الجدول"""
-        self.invoices_table.setRowCount(len(invoices))
-        
-        for row, invoice in enumerate(invoices):
-            # ✅ رقم الفاتورة (الترتيب التلقائي) - يبدأ من 1 لكل زبون
-            number_item = QTableWidgetItem(str(row + 1))
-            number_item.setBackground(QColor("white"))
-            self.invoices_table.setItem(row, 0, number_item)
-            
-            # ✅ التاريخ - ✅ استخدام DateInput الجديد
-            # ✅ التاريخ - عرضه كما هو لكن بمحاذاة لليمين
-            # ✅ التاريخ - تحويل التنسيق إذا كان yyyy-mm-dd إلى dd-mm-yyyy
-            date_str = invoice.get('date', '')
-            if date_str and '-' in date_str and len(date_str) == 10:
-                parts = date_str.split('-')
-                if len(parts[0]) == 4:  # إذا السنة أولاً
-                    date_str = f"{parts[2]}-{parts[1]}-{parts[0]}"  # تحويل إلى dd-mm-yyyy
-            date_item = QTableWidgetItem(date_str)
-            date_item.setBackground(QColor("white"))
-            date_item.setForeground(QColor("#2c3e50"))
-            date_item.setFont(QFont("Arial", 12, QFont.Bold))
-            date_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.invoices_table.setItem(row, 1, date_item)
-            
-            # النوع
-            invoice_type = invoice.get('type', 'نقدي')
-            type_item = QTableWidgetItem(invoice_type)
-            type_item.setBackground(QColor("white"))
-            if invoice_type == 'تقسيط':
-                type_item.setForeground(QColor('#e74c3c'))
-            else:
-                type_item.setForeground(QColor('#27ae60'))
-            self.invoices_table.setItem(row, 2, type_item)
-            
-            # المبلغ بالدولار
-            total_usd = invoice.get('total_usd', 0)
-            usd_text = f"{int(total_usd)} $" if total_usd == int(total_usd) else f"{total_usd:.2f} $"
-            usd_item = QTableWidgetItem(usd_text)
-            usd_item.setBackground(QColor("white"))
-            self.invoices_table.setItem(row, 3, usd_item)
-            
-            # ✅ ✅ ✅ التعديل الهام: الحالة - حساب الحالة بناءً على المبلغ المتبقي الحقيقي
-            if invoice_type == 'نقدي':
-                status = "مكتمل"
-            else:
-                # ✅ ✅ ✅ التعديل: حساب الحالة بناءً على المبلغ المتبقي الحقيقي
-                total_amount = invoice.get('total_usd', 0)
-                paid_amount = invoice.get('paid_amount', 0)
-                remaining_amount = total_amount - paid_amount
-                
-                # ✅ ✅ ✅ التعديل الهام: استخدام عتبة 0.009 بدلاً من 0.01 لتجنب مشاكل التقريب
-                if abs(remaining_amount) < 0.009:  # إذا كان المتبقي أقل من 0.01 (مع هامش تقريب)
-                    status = "مكتمل"
-                else:
-                    status = "معلق"
-            
-            status_item = QTableWidgetItem(status)
-            status_item.setBackground(QColor("white"))
-            if status == "معلق":
-                status_item.setForeground(QColor('#e74c3c'))
-            else:
-                status_item.setForeground(QColor('#27ae60'))
-            self.invoices_table.setItem(row, 4, status_item)
-            
-            # ✅ عمود الدفعات
-            if invoice_type == 'تقسيط':
-                payments_count = len(invoice.get('payments', []))
-                payments_text = f"{payments_count} دفعة" if payments_count > 0 else "لا توجد دفعات"
-            else:
-                payments_text = "---"
-            
-            payments_item = QTableWidgetItem(payments_text)
-            payments_item.setBackground(QColor("white"))
-            self.invoices_table.setItem(row, 5, payments_item)
+        self.invoices_table.set_records(invoices)
+        # ✅ تحديث الفهرس المقلوب للفواتير المضافة/المعدلة/المحذوفة فقط
+        model = self.invoices_table.source_model
+        self.invoice_index.sync({
+            invoice.get('invoice_uuid'): model.search_key(row)[0]
+            for row, invoice in enumerate(invoices)
+        })
+        self.invoice_rows = {invoice.get('invoice_uuid'): row for row, invoice in enumerate(invoices)}
+        # ✅ إعادة تطبيق البحث الحالي على البيانات الجديدة (فوراً - أرقام الصفوف تغيرت)
+        self.search_controller.run_now(wait=True)
+
+    @staticmethod
+    def invoice_search_key(invoice, row):
+        """✅ مفتاح البحث الموحد للفاتورة: (العنوان وأسماء الأصناف، التاريخ) - يحسب عند التحميل"""
+        quick_text = '\n'.join([invoice.get('address', '')] +
+                               [item.get('product_name', '') for item in invoice.get('items', [])])
+        return normalize_text(quick_text), normalize_text(invoice.get('date', ''))
 
     def search_invoices(self):
-        try:
-            quick_search_text = self.quick_search_input.text().strip()
-            date_search_text = self.date_search_input.text().strip()
-            
-            # ✅ إذا كانت جميع حقول البحث فارغة، عرض جميع الفواتير
-            if not quick_search_text and not date_search_text:
-                self.filtered_invoices = self.all_invoices.copy()
-                self.load_invoices_table(self.all_invoices)
-                return
-            
-            filtered_invoices = []
-            
-            for invoice in self.all_invoices:
-                match_quick_search = False
-                match_date_search = False
-                
-                # ✅ البحث السريع في الأصناف والعنوان
-                if quick_search_text:
-                    search_text_lower = quick_search_text.lower()
-                    
-                    # البحث في العنوان
-                    address = invoice.get('address', '').lower()
-                    if search_text_lower in address:
-                        match_quick_search = True
-                    
-                    # البحث في الأصناف
-                    if not match_quick_search:
-                        for item in invoice.get('items', []):
-                            product_name = item.get('product_name', '').lower()
-                            if search_text_lower in product_name:
-                                match_quick_search = True
-                                break
-                else:
-                    match_quick_search = True  # إذا كان البحث السريع فارغاً
-                
-                # ✅ البحث بالتاريخ - إصلاح المقارنة
-                if date_search_text:
-                    # ✅ إصلاح: البحث البسيط في سلسلة التاريخ
-                    invoice_date = invoice.get('date', '').lower()
-                    search_date = date_search_text.lower()
-                    
-                    # ✅ البحث بأي جزء من التاريخ
-                    if search_date in invoice_date:
-                        match_date_search = True
-                else:
-                    match_date_search = True  # إذا كان البحث بالتاريخ فارغاً
-                
-                # ✅ إذا تطابقت جميع شروط البحث، أضف الفاتورة إلى النتائج
-                if match_quick_search and match_date_search:
-                    filtered_invoices.append(invoice)
-            
-            # ✅ حفظ الفواتير المصفاة واستخدامها للعرض
-            self.filtered_invoices = filtered_invoices
-            
-            # ✅ عرض الفواتير المصفاة
-            self.load_invoices_table(filtered_invoices)
-            
-        except Exception as e:
-            print(f"❌ خطأ في البحث: {e}")
-            # في حالة الخطأ، عرض جميع الفواتير
-            self.filtered_invoices = self.all_invoices.copy()
-            self.load_invoices_table(self.all_invoices)
+        """بحث في الفواتير فوراً (الكتابة في حقول البحث تمر عبر search_controller بعد مهلة)"""
+        self.search_controller.run_now()
+
+    def prepare_invoice_search(self):
+        """✅ قراءة حقول البحث في الواجهة - مرور صفوف التاريخ يتم في خيط خلفي"""
+        quick_search_text = normalize_text(self.quick_search_input.text())
+        date_search_text = normalize_text(self.date_search_input.text())
+        
+        # ✅ إذا كانت جميع حقول البحث فارغة، عرض جميع الفواتير
+        if not quick_search_text and not date_search_text:
+            return None
+        
+        # ✅ البحث السريع: تقاطع مجموعات الفواتير لكل كلمة من الفهرس المقلوب
+        # (كلمات العنوان والأصناف كبادئات) - سريع، ويتم هنا لأن الفهرس يعدل في الواجهة
+        matching_uuids = self.invoice_index.search(quick_search_text)
+        
+        # ✅ بدون تاريخ: الصفوف مباشرة من نتيجة الفهرس (بدون المرور على كل الفواتير)
+        if not date_search_text:
+            rows = {self.invoice_rows[invoice_uuid] for invoice_uuid in matching_uuids
+                    if invoice_uuid in self.invoice_rows}
+            return lambda cancelled: rows
+        
+        invoices = self.invoices_table.records()
+        keys = self.invoices_table.source_model.search_keys()
+        
+        def job(cancelled):
+            # ✅ التاريخ بأي جزء منه
+            rows = matching_rows(keys, lambda key: date_search_text in key[1], cancelled)
+            if rows is None or matching_uuids is None:
+                return rows
+            return {row for row in rows if invoices[row].get('invoice_uuid') in matching_uuids}
+        
+        return job
+
+    def apply_invoice_search(self, rows):
+        """✅ عرض نتيجة البحث عبر proxy الجدول"""
+        self.invoices_table.filter_rows(rows)
 
     def normalize_date_for_search(self, date_str):
         """✅ ✅ ✅ إصلاح: تحويل التاريخ إلى تنسيق موحد للمقارنة (dd-mm-yyyy)"""
@@ -6287,7 +5965,8 @@ class CustomerInvoicesPage(QWidget):
             
             if invoice_dialog.exec() == QDialog.Accepted:
                 invoice_data = invoice_dialog.get_invoice_data()
-                self.save_customer_invoice(invoice_data)
+                if self.save_customer_invoice(invoice_data):
+                    invoice_dialog.send_initial_payment()
                 
         except Exception as e:
             self.show_message("خطأ", f"حدث خطأ في إنشاء الفاتورة التقسيط: {e}", "error")
@@ -6318,12 +5997,7 @@ class CustomerInvoicesPage(QWidget):
     def get_next_reservation_number(self):
         """✅ الحصول على رقم الحجز التالي"""
         try:
-            reservations_file = "data/customer_reservations.json"
-            if not os.path.exists(reservations_file):
-                return 1
-            
-            with open(reservations_file, 'r', encoding='utf-8') as f:
-                reservations = json.load(f)
+            reservations = get_json_repository().read("data/customer_reservations.json", [])
             
             max_number = 0
             for reservation in reservations:
@@ -6339,71 +6013,21 @@ class CustomerInvoicesPage(QWidget):
     def get_next_invoice_number(self):
         """✅ الحصول على رقم الفاتورة التالي - يبدأ من 1 لكل زبون"""
         try:
-            # تحميل آخر رقم فاتورة من ملف الزبائن لهذا الزبون المحدد
-            with open("data/customers.json", 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-            
-            max_number = 0
-            for customer in customers:
-                if (customer.get('name') == self.customer_name and 
-                    customer.get('phone') == self.phone_number):
-                    
-                    invoices = customer.get('invoices', [])
-                    for invoice in invoices:
-                        # ✅ استخدام customer_invoice_id بدلاً من invoice_number العام
-                        customer_invoice_id = invoice.get('customer_invoice_id', 0)
-                        if customer_invoice_id > max_number:
-                            max_number = customer_invoice_id
-                    break
-            
-            return max_number + 1
-            
+            # ✅ استخدام customer_invoice_id بدلاً من invoice_number العام
+            return get_customer_store().next_customer_invoice_id(self.customer_name, self.phone_number)
         except:
             return 1
 
     def save_customer_invoice(self, invoice_data):
         """✅ حفظ فاتورة الزبون"""
         try:
-            with open("data/customers.json", 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-            
-            for customer in customers:
-                if (customer.get('name') == self.customer_name and 
-                    customer.get('phone') == self.phone_number):
-                    
-                    # ✅ ✅ ✅ التعديل: إضافة UUID فريد للفاتورة
-                    if 'invoice_uuid' not in invoice_data:
-                        invoice_data['invoice_uuid'] = str(uuid.uuid4())
-                    
-                    # ✅ تحديث إحصائيات الزبون
-                    customer['total_invoices'] = customer.get('total_invoices', 0) + 1
-                    customer['total_amount'] = customer.get('total_amount', 0) + invoice_data['total_usd']
-                    
-                    # ✅ تحديث المدفوعات والمتبقي بناءً على نوع الفاتورة
-                    if invoice_data['type'] == 'نقدي':
-                        customer['total_paid'] = customer.get('total_paid', 0) + invoice_data['total_usd']
-                    else:  # تقسيط
-                        customer['total_paid'] = customer.get('total_paid', 0) + invoice_data['paid_amount']
-                        customer['total_remaining'] = customer.get('total_remaining', 0) + invoice_data['remaining_amount']
-                    
-                    customer['last_invoice_date'] = invoice_data['date']
-                    
-                    # ✅ إضافة الفاتورة إلى قائمة فواتير الزبون
-                    if 'invoices' not in customer:
-                        customer['invoices'] = []
-                    
-                    # ✅ ✅ ✅ التعديل: استخدام رقم فاتورة يبدأ من 1 لكل زبون
-                    invoice_data['customer_invoice_id'] = len(customer['invoices']) + 1
-                    
-                    customer['invoices'].append(invoice_data)
-                    
-                    break
-            
-            with open("data/customers.json", 'w', encoding='utf-8') as f:
-                json.dump(customers, f, ensure_ascii=False, indent=2)
-            
-            # ✅ تحديث المخزون في قاعدة البيانات
-            self.update_stock_quantity(invoice_data['items'], "subtract")
+            # ✅ إضافة صف الفاتورة وأصنافها وتحديث إحصائيات الزبون وخصم المخزون في معاملة واحدة
+            # (يضيف UUID فريد للفاتورة و customer_invoice_id يبدأ من 1 لكل زبون)
+            with get_db(DB_PATH).transaction():
+                get_customer_store().add_invoice(self.customer_name, self.phone_number, invoice_data)
+
+                # ✅ تحديث المخزون في قاعدة البيانات
+                self.update_stock_quantity(invoice_data['items'], "subtract")
             
             # ✅ ✅ ✅ إرسال الفاتورة إلى صفحة الفواتير
             self.send_invoice_to_invoices_page(invoice_data)
@@ -6420,18 +6044,15 @@ class CustomerInvoicesPage(QWidget):
             
             # ✅ عرض رسالة نجاح واحدة فقط
             self.show_message("نجاح", "✅ تم حفظ الفاتورة بنجاح", "info")
+            return True
         except Exception as e:
             self.show_message("خطأ", f"حدث خطأ في حفظ الفاتورة: {e}", "error")
+            return False
 
     def send_invoice_to_invoices_page(self, invoice_data):
         """✅ ✅ ✅ إرسال الفاتورة إلى صفحة الفواتير - الإصدار المصحح"""
         try:
             invoices_file = "data/invoices.json"
-            invoices = []
-            
-            if os.path.exists(invoices_file):
-                with open(invoices_file, 'r', encoding='utf-8') as f:
-                    invoices = json.load(f)
             
             # ✅ التصحيح: استخدام type مباشرة من invoice_data
             invoice_type = invoice_data.get('type', 'نقدي')
@@ -6455,10 +6076,8 @@ class CustomerInvoicesPage(QWidget):
                 'invoice_uuid': invoice_data.get('invoice_uuid', '')  # ✅ إضافة UUID
             }
             
-            invoices.append(new_invoice)
-            
-            with open(invoices_file, 'w', encoding='utf-8') as f:
-                json.dump(invoices, f, ensure_ascii=False, indent=2)
+            # ✅ حفظ الفاتورة (سجل واحد في ملف التعديلات)
+            get_json_repository().append(invoices_file, new_invoice, key='invoice_uuid')
                 
             print(f"✅ تم إرسال الفاتورة {invoice_data['invoice_number']} ({invoice_type}) إلى صفحة الفواتير")
                 
@@ -6529,72 +6148,64 @@ class CustomerInvoicesPage(QWidget):
             print(f"❌ خطأ في إرسال إشعار الدفعة: {e}")
 
     def update_stock_quantity(self, items, operation):
-        """✅ تحديث كمية المخزون في قاعدة البيانات - فوري ومباشر"""
+        """✅ تحديث كمية المخزون في قاعدة البيانات - استعلام محضر واحد لكل الأصناف
+
+        إذا استدعيت داخل معاملة خارجية (حفظ الفاتورة) تنضم إليها ويرفع الخطأ
+        لكي يتم التراجع عن الفاتورة والمخزون معاً.
+        """
+        sign = -1 if operation == "subtract" else 1
         try:
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            
-            for item in items:
-                product_id = item['product_id']
-                quantity = item['quantity']
-                
-                if operation == "subtract":
-                    c.execute("UPDATE Items SET quantity = quantity - ? WHERE id = ?", (quantity, product_id))
-                elif operation == "add":
-                    c.execute("UPDATE Items SET quantity = quantity + ? WHERE id = ?", (quantity, product_id))
-            
-            conn.commit()
-            conn.close()
+            with get_db(DB_PATH).transaction() as conn:
+                conn.executemany(
+                    "UPDATE Items SET quantity = quantity + ? WHERE id = ?",
+                    [(sign * item['quantity'], item['product_id']) for item in items]
+                )
+            # ✅ أرقام الأصناف المعدلة لكي تحدث الصفحات صفوفها فقط
+            bump_version('stock', keys=[item['product_id'] for item in items])
             
         except Exception as e:
             print(f"❌ خطأ في تحديث المخزون: {e}")
+            raise
 
     def add_new_payment(self):
         """✅ ✅ ✅ التعديل: إضافة تحقق من حالة الفاتورة قبل إضافة دفعة جديدة"""
-        selected_row = self.invoices_table.currentRow()
-        if selected_row < 0:
+        selected_invoice = self.invoices_table.current_record()
+        if not selected_invoice:
             self.show_message("تحذير", "⚠️ يرجى اختيار فاتورة أولاً", "warning")
             return
             
         try:
-            with open("data/customers.json", 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-            
-            for customer in customers:
-                if (customer.get('name') == self.customer_name and 
-                    customer.get('phone') == self.phone_number):
+            # ✅ قراءة الفاتورة المحددة من المخزن (أحدث المبالغ المدفوعة)
+            invoice_data = get_customer_store().get_invoice(selected_invoice.get('invoice_uuid'))
+
+            if invoice_data:
+                if invoice_data.get('type') != 'تقسيط':
+                    self.show_message("تحذير", "⚠️ يمكن إضافة دفعات فقط للفواتير التقسيط", "warning")
+                    return
                     
-                    invoices = customer.get('invoices', [])
-                    if selected_row < len(invoices):
-                        invoice_data = invoices[selected_row]
-                        
-                        if invoice_data.get('type') != 'تقسيط':
-                            self.show_message("تحذير", "⚠️ يمكن إضافة دفعات فقط للفواتير التقسيط", "warning")
-                            return
-                        
-                        # ✅ ✅ ✅ التعديل الجديد: التحقق من حالة الفاتورة
-                        total_usd = invoice_data.get('total_usd', 0)
-                        paid_amount = invoice_data.get('paid_amount', 0)
-                        
-                        # إذا كانت الفاتورة مكتملة (المبلغ المدفوع يساوي أو يزيد عن الإجمالي)
-                        if paid_amount >= total_usd:
-                            self.show_message(
-                                "فاتورة مكتملة", 
-                                "⚠️ هذه الفاتورة حسابها مكتمل ولا يمكن إضافة دفعة إليها\n\n"
-                                "💡 يمكنك إضافة دفعة فقط إذا تم إضافة أصناف لاحقاً للفاتورة",
-                                "warning"
-                            )
-                            return
-                            
-                        # ✅ ✅ ✅ التصحيح: إنشاء PaymentDialog ومعالجته بشكل صحيح
-                        payment_dialog = PaymentDialog(self, invoice_data, self.exchange_rate)
+                # ✅ ✅ ✅ التعديل الجديد: التحقق من حالة الفاتورة
+                total_usd = invoice_data.get('total_usd', 0)
+                paid_amount = invoice_data.get('paid_amount', 0)
+                    
+                # إذا كانت الفاتورة مكتملة (المبلغ المدفوع يساوي أو يزيد عن الإجمالي)
+                if paid_amount >= total_usd:
+                    self.show_message(
+                        "فاتورة مكتملة", 
+                        "⚠️ هذه الفاتورة حسابها مكتمل ولا يمكن إضافة دفعة إليها\n\n"
+                        "💡 يمكنك إضافة دفعة فقط إذا تم إضافة أصناف لاحقاً للفاتورة",
+                        "warning"
+                    )
+                    return
                         
-                        if payment_dialog.exec() == QDialog.Accepted:
-                            payment_data = payment_dialog.get_payment_data()
-                            self.save_payment(invoice_data, payment_data)
-                            self.load_customer_data()
-                        return
-            
+                # ✅ ✅ ✅ التصحيح: إنشاء PaymentDialog ومعالجته بشكل صحيح
+                payment_dialog = PaymentDialog(self, invoice_data, self.exchange_rate)
+                    
+                if payment_dialog.exec() == QDialog.Accepted:
+                    payment_data = payment_dialog.get_payment_data()
+                    self.save_payment(invoice_data, payment_data)
+                    self.load_customer_data()
+                return
+        
         except Exception as e:
             self.show_message("خطأ", f"❌ حدث خطأ في إضافة الدفعة: {e}", "error")
 
@@ -6616,68 +6227,57 @@ class CustomerInvoicesPage(QWidget):
             self.show_message("خطأ", f"حدث خطأ في فتح صفحة الحجوزات: {str(e)}", "error")
     def delete_selected_invoice(self):
         """✅ ✅ ✅ التعديل: حذف الفاتورة المحددة مع إصلاح مشكلة التحديد المخفي"""
-        selected_row = self.invoices_table.currentRow()
+        selected_row = self.invoices_table.current_row()
         if selected_row < 0:
             self.show_message("تحذير", "⚠️ يرجى اختيار فاتورة للحذف", "warning")
             return
         
         try:
-            with open("data/customers.json", 'r', encoding='utf-8') as f:
-                customers = json.load(f)
+            store = get_customer_store()
+            invoice_to_delete = self.invoices_table.record_at(selected_row)
             
-            invoice_to_delete = None
-            for customer in customers:
-                if (customer.get('name') == self.customer_name and 
-                    customer.get('phone') == self.phone_number):
-                    
-                    invoices = customer.get('invoices', [])
-                    if selected_row < len(invoices):
-                        invoice_to_delete = invoices[selected_row]
-                        
-                        # ✅ ✅ ✅ التعديل: الحصول على رقم الفاتورة الصحيح من الجدول
-                        display_number = self.invoices_table.item(selected_row, 0).text()
-                        
-                        # ✅ ✅ ✅ التعديل: حفظ صف التحديد قبل الحذف
-                        self.last_selected_row = selected_row
-                        
-                        # ✅ تأكيد الحذف مع عرض الرقم الصحيح
-                        reply = self.show_message("تأكيد الحذف", 
-                            f"هل أنت متأكد من حذف الفاتورة رقم {display_number}؟\n\nهذا الإجراء لا يمكن التراجع عنه!",
-                            "question", True)
-                        
-                        if reply == QMessageBox.Yes:
-                            # ✅ استعادة المخزون أولاً
-                            self.update_stock_quantity(invoice_to_delete.get('items', []), "add")
-                            
-                            # ✅ حذف الفاتورة من القائمة
-                            invoices.pop(selected_row)
-                            
-                            # ✅ تحديث إحصائيات الزبون
-                            self.update_customer_stats_after_deletion(customer, invoice_to_delete)
-                            
-                            # ✅ ✅ ✅ حذف الفاتورة من صفحة الفواتير
-                            self.delete_invoice_from_invoices_page(invoice_to_delete)
-                            self.update_parent_invoice_counters()
-                            
-                            # ✅ ✅ ✅ حذف جميع الدفعات المرتبطة بهذه الفاتورة من صفحة المدفوعات
-                            self.delete_invoice_payments_from_payments_page(invoice_to_delete)
-                            
-                            # ✅ ✅ إرسال إشعار بحذف فاتورة - إضافة جديدة
-                            self.send_invoice_deleted_notification(invoice_to_delete)
-                            
-                            # ✅ حفظ التغييرات
-                            with open("data/customers.json", 'w', encoding='utf-8') as f:
-                                json.dump(customers, f, ensure_ascii=False, indent=2)
-                            
-                            # ✅ ✅ ✅ التعديل: إلغاء التحديد المخفي بعد الحذف
-                            self.clear_selection_after_operation()
-                            
-                            # ✅ إعادة تحميل البيانات
-                            self.load_customer_data()
-                            
-                            self.show_message("نجاح", "✅ تم حذف الفاتورة بنجاح", "info")
-                        break
-                    break
+            # ✅ ✅ ✅ التعديل: رقم الفاتورة الصحيح = ترتيبها بين كل فواتير الزبون (حتى أثناء البحث)
+            display_number = self.invoices_table.source_row(selected_row) + 1
+            
+            # ✅ ✅ ✅ التعديل: حفظ صف التحديد قبل الحذف
+            self.last_selected_row = selected_row
+            
+            # ✅ تأكيد الحذف مع عرض الرقم الصحيح
+            reply = self.show_message("تأكيد الحذف", 
+                f"هل أنت متأكد من حذف الفاتورة رقم {display_number}؟\n\nهذا الإجراء لا يمكن التراجع عنه!",
+                "question", True)
+            
+            if reply != QMessageBox.Yes:
+                return
+            
+            # ✅ حذف الفاتورة من المخزن واستعادة المخزون في معاملة واحدة
+            # (يتم تحديث إحصائيات الزبون في نفس المعاملة)
+            with get_db(DB_PATH).transaction():
+                if store.delete_invoice(self.customer_name, self.phone_number,
+                                        invoice_to_delete.get('invoice_uuid')) is None:
+                    self.show_message("خطأ", "❌ لم يتم العثور على الفاتورة", "error")
+                    return
+                
+                # ✅ استعادة المخزون
+                self.update_stock_quantity(invoice_to_delete.get('items', []), "add")
+            
+            # ✅ ✅ ✅ حذف الفاتورة من صفحة الفواتير
+            self.delete_invoice_from_invoices_page(invoice_to_delete)
+            self.update_parent_invoice_counters()
+            
+            # ✅ ✅ ✅ حذف جميع الدفعات المرتبطة بهذه الفاتورة من صفحة المدفوعات
+            self.delete_invoice_payments_from_payments_page(invoice_to_delete)
+            
+            # ✅ ✅ إرسال إشعار بحذف فاتورة - إضافة جديدة
+            self.send_invoice_deleted_notification(invoice_to_delete)
+            
+            # ✅ ✅ ✅ التعديل: إلغاء التحديد المخفي بعد الحذف
+            self.clear_selection_after_operation()
+            
+            # ✅ إعادة تحميل البيانات
+            self.load_customer_data()
+            
+            self.show_message("نجاح", "✅ تم حذف الفاتورة بنجاح", "info")
             
         except Exception as e:
             self.show_message("خطأ", f"❌ حدث خطأ في حذف الفاتورة: {e}", "error")
@@ -6686,8 +6286,7 @@ class CustomerInvoicesPage(QWidget):
         """✅ ✅ ✅ إصلاح مشكلة التحديد المخفي بعد العمليات"""
         try:
             # إلغاء تحديد أي صف في الجدول
-            self.invoices_table.clearSelection()
-            self.invoices_table.setCurrentItem(None)
+            self.invoices_table.clear_current()
             
             # إلغاء أي تحديد مخفي
             if hasattr(self, 'last_selected_row'):
@@ -6699,21 +6298,8 @@ class CustomerInvoicesPage(QWidget):
     def delete_invoice_from_invoices_page(self, invoice_data):
         """✅ ✅ ✅ حذف الفاتورة من صفحة الفواتير"""
         try:
-            invoices_file = "data/invoices.json"
-            if not os.path.exists(invoices_file):
-                return
-            
-            with open(invoices_file, 'r', encoding='utf-8') as f:
-                invoices = json.load(f)
-            
             # ✅ البحث عن الفاتورة وحذفها باستخدام UUID
-            updated_invoices = []
-            for invoice in invoices:
-                if invoice.get('invoice_uuid') != invoice_data.get('invoice_uuid'):
-                    updated_invoices.append(invoice)
-            
-            with open(invoices_file, 'w', encoding='utf-8') as f:
-                json.dump(updated_invoices, f, ensure_ascii=False, indent=2)
+            get_json_repository().remove_where("data/invoices.json", invoice_uuid=invoice_data.get('invoice_uuid'))
                 
             print(f"✅ تم حذف الفاتورة {invoice_data['invoice_number']} من صفحة الفواتير")
                 
@@ -6723,50 +6309,17 @@ class CustomerInvoicesPage(QWidget):
     def delete_invoice_payments_from_payments_page(self, invoice_data):
         """✅ ✅ ✅ حذف جميع الدفعات المرتبطة بالفاتورة من صفحة المدفوعات"""
         try:
-            payments_file = "data/customer_payments.json"
-            if not os.path.exists(payments_file):
-                return
-            
-            with open(payments_file, 'r', encoding='utf-8') as f:
-                payments = json.load(f)
-            
             # ✅ البحث عن جميع الدفعات المرتبطة بالفاتورة وحذفها باستخدام UUID
-            updated_payments = []
-            for payment in payments:
-                if payment.get('invoice_uuid') != invoice_data.get('invoice_uuid'):
-                    updated_payments.append(payment)
-                else:
-                    print(f"🗑️ حذف دفعة مرتبطة بالفاتورة: {payment.get('amount')} $")
-            
-            with open(payments_file, 'w', encoding='utf-8') as f:
-                json.dump(updated_payments, f, ensure_ascii=False, indent=2)
+            removed = get_customer_payments_store().remove_where(
+                self.phone_number, invoice_uuid=invoice_data.get('invoice_uuid'))
+            if removed:
+                print(f"🗑️ حذف {removed} دفعة مرتبطة بالفاتورة")
                 
             print(f"✅ تم حذف جميع الدفعات المرتبطة بالفاتورة {invoice_data['invoice_number']} من صفحة المدفوعات")
                 
         except Exception as e:
             print(f"❌ خطأ في حذف دفعات الفاتورة من صفحة المدفوعات: {e}")
 
-    def update_customer_stats_after_deletion(self, customer, deleted_invoice):
-        """✅ تحديث إحصائيات الزبون بعد حذف الفاتورة"""
-        try:
-            invoice_total = deleted_invoice.get('total_usd', 0)
-            invoice_paid = deleted_invoice.get('paid_amount', 0)
-            invoice_type = deleted_invoice.get('type', 'نقدي')
-            
-            # ✅ تحديث الإجمالي
-            customer['total_amount'] = max(0, customer.get('total_amount', 0) - invoice_total)
-            customer['total_invoices'] = max(0, customer.get('total_invoices', 0) - 1)
-            
-            # ✅ تحديث المدفوعات والمتبقي بناءً على نوع الفاتورة
-            if invoice_type == 'نقدي':
-                customer['total_paid'] = max(0, customer.get('total_paid', 0) - invoice_total)
-            else:  # تقسيط
-                customer['total_paid'] = max(0, customer.get('total_paid', 0) - invoice_paid)
-                customer['total_remaining'] = max(0, customer.get('total_remaining', 0) - (invoice_total - invoice_paid))
-                
-        except Exception as e:
-            print(f"❌ خطأ في تحديث إحصائيات الزبون بعد الحذف: {e}")
-
     def go_back_to_invoices(self):
         """✅ الرجوع إلى صفحة الفواتير - الحل النهائي"""
         try:
@@ -6860,52 +6413,9 @@ class CustomerInvoicesPage(QWidget):
             msg.exec()
             return None
 
-    def cleanup_deleted_customer_payments(self):
-        """✅ تنظيف الدفعات الخاصة بالزبائن المحذوفين"""
-        try:
-            payments_file = "data/customer_payments.json"
-            customers_file = "data/customers.json"
-            
-            if not os.path.exists(payments_file):
-                return
-            
-            with open(payments_file, 'r', encoding='utf-8') as f:
-                payments = json.load(f)
-            
-            with open(customers_file, 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-            
-            # ✅ جمع أرقام هواتف الزبائن الموجودين
-            existing_phones = set()
-            for customer in customers:
-                phone = customer.get('phone')
-                if phone:
-                    existing_phones.add(phone)
-            
-            # ✅ تصفية الدفعات - إبقاء فقط دفعات الزبائن الموجودين
-            filtered_payments = []
-            for payment in payments:
-                if payment.get('customer_phone') in existing_phones:
-                    filtered_payments.append(payment)
-                else:
-                    print(f"🗑️ حذف دفعة لزبون محذوف: {payment.get('customer_name')}")
-            
-            # ✅ حفظ الملف المصفى
-            with open(payments_file, 'w', encoding='utf-8') as f:
-                json.dump(filtered_payments, f, ensure_ascii=False, indent=2)
-            
-            print(f"✅ تم تنظيف دفعات الزبائن المحذوفين - بقي {len(filtered_payments)} دفعة")
-            
-        except Exception as e:
-            print(f"❌ خطأ في تنظيف الدفعات: {e}")
-
     def closeEvent(self, event):
         """✅ إغلاق النافذة والرجوع إلى صفحة الفواتير"""
         try:
-            # ✅ إيقاف المؤقت قبل الإغلاق
-            if hasattr(self, 'refresh_timer'):
-                self.refresh_timer.stop()
-                
             self.hide()
             event.accept()
         except Exception as e:
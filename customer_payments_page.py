@@ -16,6 +16,48 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt, QSize, QDate, QTimer
 from PySide6.QtGui import QPixmap, QFont, QColor, QIntValidator, QDoubleValidator, QIcon, QPainter
 
+# ✅ مخزن الزبائن والفواتير (SQLite)
+try:
+    from pages.customer_store import get_customer_store
+except ImportError:
+    from customer_store import get_customer_store
+
+# ✅ إشعارات تغير البيانات بدلاً من مؤقتات التحديث الدورية
+try:
+    from pages.data_versions import bump_version, subscribe_domains
+except ImportError:
+    from data_versions import bump_version, subscribe_domains
+
+# ✅ مستودع ملفات JSON المشترك
+try:
+    from pages.json_repository import get_json_repository
+except ImportError:
+    from json_repository import get_json_repository
+
+# ✅ دفعات الزبائن: ملف لكل زبون + فهرس صغير
+try:
+    from pages.customer_payments_store import get_customer_payments_store
+except ImportError:
+    from customer_payments_store import get_customer_payments_store
+
+# ✅ جداول افتراضية (نموذج/عرض) بدلاً من عنصر لكل خانة
+try:
+    from pages.table_models import Column, RecordTableView
+except ImportError:
+    from table_models import Column, RecordTableView
+
+# ✅ توحيد النص العربي للبحث
+try:
+    from pages.text_normalize import normalize_text
+except ImportError:
+    from text_normalize import normalize_text
+
+# ✅ بحث مؤجل في خيط خلفي بدلاً من التصفية مع كل حرف
+try:
+    from pages.search_controller import SearchController, matching_rows
+except ImportError:
+    from search_controller import SearchController, matching_rows
+
 DB_PATH = "chbib_materials.db"
 
 class DateInput(QLineEdit):
@@ -190,20 +232,8 @@ class AddPaymentDialog(QDialog):
     def load_customer_invoices(self):
         """✅ تحميل فواتير الزبون من قاعدة البيانات"""
         try:
-            with open("data/customers.json", 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-            
-            for customer in customers:
-                if (customer.get('name') == self.customer_name and 
-                    customer.get('phone') == self.phone_number):
-                    invoices = customer.get('invoices', [])
-                    # ✅ إضافة UUID للفواتير القديمة التي لا تمتلكه
-                    for invoice in invoices:
-                        if 'invoice_uuid' not in invoice:
-                            invoice['invoice_uuid'] = str(uuid.uuid4())
-                    return invoices
-            
-            return []
+            customer = get_customer_store().get_customer(self.customer_name, self.phone_number)
+            return customer.get('invoices', []) if customer else []
         except Exception as e:
             print(f"❌ خطأ في تحميل فواتير الزبون: {e}")
             return []
@@ -409,20 +439,10 @@ class AddPaymentDialog(QDialog):
     def get_invoice_display_number(self, invoice_uuid):
         """✅ الحصول على رقم العرض الحقيقي للفاتورة من خلال UUID"""
         try:
-            with open("data/customers.json", 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-        
-            for customer in customers:
-                if (customer.get('name') == self.customer_name and 
-                    customer.get('phone') == self.phone_number):
-                
-                    invoices = customer.get('invoices', [])
-                    for index, invoice in enumerate(invoices):
-                        if invoice.get('invoice_uuid') == invoice_uuid:
-                            # ✅ الرقم الحقيقي هو index + 1 (نفس آلية صفحة الفواتير)
-                            return str(index + 1)
-        
-            return "غير معروف"
+            # ✅ الرقم الحقيقي هو ترتيب الفاتورة بين فواتير الزبون (نفس آلية صفحة الفواتير)
+            display_number = get_customer_store().get_invoice_display_number(
+                self.customer_name, self.phone_number, invoice_uuid)
+            return str(display_number) if display_number is not None else "غير معروف"
         except Exception as e:
             print(f"❌ خطأ في الحصول على رقم العرض: {e}")
             return "غير معروف"
@@ -571,10 +591,11 @@ class CustomerPaymentsPage(QWidget):
         self.current_search_date = ""
         self.current_search_invoice = ""
         
-        # ✅ إضافة مؤقت للتحديث التلقائي (تم إيقافه أثناء البحث)
-        self.refresh_timer = QTimer(self)
-        self.refresh_timer.timeout.connect(self.load_payments_data)
-        self.refresh_timer.start(3000)  # تحديث كل 3 ثواني
+        # ✅ أرقام عرض فواتير الزبون {invoice_uuid: رقم} - تحسب مرة واحدة لكل تحميل
+        self.invoice_numbers = {}
+        
+        # ✅ التحديث التلقائي عند تغير الدفعات فقط (يتجاهل أثناء البحث)
+        self.data_subscription = subscribe_domains(self, ('payments',), self.load_payments_data)
         
         # ✅ ضبط حجم النافذة
         screen = self.screen()
@@ -591,11 +612,9 @@ class CustomerPaymentsPage(QWidget):
     def load_exchange_rate(self):
         """تحميل سعر الصرف"""
         try:
-            exchange_file = "data/exchange_rate.json"
-            if os.path.exists(exchange_file):
-                with open(exchange_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return data.get('exchange_rate', 89000)
+            data = get_json_repository().read("data/exchange_rate.json")
+            if data:
+                return data.get('exchange_rate', 89000)
             return 89000
         except:
             return 89000
@@ -695,11 +714,9 @@ class CustomerPaymentsPage(QWidget):
                 background-color: #f8f9fa;
             }
         """)
-        self.invoice_search.textChanged.connect(self.search_payments)
         
         # بحث بالتاريخ
         self.date_search = DateInput()
-        self.date_search.textChanged.connect(self.search_payments)
         
         search_layout.addStretch()
         search_layout.addWidget(self.invoice_search)
@@ -718,6 +735,10 @@ class CustomerPaymentsPage(QWidget):
         self.setup_payments_table()
         main_layout.addWidget(self.payments_table)
 
+        self.search_controller = SearchController(self, self.prepare_payment_search, self.apply_payment_search)
+        self.search_controller.connect_inputs(self.invoice_search, self.date_search)
+        self.search_controller.follow_model(self.payments_table.source_model)
+
         # ✅ أزرار التحكم - تم نقل زر حفظ إلى هنا بجانب زر الحذف
         buttons_layout = QHBoxLayout()
         
@@ -892,14 +913,24 @@ class CustomerPaymentsPage(QWidget):
 
     def setup_payments_table(self):
         """إنشاء جدول الدفعات"""
-        self.payments_table = QTableWidget()
-        self.payments_table.setColumnCount(5)  # ✅ تم تقليل الأعمدة من 6 إلى 5 بعد حذف خانة الوقت
-        self.payments_table.setHorizontalHeaderLabels([
-            "رقم", "رقم الفاتورة", "المبلغ ($)", "المبلغ (LBP)", "التاريخ"
-        ])
+        # ✅ تم تقليل الأعمدة من 6 إلى 5 بعد حذف خانة الوقت
+        self.payments_table = RecordTableView([
+            # ✅ رقم الدفعة (الترتيب التلقائي) - ثابت أثناء البحث
+            Column("رقم", lambda payment, row: str(row + 1), align=Qt.AlignCenter, background="white"),
+            # ✅ رقم العرض الحقيقي للفاتورة (نفس صفحة الفواتير)
+            Column("رقم الفاتورة", lambda payment, row: self.invoice_display_text(payment),
+                   align=Qt.AlignCenter, background="white"),
+            Column("المبلغ ($)", lambda payment, row: self.format_usd(payment.get('amount', 0)),
+                   align=Qt.AlignCenter, background="white"),
+            Column("المبلغ (LBP)", lambda payment, row: f"{int(payment.get('amount_lbp', 0)):,} LBP",
+                   align=Qt.AlignCenter, background="white"),
+            # ✅ التاريخ فقط (تم حذف الوقت)
+            Column("التاريخ", 'date', align=Qt.AlignCenter, background="white"),
+        ], search_key=lambda payment, row: (
+            normalize_text(self.invoice_display_text(payment)), normalize_text(payment.get('date', ''))))
         
         self.payments_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 background-color: white;
                 border: 2px solid #2c3e50;
                 border-radius: 8px;
@@ -919,7 +950,7 @@ class CustomerPaymentsPage(QWidget):
                 font-size: 16px;
                 font-family: Arial;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 12px;
                 border-bottom: 1px solid #ecf0f1;
                 font-size: 14px;
@@ -927,7 +958,7 @@ class CustomerPaymentsPage(QWidget):
                 font-family: Arial;
                 background-color: white;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #3498db;
                 color: white;
             }
@@ -935,8 +966,7 @@ class CustomerPaymentsPage(QWidget):
         
         self.payments_table.setFocusPolicy(Qt.NoFocus)
         self.payments_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.payments_table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.payments_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.payments_table.setSelectionBehavior(RecordTableView.SelectRows)
         
         # ✅ ضبط اتجاه الجدول من اليمين لليسار
         self.payments_table.setLayoutDirection(Qt.RightToLeft)
@@ -944,19 +974,8 @@ class CustomerPaymentsPage(QWidget):
     def get_invoice_number_by_uuid(self, invoice_uuid):
         """✅ الحصول على رقم الفاتورة الحقيقي من خلال UUID"""
         try:
-            with open("data/customers.json", 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-            
-            for customer in customers:
-                if (customer.get('name') == self.customer_name and 
-                    customer.get('phone') == self.phone_number):
-                    
-                    invoices = customer.get('invoices', [])
-                    for invoice in invoices:
-                        if invoice.get('invoice_uuid') == invoice_uuid:
-                            return invoice.get('invoice_number', '')
-            
-            return "غير معروف"
+            invoice = get_customer_store().get_invoice(invoice_uuid)
+            return invoice.get('invoice_number', '') if invoice else "غير معروف"
         except Exception as e:
             print(f"❌ خطأ في الحصول على رقم الفاتورة: {e}")
             return "غير معروف"
@@ -964,37 +983,28 @@ class CustomerPaymentsPage(QWidget):
     def get_invoice_display_number(self, invoice_uuid):
         """✅ الحصول على رقم العرض الحقيقي للفاتورة من خلال UUID"""
         try:
-            with open("data/customers.json", 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-        
-            for customer in customers:
-                if (customer.get('name') == self.customer_name and 
-                    customer.get('phone') == self.phone_number):
-                
-                    invoices = customer.get('invoices', [])
-                    for index, invoice in enumerate(invoices):
-                        if invoice.get('invoice_uuid') == invoice_uuid:
-                            # ✅ الرقم الحقيقي هو index + 1 (نفس آلية صفحة الفواتير)
-                            return str(index + 1)
-        
-            return "غير معروف"
+            # ✅ الرقم الحقيقي هو ترتيب الفاتورة بين فواتير الزبون (نفس آلية صفحة الفواتير)
+            display_number = get_customer_store().get_invoice_display_number(
+                self.customer_name, self.phone_number, invoice_uuid)
+            return str(display_number) if display_number is not None else "غير معروف"
         except Exception as e:
             print(f"❌ خطأ في الحصول على رقم العرض: {e}")
-            return "غير معروف"        
+            return "غير معروف"
+
+    def invoice_display_text(self, payment):
+        """✅ رقم عرض فاتورة الدفعة من الخريطة المحملة مسبقاً"""
+        display_number = self.invoice_numbers.get(payment.get('invoice_uuid'))
+        return str(display_number) if display_number is not None else "غير معروف"
+
+    @staticmethod
+    def format_usd(amount_usd):
+        return f"{int(amount_usd)} $" if amount_usd == int(amount_usd) else f"{amount_usd:.2f} $"
 
     def find_invoice_uuid(self, invoice_number):
-        """✅ البحث عن UUID الفاتورة من ملف customers.json"""
+        """✅ البحث عن UUID الفاتورة من مخزن الزبائن"""
         try:
-            with open("data/customers.json", 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-            
-            for customer in customers:
-                if (customer.get('name') == self.customer_name and 
-                    customer.get('phone') == self.phone_number):
-                    for invoice in customer.get('invoices', []):
-                        if invoice.get('invoice_number') == invoice_number:
-                            return invoice.get('invoice_uuid')
-            return None
+            return get_customer_store().find_invoice_uuid(
+                self.customer_name, self.phone_number, invoice_number)
         except Exception as e:
             print(f"❌ خطأ في البحث عن UUID: {e}")
             return None
@@ -1006,48 +1016,41 @@ class CustomerPaymentsPage(QWidget):
             return
             
         try:
-            payments_file = "data/customer_payments.json"
-            if not os.path.exists(payments_file):
-                self.payments = []
-                self.update_stats()
-                return
-            
-            with open(payments_file, 'r', encoding='utf-8') as f:
-                all_payments = json.load(f)
+            if hasattr(self, 'data_subscription'):
+                self.data_subscription.mark_seen()
             
-            # ✅ تصفية الدفعات الخاصة بالزبون الحالي فقط
+            # ✅ قراءة ملف دفعات هذا الزبون فقط
+            store = get_customer_payments_store()
+            customer_payments = store.customer_payments(self.phone_number)
             self.payments = [
-                payment for payment in all_payments 
-                if (payment.get('customer_id') == self.customer_id and
-                    payment.get('customer_phone') == self.phone_number)
+                dict(payment) for payment in customer_payments
+                if payment.get('customer_id') == self.customer_id
             ]
 
             # ✅ ✅ ✅ إضافة UUID للدفعات القديمة التي ما عندها UUID
-            payments_updated = False
+            found_uuids = {}
             for payment in self.payments:
                 if 'invoice_uuid' not in payment:
                     invoice_uuid = self.find_invoice_uuid(payment.get('invoice_number'))
                     if invoice_uuid:
                         payment['invoice_uuid'] = invoice_uuid
-                        payments_updated = True
+                        found_uuids[payment.get('invoice_number')] = invoice_uuid
                         print(f"✅ تم إضافة UUID للدفعة القديمة: {payment['invoice_number']}")
 
-            # ✅ حفظ التعديلات إذا تم تحديث الدفعات
-            if payments_updated:
+            # ✅ حفظ التعديلات إذا تم تحديث الدفعات (سجل تعديل واحد لكل فاتورة في ملف الزبون)
+            if found_uuids:
                 try:
-                    # تحديث جميع الدفعات في الملف
-                    for updated_payment in all_payments:
-                        if 'invoice_uuid' not in updated_payment:
-                            invoice_uuid = self.find_invoice_uuid(updated_payment.get('invoice_number'))
-                            if invoice_uuid:
-                                updated_payment['invoice_uuid'] = invoice_uuid
-                    
-                    with open(payments_file, 'w', encoding='utf-8') as f:
-                        json.dump(all_payments, f, ensure_ascii=False, indent=2)
-                    print("✅ تم حفظ التعديلات في customer_payments.json")
+                    for invoice_number, invoice_uuid in found_uuids.items():
+                        store.update_where(self.phone_number, {'invoice_uuid': invoice_uuid},
+                                           invoice_number=invoice_number, invoice_uuid=None)
+                    print("✅ تم حفظ التعديلات في ملف دفعات الزبون")
                 except Exception as e:
                     print(f"❌ خطأ في حفظ التعديلات: {e}")
 
+            # ✅ أرقام عرض كل فواتير الزبون باستعلام واحد بدلاً من استعلامين لكل صف
+            self.invoice_numbers = get_customer_store().invoice_display_numbers(
+                self.customer_name, self.phone_number)
+
             self.load_payments_table()
             self.update_stats()
             
@@ -1058,50 +1061,14 @@ class CustomerPaymentsPage(QWidget):
 
     def load_payments_table(self):
         """تحميل الدفعات في الجدول"""
-        self.payments_table.setRowCount(len(self.payments))
-        
-        for row, payment in enumerate(self.payments):
-            # ✅ رقم الدفعة (الترتيب التلقائي)
-            number_item = QTableWidgetItem(str(row + 1))
-            number_item.setBackground(QColor("white"))
-            number_item.setTextAlignment(Qt.AlignCenter)
-            self.payments_table.setItem(row, 0, number_item)
-            
-            # ✅ ✅ ✅ التصحيح: الحصول على رقم الفاتورة الحقيقي من خلال UUID
-            # ✅ ✅ ✅ التصحيح النهائي: استخدام رقم العرض الحقيقي (نفس صفحة الفواتير)
-            display_number = self.get_invoice_display_number(payment.get('invoice_uuid'))
-            invoice_item = QTableWidgetItem(display_number)
-            invoice_item.setBackground(QColor("white"))
-            invoice_item.setTextAlignment(Qt.AlignCenter)
-            self.payments_table.setItem(row, 1, invoice_item)
-            
-            # ✅ المبلغ بالدولار
-            amount_usd = payment.get('amount', 0)
-            usd_text = f"{int(amount_usd)} $" if amount_usd == int(amount_usd) else f"{amount_usd:.2f} $"
-            usd_item = QTableWidgetItem(usd_text)
-            usd_item.setBackground(QColor("white"))
-            usd_item.setTextAlignment(Qt.AlignCenter)
-            self.payments_table.setItem(row, 2, usd_item)
-            
-            # ✅ المبلغ بالليرة
-            amount_lbp = payment.get('amount_lbp', 0)
-            lbp_text = f"{int(amount_lbp):,} LBP"
-            lbp_item = QTableWidgetItem(lbp_text)
-            lbp_item.setBackground(QColor("white"))
-            lbp_item.setTextAlignment(Qt.AlignCenter)
-            self.payments_table.setItem(row, 3, lbp_item)
-            
-            # ✅ التاريخ فقط (تم حذف الوقت)
-            date_item = QTableWidgetItem(payment.get('date', ''))
-            date_item.setBackground(QColor("white"))
-            date_item.setTextAlignment(Qt.AlignCenter)
-            self.payments_table.setItem(row, 4, date_item)
+        self.payments_table.set_records(self.payments)
 
-    def update_stats(self):
-        """تحديث الإحصائيات"""
-        total_usd = sum(payment.get('amount', 0) for payment in self.payments)
-        total_lbp = sum(payment.get('amount_lbp', 0) for payment in self.payments)
-        payments_count = len(self.payments)
+    def update_stats(self, payments=None):
+        """تحديث الإحصائيات (لكل الدفعات أو لنتائج البحث)"""
+        payments = self.payments if payments is None else payments
+        total_usd = sum(payment.get('amount', 0) for payment in payments)
+        total_lbp = sum(payment.get('amount_lbp', 0) for payment in payments)
+        payments_count = len(payments)
         
         # ✅ تنسيق الأرقام
         total_usd_text = f"{int(total_usd)} $" if total_usd == int(total_usd) else f"{total_usd:.2f} $"
@@ -1112,7 +1079,11 @@ class CustomerPaymentsPage(QWidget):
         self.payments_count_label.setText(str(payments_count))
 
     def search_payments(self):
-        """بحث في الدفعات"""
+        """بحث في الدفعات فوراً (الكتابة في حقول البحث تمر عبر search_controller بعد مهلة)"""
+        self.search_controller.run_now()
+
+    def prepare_payment_search(self):
+        """✅ قراءة حقول البحث في الواجهة - المقارنة نفسها تتم في خيط خلفي"""
         invoice_text = self.invoice_search.text().strip()
         date_text = self.date_search.text().strip()
         
@@ -1123,78 +1094,30 @@ class CustomerPaymentsPage(QWidget):
         
         # ✅ إذا لم يكن هناك بحث، عرض كل الدفعات
         if not self.is_searching:
-            self.load_payments_table()
-            self.update_stats()
-            return
+            return None
         
-        # ✅ البحث بالتاريخ (بدون تحويل إلى YYYY-MM-DD)
-        filtered_payments = []
-        
-        for payment in self.payments:
-            match = True
-            
-            # ✅ البحث برقم الفاتورة الحقيقي من خلال UUID
-            if invoice_text:
-                display_number = self.get_invoice_display_number(payment.get('invoice_uuid'))
-                if invoice_text not in str(display_number).lower():
-                    match = False
-            
-            # ✅ البحث بالتاريخ (مقارنة مباشرة بالنص المدخل)
-            if date_text and match:
-                payment_date = payment.get('date', '')
-                # ✅ البحث التدريجي: إذا كتب "12" يظهر كل التواريخ التي تحتوي على 12
-                if date_text not in payment_date:
-                    match = False
-            
-            if match:
-                filtered_payments.append(payment)
-        
-        # ✅ تحميل الدفعات المفلترة في الجدول
-        self.payments_table.setRowCount(len(filtered_payments))
-        
-        for row, payment in enumerate(filtered_payments):
-            number_item = QTableWidgetItem(str(row + 1))
-            number_item.setBackground(QColor("white"))
-            number_item.setTextAlignment(Qt.AlignCenter)
-            self.payments_table.setItem(row, 0, number_item)
-            
-            # ✅ ✅ ✅ استخدام رقم الفاتورة الحقيقي
-            display_number = self.get_invoice_display_number(payment.get('invoice_uuid'))
-            invoice_item = QTableWidgetItem(str(display_number))
-            invoice_item.setBackground(QColor("white"))
-            invoice_item.setTextAlignment(Qt.AlignCenter)
-            self.payments_table.setItem(row, 1, invoice_item)
-            
-            amount_usd = payment.get('amount', 0)
-            usd_text = f"{int(amount_usd)} $" if amount_usd == int(amount_usd) else f"{amount_usd:.2f} $"
-            usd_item = QTableWidgetItem(usd_text)
-            usd_item.setBackground(QColor("white"))
-            usd_item.setTextAlignment(Qt.AlignCenter)
-            self.payments_table.setItem(row, 2, usd_item)
-            
-            amount_lbp = payment.get('amount_lbp', 0)
-            lbp_text = f"{int(amount_lbp):,} LBP"
-            lbp_item = QTableWidgetItem(lbp_text)
-            lbp_item.setBackground(QColor("white"))
-            lbp_item.setTextAlignment(Qt.AlignCenter)
-            self.payments_table.setItem(row, 3, lbp_item)
-            
-            date_item = QTableWidgetItem(payment.get('date', ''))
-            date_item.setBackground(QColor("white"))
-            date_item.setTextAlignment(Qt.AlignCenter)
-            self.payments_table.setItem(row, 4, date_item)
+        invoice_text = normalize_text(invoice_text)
+        date_text = normalize_text(date_text)
+        keys = self.payments_table.source_model.search_keys()
         
-        # ✅ تحديث الإحصائيات للنتائج المفلترة
-        total_usd = sum(payment.get('amount', 0) for payment in filtered_payments)
-        total_lbp = sum(payment.get('amount_lbp', 0) for payment in filtered_payments)
-        payments_count = len(filtered_payments)
+        def matches(key):
+            # ✅ المفاتيح الموحدة محسوبة عند التحميل: (رقم الفاتورة الحقيقي، التاريخ)
+            invoice_key, date_key = key
+            # ✅ البحث بالتاريخ (بدون تحويل إلى YYYY-MM-DD) - البحث التدريجي:
+            # إذا كتب "12" يظهر كل التواريخ التي تحتوي على 12
+            return invoice_text in invoice_key and date_text in date_key
         
-        total_usd_text = f"{int(total_usd)} $" if total_usd == int(total_usd) else f"{total_usd:.2f} $"
-        total_lbp_text = f"{int(total_lbp):,} LBP"
+        return lambda cancelled: matching_rows(keys, matches, cancelled)
+
+    def apply_payment_search(self, rows):
+        """✅ عرض نتيجة البحث عبر proxy الجدول بدون إعادة بناء الصفوف"""
+        self.payments_table.filter_rows(rows)
         
-        self.total_usd_label.setText(total_usd_text)
-        self.total_lbp_label.setText(total_lbp_text)
-        self.payments_count_label.setText(str(payments_count))
+        # ✅ تحديث الإحصائيات للنتائج المفلترة
+        if rows is None:
+            self.update_stats()
+        else:
+            self.update_stats(self.payments_table.visible_records())
 
     def add_new_payment(self):
         """✅ إضافة دفعة جديدة"""
@@ -1213,13 +1136,9 @@ class CustomerPaymentsPage(QWidget):
         try:
             print(f"💾 بدء حفظ الدفعة للفاتورة: {payment_data['invoice_number']}")
             
-            # 1. حفظ الدفعة في ملف customer_payments.json
-            payments_file = "data/customer_payments.json"
-            payments = []
-            
-            if os.path.exists(payments_file):
-                with open(payments_file, 'r', encoding='utf-8') as f:
-                    payments = json.load(f)
+            # 1. حفظ الدفعة في ملف دفعات الزبون
+            store = get_customer_payments_store()
+            payments = store.customer_payments(self.phone_number)
             
             # ✅ استخدام UUID بدلاً من رقم الفاتورة
             invoice_uuid = payment_data.get('invoice_uuid', '')
@@ -1259,14 +1178,12 @@ class CustomerPaymentsPage(QWidget):
                 'type': 'دفعة فاتورة تقسيط'
             }
             
-            payments.append(new_payment)
-            
-            with open(payments_file, 'w', encoding='utf-8') as f:
-                json.dump(payments, f, ensure_ascii=False, indent=2)
-            
-            # 2. تحديث الفاتورة في ملف customers.json
+            # 2. تحديث الفاتورة في قاعدة البيانات أولاً - إذا فشل لا تُكتب الدفعة في الملف
             self.update_invoice_payment(payment_data)
             
+            # ✅ حفظ الدفعة (سجل واحد في ملف التعديلات) بعد نجاح معاملة SQLite
+            store.add_payment(new_payment)
+            
             # ✅ إعادة تحميل البيانات
             self.load_payments_data()
             
@@ -1277,215 +1194,100 @@ class CustomerPaymentsPage(QWidget):
             self.show_message("خطأ", f"حدث خطأ في حفظ الدفعة: {e}", "error")
 
     def update_invoice_payment(self, payment_data):
-        """✅ تحديث الفاتورة بإضافة الدفعة"""
-        try:
-            with open("data/customers.json", 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-            
-            for customer in customers:
-                if (customer.get('name') == self.customer_name and 
-                    customer.get('phone') == self.phone_number):
-                    
-                    invoices = customer.get('invoices', [])
-                    for invoice in invoices:
-                        # ✅ البحث باستخدام UUID فقط
-                        if invoice.get('invoice_uuid') == payment_data.get('invoice_uuid'):
-                            # ✅ إضافة الدفعة للفاتورة
-                            if 'payments' not in invoice:
-                                invoice['payments'] = []
-                            
-                            # ✅ منع التكرار
-                            payment_exists = False
-                            for existing_payment in invoice['payments']:
-                                if (existing_payment.get('amount') == payment_data['amount'] and
-                                    existing_payment.get('date') == payment_data['date']):
-                                    payment_exists = True
-                                    break
-                            
-                            if not payment_exists:
-                                invoice_payment = {
-                                    'amount': payment_data['amount'],
-                                    'date': payment_data['date'],
-                                    'invoice_number': payment_data['invoice_number'],
-                                    'invoice_uuid': payment_data['invoice_uuid']  # ✅ إضافة UUID
-                                }
-                                invoice['payments'].append(invoice_payment)
-                                
-                                # ✅ تحديث المبالغ المدفوعة والمتبقية
-                                payment_amount = payment_data['amount']
-                                invoice['paid_amount'] = invoice.get('paid_amount', 0) + payment_amount
-                                invoice['remaining_amount'] = invoice.get('remaining_amount', 0) - payment_amount
-                                
-                                # ✅ ✅ ✅ التصحيح: التحقق من اكتمال الفاتورة
-                                total_amount = invoice.get('total_usd', 0)
-                                new_paid_amount = invoice.get('paid_amount', 0)
-                                
-                                # ✅ ✅ ✅ استخدام مقارنة دقيقة مع Decimal
-                                if abs(new_paid_amount - total_amount) < 0.01 or new_paid_amount >= total_amount:
-                                    invoice['remaining_amount'] = 0  # تأكيد ضبط المتبقي على صفر
-                                    print(f"✅ الفاتورة اكتملت بعد الدفعة! المدفوع: {new_paid_amount}، الإجمالي: {total_amount}")
-                                
-                                # ✅ تحديث إحصائيات الزبون
-                                customer['total_paid'] = customer.get('total_paid', 0) + payment_amount
-                                customer['total_remaining'] = customer.get('total_remaining', 0) - payment_amount
-                                
-                                print(f"✅ تم تحديث الفاتورة في customers.json")
-                            break
-                    break
-            
-            with open("data/customers.json", 'w', encoding='utf-8') as f:
-                json.dump(customers, f, ensure_ascii=False, indent=2)
-                
-        except Exception as e:
-            print(f"❌ خطأ في تحديث الفاتورة: {e}")
+        """✅ تحديث الفاتورة بإضافة الدفعة (الأخطاء تصل إلى المستدعي)"""
+        invoice_payment = {
+            'amount': payment_data['amount'],
+            'date': payment_data['date'],
+            'invoice_number': payment_data['invoice_number'],
+            'invoice_uuid': payment_data['invoice_uuid']  # ✅ إضافة UUID
+        }
+        # ✅ منع التكرار (نفس المبلغ ونفس التاريخ) يتم داخل المخزن
+        invoice = get_customer_store().add_invoice_payment(
+            self.customer_name, self.phone_number, payment_data['invoice_uuid'],
+            invoice_payment, skip_duplicates=True
+        )
+        if invoice:
+            if invoice['completed']:
+                print(f"✅ الفاتورة اكتملت بعد الدفعة! المدفوع: {invoice['paid_amount']}، الإجمالي: {invoice.get('total_usd', 0)}")
+            print(f"✅ تم تحديث الفاتورة في قاعدة البيانات")
 
     def delete_selected_payment(self):
         """✅ حذف الدفعة المحددة"""
-        selected_row = self.payments_table.currentRow()
+        selected_row = self.payments_table.current_row()
         if selected_row < 0:
             self.show_message("تحذير", "⚠️ يرجى اختيار دفعة للحذف", "warning")
             return
         
         try:
-            if selected_row < len(self.payments):
-                payment_to_delete = self.payments[selected_row]
+            payment_to_delete = self.payments_table.record_at(selected_row)
+            
+            # ✅ ✅ ✅ التصحيح: استخدام رقم العرض الحقيقي في رسالة التأكيد
+            display_number = self.invoice_display_text(payment_to_delete)
+            
+            # ✅ تأكيد الحذف (رقم الدفعة كما يظهر في الجدول حتى أثناء البحث)
+            reply = self.show_message("تأكيد الحذف", 
+                f"هل أنت متأكد من حذف الدفعة رقم {self.payments_table.source_row(selected_row) + 1}؟\n\n"
+                f"الفاتورة: {display_number}\n"
+                f"المبلغ: {payment_to_delete.get('amount', 0):.2f} $\n"
+                f"التاريخ: {payment_to_delete.get('date', '')}",
+                "question", True)
+            
+            if reply == QMessageBox.Yes:
+                # ✅ تحديث الفاتورة في قاعدة البيانات أولاً - إذا فشل تبقى الدفعة في الملف
+                self.remove_payment_from_invoice(payment_to_delete)
                 
-                # ✅ ✅ ✅ التصحيح: استخدام رقم العرض الحقيقي في رسالة التأكيد
-                display_number = self.get_invoice_display_number(payment_to_delete.get('invoice_uuid'))
+                # ✅ حذف الدفعة من ملف دفعات الزبون باستخدام UUID الفريد
+                self.delete_payment_from_file_by_uuid(payment_to_delete)
                 
-                # ✅ تأكيد الحذف
-                reply = self.show_message("تأكيد الحذف", 
-                    f"هل أنت متأكد من حذف الدفعة رقم {selected_row + 1}؟\n\n"
-                    f"الفاتورة: {display_number}\n"
-                    f"المبلغ: {payment_to_delete.get('amount', 0):.2f} $\n"
-                    f"التاريخ: {payment_to_delete.get('date', '')}",
-                    "question", True)
+                # ✅ إعادة تحميل البيانات
+                self.load_payments_data()
                 
-                if reply == QMessageBox.Yes:
-                    # ✅ حذف الدفعة من ملف customer_payments.json باستخدام UUID الفريد
-                    self.delete_payment_from_file_by_uuid(payment_to_delete)
-                    
-                    # ✅ تحديث الفاتورة في ملف customers.json
-                    self.remove_payment_from_invoice(payment_to_delete)
-                    
-                    # ✅ إعادة تحميل البيانات
-                    self.load_payments_data()
-                    
-                    self.show_message("نجاح", "✅ تم حذف الدفعة بنجاح", "info")
-            
+                self.show_message("نجاح", "✅ تم حذف الدفعة بنجاح", "info")
+        
         except Exception as e:
             self.show_message("خطأ", f"❌ حدث خطأ في حذف الدفعة: {e}", "error")
 
     def delete_payment_from_file_by_uuid(self, payment_to_delete):
-        """✅ حذف الدفعة من ملف customer_payments.json باستخدام UUID الفريد"""
+        """✅ حذف الدفعة من ملف دفعات الزبون باستخدام UUID الفريد"""
         try:
-            payments_file = "data/customer_payments.json"
-            if not os.path.exists(payments_file):
-                return
-            
-            with open(payments_file, 'r', encoding='utf-8') as f:
-                all_payments = json.load(f)
+            store = get_customer_payments_store()
             
             # ✅ استخدام UUID الفريد للدفعة للبحث بدقة
             payment_uuid = payment_to_delete.get('payment_uuid')
             
             if payment_uuid:
                 # ✅ البحث باستخدام UUID الفريد للدفعة
-                updated_payments = [
-                    payment for payment in all_payments 
-                    if payment.get('payment_uuid') != payment_uuid
-                ]
+                store.remove_where(self.phone_number, payment_uuid=payment_uuid)
             else:
                 # ✅ إذا لم يوجد UUID، نستخدم المعايير القديمة ولكن بدقة أكبر
-                updated_payments = [
-                    payment for payment in all_payments 
-                    if not (payment.get('customer_id') == self.customer_id and
-                           payment.get('invoice_uuid') == payment_to_delete.get('invoice_uuid') and
-                           payment.get('amount') == payment_to_delete.get('amount') and
-                           payment.get('date') == payment_to_delete.get('date') and
-                           payment.get('time') == payment_to_delete.get('time'))
-                ]
-            
-            with open(payments_file, 'w', encoding='utf-8') as f:
-                json.dump(updated_payments, f, ensure_ascii=False, indent=2)
+                store.remove_where(
+                    self.phone_number,
+                    customer_id=self.customer_id,
+                    invoice_uuid=payment_to_delete.get('invoice_uuid'),
+                    amount=payment_to_delete.get('amount'),
+                    date=payment_to_delete.get('date'),
+                    time=payment_to_delete.get('time')
+                )
                 
-            print(f"✅ تم حذف الدفعة من customer_payments.json باستخدام UUID: {payment_uuid}")
+            print(f"✅ تم حذف الدفعة من ملف دفعات الزبون باستخدام UUID: {payment_uuid}")
                 
         except Exception as e:
             print(f"❌ خطأ في حذف الدفعة من الملف: {e}")
 
     def remove_payment_from_invoice(self, payment_to_delete):
-        """✅ إزالة الدفعة من الفاتورة في ملف customers.json"""
-        try:
-            with open("data/customers.json", 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-            
-            for customer in customers:
-                if (customer.get('name') == self.customer_name and 
-                    customer.get('phone') == self.phone_number):
-                    
-                    invoices = customer.get('invoices', [])
-                    for invoice in invoices:
-                        # ✅ البحث باستخدام UUID فقط
-                        if invoice.get('invoice_uuid') == payment_to_delete.get('invoice_uuid'):
-                            # ✅ إزالة الدفعة من قائمة دفعات الفاتورة باستخدام UUID الفريد
-                            if 'payments' in invoice:
-                                invoice['payments'] = [
-                                    p for p in invoice['payments'] 
-                                    if not (p.get('amount') == payment_to_delete.get('amount') and
-                                           p.get('date') == payment_to_delete.get('date') and
-                                           p.get('invoice_uuid') == payment_to_delete.get('invoice_uuid'))
-                                ]
-                            
-                            # ✅ تحديث المبالغ المدفوعة والمتبقية
-                            payment_amount = payment_to_delete.get('amount', 0)
-                            invoice['paid_amount'] = max(0, invoice.get('paid_amount', 0) - payment_amount)
-                            invoice['remaining_amount'] = invoice.get('remaining_amount', 0) + payment_amount
-                            
-                            # ✅ ✅ ✅ التصحيح: تحديث حالة الفاتورة بعد حذف الدفعة
-                            total_amount = invoice.get('total_usd', 0)
-                            new_paid_amount = invoice.get('paid_amount', 0)
-                            
-                            # ✅ ✅ ✅ استخدام مقارنة دقيقة مع Decimal
-                            if abs(new_paid_amount - total_amount) < 0.01 or new_paid_amount >= total_amount:
-                                invoice['remaining_amount'] = 0  # تأكيد ضبط المتبقي على صفر
-                            else:
-                                # إذا لم تكن الفاتورة مكتملة، تأكد من أن المتبقي صحيح
-                                invoice['remaining_amount'] = total_amount - new_paid_amount
-                            
-                            # ✅ تحديث إحصائيات الزبون
-                            customer['total_paid'] = max(0, customer.get('total_paid', 0) - payment_amount)
-                            customer['total_remaining'] = customer.get('total_remaining', 0) + payment_amount
-                            
-                            print(f"✅ تم تحديث الفاتورة بعد حذف الدفعة")
-                            break
-                    break
-            
-            with open("data/customers.json", 'w', encoding='utf-8') as f:
-                json.dump(customers, f, ensure_ascii=False, indent=2)
-                
-        except Exception as e:
-            print(f"❌ خطأ في تحديث الفاتورة بعد الحذف: {e}")
+        """✅ إزالة الدفعة من الفاتورة في مخزن الزبائن (الأخطاء تصل إلى المستدعي)"""
+        if get_customer_store().remove_invoice_payment(
+                self.customer_name, self.phone_number,
+                payment_to_delete.get('invoice_uuid'),
+                payment_to_delete.get('amount', 0), payment_to_delete.get('date')):
+            print(f"✅ تم تحديث الفاتورة بعد حذف الدفعة")
 
     def delete_payments_by_invoice_uuid(self, invoice_uuid):
         """✅ ✅ ✅ وظيفة جديدة: حذف جميع الدفعات المرتبطة بفاتورة معينة"""
         try:
-            payments_file = "data/customer_payments.json"
-            if not os.path.exists(payments_file):
-                return
-            
-            with open(payments_file, 'r', encoding='utf-8') as f:
-                all_payments = json.load(f)
-            
-            # ✅ تصفية الدفعات المرتبطة بالفاتورة المحددة
-            updated_payments = [
-                payment for payment in all_payments 
-                if not (payment.get('customer_id') == self.customer_id and
-                       payment.get('invoice_uuid') == invoice_uuid)
-            ]
-            
-            with open(payments_file, 'w', encoding='utf-8') as f:
-                json.dump(updated_payments, f, ensure_ascii=False, indent=2)
+            # ✅ حذف الدفعات المرتبطة بالفاتورة المحددة
+            get_customer_payments_store().remove_where(
+                self.phone_number, customer_id=self.customer_id, invoice_uuid=invoice_uuid)
                 
             print(f"✅ تم حذف جميع الدفعات المرتبطة بالفاتورة UUID: {invoice_uuid}")
             
@@ -1498,22 +1300,9 @@ class CustomerPaymentsPage(QWidget):
     def delete_all_customer_payments(self):
         """✅ ✅ ✅ وظيفة جديدة: حذف جميع دفعات الزبون"""
         try:
-            payments_file = "data/customer_payments.json"
-            if not os.path.exists(payments_file):
-                return
-            
-            with open(payments_file, 'r', encoding='utf-8') as f:
-                all_payments = json.load(f)
-            
-            # ✅ تصفية جميع دفعات الزبون الحالي
-            updated_payments = [
-                payment for payment in all_payments 
-                if not (payment.get('customer_id') == self.customer_id and
-                       payment.get('customer_phone') == self.phone_number)
-            ]
-            
-            with open(payments_file, 'w', encoding='utf-8') as f:
-                json.dump(updated_payments, f, ensure_ascii=False, indent=2)
+            # ✅ حذف جميع دفعات الزبون الحالي
+            get_customer_payments_store().remove_where(
+                self.phone_number, customer_id=self.customer_id, customer_phone=self.phone_number)
                 
             print(f"✅ تم حذف جميع دفعات الزبون: {self.customer_name}")
             
@@ -1641,18 +1430,12 @@ class CustomerPaymentsPage(QWidget):
                 
                 if choice == "تصدير دفعات محددة":
                     # ✅ الحصول على الصفوف المحددة
-                    selected_rows = self.payments_table.selectionModel().selectedRows()
-                    if not selected_rows:
+                    # ✅ الدفعات المحددة من سجلات الصفوف نفسها (صحيحة أثناء البحث)
+                    selected_payments = self.payments_table.selected_records()
+                    if not selected_payments:
                         self.show_message("تحذير", "⚠️ يرجى اختيار دفعات محددة للتصدير", "warning")
                         return
                     
-                    # ✅ جمع الدفعات المحددة
-                    selected_payments = []
-                    for model_index in selected_rows:
-                        row = model_index.row()
-                        if row < len(self.payments):
-                            selected_payments.append(self.payments[row])
-                    
                     payments_to_export = selected_payments
                     export_type = "محددة"
                 else:
@@ -1801,7 +1584,7 @@ class CustomerPaymentsPage(QWidget):
             
             # ✅ إضافة بيانات الدفعات إلى الجدول
             for i, payment in enumerate(payments):
-                display_number = self.get_invoice_display_number(payment.get('invoice_uuid'))
+                display_number = self.invoice_display_text(payment)
                 html_content += f"""
                         <tr>
                             <td>{i + 1}</td>
@@ -1890,8 +1673,6 @@ class CustomerPaymentsPage(QWidget):
     def closeEvent(self, event):
         """✅ إغلاق النافذة"""
         try:
-            # ✅ إيقاف المؤقت قبل الإغلاق
-            self.refresh_timer.stop()
             event.accept()
         except Exception as e:
             print(f"❌ خطأ في إغلاق النافذة: {e}")
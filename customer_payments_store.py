@@ -0,0 +1,179 @@
+import os
+import hashlib
+import threading
+from itertools import groupby
+
+try:
+    from pages.json_repository import get_json_repository, JOURNAL_SUFFIX, SNAPSHOT_SUFFIX
+except ImportError:
+    from json_repository import get_json_repository, JOURNAL_SUFFIX, SNAPSHOT_SUFFIX
+
+# ✅ ملف لكل زبون داخل هذا المجلد + فهرس صغير للزبائن
+PAYMENTS_DIR = "data/customer_payments"
+INDEX_FILE = "data/customer_payments/index.json"
+
+# ✅ الملف القديم (كل دفعات كل الزبائن) - يقسم مرة واحدة ثم يعاد تسميته
+LEGACY_PAYMENTS_JSON = "data/customer_payments.json"
+LEGACY_SUFFIX = ".migrated"
+
+
+def _phone_key(record):
+    return str(record.get('customer_phone') or '')
+
+
+class CustomerPaymentsStore:
+    """✅ دفعات الزبائن مقسمة: ملف JSON لكل زبون بدلاً من customer_payments.json الواحد
+
+    الفهرس (index.json) قائمة صغيرة بسجل لكل زبون: رقم الهاتف، ملف الدفعات،
+    customer_id واسم الزبون، وملخص (عدد الدفعات ومجموعها). فتح صفحة زبون أو حفظ
+    دفعة له أو حذفها يقرأ ويكتب ملفه فقط، وكل الملفات تمر عبر JsonRepository
+    (تحليل مرة واحدة، وإضافة الدفعات بسجل واحد في ملف التعديلات).
+    """
+
+    def __init__(self, repository=None):
+        self._repository = repository or get_json_repository()
+        self._lock = threading.RLock()
+        self._migrated = False
+
+    # ======== ✅ الملفات ========
+    @staticmethod
+    def shard_name(phone):
+        """✅ اسم ملف دفعات الزبون (ثابت لرقم الهاتف وآمن لأي نص)"""
+        return hashlib.sha1(str(phone or '').encode('utf-8')).hexdigest()[:16] + ".json"
+
+    def _shard_path(self, phone):
+        return os.path.join(PAYMENTS_DIR, self.shard_name(phone))
+
+    def _ensure_migrated(self):
+        """✅ تقسيم customer_payments.json القديم إلى ملفات الزبائن (مرة واحدة)
+
+        الفهرس يكتب بعد كل الملفات، لذلك الانقطاع أثناء التقسيم يعيده من البداية.
+        """
+        if self._migrated:
+            return
+        with self._lock:
+            if self._migrated:
+                return
+            if not os.path.exists(INDEX_FILE) and (
+                    os.path.exists(LEGACY_PAYMENTS_JSON) or
+                    os.path.exists(LEGACY_PAYMENTS_JSON + JOURNAL_SUFFIX)):
+                payments = self._repository.read(LEGACY_PAYMENTS_JSON, [])
+                index = []
+                for phone, group in groupby(sorted(payments, key=_phone_key), key=_phone_key):
+                    shard = list(group)
+                    self._repository.save(self._shard_path(phone), shard)
+                    index.append(self._summary(phone, shard))
+                # ✅ الملفات الجديدة على القرص قبل الفهرس، والفهرس قبل إعادة تسمية الملف
+                # القديم - إذا فشلت الكتابة ترفع flush الخطأ ويبقى الملف القديم كما هو
+                self._repository.flush()
+                self._repository.save(INDEX_FILE, index)
+                self._repository.flush(INDEX_FILE)
+                for path in (LEGACY_PAYMENTS_JSON, LEGACY_PAYMENTS_JSON + JOURNAL_SUFFIX,
+                             LEGACY_PAYMENTS_JSON + SNAPSHOT_SUFFIX):
+                    if os.path.exists(path):
+                        os.replace(path, path + LEGACY_SUFFIX)
+                self._repository.invalidate(LEGACY_PAYMENTS_JSON)
+                print(f"✅ تم تقسيم دفعات الزبائن إلى {len(index)} ملف")
+            self._migrated = True
+
+    # ======== ✅ الفهرس ========
+    def _summary(self, phone, payments):
+        last = payments[-1] if payments else {}
+        return {
+            'customer_phone': phone,
+            'customer_id': last.get('customer_id'),
+            'customer_name': last.get('customer_name'),
+            'shard': self.shard_name(phone),
+            'payments_count': len(payments),
+            'total_usd': sum(float(payment.get('amount', 0) or 0) for payment in payments),
+            'total_lbp': sum(float(payment.get('amount_lbp', 0) or 0) for payment in payments),
+        }
+
+    def _update_summary(self, phone, payments):
+        """✅ تحديث سجل الزبون في الفهرس (سجلان في ملف تعديلات الفهرس)"""
+        self._repository.remove_where(INDEX_FILE, customer_phone=phone)
+        if payments:
+            self._repository.append(INDEX_FILE, self._summary(phone, payments))
+
+    def customers(self):
+        """✅ سجلات الفهرس لكل الزبائن الذين لهم دفعات (مشتركة - للقراءة فقط)"""
+        self._ensure_migrated()
+        return self._repository.read(INDEX_FILE, [])
+
+    def customer_summary(self, phone):
+        phone = str(phone or '')
+        for entry in self.customers():
+            if entry.get('customer_phone') == phone:
+                return entry
+        return None
+
+    # ======== ✅ دفعات زبون واحد ========
+    def customer_payments(self, phone):
+        """✅ دفعات الزبون من ملفه فقط (مشتركة - للقراءة فقط)"""
+        self._ensure_migrated()
+        return self._repository.read(self._shard_path(phone), [])
+
+    def add_payment(self, payment):
+        """✅ إضافة دفعة إلى ملف زبونها - سجل واحد في ملف التعديلات"""
+        self._ensure_migrated()
+        phone = _phone_key(payment)
+        with self._lock:
+            path = self._shard_path(phone)
+            self._repository.append(path, payment, key='payment_uuid')
+            self._update_summary(phone, self._repository.read(path, []))
+
+    def update_where(self, phone, changes, **match):
+        """✅ تعديل حقول دفعات الزبون المطابقة - ترجع عدد الدفعات المعدلة
+
+        مثلاً إضافة UUID للدفعات القديمة: سجل واحد في ملف التعديلات بدلاً من إعادة
+        كتابة ملف الزبون.
+        """
+        self._ensure_migrated()
+        phone = str(phone or '')
+        with self._lock:
+            path = self._shard_path(phone)
+            updated = self._repository.update_where(path, changes, **match)
+            if updated:
+                self._update_summary(phone, self._repository.read(path, []))
+            return updated
+
+    def remove_where(self, phone, **match):
+        """✅ حذف دفعات الزبون المطابقة لكل الحقول - ترجع عدد الدفعات المحذوفة"""
+        self._ensure_migrated()
+        phone = str(phone or '')
+        with self._lock:
+            path = self._shard_path(phone)
+            removed = self._repository.remove_where(path, **match)
+            if removed:
+                self._update_summary(phone, self._repository.read(path, []))
+            return removed
+
+    def remove_customer(self, phone):
+        """✅ حذف ملف دفعات الزبون وسجله في الفهرس - ترجع عدد الدفعات المحذوفة"""
+        self._ensure_migrated()
+        phone = str(phone or '')
+        with self._lock:
+            path = self._shard_path(phone)
+            removed = len(self._repository.read(path, []))
+            # ✅ قبل الحذف: invalidate تكتب أي تعديل متراكم للملف (وإلا كتب بعد حذفه)،
+            # وإذا فشلت الكتابة ترفع الخطأ ولا يحذف شيء
+            self._repository.invalidate(path)
+            for file_path in (path, path + JOURNAL_SUFFIX, path + SNAPSHOT_SUFFIX):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            self._update_summary(phone, [])
+            return removed
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_customer_payments_store():
+    """✅ نسخة واحدة من مخزن الدفعات لكل العملية"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CustomerPaymentsStore()
+    return _store
@@ -1,6 +1,5 @@
 import sys
 import os
-import sqlite3
 import json
 from datetime import datetime
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
@@ -11,6 +10,29 @@ from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
 from PySide6.QtCore import Qt, QDate, QTimer
 from PySide6.QtGui import QPixmap, QPalette, QBrush, QFont, QColor  # ⬅️ تم إضافة QColor هنا
 
+# ✅ اتصال SQLite المشترك - الحجوزات في القاعدة الرئيسية مع المخزون
+try:
+    from pages.db_connection import get_db, refresh_reservation_search
+except ImportError:
+    from db_connection import get_db, refresh_reservation_search
+
+# ✅ إشعارات تغير البيانات بدلاً من مؤقتات التحديث الدورية
+try:
+    from pages.data_versions import bump_version, subscribe_domains
+except ImportError:
+    from data_versions import bump_version, subscribe_domains
+
+try:
+    from pages.text_normalize import fts_prefix_query
+except ImportError:
+    from text_normalize import fts_prefix_query
+
+# ✅ بحث مؤجل في خيط خلفي بدلاً من استعلام القاعدة مع كل حرف
+try:
+    from pages.search_controller import SearchController
+except ImportError:
+    from search_controller import SearchController
+
 class EditReservationDialog(QDialog):
     def __init__(self, reservation_data, parent=None):
         super().__init__(parent)
@@ -223,6 +245,7 @@ class CustomerReservationsPage(QMainWindow):
         self.controller = controller  # ⬅️ حفظ الـ controller للاستخدام
         self.setWindowTitle(f"حجوزات الزبون - {customer_name}")
         self.setGeometry(100, 100, 1400, 800)
+        self.reservations = []
         
         # إعداد قاعدة البيانات
         self.setup_database()
@@ -236,53 +259,17 @@ class CustomerReservationsPage(QMainWindow):
         # حساب الرصيد المتبقي
         self.calculate_remaining_balance()
         
-        # مؤقت للتحديث التلقائي
-        self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self.calculate_remaining_balance)
-        self.update_timer.start(5000)  # تحديث كل 5 ثواني
+        # التحديث التلقائي عند تغير الحجوزات فقط
+        self.data_subscription = subscribe_domains(self, ('reservations',), self.refresh_data)
+    
+    def refresh_data(self):
+        """إعادة تحميل الحجوزات والرصيد بعد تغيرها"""
+        self.load_reservations()
+        self.calculate_remaining_balance()
     
     def setup_database(self):
-        """إعداد قاعدة البيانات"""
-        conn = sqlite3.connect('customer_reservations.db')
-        cursor = conn.cursor()
-        
-        # جدول الحجوزات
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS reservations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                customer_name TEXT NOT NULL,
-                items_json TEXT NOT NULL,
-                total_quantity INTEGER NOT NULL,
-                unit_price_usd REAL NOT NULL,
-                total_amount_usd REAL NOT NULL,
-                total_amount_lbp REAL NOT NULL,
-                date TEXT NOT NULL,
-                remaining_quantity INTEGER NOT NULL,
-                remaining_amount_usd REAL NOT NULL,
-                exchange_rate REAL NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # جدول السحوبات
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS withdrawals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                reservation_id INTEGER,
-                customer_name TEXT NOT NULL,
-                items_json TEXT NOT NULL,
-                quantity INTEGER NOT NULL,
-                amount_usd REAL NOT NULL,
-                amount_lbp REAL NOT NULL,
-                date TEXT NOT NULL,
-                exchange_rate REAL NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (reservation_id) REFERENCES reservations (id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """إعداد قاعدة البيانات - جداول الحجوزات في القاعدة الرئيسية (db_connection.MIGRATIONS)"""
+        get_db()
     
     def setup_ui(self):
         """إعداد واجهة المستخدم"""
@@ -402,7 +389,8 @@ class CustomerReservationsPage(QMainWindow):
         
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("ابحث بالتاريخ (dd\\mm\\yyyy) أو باسم الصنف...")
-        self.search_input.textChanged.connect(self.search_reservations)
+        self.search_controller = SearchController(self, self.prepare_reservation_search, self.apply_reservation_search)
+        self.search_controller.connect_inputs(self.search_input)
         self.search_input.setFixedWidth(350)
         self.search_input.setMinimumHeight(35)
         search_layout.addWidget(self.search_input)
@@ -534,7 +522,10 @@ class CustomerReservationsPage(QMainWindow):
     
     def load_reservations(self):
         """تحميل حجوزات الزبون المحدد فقط"""
-        conn = sqlite3.connect('customer_reservations.db')
+        if hasattr(self, 'data_subscription'):
+            self.data_subscription.mark_seen()
+        
+        conn = get_db().connection()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -545,20 +536,28 @@ class CustomerReservationsPage(QMainWindow):
             ORDER BY date DESC
         ''', (self.customer_name,))
         
-        reservations = cursor.fetchall()
-        conn.close()
+        self.reservations = cursor.fetchall()
         
+        # ✅ إعادة تطبيق البحث الحالي على البيانات الجديدة
+        self.search_controller.run_now(wait=True)
+    
+    @staticmethod
+    def items_text(items_json):
+        """نص عمود الأصناف: اسم(كمية), ..."""
+        try:
+            items = json.loads(items_json)
+            return ", ".join([f"{item['name']}({item['quantity']})" for item in items])
+        except:
+            return str(items_json)
+    
+    def show_reservations(self, reservations):
+        """عرض الحجوزات في الجدول"""
         self.table.setRowCount(len(reservations))
         
         for row_idx, row_data in enumerate(reservations):
             for col_idx, col_data in enumerate(row_data):
                 if col_idx == 2:  # عمود الأصناف
-                    try:
-                        items = json.loads(col_data)
-                        items_str = ", ".join([f"{item['name']}({item['quantity']})" for item in items])
-                        item = QTableWidgetItem(items_str)
-                    except:
-                        item = QTableWidgetItem(str(col_data))
+                    item = QTableWidgetItem(self.items_text(col_data))
                 elif col_idx in [4, 5, 9]:  # الأسعار (USD)
                     item = QTableWidgetItem(f"${col_data:.2f}")
                 elif col_idx == 6:  # المبلغ LBP
@@ -573,54 +572,43 @@ class CustomerReservationsPage(QMainWindow):
                 self.table.setItem(row_idx, col_idx, item)
     
     def search_reservations(self):
-        """بحث في حجوزات الزبون المحدد"""
-        search_text = self.search_input.text().strip()
-        if not search_text:
-            self.load_reservations()
-            return
-        
-        conn = sqlite3.connect('customer_reservations.db')
-        cursor = conn.cursor()
-        
-        # البحث بالتاريخ أو باسم الصنف للزبون المحدد فقط
-        cursor.execute('''
-            SELECT id, customer_name, items_json, total_quantity, unit_price_usd, 
-                   total_amount_usd, total_amount_lbp, date, remaining_quantity, remaining_amount_usd
-            FROM reservations
-            WHERE customer_name = ? AND (date LIKE ? OR items_json LIKE ?)
-            ORDER BY date DESC
-        ''', (self.customer_name, f'%{search_text}%', f'%{search_text}%'))
-        
-        reservations = cursor.fetchall()
-        conn.close()
-        
-        self.table.setRowCount(len(reservations))
+        """بحث في حجوزات الزبون المحدد فوراً (الكتابة تمر عبر search_controller بعد مهلة)"""
+        self.search_controller.run_now()
+    
+    def prepare_reservation_search(self):
+        """✅ البحث بالتاريخ أو باسم الصنف أو الوحدة عبر فهرس reservation_search (FTS5)
+
+        كل كلمة مكتوبة تطابق بداية كلمة في الأصناف/التاريخ (بعد توحيد الحروف العربية)،
+        بدلاً من LIKE على نص items_json الخام. الاستعلام يتم في خيط خلفي.
+        """
+        query = fts_prefix_query(self.search_input.text())
+        if not query:
+            return None
+        customer_name = self.customer_name
+        
+        def job(cancelled):
+            # ✅ فهرسة الحجوزات التي تغيرت منذ آخر بحث أولاً
+            refresh_reservation_search()
+            cursor = get_db().connection().cursor()
+            cursor.execute('''
+                SELECT r.id FROM reservation_search s
+                JOIN reservations r ON r.id = s.rowid
+                WHERE reservation_search MATCH ? AND r.customer_name = ?
+            ''', (query, customer_name))
+            return {row[0] for row in cursor.fetchall()}
         
-        for row_idx, row_data in enumerate(reservations):
-            for col_idx, col_data in enumerate(row_data):
-                if col_idx == 2:  # عمود الأصناف
-                    try:
-                        items = json.loads(col_data)
-                        items_str = ", ".join([f"{item['name']}({item['quantity']})" for item in items])
-                        item = QTableWidgetItem(items_str)
-                    except:
-                        item = QTableWidgetItem(str(col_data))
-                elif col_idx in [4, 5, 9]:  # الأسعار (USD)
-                    item = QTableWidgetItem(f"${col_data:.2f}")
-                elif col_idx == 6:  # المبلغ LBP
-                    item = QTableWidgetItem(f"{col_data:,.0f} LBP")
-                elif col_idx in [3, 8]:  # الكميات
-                    item = QTableWidgetItem(f"{col_data:.0f}")
-                else:
-                    item = QTableWidgetItem(str(col_data))
-                
-                item.setTextAlignment(Qt.AlignCenter)
-                item.setFont(QFont("Arial", 11))
-                self.table.setItem(row_idx, col_idx, item)
+        return job
+    
+    def apply_reservation_search(self, reservation_ids):
+        if reservation_ids is None:
+            self.show_reservations(self.reservations)
+        else:
+            # ✅ نفس ترتيب التحميل (التاريخ تنازلياً)
+            self.show_reservations([row for row in self.reservations if row[0] in reservation_ids])
     
     def calculate_remaining_balance(self):
         """حساب الرصيد المتبقي للزبون المحدد فقط"""
-        conn = sqlite3.connect('customer_reservations.db')
+        conn = get_db().connection()
         cursor = conn.cursor()
         
         # مجموع المبالغ المتبقية من حجوزات الزبون المحدد
@@ -632,7 +620,6 @@ class CustomerReservationsPage(QMainWindow):
         ''', (self.customer_name,))
         
         total_usd, total_lbp = cursor.fetchone()
-        conn.close()
         
         # تحديث التسميات
         self.balance_usd_label.setText(f"{total_usd:.2f}$")
@@ -648,12 +635,11 @@ class CustomerReservationsPage(QMainWindow):
         reservation_id = int(self.table.item(current_row, 0).text())
         
         # جلب بيانات الحجز الحالية
-        conn = sqlite3.connect('customer_reservations.db')
+        conn = get_db().connection()
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM reservations WHERE id = ? AND customer_name = ?', 
                       (reservation_id, self.customer_name))
         reservation_data = cursor.fetchone()
-        conn.close()
         
         if not reservation_data:
             QMessageBox.warning(self, "خطأ", "لم يتم العثور على الحجز")
@@ -671,26 +657,25 @@ class CustomerReservationsPage(QMainWindow):
             updated_data = dialog.get_updated_data()
             
             # تحديث البيانات في قاعدة البيانات
-            conn = sqlite3.connect('customer_reservations.db')
-            cursor = conn.cursor()
+            with get_db().transaction() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute('''
-                UPDATE reservations 
-                SET items_json = ?, total_quantity = ?, unit_price_usd = ?,
-                    total_amount_usd = ?, total_amount_lbp = ?, date = ?, exchange_rate = ?,
-                    remaining_quantity = ?, remaining_amount_usd = ?
-                WHERE id = ? AND customer_name = ?
-            ''', (
-                updated_data['items_json'], 
-                updated_data['total_quantity'], updated_data['unit_price_usd'],
-                updated_data['total_amount_usd'], updated_data['total_amount_lbp'],
-                updated_data['date'], updated_data['exchange_rate'],
-                updated_data['remaining_quantity'], updated_data['remaining_amount_usd'],
-                reservation_id, self.customer_name
-            ))
+                cursor.execute('''
+                    UPDATE reservations 
+                    SET items_json = ?, total_quantity = ?, unit_price_usd = ?,
+                        total_amount_usd = ?, total_amount_lbp = ?, date = ?, exchange_rate = ?,
+                        remaining_quantity = ?, remaining_amount_usd = ?
+                    WHERE id = ? AND customer_name = ?
+                ''', (
+                    updated_data['items_json'], 
+                    updated_data['total_quantity'], updated_data['unit_price_usd'],
+                    updated_data['total_amount_usd'], updated_data['total_amount_lbp'],
+                    updated_data['date'], updated_data['exchange_rate'],
+                    updated_data['remaining_quantity'], updated_data['remaining_amount_usd'],
+                    reservation_id, self.customer_name
+                ))
             
-            conn.commit()
-            conn.close()
+            bump_version('reservations')
             
             QMessageBox.information(self, "نجاح", "تم تعديل الحجز بنجاح")
             self.load_reservations()
@@ -712,18 +697,17 @@ class CustomerReservationsPage(QMainWindow):
         )
         
         if reply == QMessageBox.Yes:
-            conn = sqlite3.connect('customer_reservations.db')
-            cursor = conn.cursor()
+            with get_db().transaction() as conn:
+                cursor = conn.cursor()
             
-            # حذف السحوبات المرتبطة أولاً
-            cursor.execute('DELETE FROM withdrawals WHERE reservation_id = ?', (reservation_id,))
+                # حذف السحوبات المرتبطة أولاً
+                cursor.execute('DELETE FROM withdrawals WHERE reservation_id = ?', (reservation_id,))
             
-            # حذف الحجز
-            cursor.execute('DELETE FROM reservations WHERE id = ? AND customer_name = ?', 
-                          (reservation_id, self.customer_name))
+                # حذف الحجز
+                cursor.execute('DELETE FROM reservations WHERE id = ? AND customer_name = ?', 
+                              (reservation_id, self.customer_name))
             
-            conn.commit()
-            conn.close()
+            bump_version('reservations')
             
             QMessageBox.information(self, "نجاح", "تم حذف الحجز بنجاح")
             self.load_reservations()
@@ -743,29 +727,28 @@ class CustomerReservationsPage(QMainWindow):
         if invoice_data['customer_name'] != self.customer_name:
             return  # لا تضيف إذا كان اسم الزبون لا يتطابق
         
-        conn = sqlite3.connect('customer_reservations.db')
-        cursor = conn.cursor()
+        with get_db().transaction() as conn:
+            cursor = conn.cursor()
         
-        cursor.execute('''
-            INSERT INTO reservations 
-            (customer_name, items_json, total_quantity, unit_price_usd, total_amount_usd, 
-             total_amount_lbp, date, remaining_quantity, remaining_amount_usd, exchange_rate)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            invoice_data['customer_name'],
-            invoice_data['items_json'],
-            invoice_data['total_quantity'],
-            invoice_data['unit_price_usd'],
-            invoice_data['total_amount_usd'],
-            invoice_data['total_amount_lbp'],
-            invoice_data['date'],
-            invoice_data['total_quantity'],
-            invoice_data['total_amount_usd'],
-            invoice_data['exchange_rate']
-        ))
-        
-        conn.commit()
-        conn.close()
+            cursor.execute('''
+                INSERT INTO reservations 
+                (customer_name, items_json, total_quantity, unit_price_usd, total_amount_usd, 
+                 total_amount_lbp, date, remaining_quantity, remaining_amount_usd, exchange_rate)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                invoice_data['customer_name'],
+                invoice_data['items_json'],
+                invoice_data['total_quantity'],
+                invoice_data['unit_price_usd'],
+                invoice_data['total_amount_usd'],
+                invoice_data['total_amount_lbp'],
+                invoice_data['date'],
+                invoice_data['total_quantity'],
+                invoice_data['total_amount_usd'],
+                invoice_data['exchange_rate']
+            ))
+        
+        bump_version('reservations')
         
         self.load_reservations()
         self.calculate_remaining_balance()
@@ -0,0 +1,722 @@
+import json
+import uuid
+
+try:
+    from pages.db_connection import get_db
+    from pages.data_versions import bump_version
+    from pages.json_repository import get_json_repository
+    from pages.report_etl import get_report_loader
+    from pages.text_normalize import normalize_text, fts_prefix_query
+except ImportError:
+    from db_connection import get_db
+    from data_versions import bump_version
+    from json_repository import get_json_repository
+    from report_etl import get_report_loader
+    from text_normalize import normalize_text, fts_prefix_query
+
+DB_PATH = "chbib_materials.db"  # ✅ نفس قاعدة بيانات المخزون لتشارك المعاملة مع تحديث الكميات
+CUSTOMERS_JSON = "data/customers.json"
+
+# ✅ الحقول المخزنة في أعمدة مستقلة - أي حقل آخر يحفظ في العمود extra كـ JSON
+CUSTOMER_COLUMNS = (
+    'name', 'phone', 'address', 'date_added', 'total_invoices', 'total_amount',
+    'total_paid', 'total_remaining', 'last_invoice_date'
+)
+INVOICE_COLUMNS = (
+    'invoice_uuid', 'customer_invoice_id', 'invoice_number', 'type', 'date', 'address',
+    'customer_name', 'customer_phone', 'total_usd', 'total_lbp', 'paid_amount',
+    'remaining_amount', 'exchange_rate'
+)
+ITEM_COLUMNS = (
+    'product_id', 'product_name', 'unit', 'quantity', 'unit_price_usd', 'unit_price_lbp',
+    'total_usd', 'total_lbp', 'purchase_price'
+)
+PAYMENT_COLUMNS = ('payment_uuid', 'amount', 'date')
+
+# ✅ الحقول التي لها قيمة افتراضية دائماً في سجل الزبون
+CUSTOMER_DEFAULTS = {
+    'total_invoices': 0,
+    'total_amount': 0,
+    'total_paid': 0,
+    'total_remaining': 0,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    phone TEXT NOT NULL DEFAULT '',
+    address TEXT,
+    date_added TEXT,
+    total_invoices INTEGER NOT NULL DEFAULT 0,
+    total_amount REAL NOT NULL DEFAULT 0,
+    total_paid REAL NOT NULL DEFAULT 0,
+    total_remaining REAL NOT NULL DEFAULT 0,
+    last_invoice_date TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_customers_name_phone ON customers(name, phone);
+CREATE INDEX IF NOT EXISTS idx_customers_phone ON customers(phone);
+
+CREATE TABLE IF NOT EXISTS invoices (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    invoice_uuid TEXT NOT NULL UNIQUE,
+    customer_id INTEGER NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+    customer_invoice_id INTEGER,
+    invoice_number,
+    type TEXT,
+    date TEXT,
+    address TEXT,
+    customer_name TEXT,
+    customer_phone TEXT,
+    total_usd REAL,
+    total_lbp REAL,
+    paid_amount REAL,
+    remaining_amount REAL,
+    exchange_rate REAL,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_invoices_customer ON invoices(customer_id, id);
+CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices(date);
+CREATE INDEX IF NOT EXISTS idx_invoices_type ON invoices(type);
+
+CREATE TABLE IF NOT EXISTS invoice_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    invoice_id INTEGER NOT NULL REFERENCES invoices(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    product_id,
+    product_name TEXT,
+    unit TEXT,
+    quantity REAL,
+    unit_price_usd REAL,
+    unit_price_lbp REAL,
+    total_usd REAL,
+    total_lbp REAL,
+    purchase_price REAL,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_invoice_items_invoice ON invoice_items(invoice_id, position);
+CREATE INDEX IF NOT EXISTS idx_invoice_items_product ON invoice_items(product_id);
+
+CREATE TABLE IF NOT EXISTS invoice_payments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    invoice_id INTEGER NOT NULL REFERENCES invoices(id) ON DELETE CASCADE,
+    payment_uuid TEXT,
+    amount REAL NOT NULL DEFAULT 0,
+    date TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_invoice_payments_invoice ON invoice_payments(invoice_id, id);
+CREATE INDEX IF NOT EXISTS idx_invoice_payments_uuid ON invoice_payments(payment_uuid);
+
+-- ✅ فهرس FTS5 لأصناف الفواتير (rowid = invoice_items.id): الصنف، الوحدة، تاريخ الفاتورة
+-- والزبون بعد normalize_text. يحدثه المخزن في معاملة كل كتابة (index_invoice_items)
+CREATE VIRTUAL TABLE IF NOT EXISTS invoice_item_search USING fts5(
+    product_name, unit, date, customer_name, tokenize = 'unicode61'
+);
+"""
+
+# ✅ أصناف الفواتير مع فاتورتها - الشرط where في الدالتين التاليتين على invoices باسم inv
+_INVOICE_ITEMS_SOURCE = "invoice_items it JOIN invoices inv ON inv.id = it.invoice_id"
+
+
+def index_invoice_items(c, where, params=()):
+    """✅ إضافة أصناف الفواتير المطابقة لـ where إلى فهرس invoice_item_search"""
+    rows = c.connection.execute(f"""
+        SELECT it.id, it.product_name, it.unit, inv.date, inv.customer_name
+        FROM {_INVOICE_ITEMS_SOURCE} WHERE {where}
+    """, params)
+    c.executemany("""
+        INSERT INTO invoice_item_search (rowid, product_name, unit, date, customer_name)
+        VALUES (?, ?, ?, ?, ?)
+    """, ((row[0], *(normalize_text(value) for value in row[1:])) for row in rows))
+
+
+def unindex_invoice_items(c, where, params=()):
+    """✅ حذف أصناف الفواتير المطابقة لـ where من الفهرس (قبل حذف الأصناف نفسها)"""
+    c.execute(f"""
+        DELETE FROM invoice_item_search WHERE rowid IN (
+            SELECT it.id FROM {_INVOICE_ITEMS_SOURCE} WHERE {where}
+        )
+    """, params)
+
+
+def _split_record(record, columns):
+    """✅ فصل الحقول المعروفة عن الحقول الإضافية"""
+    values = [record.get(column) for column in columns]
+    extra = {key: value for key, value in record.items() if key not in columns}
+    return values, (json.dumps(extra, ensure_ascii=False) if extra else None)
+
+
+def _build_record(row, columns, extra_json):
+    """✅ إعادة بناء القاموس بنفس شكل ملف customers.json القديم"""
+    record = json.loads(extra_json) if extra_json else {}
+    for column, value in zip(columns, row):
+        if value is not None:
+            record[column] = value
+    return record
+
+
+class CustomerStore:
+    """✅ مخزن الزبائن والفواتير في SQLite بدلاً من ملف customers.json الواحد
+
+    كل عملية كتابة تلمس فقط صفوف الزبون والفاتورة المعنية، والقراءة تتم عبر فهارس
+    بدلاً من تحليل الملف بالكامل.
+    """
+
+    def __init__(self, db_path=DB_PATH, json_path=CUSTOMERS_JSON):
+        self.db_path = db_path
+        self.json_path = json_path
+        self._db = get_db(db_path)
+        self.ensure_schema()
+        self.migrate_from_json()
+
+    def ensure_schema(self):
+        """✅ إنشاء الجداول والفهارس إذا لم تكن موجودة"""
+        self._db.connection().executescript(SCHEMA)
+
+    # ======== ✅ الترحيل من customers.json ========
+    def migrate_from_json(self, json_path=None):
+        """✅ ترحيل لمرة واحدة من ملف customers.json إلى الجداول"""
+        json_path = json_path or self.json_path
+        try:
+            with self._db.transaction() as conn:
+                c = conn.cursor()
+                c.execute("SELECT value FROM store_meta WHERE key = 'customers_json_migrated'")
+                if c.fetchone():
+                    return 0
+
+                # ✅ قراءة تدريجية: زبون واحد في الذاكرة بدلاً من تحليل الملف كله مرة واحدة
+                # (مع التعديلات المتراكمة وملف التعديلات إن وجد)
+                customers = get_json_repository().iter_records(json_path)
+
+                count = 0
+                seen_uuids = set()
+                for customer in customers:
+                    count += 1
+                    customer_id = self._insert_customer(c, customer)
+                    for invoice in customer.get('invoices', []):
+                        invoice = dict(invoice)
+                        invoice_uuid = invoice.get('invoice_uuid')
+                        if not invoice_uuid or invoice_uuid in seen_uuids:
+                            invoice['invoice_uuid'] = str(uuid.uuid4())
+                            print(f"✅ تم إضافة UUID للفاتورة القديمة: {invoice.get('invoice_number', '')}")
+                        seen_uuids.add(invoice['invoice_uuid'])
+                        self._insert_invoice(c, customer_id, invoice)
+
+                c.execute(
+                    "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('customers_json_migrated', ?)",
+                    (str(count),)
+                )
+            if count:
+                print(f"✅ تم ترحيل {count} زبون من {json_path} إلى قاعدة البيانات")
+            return count
+        except Exception as e:
+            print(f"❌ خطأ في ترحيل بيانات الزبائن: {e}")
+            return 0
+
+    # ======== ✅ أدوات داخلية ========
+    def _insert_customer(self, c, customer):
+        record = {key: value for key, value in customer.items() if key != 'invoices'}
+        for key, value in CUSTOMER_DEFAULTS.items():
+            record.setdefault(key, value)
+        record.setdefault('phone', '')
+        values, extra = _split_record(record, CUSTOMER_COLUMNS)
+        c.execute(f"""
+            INSERT INTO customers ({', '.join(CUSTOMER_COLUMNS)}, extra)
+            VALUES ({', '.join('?' * len(CUSTOMER_COLUMNS))}, ?)
+        """, (*values, extra))
+        return c.lastrowid
+
+    def _insert_invoice(self, c, customer_id, invoice):
+        record = {key: value for key, value in invoice.items() if key not in ('items', 'payments')}
+        values, extra = _split_record(record, INVOICE_COLUMNS)
+        c.execute(f"""
+            INSERT INTO invoices (customer_id, {', '.join(INVOICE_COLUMNS)}, extra)
+            VALUES (?, {', '.join('?' * len(INVOICE_COLUMNS))}, ?)
+        """, (customer_id, *values, extra))
+        invoice_id = c.lastrowid
+        self._insert_children(c, invoice_id, invoice)
+        index_invoice_items(c, "inv.id = ?", (invoice_id,))
+        return invoice_id
+
+    def _insert_children(self, c, invoice_id, invoice):
+        item_rows = []
+        for position, item in enumerate(invoice.get('items', [])):
+            values, extra = _split_record(item, ITEM_COLUMNS)
+            item_rows.append((invoice_id, position, *values, extra))
+        if item_rows:
+            c.executemany(f"""
+                INSERT INTO invoice_items (invoice_id, position, {', '.join(ITEM_COLUMNS)}, extra)
+                VALUES (?, ?, {', '.join('?' * len(ITEM_COLUMNS))}, ?)
+            """, item_rows)
+
+        payment_rows = []
+        for payment in invoice.get('payments', []):
+            values, extra = _split_record(payment, PAYMENT_COLUMNS)
+            payment_rows.append((invoice_id, *values, extra))
+        if payment_rows:
+            c.executemany(f"""
+                INSERT INTO invoice_payments (invoice_id, {', '.join(PAYMENT_COLUMNS)}, extra)
+                VALUES (?, {', '.join('?' * len(PAYMENT_COLUMNS))}, ?)
+            """, payment_rows)
+
+    def _find_customer_id(self, c, name, phone):
+        c.execute("SELECT id FROM customers WHERE name = ? AND phone = ? ORDER BY id LIMIT 1", (name, phone))
+        row = c.fetchone()
+        return row[0] if row else None
+
+    def _find_invoice_row(self, c, customer_id, invoice_uuid):
+        c.execute(f"""
+            SELECT id, {', '.join(INVOICE_COLUMNS)}, extra
+            FROM invoices WHERE customer_id = ? AND invoice_uuid = ?
+        """, (customer_id, invoice_uuid))
+        return c.fetchone()
+
+    def _next_invoice_id(self, c, customer_id):
+        # ✅ أكبر رقم + 1 (وليس العدد + 1) - بعد حذف فاتورة لا يتكرر رقم فاتورة موجودة
+        c.execute("""
+            SELECT COALESCE(MAX(customer_invoice_id), 0) + 1 FROM invoices WHERE customer_id = ?
+        """, (customer_id,))
+        return c.fetchone()[0]
+
+    def _load_invoices(self, c, where, params):
+        """✅ تحميل الفواتير مع الأصناف والدفعات بثلاث استعلامات فقط"""
+        c.execute(f"""
+            SELECT id, {', '.join(INVOICE_COLUMNS)}, extra
+            FROM invoices WHERE {where} ORDER BY id
+        """, params)
+        invoice_rows = c.fetchall()
+        if not invoice_rows:
+            return []
+
+        invoices = {}
+        for row in invoice_rows:
+            invoice = _build_record(row[1:-1], INVOICE_COLUMNS, row[-1])
+            invoice['items'] = []
+            invoice['payments'] = []
+            invoices[row[0]] = invoice
+
+        c.execute(f"""
+            SELECT invoice_id, {', '.join(ITEM_COLUMNS)}, extra
+            FROM invoice_items
+            WHERE invoice_id IN (SELECT id FROM invoices WHERE {where})
+            ORDER BY invoice_id, position
+        """, params)
+        for row in c.fetchall():
+            invoices[row[0]]['items'].append(_build_record(row[1:-1], ITEM_COLUMNS, row[-1]))
+
+        c.execute(f"""
+            SELECT invoice_id, {', '.join(PAYMENT_COLUMNS)}, extra
+            FROM invoice_payments
+            WHERE invoice_id IN (SELECT id FROM invoices WHERE {where})
+            ORDER BY invoice_id, id
+        """, params)
+        for row in c.fetchall():
+            invoices[row[0]]['payments'].append(_build_record(row[1:-1], PAYMENT_COLUMNS, row[-1]))
+
+        return list(invoices.values())
+
+    def _customer_record(self, row):
+        return _build_record(row[1:-1], CUSTOMER_COLUMNS, row[-1])
+
+    def _sync_reports(self, conn, invoice_uuids=(), customer_ids=()):
+        """✅ تحديث مجاميع المبيعات في معاملة الحفظ نفسها (report_etl.ReportLoader.sync_now)"""
+        get_report_loader().sync_now(conn, invoice_uuids, customer_ids)
+
+    def _adjust_customer(self, c, customer_id, **deltas):
+        """✅ تعديل إجماليات الزبون بفرق القيم فقط"""
+        assignments = []
+        params = []
+        for column, (delta, floor_zero) in deltas.items():
+            if floor_zero:
+                assignments.append(f"{column} = MAX(0, {column} + ?)")
+            else:
+                assignments.append(f"{column} = {column} + ?")
+            params.append(delta)
+        params.append(customer_id)
+        c.execute(f"UPDATE customers SET {', '.join(assignments)} WHERE id = ?", params)
+
+    # ======== ✅ القراءة ========
+    def list_customers(self):
+        """✅ قائمة الزبائن بدون الفواتير (بنفس ترتيب الملف القديم)"""
+        conn = self._db.connection()
+        c = conn.cursor()
+        c.execute(f"SELECT id, {', '.join(CUSTOMER_COLUMNS)}, extra FROM customers ORDER BY id")
+        return [self._customer_record(row) for row in c.fetchall()]
+
+    def count_customers(self):
+        conn = self._db.connection()
+        return conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+
+    def customer_position(self, name, phone):
+        """✅ ترتيب الزبون في القائمة (يبدأ من 1) - يستخدم كـ customer_id في الصفحات"""
+        conn = self._db.connection()
+        c = conn.cursor()
+        customer_id = self._find_customer_id(c, name, phone)
+        if customer_id is None:
+            return None
+        c.execute("SELECT COUNT(*) FROM customers WHERE id <= ?", (customer_id,))
+        return c.fetchone()[0]
+
+    def get_customer(self, name, phone, with_invoices=True):
+        """✅ بيانات زبون واحد مع فواتيره - نفس شكل سجل customers.json"""
+        conn = self._db.connection()
+        c = conn.cursor()
+        c.execute(f"""
+            SELECT id, {', '.join(CUSTOMER_COLUMNS)}, extra FROM customers
+            WHERE name = ? AND phone = ? ORDER BY id LIMIT 1
+        """, (name, phone))
+        row = c.fetchone()
+        if not row:
+            return None
+        customer = self._customer_record(row)
+        if with_invoices:
+            customer['invoices'] = self._load_invoices(c, "customer_id = ?", (row[0],))
+        return customer
+
+    def get_customer_stats(self, name, phone):
+        """✅ إحصائيات الزبون بدون تحميل الفواتير"""
+        conn = self._db.connection()
+        c = conn.cursor()
+        c.execute("""
+            SELECT c.total_paid, c.total_remaining,
+                   (SELECT COUNT(*) FROM invoices i WHERE i.customer_id = c.id)
+            FROM customers c WHERE c.name = ? AND c.phone = ? ORDER BY c.id LIMIT 1
+        """, (name, phone))
+        row = c.fetchone()
+        if not row:
+            return {}
+        return {'total_paid': row[0], 'total_remaining': row[1], 'invoices_count': row[2]}
+
+    def get_invoice(self, invoice_uuid):
+        """✅ فاتورة واحدة من خلال UUID"""
+        conn = self._db.connection()
+        invoices = self._load_invoices(conn.cursor(), "invoice_uuid = ?", (invoice_uuid,))
+        return invoices[0] if invoices else None
+
+    def get_invoice_display_number(self, name, phone, invoice_uuid):
+        """✅ رقم العرض = ترتيب الفاتورة بين فواتير الزبون (يبدأ من 1)"""
+        conn = self._db.connection()
+        c = conn.cursor()
+        customer_id = self._find_customer_id(c, name, phone)
+        if customer_id is None:
+            return None
+        c.execute("SELECT id FROM invoices WHERE customer_id = ? AND invoice_uuid = ?", (customer_id, invoice_uuid))
+        row = c.fetchone()
+        if not row:
+            return None
+        c.execute("SELECT COUNT(*) FROM invoices WHERE customer_id = ? AND id <= ?", (customer_id, row[0]))
+        return c.fetchone()[0]
+
+    def invoice_display_numbers(self, name, phone):
+        """✅ أرقام العرض لكل فواتير الزبون دفعة واحدة - {invoice_uuid: رقم العرض}"""
+        conn = self._db.connection()
+        c = conn.cursor()
+        customer_id = self._find_customer_id(c, name, phone)
+        if customer_id is None:
+            return {}
+        c.execute("SELECT invoice_uuid FROM invoices WHERE customer_id = ? ORDER BY id", (customer_id,))
+        return {row[0]: number for number, row in enumerate(c.fetchall(), 1)}
+
+    def search_invoice_items(self, text, name=None, phone=None):
+        """✅ UUID الفواتير التي فيها صنف يطابق text (الاسم، الوحدة، التاريخ، الزبون)
+
+        بحث مفهرس في invoice_item_search (FTS5) - لكل الزبائن أو لزبون واحد.
+        """
+        query = fts_prefix_query(text)
+        if not query:
+            return set()
+        conn = self._db.connection()
+        c = conn.cursor()
+        sql = """
+            SELECT DISTINCT inv.invoice_uuid FROM invoice_item_search s
+            JOIN invoice_items it ON it.id = s.rowid
+            JOIN invoices inv ON inv.id = it.invoice_id
+            WHERE invoice_item_search MATCH ?
+        """
+        params = [query]
+        if name is not None:
+            customer_id = self._find_customer_id(c, name, phone)
+            if customer_id is None:
+                return set()
+            sql += " AND inv.customer_id = ?"
+            params.append(customer_id)
+        c.execute(sql, params)
+        return {row[0] for row in c.fetchall()}
+
+    def find_invoice_uuid(self, name, phone, invoice_number):
+        conn = self._db.connection()
+        c = conn.cursor()
+        customer_id = self._find_customer_id(c, name, phone)
+        if customer_id is None:
+            return None
+        c.execute("""
+            SELECT invoice_uuid FROM invoices
+            WHERE customer_id = ? AND invoice_number = ? ORDER BY id LIMIT 1
+        """, (customer_id, invoice_number))
+        row = c.fetchone()
+        return row[0] if row else None
+
+    def next_customer_invoice_id(self, name, phone):
+        """✅ رقم الفاتورة التالي لهذا الزبون - يبدأ من 1"""
+        conn = self._db.connection()
+        c = conn.cursor()
+        customer_id = self._find_customer_id(c, name, phone)
+        if customer_id is None:
+            return 1
+        return self._next_invoice_id(c, customer_id)
+
+    # ======== ✅ الكتابة - الزبائن ========
+    def add_customer(self, customer_data):
+        """✅ إضافة زبون جديد - ترجع False إذا كان الزبون موجوداً"""
+        with self._db.transaction() as conn:
+            c = conn.cursor()
+            if self._find_customer_id(c, customer_data.get('name'), customer_data.get('phone', '')) is not None:
+                return False
+            self._insert_customer(c, customer_data)
+            bump_version('customers')
+            return True
+
+    def update_customer(self, name, phone, updated_data):
+        """✅ تعديل بيانات الزبون (الاسم، الهاتف، العنوان...)"""
+        with self._db.transaction() as conn:
+            c = conn.cursor()
+            c.execute(f"SELECT id, {', '.join(CUSTOMER_COLUMNS)}, extra FROM customers WHERE name = ? AND phone = ? ORDER BY id LIMIT 1", (name, phone))
+            row = c.fetchone()
+            if not row:
+                return False
+            record = self._customer_record(row)
+            record.update(updated_data)
+            values, extra = _split_record(record, CUSTOMER_COLUMNS)
+            c.execute(f"""
+                UPDATE customers SET {', '.join(f'{column} = ?' for column in CUSTOMER_COLUMNS)}, extra = ?
+                WHERE id = ?
+            """, (*values, extra, row[0]))
+            bump_version('customers')
+            return True
+
+    def delete_customer(self, name, phone):
+        """✅ حذف الزبون مع جميع فواتيره ودفعاته"""
+        with self._db.transaction() as conn:
+            c = conn.cursor()
+            customer_id = self._find_customer_id(c, name, phone)
+            if customer_id is None:
+                return False
+            unindex_invoice_items(c, "inv.customer_id = ?", (customer_id,))
+            c.execute("DELETE FROM customers WHERE id = ?", (customer_id,))
+            self._sync_reports(conn, customer_ids=(customer_id,))
+            bump_version('customers')
+            return True
+
+    # ======== ✅ الكتابة - الفواتير ========
+    def add_invoice(self, name, phone, invoice_data):
+        """✅ إضافة فاتورة للزبون وتحديث إحصائياته في نفس المعاملة"""
+        with self._db.transaction() as conn:
+            c = conn.cursor()
+            customer_id = self._find_customer_id(c, name, phone)
+            if customer_id is None:
+                print(f"⚠️ لم يتم العثور على الزبون: {name}")
+                return False
+
+            if 'invoice_uuid' not in invoice_data:
+                invoice_data['invoice_uuid'] = str(uuid.uuid4())
+
+            # ✅ رقم فاتورة يبدأ من 1 لكل زبون
+            invoice_data['customer_invoice_id'] = self._next_invoice_id(c, customer_id)
+
+            self._insert_invoice(c, customer_id, invoice_data)
+
+            total_usd = invoice_data['total_usd']
+            if invoice_data['type'] == 'نقدي':
+                paid, remaining = total_usd, 0
+            else:  # تقسيط
+                paid, remaining = invoice_data['paid_amount'], invoice_data['remaining_amount']
+            self._adjust_customer(
+                c, customer_id,
+                total_invoices=(1, False), total_amount=(total_usd, False),
+                total_paid=(paid, False), total_remaining=(remaining, False)
+            )
+            c.execute("UPDATE customers SET last_invoice_date = ? WHERE id = ?", (invoice_data['date'], customer_id))
+            self._sync_reports(conn, invoice_uuids=(invoice_data['invoice_uuid'],))
+            bump_version('customers')
+            return True
+
+    def update_invoice(self, name, phone, invoice_uuid, new_invoice_data):
+        """✅ استبدال الفاتورة في مكانها (نفس رقم العرض) وتحديث إحصائيات الزبون بالفرق"""
+        with self._db.transaction() as conn:
+            c = conn.cursor()
+            customer_id = self._find_customer_id(c, name, phone)
+            if customer_id is None:
+                return None
+            row = self._find_invoice_row(c, customer_id, invoice_uuid)
+            if not row:
+                return None
+            invoice_id = row[0]
+            old_invoice = _build_record(row[1:-1], INVOICE_COLUMNS, row[-1])
+
+            record = {key: value for key, value in new_invoice_data.items() if key not in ('items', 'payments')}
+            values, extra = _split_record(record, INVOICE_COLUMNS)
+            c.execute(f"""
+                UPDATE invoices SET {', '.join(f'{column} = ?' for column in INVOICE_COLUMNS)}, extra = ?
+                WHERE id = ?
+            """, (*values, extra, invoice_id))
+            unindex_invoice_items(c, "inv.id = ?", (invoice_id,))
+            c.execute("DELETE FROM invoice_items WHERE invoice_id = ?", (invoice_id,))
+            c.execute("DELETE FROM invoice_payments WHERE invoice_id = ?", (invoice_id,))
+            self._insert_children(c, invoice_id, new_invoice_data)
+            index_invoice_items(c, "inv.id = ?", (invoice_id,))
+
+            old_total = old_invoice.get('total_usd', 0)
+            new_total = new_invoice_data.get('total_usd', 0)
+            old_paid = old_invoice.get('paid_amount', 0)
+            new_paid = new_invoice_data.get('paid_amount', 0)
+            self._adjust_customer(
+                c, customer_id,
+                total_amount=(new_total - old_total, False),
+                total_paid=(new_paid - old_paid, False),
+                total_remaining=((new_total - new_paid) - (old_total - old_paid), False)
+            )
+            self._sync_reports(conn, invoice_uuids=(invoice_uuid,))
+            bump_version('customers')
+            return old_invoice
+
+    def delete_invoice(self, name, phone, invoice_uuid):
+        """✅ حذف فاتورة واحدة (الأصناف والدفعات تحذف تلقائياً) وتحديث الإحصائيات"""
+        with self._db.transaction() as conn:
+            c = conn.cursor()
+            customer_id = self._find_customer_id(c, name, phone)
+            if customer_id is None:
+                return None
+            invoices = self._load_invoices(c, "customer_id = ? AND invoice_uuid = ?", (customer_id, invoice_uuid))
+            if not invoices:
+                return None
+            deleted_invoice = invoices[0]
+
+            unindex_invoice_items(c, "inv.customer_id = ? AND inv.invoice_uuid = ?", (customer_id, invoice_uuid))
+            c.execute("DELETE FROM invoices WHERE customer_id = ? AND invoice_uuid = ?", (customer_id, invoice_uuid))
+
+            invoice_total = deleted_invoice.get('total_usd', 0)
+            invoice_paid = deleted_invoice.get('paid_amount', 0)
+            if deleted_invoice.get('type', 'نقدي') == 'نقدي':
+                self._adjust_customer(
+                    c, customer_id,
+                    total_amount=(-invoice_total, True), total_invoices=(-1, True),
+                    total_paid=(-invoice_total, True)
+                )
+            else:  # تقسيط
+                self._adjust_customer(
+                    c, customer_id,
+                    total_amount=(-invoice_total, True), total_invoices=(-1, True),
+                    total_paid=(-invoice_paid, True),
+                    total_remaining=(-(invoice_total - invoice_paid), True)
+                )
+            self._sync_reports(conn, invoice_uuids=(invoice_uuid,))
+            bump_version('customers')
+            return deleted_invoice
+
+    # ======== ✅ الكتابة - الدفعات ========
+    def add_invoice_payment(self, name, phone, invoice_uuid, payment_data, skip_duplicates=False):
+        """✅ إضافة دفعة لفاتورة وتحديث المدفوع والمتبقي
+
+        ترجع قاموس الفاتورة بعد التحديث مع المفتاح completed، أو None إذا لم توجد الفاتورة
+        أو كانت الدفعة مكررة (عند skip_duplicates).
+        """
+        with self._db.transaction() as conn:
+            c = conn.cursor()
+            customer_id = self._find_customer_id(c, name, phone)
+            if customer_id is None:
+                return None
+            row = self._find_invoice_row(c, customer_id, invoice_uuid)
+            if not row:
+                return None
+            invoice_id = row[0]
+            invoice = _build_record(row[1:-1], INVOICE_COLUMNS, row[-1])
+            payment_amount = payment_data['amount']
+
+            if skip_duplicates:
+                c.execute("""
+                    SELECT 1 FROM invoice_payments WHERE invoice_id = ? AND amount = ? AND date = ? LIMIT 1
+                """, (invoice_id, payment_amount, payment_data.get('date')))
+                if c.fetchone():
+                    return None
+
+            values, extra = _split_record(payment_data, PAYMENT_COLUMNS)
+            c.execute(f"""
+                INSERT INTO invoice_payments (invoice_id, {', '.join(PAYMENT_COLUMNS)}, extra)
+                VALUES (?, {', '.join('?' * len(PAYMENT_COLUMNS))}, ?)
+            """, (invoice_id, *values, extra))
+
+            # ✅ حساب المبلغ المتبقي الحقيقي مع التقريب الصحيح لتجنب -0.00
+            total_amount = invoice.get('total_usd', 0)
+            new_paid_amount = invoice.get('paid_amount', 0) + payment_amount
+            real_remaining = total_amount - new_paid_amount
+            remaining = 0.0 if real_remaining <= 0.009 else round(real_remaining, 2)
+
+            c.execute("UPDATE invoices SET paid_amount = ?, remaining_amount = ? WHERE id = ?",
+                      (new_paid_amount, remaining, invoice_id))
+            self._adjust_customer(
+                c, customer_id,
+                total_paid=(payment_amount, False), total_remaining=(-payment_amount, True)
+            )
+            bump_version('customers')
+
+            invoice['paid_amount'] = new_paid_amount
+            invoice['remaining_amount'] = remaining
+            invoice['completed'] = remaining == 0.0
+            return invoice
+
+    def remove_invoice_payment(self, name, phone, invoice_uuid, amount, date):
+        """✅ إزالة دفعة من الفاتورة (مطابقة بالمبلغ والتاريخ) وإعادة حساب المتبقي"""
+        with self._db.transaction() as conn:
+            c = conn.cursor()
+            customer_id = self._find_customer_id(c, name, phone)
+            if customer_id is None:
+                return False
+            row = self._find_invoice_row(c, customer_id, invoice_uuid)
+            if not row:
+                return False
+            invoice_id = row[0]
+            invoice = _build_record(row[1:-1], INVOICE_COLUMNS, row[-1])
+
+            # ✅ حذف دفعة واحدة فقط - قد تتكرر دفعة بنفس المبلغ والتاريخ
+            c.execute("""
+                DELETE FROM invoice_payments WHERE id = (
+                    SELECT id FROM invoice_payments
+                    WHERE invoice_id = ? AND amount = ? AND date = ? LIMIT 1
+                )
+            """, (invoice_id, amount, date))
+            if c.rowcount == 0:
+                return False
+
+            total_amount = invoice.get('total_usd', 0)
+            new_paid_amount = max(0, invoice.get('paid_amount', 0) - amount)
+            if abs(new_paid_amount - total_amount) < 0.01 or new_paid_amount >= total_amount:
+                remaining = 0
+            else:
+                remaining = total_amount - new_paid_amount
+
+            c.execute("UPDATE invoices SET paid_amount = ?, remaining_amount = ? WHERE id = ?",
+                      (new_paid_amount, remaining, invoice_id))
+            self._adjust_customer(
+                c, customer_id,
+                total_paid=(-amount, True), total_remaining=(amount, False)
+            )
+            bump_version('customers')
+            return True
+
+
+_store = None
+
+
+def get_customer_store():
+    """✅ نسخة واحدة من المخزن لكل العملية (يتم الترحيل عند أول استخدام)"""
+    global _store
+    if _store is None:
+        _store = CustomerStore()
+    return _store
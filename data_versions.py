@@ -0,0 +1,219 @@
+import os
+import threading
+from collections import deque
+
+try:
+    from PySide6.QtCore import QObject, QEvent, QFileSystemWatcher, QTimer, Signal
+except ImportError as e:
+    # ✅ العدادات تعمل بدون Qt (مثلاً عند استخدام المخزن من سكربت)
+    print(f"⚠️ مراقبة الملفات غير متاحة بدون PySide6: {e}")
+    QObject = None
+
+# ✅ مجالات البيانات - لكل مجال رقم إصدار يزيد مع كل تعديل
+DOMAINS = ('customers', 'payments', 'reservations', 'stock', 'sales')
+
+# ✅ الملفات المراقبة والمجالات التي تتأثر بتغييرها من خارج البرنامج
+# (قاعدة البيانات غير مراقبة: ملف WAL يتغير مع كل checkpoint، وكل كتابة فيها من
+# البرنامج تزيد الإصدار بنفسها مع مفاتيح السجلات)
+WATCHED_FILES = {
+    # ✅ فهرس دفعات الزبائن يتغير مع كل تعديل في ملف أي زبون (customer_payments_store)
+    "data/customer_payments/index.json": ('payments',),
+    "data/customer_reservations.json": ('reservations',),
+    "data/invoices.json": ('customers',),
+}
+
+# ✅ مهلة تجميع الإشعارات المتتالية في إشعار واحد (بالمللي ثانية)
+NOTIFY_DELAY_MS = 150
+
+# ✅ عدد الإصدارات الأخيرة المحفوظة مع مفاتيح السجلات المعدلة (لتحديث الصفوف فقط)
+CHANGE_LOG_SIZE = 256
+
+_versions = dict.fromkeys(DOMAINS, 0)
+_changes = {domain: deque(maxlen=CHANGE_LOG_SIZE) for domain in DOMAINS}
+_versions_lock = threading.Lock()
+_bus = None
+
+# ✅ توقيع (mtime، الحجم) كل ملف مراقب بعد آخر كتابة من البرنامج نفسه
+_own_writes = {}
+
+
+def data_version(domain):
+    """✅ رقم الإصدار الحالي للمجال"""
+    return _versions.get(domain, 0)
+
+
+def bump_version(*domains, keys=None):
+    """✅ زيادة إصدار المجالات المعدلة - آمنة للاستدعاء من أي خيط
+
+    keys: مفاتيح السجلات المعدلة (مثلاً أرقام الأصناف) إذا كانت معروفة،
+    لكي تحدث الصفحات هذه الصفوف فقط بدلاً من إعادة تحميل كل البيانات.
+    """
+    keys = frozenset(keys) if keys is not None else None
+    with _versions_lock:
+        for domain in domains:
+            version = _versions[domain] = _versions.get(domain, 0) + 1
+            _changes.setdefault(domain, deque(maxlen=CHANGE_LOG_SIZE)).append((version, keys))
+    if _bus is not None:
+        _bus.schedule_notify()
+
+
+def changed_keys(domain, since):
+    """✅ مفاتيح السجلات المعدلة في المجال بعد الإصدار since
+
+    ترجع None إذا كان أحد التعديلات غير محدد المفاتيح (مثلاً تغير الملف من خارج
+    البرنامج) أو أقدم من سجل التغييرات - عندها يجب إعادة تحميل كل البيانات.
+    """
+    with _versions_lock:
+        current = _versions.get(domain, 0)
+        log = [entry for entry in _changes.get(domain, ()) if entry[0] > since]
+    if len(log) != current - since:
+        return None
+    result = set()
+    for _, keys in log:
+        if keys is None:
+            return None
+        result |= keys
+    return result
+
+
+def _watched_key(path):
+    return os.path.normpath(path).replace(os.sep, "/")
+
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def domains_for_file(path):
+    """✅ المجالات المرتبطة بملف بيانات (فارغة إذا لم يكن الملف مراقباً)"""
+    return WATCHED_FILES.get(_watched_key(path), ())
+
+
+def record_own_write(path):
+    """✅ تسجيل كتابة البرنامج لملف مراقب بعد انتهائها
+
+    إشعار المراقبة لنفس النسخة يتجاهل - البرنامج زاد الإصدار بنفسه عبر bump_version
+    مع مفاتيح السجلات، وزيادة بدون مفاتيح كانت ستعيد تحميل كل البيانات.
+    """
+    key = _watched_key(path)
+    if key in WATCHED_FILES:
+        _own_writes[key] = _file_signature(path)
+
+
+def is_own_write(path):
+    """✅ هل الملف الحالي هو نفس النسخة التي كتبها البرنامج آخر مرة"""
+    signature = _own_writes.get(_watched_key(path))
+    return signature is not None and signature == _file_signature(path)
+
+
+if QObject is not None:
+
+    class DataVersionBus(QObject):
+        """✅ ناقل إشعارات التغيير بدلاً من مؤقتات التحديث الدورية
+
+        يرسل changed(domain, version) مرة واحدة لكل مجال تغير إصداره، سواء كان
+        التعديل من داخل البرنامج (bump_version) أو من خارجه (QFileSystemWatcher).
+        """
+        changed = Signal(str, int)
+        _bumped = Signal()
+
+        def __init__(self):
+            super().__init__()
+            self._emitted = {domain: data_version(domain) for domain in DOMAINS}
+
+            self._notify_timer = QTimer(self)
+            self._notify_timer.setSingleShot(True)
+            self._notify_timer.setInterval(NOTIFY_DELAY_MS)
+            self._notify_timer.timeout.connect(self._flush)
+            # ✅ الإشارة تنتقل إلى خيط الواجهة إذا جاء التعديل من خيط آخر
+            self._bumped.connect(self._notify_timer.start)
+
+            self._watcher = QFileSystemWatcher(self)
+            self._watcher.fileChanged.connect(self._on_file_changed)
+            self.watch_known_files()
+
+        def watch_known_files(self):
+            """✅ إضافة ملفات البيانات الموجودة إلى المراقبة"""
+            watched = set(self._watcher.files())
+            for path in WATCHED_FILES:
+                if path not in watched and os.path.exists(path):
+                    self._watcher.addPath(path)
+
+        def schedule_notify(self):
+            self._bumped.emit()
+
+        def _on_file_changed(self, path):
+            # ✅ تغيير من خارج البرنامج فقط - كتابات البرنامج زادت الإصدار مسبقاً
+            if not is_own_write(path):
+                bump_version(*domains_for_file(path))
+            # ✅ الاستبدال الذري للملف يزيله من المراقبة - نعيد إضافته
+            if path not in self._watcher.files() and os.path.exists(path):
+                self._watcher.addPath(path)
+
+        def _flush(self):
+            self.watch_known_files()
+            for domain in DOMAINS:
+                version = data_version(domain)
+                if version != self._emitted.get(domain):
+                    self._emitted[domain] = version
+                    self.changed.emit(domain, version)
+
+    class DomainSubscription(QObject):
+        """✅ تحديث الصفحة فقط عند تغير إصدار أحد مجالاتها
+
+        إذا كانت الصفحة مخفية يؤجل التحديث حتى ظهورها التالي.
+        """
+
+        def __init__(self, widget, domains, callback):
+            super().__init__(widget)
+            self.widget = widget
+            self.domains = tuple(domains)
+            self.callback = callback
+            self._previous = {}
+            self.mark_seen()
+            get_data_bus().changed.connect(self._on_changed)
+            widget.installEventFilter(self)
+
+        def mark_seen(self):
+            """✅ اعتبار الإصدارات الحالية معروضة (بعد تحميل الصفحة لبياناتها بنفسها)"""
+            self._seen = {domain: data_version(domain) for domain in self.domains}
+
+        def is_stale(self):
+            return any(data_version(domain) != self._seen.get(domain) for domain in self.domains)
+
+        def changed_keys(self, domain):
+            """✅ مفاتيح السجلات المعدلة في آخر تحديث (داخل callback) أو None إذا لم تكن معروفة"""
+            return changed_keys(domain, self._previous.get(domain, 0)) if domain in self._previous else None
+
+        def refresh_if_stale(self):
+            if self.is_stale():
+                self._previous = self._seen
+                self.mark_seen()
+                try:
+                    self.callback()
+                except Exception as e:
+                    print(f"⚠️ خطأ في التحديث بعد تغير البيانات: {e}")
+
+        def _on_changed(self, domain, version):
+            if domain in self.domains and self.widget.isVisible():
+                self.refresh_if_stale()
+
+        def eventFilter(self, watched, event):
+            if watched is self.widget and event.type() == QEvent.Show:
+                self.refresh_if_stale()
+            return False
+
+    def get_data_bus():
+        """✅ نسخة واحدة من الناقل لكل العملية (تنشأ بعد QApplication)"""
+        global _bus
+        if _bus is None:
+            _bus = DataVersionBus()
+        return _bus
+
+    def subscribe_domains(widget, domains, callback):
+        """✅ ربط صفحة بمجالات بياناتها - ترجع كائن الاشتراك"""
+        return DomainSubscription(widget, domains, callback)
@@ -0,0 +1,645 @@
+import os
+import json
+import atexit
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+try:
+    from pages.text_normalize import normalize_text
+except ImportError:
+    from text_normalize import normalize_text
+
+DB_PATH = "chbib_materials.db"
+
+# ✅ قواعد البيانات الأخرى تربط (ATTACH) على اتصال القاعدة الرئيسية باسم مخطط
+# مثال: SELECT ... FROM reports.products p JOIN Items s ON s.name = p.name_ar
+ATTACHED_DATABASES = {
+    'reports': "business_management.db",
+    'payments': "payments_database.db",
+}
+
+# ✅ ملف الحجوزات القديم - يتم نقل جداوله إلى القاعدة الرئيسية (الترحيل 2)
+LEGACY_RESERVATIONS_DB = "customer_reservations.db"
+
+# ✅ انتظار القفل بدلاً من الفشل الفوري "database is locked"
+BUSY_TIMEOUT_MS = 5000
+
+# ✅ عدد الاستعلامات المحضرة التي يحتفظ بها كل اتصال
+STATEMENT_CACHE_SIZE = 256
+
+
+class ConnectionManager:
+    """✅ اتصال SQLite واحد طويل العمر لكل خيط بدلاً من فتح وإغلاق اتصال في كل عملية
+
+    - وضع WAL: القراءة لا تنتظر الكتابة
+    - busy_timeout: انتظار القفل بدلاً من الخطأ
+    - cached_statements: إعادة استخدام الاستعلامات المحضرة
+    - attachments: قواعد بيانات إضافية تربط على كل اتصال {اسم المخطط: الملف}
+    الاتصال مشترك - لا تستدعِ close() عليه.
+
+    ملاحظة: في وضع WAL تكون المعاملة ذرية داخل كل ملف على حدة، لذلك الجداول التي
+    تكتب معاً (الفواتير، المخزون، الحجوزات) موجودة في الملف الرئيسي نفسه.
+    """
+
+    def __init__(self, db_path=DB_PATH, attachments=None):
+        self.db_path = db_path
+        self.attachments = dict(attachments or {})
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        for schema, path in self.attachments.items():
+            conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+            conn.execute(f"PRAGMA {schema}.journal_mode = WAL")
+            conn.execute(f"PRAGMA {schema}.synchronous = NORMAL")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def connection(self):
+        """✅ اتصال الخيط الحالي (ينشأ عند أول استخدام)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+            self._local.depth = 0
+            self._local.after_commit = []
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """✅ معاملة واحدة - المعاملات المتداخلة تنضم إلى المعاملة الخارجية
+
+        يتم الحفظ (commit) عند خروج المعاملة الخارجية فقط، والتراجع عن الكل عند أي خطأ.
+        """
+        conn = self.connection()
+        if self._local.depth == 0 and conn.in_transaction:
+            # ✅ معاملة متروكة من عملية سابقة فشلت قبل commit - نفس سلوك إغلاق الاتصال القديم
+            conn.rollback()
+        self._local.depth += 1
+        committed = False
+        try:
+            yield conn
+            if self._local.depth == 1:
+                conn.commit()
+                committed = True
+        except Exception:
+            if self._local.depth == 1:
+                conn.rollback()
+            raise
+        finally:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                callbacks, self._local.after_commit = self._local.after_commit, []
+                if committed:
+                    for callback in callbacks:
+                        try:
+                            callback()
+                        except Exception as e:
+                            print(f"⚠️ خطأ في تنفيذ إجراء بعد حفظ المعاملة: {e}")
+
+    def after_commit(self, callback):
+        """✅ تنفيذ callback بعد حفظ المعاملة الخارجية للخيط الحالي (فوراً إذا لا توجد معاملة)
+
+        مثل إشعار الصفحات بتغير البيانات - لا يصل الإشعار قبل الحفظ، ولا يصل إذا تم التراجع.
+        """
+        self.connection()
+        if self._local.depth == 0:
+            callback()
+        else:
+            self._local.after_commit.append(callback)
+
+    def migrate(self, migrations):
+        """✅ تطبيق الترحيلات الجديدة بالترتيب - رقم آخر ترحيل في PRAGMA user_version"""
+        conn = self.connection()
+        current = conn.execute("PRAGMA user_version").fetchone()[0]
+        for version, description, apply in migrations:
+            if version <= current:
+                continue
+            try:
+                apply(self)
+                with self.transaction() as conn:
+                    conn.execute(f"PRAGMA user_version = {int(version)}")
+                print(f"✅ ترحيل قاعدة البيانات {version}: {description}")
+            except Exception as e:
+                print(f"❌ فشل ترحيل قاعدة البيانات {version} ({description}): {e}")
+                break
+
+    def release(self):
+        """✅ إغلاق اتصال الخيط الحالي (في نهاية خيط عامل مؤقت مثل QThread)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        try:
+            conn.close()
+        except Exception as e:
+            print(f"⚠️ خطأ في إغلاق اتصال قاعدة البيانات: {e}")
+
+    def close_all(self):
+        """✅ إغلاق كل الاتصالات (عند إغلاق البرنامج)"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception as e:
+                print(f"⚠️ خطأ في إغلاق اتصال قاعدة البيانات: {e}")
+
+
+STOCK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT,
+    buy_unit TEXT,
+    sell_unit TEXT,
+    buy_price REAL,
+    sell_price REAL,
+    quantity REAL,
+    currency TEXT,
+    capital_value_lbp REAL
+);
+
+CREATE TABLE IF NOT EXISTS Units (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    unit TEXT,
+    kind TEXT
+);
+
+CREATE TABLE IF NOT EXISTS ItemSellUnits (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_id INTEGER,
+    sell_unit TEXT,
+    FOREIGN KEY (item_id) REFERENCES Items (id) ON DELETE CASCADE
+);
+"""
+
+RESERVATIONS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reservations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    customer_name TEXT NOT NULL,
+    items_json TEXT NOT NULL,
+    total_quantity INTEGER NOT NULL,
+    unit_price_usd REAL NOT NULL,
+    total_amount_usd REAL NOT NULL,
+    total_amount_lbp REAL NOT NULL,
+    date TEXT NOT NULL,
+    remaining_quantity INTEGER NOT NULL,
+    remaining_amount_usd REAL NOT NULL,
+    exchange_rate REAL NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS withdrawals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    reservation_id INTEGER,
+    customer_name TEXT NOT NULL,
+    items_json TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    amount_usd REAL NOT NULL,
+    amount_lbp REAL NOT NULL,
+    date TEXT NOT NULL,
+    exchange_rate REAL NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (reservation_id) REFERENCES reservations (id)
+);
+"""
+
+
+def _create_stock_tables(db):
+    db.connection().executescript(STOCK_SCHEMA)
+
+
+def _move_reservations_to_main(db):
+    """✅ نقل جداول الحجوزات من customer_reservations.db إلى القاعدة الرئيسية
+
+    حتى يتم الحجز/السحب وتعديل المخزون في معاملة واحدة.
+    """
+    conn = db.connection()
+    conn.executescript(RESERVATIONS_SCHEMA)
+    if not os.path.exists(LEGACY_RESERVATIONS_DB):
+        return
+
+    # ✅ ATTACH غير مسموح داخل معاملة - يتم قبلها وبعدها
+    conn.execute("ATTACH DATABASE ? AS legacy_reservations", (LEGACY_RESERVATIONS_DB,))
+    try:
+        legacy_tables = {row[0] for row in conn.execute(
+            "SELECT name FROM legacy_reservations.sqlite_master WHERE type = 'table'")}
+        with db.transaction() as conn:
+            for table in ('reservations', 'withdrawals'):
+                if table in legacy_tables:
+                    conn.execute(f"INSERT OR IGNORE INTO main.{table} SELECT * FROM legacy_reservations.{table}")
+    finally:
+        conn.execute("DETACH DATABASE legacy_reservations")
+
+
+REPORT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports.products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name_ar TEXT NOT NULL,
+    name_en TEXT,
+    quantity INTEGER DEFAULT 0,
+    capital_price REAL DEFAULT 0,
+    selling_price REAL DEFAULT 0,
+    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS reports.customers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name_ar TEXT NOT NULL,
+    name_en TEXT,
+    phone TEXT,
+    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS reports.invoices (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    customer_id INTEGER,
+    invoice_type TEXT CHECK(invoice_type IN ('نقدي', 'تقسيط')),
+    total_amount REAL DEFAULT 0,
+    paid_amount REAL DEFAULT 0,
+    remaining_amount REAL DEFAULT 0,
+    invoice_date DATE,
+    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (customer_id) REFERENCES customers (id)
+);
+
+CREATE TABLE IF NOT EXISTS reports.invoice_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    invoice_id INTEGER,
+    product_id INTEGER,
+    quantity INTEGER,
+    unit_price REAL,
+    total_price REAL,
+    FOREIGN KEY (invoice_id) REFERENCES invoices (id),
+    FOREIGN KEY (product_id) REFERENCES products (id)
+);
+
+CREATE TABLE IF NOT EXISTS reports.payments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    customer_id INTEGER,
+    invoice_id INTEGER,
+    amount REAL,
+    payment_date DATE,
+    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (customer_id) REFERENCES customers (id),
+    FOREIGN KEY (invoice_id) REFERENCES invoices (id)
+);
+
+CREATE TABLE IF NOT EXISTS reports.etl_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# ✅ مفتاح السجل المصدر في كل جدول تقارير (يضاف للجداول القديمة)
+REPORT_SOURCE_KEYS = {
+    'products': ('source_item_id', 'INTEGER'),
+    'customers': ('source_customer_id', 'INTEGER'),
+    'invoices': ('invoice_uuid', 'TEXT'),
+    'payments': ('payment_uuid', 'TEXT'),
+}
+
+# ✅ سجل التغييرات في القاعدة الرئيسية - يعبأ بالـ triggers ويقرؤه report_etl
+# كل سجل: (رقم تسلسلي، نوع الكيان، مفتاحه)؛ رقم آخر سجل تمت معالجته هو "العلامة المائية"
+REPORT_CHANGES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    entity TEXT NOT NULL,
+    entity_key TEXT NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_report_items_ins AFTER INSERT ON Items BEGIN
+    INSERT INTO report_changes (entity, entity_key) VALUES ('product', NEW.id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_report_items_upd AFTER UPDATE ON Items BEGIN
+    INSERT INTO report_changes (entity, entity_key) VALUES ('product', NEW.id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_report_items_del AFTER DELETE ON Items BEGIN
+    INSERT INTO report_changes (entity, entity_key) VALUES ('product', OLD.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_report_customers_ins AFTER INSERT ON customers BEGIN
+    INSERT INTO report_changes (entity, entity_key) VALUES ('customer', NEW.id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_report_customers_upd AFTER UPDATE ON customers BEGIN
+    INSERT INTO report_changes (entity, entity_key) VALUES ('customer', NEW.id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_report_customers_del AFTER DELETE ON customers BEGIN
+    INSERT INTO report_changes (entity, entity_key) VALUES ('customer', OLD.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_report_invoices_ins AFTER INSERT ON invoices BEGIN
+    INSERT INTO report_changes (entity, entity_key) VALUES ('invoice', NEW.invoice_uuid);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_report_invoices_upd AFTER UPDATE ON invoices BEGIN
+    INSERT INTO report_changes (entity, entity_key) VALUES ('invoice', NEW.invoice_uuid);
+    INSERT INTO report_changes (entity, entity_key)
+        SELECT 'invoice', OLD.invoice_uuid WHERE OLD.invoice_uuid IS NOT NEW.invoice_uuid;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_report_invoices_del AFTER DELETE ON invoices BEGIN
+    INSERT INTO report_changes (entity, entity_key) VALUES ('invoice', OLD.invoice_uuid);
+END;
+
+-- ✅ تغيير الأصناف يعني إعادة تحميل فاتورتها (إن كانت ما زالت موجودة)
+CREATE TRIGGER IF NOT EXISTS trg_report_invoice_items_ins AFTER INSERT ON invoice_items BEGIN
+    INSERT INTO report_changes (entity, entity_key)
+        SELECT 'invoice', invoice_uuid FROM invoices WHERE id = NEW.invoice_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_report_invoice_items_upd AFTER UPDATE ON invoice_items BEGIN
+    INSERT INTO report_changes (entity, entity_key)
+        SELECT 'invoice', invoice_uuid FROM invoices WHERE id = NEW.invoice_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_report_invoice_items_del AFTER DELETE ON invoice_items BEGIN
+    INSERT INTO report_changes (entity, entity_key)
+        SELECT 'invoice', invoice_uuid FROM invoices WHERE id = OLD.invoice_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_report_payments_ins AFTER INSERT ON invoice_payments BEGIN
+    INSERT INTO report_changes (entity, entity_key) VALUES ('payment', COALESCE(NEW.payment_uuid, 'id:' || NEW.id));
+END;
+CREATE TRIGGER IF NOT EXISTS trg_report_payments_upd AFTER UPDATE ON invoice_payments BEGIN
+    INSERT INTO report_changes (entity, entity_key) VALUES ('payment', COALESCE(NEW.payment_uuid, 'id:' || NEW.id));
+END;
+CREATE TRIGGER IF NOT EXISTS trg_report_payments_del AFTER DELETE ON invoice_payments BEGIN
+    INSERT INTO report_changes (entity, entity_key) VALUES ('payment', COALESCE(OLD.payment_uuid, 'id:' || OLD.id));
+END;
+"""
+
+
+def _create_report_tables(db):
+    """✅ جداول التقارير تغذى من البيانات الحقيقية بدلاً من البيانات التجريبية
+
+    - إضافة مفتاح السجل المصدر لكل جدول وحذف الصفوف التجريبية (بدون مفتاح)
+    - سجل التغييرات (report_changes) مع triggers على جداول المصدر
+    - تسجيل كل البيانات الحالية مرة واحدة ليتم استيرادها في أول تحديث
+    """
+    try:
+        from pages.customer_store import SCHEMA as CUSTOMER_SCHEMA
+    except ImportError:
+        from customer_store import SCHEMA as CUSTOMER_SCHEMA
+
+    conn = db.connection()
+    conn.executescript(STOCK_SCHEMA + CUSTOMER_SCHEMA + REPORT_SCHEMA + REPORT_CHANGES_SCHEMA)
+    with db.transaction() as conn:
+        for table, (column, column_type) in REPORT_SOURCE_KEYS.items():
+            columns = [row[1] for row in conn.execute(f"PRAGMA reports.table_info({table})")]
+            if column not in columns:
+                conn.execute(f"ALTER TABLE reports.{table} ADD COLUMN {column} {column_type}")
+            conn.execute(f"DELETE FROM reports.{table} WHERE {column} IS NULL")
+            conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS reports.idx_{table}_{column} ON {table}({column})")
+        conn.execute("DELETE FROM reports.invoice_items WHERE invoice_id NOT IN (SELECT id FROM reports.invoices)")
+        conn.execute("CREATE INDEX IF NOT EXISTS reports.idx_invoice_items_invoice ON invoice_items(invoice_id)")
+
+        conn.execute("INSERT INTO report_changes (entity, entity_key) SELECT 'product', id FROM Items")
+        conn.execute("INSERT INTO report_changes (entity, entity_key) SELECT 'customer', id FROM customers")
+        conn.execute("INSERT INTO report_changes (entity, entity_key) SELECT 'invoice', invoice_uuid FROM invoices")
+        conn.execute("""
+            INSERT INTO report_changes (entity, entity_key)
+            SELECT 'payment', COALESCE(payment_uuid, 'id:' || id) FROM invoice_payments
+        """)
+
+
+# ✅ مجاميع المبيعات اليومية والشهرية (period: yyyy-MM-dd أو yyyy-MM)
+# تحدث في نفس معاملة مزامنة كل فاتورة (report_etl.apply_sales_rollup)
+SALES_ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports.sales_daily (
+    period TEXT PRIMARY KEY,
+    cash_sales REAL NOT NULL DEFAULT 0,
+    credit_sales REAL NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    cost REAL NOT NULL DEFAULT 0,
+    profit REAL NOT NULL DEFAULT 0,
+    invoice_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS reports.sales_monthly (
+    period TEXT PRIMARY KEY,
+    cash_sales REAL NOT NULL DEFAULT 0,
+    credit_sales REAL NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    cost REAL NOT NULL DEFAULT 0,
+    profit REAL NOT NULL DEFAULT 0,
+    invoice_count INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+# ✅ الإيراد والتكلفة اللذان أضيفا للمجاميع مع كل فاتورة - يطرحان كما هما عند تعديلها أو حذفها
+BOOKED_TOTALS_COLUMNS = (('booked_revenue', 'REAL'), ('booked_cost', 'REAL'))
+
+
+def _create_sales_rollups(db):
+    """✅ إنشاء جداول المجاميع وتعبئتها من الفواتير الموجودة في التقارير"""
+    try:
+        from pages.report_etl import rebuild_sales_rollups
+    except ImportError:
+        from report_etl import rebuild_sales_rollups
+
+    conn = db.connection()
+    conn.executescript(SALES_ROLLUP_SCHEMA)
+    columns = [row[1] for row in conn.execute("PRAGMA reports.table_info(invoices)")]
+    for column, column_type in BOOKED_TOTALS_COLUMNS:
+        if column not in columns:
+            conn.execute(f"ALTER TABLE reports.invoices ADD COLUMN {column} {column_type}")
+    with db.transaction() as conn:
+        rebuild_sales_rollups(conn)
+
+
+# ✅ فهارس استعلامات التقارير (report_engine) - بعضها يغطي كل أعمدة الاستعلام
+# حتى لا يحتاج SQLite لقراءة الجدول نفسه
+REPORT_INDEXES_SCHEMA = """
+CREATE INDEX IF NOT EXISTS reports.idx_invoices_date
+    ON invoices(invoice_date, invoice_type, total_amount, paid_amount, remaining_amount, customer_id);
+CREATE INDEX IF NOT EXISTS reports.idx_invoices_type_date ON invoices(invoice_type, invoice_date);
+CREATE INDEX IF NOT EXISTS reports.idx_invoices_customer
+    ON invoices(customer_id, invoice_date, total_amount, remaining_amount);
+DROP INDEX IF EXISTS reports.idx_invoice_items_invoice;
+CREATE INDEX IF NOT EXISTS reports.idx_invoice_items_invoice
+    ON invoice_items(invoice_id, product_id, quantity, total_price);
+CREATE INDEX IF NOT EXISTS reports.idx_invoice_items_product ON invoice_items(product_id);
+CREATE INDEX IF NOT EXISTS reports.idx_payments_customer ON payments(customer_id, amount);
+CREATE INDEX IF NOT EXISTS reports.idx_payments_invoice ON payments(invoice_id);
+CREATE INDEX IF NOT EXISTS main.idx_items_name ON Items(name);
+"""
+
+
+def _create_report_indexes(db):
+    db.connection().executescript(REPORT_INDEXES_SCHEMA)
+
+
+def _index_payments_by_date(db):
+    """✅ تقرير العملاء يجمع دفعات الفترة لكل زبون - الفهرس يغطي التاريخ والمبلغ"""
+    db.connection().executescript("""
+        DROP INDEX IF EXISTS reports.idx_payments_customer;
+        CREATE INDEX IF NOT EXISTS reports.idx_payments_customer ON payments(customer_id, payment_date, amount);
+    """)
+
+
+def _index_payments_by_period(db):
+    """✅ دفعات الفترة لكل الزبائن (تقرير العملاء) - بحث بمدى التاريخ بدلاً من مسح فهرس الزبون"""
+    db.connection().executescript("""
+        CREATE INDEX IF NOT EXISTS reports.idx_payments_date ON payments(payment_date, customer_id, amount);
+    """)
+
+
+def _reservation_search_row(reservation_id, items_json, date, customer_name):
+    """✅ صف فهرس الحجز: أسماء الأصناف ووحداتها من items_json، التاريخ، الزبون (موحدة)"""
+    try:
+        items = json.loads(items_json or '[]')
+    except ValueError:
+        items = []
+    if not isinstance(items, list):
+        items = []
+    items = [item for item in items if isinstance(item, dict)]
+    return (
+        reservation_id,
+        ' '.join(normalize_text(item.get('name')) for item in items),
+        ' '.join(normalize_text(item.get('unit')) for item in items),
+        normalize_text(date),
+        normalize_text(customer_name),
+    )
+
+
+# ✅ فهرس FTS5 لأصناف الحجوزات. الـ triggers تسجل رقم الحجز المتغير فقط (بدون دوال
+# SQL خاصة) لذلك الكتابة في reservations تنجح من أي اتصال، والنصوص توحد في بايثون
+# عند البحث عبر refresh_reservation_search. rowid = رقم الحجز.
+RESERVATION_SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS reservation_search USING fts5(
+    product_names, units, date, customer_name, tokenize = 'unicode61'
+);
+CREATE TABLE IF NOT EXISTS reservation_search_pending (
+    reservation_id INTEGER PRIMARY KEY
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_reservation_search_mark_ins AFTER INSERT ON reservations BEGIN
+    INSERT OR IGNORE INTO reservation_search_pending (reservation_id) VALUES (NEW.id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_reservation_search_mark_upd AFTER UPDATE ON reservations BEGIN
+    INSERT OR IGNORE INTO reservation_search_pending (reservation_id) VALUES (OLD.id), (NEW.id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_reservation_search_mark_del AFTER DELETE ON reservations BEGIN
+    INSERT OR IGNORE INTO reservation_search_pending (reservation_id) VALUES (OLD.id);
+END;
+"""
+
+
+def refresh_reservation_search(db=None):
+    """✅ إعادة فهرسة الحجوزات التي تغيرت منذ آخر بحث (يستدعى قبل البحث في reservation_search)"""
+    db = db or get_db()
+    with db.transaction() as conn:
+        rows = conn.execute("""
+            SELECT p.reservation_id, r.id, r.items_json, r.date, r.customer_name
+            FROM reservation_search_pending p
+            LEFT JOIN reservations r ON r.id = p.reservation_id
+        """).fetchall()
+        if not rows:
+            return
+        conn.executemany("DELETE FROM reservation_search WHERE rowid = ?",
+                         [(row[0],) for row in rows])
+        conn.executemany("""
+            INSERT INTO reservation_search (rowid, product_names, units, date, customer_name)
+            VALUES (?, ?, ?, ?, ?)
+        """, [_reservation_search_row(*row[1:]) for row in rows if row[1] is not None])
+        conn.executemany("DELETE FROM reservation_search_pending WHERE reservation_id = ?",
+                         [(row[0],) for row in rows])
+
+
+def _create_item_search(db):
+    """✅ إنشاء فهرس البحث في أصناف الحجوزات وتسجيل كل الحجوزات الموجودة لفهرستها"""
+    conn = db.connection()
+    conn.executescript(RESERVATIONS_SCHEMA + RESERVATION_SEARCH_SCHEMA)
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM reservation_search")
+        conn.execute("""
+            INSERT OR IGNORE INTO reservation_search_pending (reservation_id)
+            SELECT id FROM reservations
+        """)
+
+
+def _normalize_search_in_python(db):
+    """✅ فهرس الحجوزات بدون دوال SQL خاصة، وحذف فهرس أصناف الفواتير غير المستخدم
+
+    triggers القديمة كانت تستدعي normalize_text داخل SQL فتفشل الكتابة من أي اتصال
+    لم يسجلها. البحث في أصناف الفواتير يتم عبر InvertedIndex في صفحة الفواتير.
+    """
+    db.connection().executescript("""
+        DROP TRIGGER IF EXISTS trg_reservation_search_ins;
+        DROP TRIGGER IF EXISTS trg_reservation_search_upd;
+        DROP TRIGGER IF EXISTS trg_reservation_search_del;
+        DROP TRIGGER IF EXISTS trg_invoice_item_search_ins;
+        DROP TRIGGER IF EXISTS trg_invoice_item_search_upd;
+        DROP TRIGGER IF EXISTS trg_invoice_item_search_del;
+        DROP TRIGGER IF EXISTS trg_invoice_item_search_invoice_upd;
+        DROP TABLE IF EXISTS invoice_item_search;
+    """)
+    _create_item_search(db)
+
+
+def _create_invoice_item_search(db):
+    """✅ فهرس FTS5 لأصناف الفواتير وتعبئته من الفواتير الموجودة
+
+    يحدثه CustomerStore في معاملة كل كتابة (النصوص موحدة في بايثون، بدون triggers).
+    """
+    try:
+        from pages.customer_store import SCHEMA as CUSTOMER_SCHEMA, index_invoice_items
+    except ImportError:
+        from customer_store import SCHEMA as CUSTOMER_SCHEMA, index_invoice_items
+
+    db.connection().executescript(CUSTOMER_SCHEMA)
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM invoice_item_search")
+        index_invoice_items(conn.cursor(), "1")
+
+
+# ✅ ترحيلات المخطط لكل قواعد البيانات - قصة ترحيل واحدة بدلاً من كل صفحة على حدة
+# (رقم الترحيل، الوصف، الدالة) - تضاف الترحيلات الجديدة في آخر القائمة فقط
+MIGRATIONS = [
+    (1, "جداول المخزون", _create_stock_tables),
+    (2, "نقل الحجوزات إلى القاعدة الرئيسية", _move_reservations_to_main),
+    (3, "جداول التقارير من البيانات الحقيقية", _create_report_tables),
+    (4, "مجاميع المبيعات اليومية والشهرية", _create_sales_rollups),
+    (5, "فهارس استعلامات التقارير", _create_report_indexes),
+    (6, "فهرس دفعات الزبائن حسب التاريخ", _index_payments_by_date),
+    (7, "فهارس FTS5 للبحث في أصناف الحجوزات والفواتير", _create_item_search),
+    (8, "تسجيل إيراد وتكلفة كل فاتورة في المجاميع", _create_sales_rollups),
+    (9, "توحيد نصوص فهرس الحجوزات في بايثون بدلاً من triggers", _normalize_search_in_python),
+    (10, "فهرس الدفعات حسب التاريخ لتقرير العملاء", _index_payments_by_period),
+    (11, "فهرس FTS5 لأصناف الفواتير يحدثه مخزن الزبائن", _create_invoice_item_search),
+]
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_db(db_path=DB_PATH):
+    """✅ مدير الاتصالات المشترك لملف قاعدة البيانات
+
+    القاعدة الرئيسية تربط قواعد التقارير والدفعات وتطبق الترحيلات عند أول استخدام.
+    """
+    manager = _managers.get(db_path)
+    if manager is None:
+        with _managers_lock:
+            manager = _managers.get(db_path)
+            if manager is None:
+                if db_path == DB_PATH:
+                    manager = ConnectionManager(db_path, ATTACHED_DATABASES)
+                    manager.migrate(MIGRATIONS)
+                else:
+                    manager = ConnectionManager(db_path)
+                _managers[db_path] = manager
+                atexit.register(manager.close_all)
+    return manager
@@ -0,0 +1,82 @@
+from bisect import bisect_left, bisect_right, insort
+
+try:
+    from pages.text_normalize import index_tokens, tokenize
+except ImportError:
+    from text_normalize import index_tokens, tokenize
+
+
+class InvertedIndex:
+    """✅ فهرس مقلوب: كلمة -> مفاتيح السجلات التي تحتويها (مثل UUID الفواتير)
+
+    البحث يطابق كل كلمة من النص المكتوب كبادئة لكلمات السجل (بحث ثنائي في
+    قائمة الكلمات المرتبة)، والنتيجة تقاطع مجموعات المفاتيح - بدلاً من المرور
+    على كل السجلات ونصوصها. التحديث تدريجي: sync يعيد فهرسة السجلات التي
+    تغير نصها فقط ويحذف السجلات المختفية.
+    """
+
+    def __init__(self):
+        self._postings = {}   # كلمة -> set(المفاتيح)
+        self._words = []      # الكلمات مرتبة (للبحث بالبادئة)
+        self._texts = {}      # المفتاح -> النص المفهرس
+        self._tokens = {}     # المفتاح -> كلماته
+
+    def __len__(self):
+        return len(self._texts)
+
+    def add(self, key, text):
+        """✅ فهرسة سجل (أو إعادة فهرسته إذا تغير نصه)"""
+        if self._texts.get(key) == text:
+            return
+        self.remove(key)
+        tokens = index_tokens(text)
+        self._texts[key] = text
+        self._tokens[key] = tokens
+        for token in tokens:
+            keys = self._postings.get(token)
+            if keys is None:
+                keys = self._postings[token] = set()
+                insort(self._words, token)
+            keys.add(key)
+
+    def remove(self, key):
+        tokens = self._tokens.pop(key, None)
+        if tokens is None:
+            return
+        del self._texts[key]
+        for token in tokens:
+            keys = self._postings[token]
+            keys.discard(key)
+            if not keys:
+                del self._postings[token]
+                del self._words[bisect_left(self._words, token)]
+
+    def sync(self, entries):
+        """✅ مزامنة الفهرس مع {المفتاح: النص} - تعديل الفرق فقط"""
+        for key in [key for key in self._texts if key not in entries]:
+            self.remove(key)
+        for key, text in entries.items():
+            self.add(key, text)
+
+    def _prefix_keys(self, prefix):
+        start = bisect_left(self._words, prefix)
+        end = bisect_right(self._words, prefix + '\uffff')
+        if end - start == 1:
+            return self._postings[self._words[start]]
+        keys = set()
+        for index in range(start, end):
+            keys |= self._postings[self._words[index]]
+        return keys
+
+    def search(self, text):
+        """✅ مفاتيح السجلات التي تحتوي كل كلمات text (كبادئات)، أو None إذا لا كلمات"""
+        query_tokens = tokenize(text)
+        if not query_tokens:
+            return None
+        result = None
+        # ✅ البدء بأضيق مجموعة يجعل التقاطع أسرع
+        for keys in sorted((self._prefix_keys(token) for token in query_tokens), key=len):
+            result = set(keys) if result is None else result & keys
+            if not result:
+                break
+        return result
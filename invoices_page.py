@@ -1,6 +1,4 @@
 import os
-import json
-import sqlite3
 from datetime import datetime
 from decimal import Decimal, ROUND_HALF_UP
 from PySide6.QtWidgets import (
@@ -18,6 +16,60 @@ from PySide6.QtGui import QPixmap, QFont, QIcon, QPainter, QColor, QKeySequence,
 
 DB_PATH = "chbib_materials.db"
 
+# ✅ مخزن الزبائن والفواتير (SQLite)
+try:
+    from pages.customer_store import get_customer_store
+except ImportError:
+    from customer_store import get_customer_store
+
+# ✅ اتصال SQLite المشترك (اتصال واحد لكل خيط)
+try:
+    from pages.db_connection import get_db
+except ImportError:
+    from db_connection import get_db
+
+# ✅ مستودع ملفات JSON المشترك
+try:
+    from pages.json_repository import get_json_repository, atomic_write_text, json_text
+except ImportError:
+    from json_repository import get_json_repository, atomic_write_text, json_text
+
+# ✅ دفعات الزبائن: ملف لكل زبون + فهرس صغير
+try:
+    from pages.customer_payments_store import get_customer_payments_store
+except ImportError:
+    from customer_payments_store import get_customer_payments_store
+
+# ✅ جداول افتراضية (نموذج/عرض) بدلاً من عنصر لكل خانة
+try:
+    from pages.table_models import Column, RecordTableView
+except ImportError:
+    from table_models import Column, RecordTableView
+
+# ✅ بحث مؤجل في خيط خلفي بدلاً من التصفية مع كل حرف
+try:
+    from pages.search_controller import table_text_search
+except ImportError:
+    from search_controller import table_text_search
+
+# ✅ مجاميع المبيعات الشهرية من جداول التقارير
+try:
+    from pages.report_etl import get_report_loader
+except ImportError:
+    from report_etl import get_report_loader
+
+# ✅ إشعارات تغير البيانات (مجاميع المبيعات)
+try:
+    from pages.data_versions import subscribe_domains
+except ImportError:
+    from data_versions import subscribe_domains
+
+# ✅ كتالوج الأصناف المشترك (يحمل مرة واحدة مع فهارس بالاسم والرقم)
+try:
+    from pages.product_catalog import get_product_catalog
+except ImportError:
+    from product_catalog import get_product_catalog
+
 # ✅ استيراد الصفحة الجديدة
 try:
     from pages.customer_invoices_page import CustomerInvoicesPage
@@ -31,9 +83,7 @@ class InvoicesPage(QWidget):
         self.controller = controller
         self.setup_event_listeners()
         self.data_file = "data/invoices.json"
-        self.customers_file = "data/customers.json"
         self.reports_file = "data/reports.json"
-        self.sales_stats_file = "data/sales_stats.json"  # ✅ ملف جديد للإحصائيات
         self.exchange_rate = self.load_exchange_rate()
         self.current_invoice_items = []
         self.invoice_counter = self.load_invoice_counter()
@@ -43,154 +93,32 @@ class InvoicesPage(QWidget):
         self.total_installment_sales = 0.0
         
         self.ensure_data_files()
-        self.load_sales_stats()  # ✅ تحميل الإحصائيات المحفوظة
+        self.load_sales_stats()  # ✅ مبيعات الشهر الحالي
+        # ✅ استيراد التغييرات إلى التقارير في الخلفية - المجاميع تعاد قراءتها عند انتهائه
+        self.sales_subscription = subscribe_domains(self, ('sales',), self.load_sales_stats)
+        get_report_loader().refresh_in_background()
         self.setup_ui()
         self.load_customers()
         self.setShortcut()
 
     def load_sales_stats(self):
-        """✅ تحميل إحصائيات المبيعات من ملف"""
-        try:
-            if os.path.exists(self.sales_stats_file):
-                with open(self.sales_stats_file, 'r', encoding='utf-8') as f:
-                    stats = json.load(f)
-                    self.total_cash_sales = stats.get('total_cash_sales', 0.0)
-                    self.total_installment_sales = stats.get('total_installment_sales', 0.0)
-            else:
-                # ✅ إذا لم يوجد الملف، نحسب الإحصائيات من الفواتير الحالية
-                self.calculate_initial_sales_stats()
-        except Exception as e:
-            print(f"❌ خطأ في تحميل إحصائيات المبيعات: {e}")
-            self.calculate_initial_sales_stats()
-
-    def calculate_initial_sales_stats(self):
-        """✅ حساب الإحصائيات الأولية من الفواتير الحالية"""
-        try:
-            if not os.path.exists(self.data_file):
-                self.total_cash_sales = 0.0
-                self.total_installment_sales = 0.0
-                return
-
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                invoices = json.load(f)
-
-            self.total_cash_sales = 0.0
-            self.total_installment_sales = 0.0
-
-            for invoice in invoices:
-                payment_type = invoice.get('payment_type', 'نقدي')
-                total_amount = float(invoice.get('total_amount', 0))
-                
-                if payment_type == 'نقدي':
-                    self.total_cash_sales += total_amount
-                elif payment_type == 'تقسيط':
-                    self.total_installment_sales += total_amount
-
-            self.save_sales_stats()
-            print(f"✅ تم حساب الإحصائيات الأولية: نقدي={self.total_cash_sales}, تقسيط={self.total_installment_sales}")
-
-        except Exception as e:
-            print(f"❌ خطأ في حساب الإحصائيات الأولية: {e}")
-
-    def save_sales_stats(self):
-        """✅ حفظ إحصائيات المبيعات في ملف"""
-        try:
-            os.makedirs("data", exist_ok=True)
-            stats = {
-                'total_cash_sales': self.total_cash_sales,
-                'total_installment_sales': self.total_installment_sales,
-                'last_updated': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-            with open(self.sales_stats_file, 'w', encoding='utf-8') as f:
-                json.dump(stats, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"❌ خطأ في حفظ إحصائيات المبيعات: {e}")
-
-    def update_sales_stats(self, invoice_data):
-        """✅ تحديث إحصائيات المبيعات عند إضافة فاتورة جديدة"""
-        try:
-            payment_type = invoice_data.get('payment_type', 'نقدي')
-            total_amount = float(invoice_data.get('total_amount', 0))
-            
-            if payment_type == 'نقدي':
-                self.total_cash_sales += total_amount
-            elif payment_type == 'تقسيط':
-                self.total_installment_sales += total_amount
-            
-            self.save_sales_stats()
-            
-            print(f"✅ تم تحديث الإحصائيات: نقدي={self.total_cash_sales}, تقسيط={self.total_installment_sales}")
-            
-        except Exception as e:
-            print(f"❌ خطأ في تحديث إحصائيات المبيعات: {e}")
-
-    def convert_installment_to_cash(self, invoice_data):
-        """✅ تحويل فاتورة تقسيط إلى نقدي عند السداد"""
-        try:
-            total_amount = float(invoice_data.get('total_amount', 0))
-            
-            # ✅ خصم من التقسيط وإضافة للنقدي
-            self.total_installment_sales -= total_amount
-            self.total_cash_sales += total_amount
-            
-            # ✅ التأكد من أن الأرقام لا تكون سالبة
-            if self.total_installment_sales < 0:
-                self.total_installment_sales = 0
-                
-            self.save_sales_stats()
-            
-            print(f"✅ تم التحويل: {total_amount} من التقسيط إلى النقدي")
-            
-        except Exception as e:
-            print(f"❌ خطأ في تحويل التقسيط إلى نقدي: {e}")
+        """✅ مبيعات الشهر الحالي من جدول المجاميع الشهرية (reports.sales_monthly)
 
-    def reset_monthly_sales(self):
-        """✅ تصفير إحصائيات المبيعات الشهرية"""
+        المجاميع تحدث مع كل فاتورة في قاعدة البيانات، لذلك لا حاجة لعدادات تحفظ في ملف
+        ولا لتصفيرها بداية كل شهر - الأشهر السابقة تبقى في صفحة التقارير.
+        قراءة فقط - لا تستورد التغييرات في خيط الواجهة.
+        """
         try:
-            reply = QMessageBox.question(
-                self,
-                "تصفير الإحصائيات الشهرية",
-                "هل تريد تصفير إحصائيات المبيعات للشهر الجديد؟\n\nسيتم الاحتفاظ بالأرشيف في صفحة التقارير.",
-                QMessageBox.Yes | QMessageBox.No,
-                QMessageBox.No
-            )
-            
-            if reply == QMessageBox.Yes:
-                # ✅ حفظ البيانات الحالية للتقرير (سيتم استخدامها في reports_page.py)
-                monthly_report = self.prepare_monthly_report()
-                
-                # ✅ تصفير الإحصائيات
-                self.total_cash_sales = 0.0
-                self.total_installment_sales = 0.0
-                self.save_sales_stats()
-                
-                # ✅ رسالة نجاح
-                self.show_auto_close_success_message("✅ تم تصفير الإحصائيات الشهرية بنجاح")
-                
-                print(f"✅ تم تصفير الإحصائيات الشهرية: {monthly_report}")
-                
+            self.total_cash_sales, self.total_installment_sales = get_report_loader().month_totals()
         except Exception as e:
-            QMessageBox.critical(self, "خطأ", f"حدث خطأ في تصفير الإحصائيات: {e}")
-
-    def prepare_monthly_report(self):
-        """✅ تحضير تقرير شهري لصفحة التقارير المستقبلية"""
-        return {
-            'month': datetime.now().month,
-            'year': datetime.now().year,
-            'final_cash_sales': self.total_cash_sales,
-            'final_installment_sales': self.total_installment_sales,
-            'total_sales': self.total_cash_sales + self.total_installment_sales,
-            'reset_date': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+            print(f"❌ خطأ في تحميل إحصائيات المبيعات: {e}")
 
     def load_invoice_counter(self):
         """✅ تحميل عداد الفواتير من ملف"""
         try:
-            counter_file = "data/invoice_counter.json"
-            if os.path.exists(counter_file):
-                with open(counter_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return data.get('counter', 1)
+            data = get_json_repository().read("data/invoice_counter.json")
+            if data:
+                return data.get('counter', 1)
             return 1
         except:
             return 1
@@ -203,11 +131,8 @@ class InvoicesPage(QWidget):
             cash_total = 0.0
             installment_total = 0.0
             
-            invoices_file = "data/invoices.json"
-            if os.path.exists(invoices_file):
-                with open(invoices_file, 'r', encoding='utf-8') as f:
-                    invoices = json.load(f)
-                
+            invoices = get_json_repository().read("data/invoices.json")
+            if invoices is not None:
                 for invoice in invoices:
                     invoice_type = invoice.get('type', 'نقدي')
                     total_usd = invoice.get('total_usd', 0)
@@ -227,10 +152,7 @@ class InvoicesPage(QWidget):
     def save_invoice_counter(self):
         """✅ حفظ عداد الفواتير في ملف"""
         try:
-            counter_file = "data/invoice_counter.json"
-            os.makedirs("data", exist_ok=True)
-            with open(counter_file, 'w', encoding='utf-8') as f:
-                json.dump({'counter': self.invoice_counter}, f, ensure_ascii=False, indent=2)
+            get_json_repository().save("data/invoice_counter.json", {'counter': self.invoice_counter})
         except Exception as e:
             print(f"❌ خطأ في حفظ عداد الفواتير: {e}")
 
@@ -245,34 +167,27 @@ class InvoicesPage(QWidget):
         """✅ تحميل سعر الصرف من ملف الإعدادات - محدث"""
         try:
             # الأولوية: ملف سعر الصرف الجديد
-            exchange_file = "data/exchange_rate.json"
-            if os.path.exists(exchange_file):
-                with open(exchange_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    rate = data.get('exchange_rate')
-                    if rate:
-                        print(f"✅ [سعر الصرف] تم تحميل السعر من الملف: {rate:,.0f} LBP/USD")
-                        return float(rate)
+            repository = get_json_repository()
+            data = repository.read("data/exchange_rate.json")
+            if data:
+                rate = data.get('exchange_rate')
+                if rate:
+                    print(f"✅ [سعر الصرف] تم تحميل السعر من الملف: {rate:,.0f} LBP/USD")
+                    return float(rate)
             
             # الاحتياطي: ملف الإعدادات القديم
-            admin_file = "data/admin_settings.json"
-            if os.path.exists(admin_file):
-                with open(admin_file, 'r', encoding='utf-8') as f:
-                    admin_data = json.load(f)
-                    if admin_data and 'exchange_rate' in admin_data:
-                        rate = float(admin_data['exchange_rate'])
-                        print(f"✅ [سعر الصرف] تم تحميل السعر من الإدارة: {rate:,.0f} LBP/USD")
-                        return rate
+            admin_data = repository.read("data/admin_settings.json")
+            if admin_data and 'exchange_rate' in admin_data:
+                rate = float(admin_data['exchange_rate'])
+                print(f"✅ [سعر الصرف] تم تحميل السعر من الإدارة: {rate:,.0f} LBP/USD")
+                return rate
 
             # الاحتياطي: الإعدادات القديمة
-            settings_file = "data/settings.json"
-            if os.path.exists(settings_file):
-                with open(settings_file, 'r', encoding='utf-8') as f:
-                    settings = json.load(f)
-                    if settings and 'exchange_rate' in settings[0]:
-                        rate = float(settings[0]['exchange_rate'])
-                        print(f"✅ [سعر الصرف] تم تحميل السعر من الإعدادات: {rate:,.0f} LBP/USD")
-                        return rate
+            settings = repository.read("data/settings.json")
+            if settings and 'exchange_rate' in settings[0]:
+                rate = float(settings[0]['exchange_rate'])
+                print(f"✅ [سعر الصرف] تم تحميل السعر من الإعدادات: {rate:,.0f} LBP/USD")
+                return rate
         except Exception as e:
             print(f"❌ خطأ في تحميل سعر الصرف: {e}")
         
@@ -295,77 +210,23 @@ class InvoicesPage(QWidget):
     def ensure_data_files(self):
         """تأكد من وجود ملفات البيانات"""
         os.makedirs("data", exist_ok=True)
-        for file in [self.data_file, self.customers_file, self.reports_file, self.sales_stats_file]:
+        for file in [self.data_file, self.reports_file]:
             if not os.path.exists(file):
-                with open(file, 'w', encoding='utf-8') as f:
-                    json.dump([], f, ensure_ascii=False, indent=2)
+                # ✅ كتابة ذرية - الانقطاع لا يترك ملفاً فارغاً غير صالح
+                atomic_write_text(file, json_text([]))
 
     def load_products_from_database(self):
-        """✅ تحميل الأصناف من قاعدة البيانات مع تحديث سعر الصرف"""
+        """✅ الأصناف من الكتالوج المشترك (يحمل من قاعدة البيانات عند التغيير فقط)"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            
-            c.execute("""
-                SELECT 
-                    id, name, buy_unit, sell_unit, buy_price, sell_price, 
-                    quantity, currency 
-                FROM Items 
-                ORDER BY name
-            """)
-            
-            products = []
-            for row in c.fetchall():
-                product = {
-                    'id': row[0],
-                    'name': row[1],
-                    'buy_unit': row[2],
-                    'sell_unit': row[3],
-                    'buy_price': float(row[4]),  # السعر الأصلي
-                    'sell_price': float(row[5]), # السعر الأصلي
-                    'stock': float(row[6]),
-                    'currency': row[7]
-                }
-                
-                # ✅ تحويل الأسعار بناءً على العملة وسعر الصرف الحالي
-                if product['currency'].upper() == 'LBP':
-                    # تحويل من LBP إلى USD باستخدام سعر الصرف الحالي
-                    product['buy_price_usd'] = product['buy_price'] / self.exchange_rate
-                    product['sell_price_usd'] = product['sell_price'] / self.exchange_rate
-                    print(f"✅ [تحويل الأسعار] {product['name']}: {product['sell_price']} LBP → {product['sell_price_usd']:.4f} USD")
-                else:
-                    # إذا كانت العملة USD، استخدام الأسعار كما هي
-                    product['buy_price_usd'] = product['buy_price']
-                    product['sell_price_usd'] = product['sell_price']
-                    print(f"✅ [تحويل الأسعار] منتج {product['name']}: {product['sell_price_usd']:.4f} USD")
-                
-                products.append(product)
-            
-            conn.close()
-            return products
-            
+            return get_product_catalog().products(self.exchange_rate)
         except Exception as e:
             print(f"❌ خطأ في تحميل الأصناف من قاعدة البيانات: {e}")
             return []
 
     def get_item_sell_units(self, item_id):
-        """✅ جلب وحدات المبيع الخاصة بصنف معين من قاعدة البيانات"""
+        """✅ وحدات المبيع الخاصة بصنف معين من الكتالوج المشترك"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            c.execute("SELECT sell_unit FROM ItemSellUnits WHERE item_id=? ORDER BY sell_unit", (item_id,))
-            units = [row[0] for row in c.fetchall()]
-            conn.close()
-            
-            # ✅ إذا لم توجد وحدات مخصصة، نستخدم الوحدة الافتراضية من الجدول الرئيسي
-            if not units:
-                c.execute("SELECT sell_unit FROM Items WHERE id=?", (item_id,))
-                default_unit = c.fetchone()
-                if default_unit and default_unit[0]:
-                    units = [default_unit[0]]
-            
-            return units if units else ["قطعة"]  # ✅ قيمة افتراضية إذا لم توجد وحدات
-            
+            return get_product_catalog().sell_units(item_id)
         except Exception as e:
             print(f"❌ خطأ في جلب وحدات المبيع للصنف {item_id}: {e}")
             return ["قطعة"]
@@ -444,7 +305,6 @@ class InvoicesPage(QWidget):
                 min-height: 30px;
             }
         """)
-        self.search_input.textChanged.connect(self.search_customers)
         
         search_layout.addWidget(search_label)
         search_layout.addWidget(self.search_input)
@@ -600,16 +460,31 @@ class InvoicesPage(QWidget):
         self.delete_shortcut = QShortcut(QKeySequence("Delete"), self)
         self.delete_shortcut.activated.connect(self.delete_selected_customer)
 
+    @staticmethod
+    def format_customer_date(customer, row):
+        """تنسيق التاريخ - d/m/y فقط بدون وقت"""
+        date_str = customer.get('date_added', '')
+        if not date_str:
+            return ''
+        try:
+            return datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S").strftime('%d/%m/%Y')
+        except ValueError:
+            return date_str
+
     def setup_customers_table(self):
         """إنشاء جدول الزبائن مع إمكانية التحديد الفردي"""
-        self.customers_table = QTableWidget()
-        self.customers_table.setColumnCount(5)  # ✅ زيادة عمود للترقيم
-        self.customers_table.setHorizontalHeaderLabels([
-            "", "اسم الزبون", "رقم الهاتف", "العنوان", "تاريخ الإضافة"  # ✅ إضافة عمود "م" للترقيم
-        ])
+        colors = dict(foreground="black", background="white")
+        self.customers_table = RecordTableView([
+            Column("", lambda customer, row: str(row + 1), align=Qt.AlignCenter, **colors),  # ✅ الترقيم يبدأ من 1
+            Column("اسم الزبون", lambda customer, row: customer.get('name', 'غير محدد'), **colors),
+            Column("رقم الهاتف", lambda customer, row: customer.get('phone', 'غير محدد'), **colors),
+            Column("العنوان", lambda customer, row: customer.get('address', 'غير محدد'), **colors),
+            Column("تاريخ الإضافة", self.format_customer_date, **colors),
+        ], search_columns=(1, 2, 3))  # ✅ البحث بالاسم والهاتف والعنوان (مفاتيح موحدة تحسب عند التحميل)
+        self.search_controller = table_text_search(self.customers_table, self.search_input)
         
         self.customers_table.setStyleSheet("""
-        QTableWidget {
+        QTableView {
             background-color: white;
             border: 2px solid #2c3e50;
             border-radius: 8px;
@@ -629,7 +504,7 @@ class InvoicesPage(QWidget):
             font-size: 18px;
             font-family: Arial;
         }
-        QTableWidget::item {
+        QTableView::item {
             padding: 15px;
             border-bottom: 1px solid #ecf0f1;
             font-weight: bold;
@@ -637,11 +512,11 @@ class InvoicesPage(QWidget):
             font-family: Arial;
             background-color: white;
         }
-        QTableWidget::item:selected {
+        QTableView::item:selected {
             background-color: #3498db;
             color: white;
         }
-        QTableWidget::item:focus {
+        QTableView::item:focus {
             border: none;
             outline: none;
             background-color: #3498db;
@@ -649,8 +524,8 @@ class InvoicesPage(QWidget):
     """)
         
         # ✅ ✅ ✅ السماح بالتحديد الفردي فقط
-        self.customers_table.setSelectionMode(QTableWidget.SingleSelection)
-        self.customers_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.customers_table.setSelectionMode(RecordTableView.SingleSelection)
+        self.customers_table.setSelectionBehavior(RecordTableView.SelectRows)
         
         # ✅ إزالة المستطيل عند التحديد
         self.customers_table.setFocusPolicy(Qt.NoFocus)
@@ -675,9 +550,8 @@ class InvoicesPage(QWidget):
         """✅ إزالة التحديد عند النقر على الخلفية"""
         if (source is self.customers_table.viewport() and 
             event.type() == event.Type.MouseButtonPress):
-            # الحصول على العنصر الذي تم النقر عليه
-            item = self.customers_table.itemAt(event.pos())
-            if item is None:
+            # الحصول على الصف الذي تم النقر عليه
+            if not self.customers_table.indexAt(event.pos()).isValid():
                 # إذا لم يتم النقر على عنصر، إزالة التحديد
                 self.customers_table.clearSelection()
                 return True
@@ -685,21 +559,17 @@ class InvoicesPage(QWidget):
 
     def on_table_double_click(self, index):
         """✅ فتح صفحة الزبون عند الضغط مرتين على اسم الزبون في الجدول"""
-        selected_row = self.customers_table.currentRow()
-        if selected_row >= 0:
-            # الحصول على بيانات الزبون من الجدول
-            customer_name_item = self.customers_table.item(selected_row, 1)  # ✅ تغيير العمود إلى 1 (اسم الزبون)
-            customer_phone_item = self.customers_table.item(selected_row, 2)  # ✅ تغيير العمود إلى 2 (رقم الهاتف)
-            
-            if customer_name_item and customer_phone_item:
-                customer_name = customer_name_item.text()
-                customer_phone = customer_phone_item.text()
-                
-                if customer_name and customer_name != 'غير محدد':
-                    # ✅ إزالة التحديد قبل فتح الصفحة
-                    self.customers_table.clearSelection()
-                    
-                    self.open_customer_page(customer_name, customer_phone)
+        customer = self.customers_table.current_record()
+        if customer:
+            # الحصول على بيانات الزبون من السجل
+            customer_name = customer.get('name', 'غير محدد')
+            customer_phone = customer.get('phone', 'غير محدد')
+
+            if customer_name and customer_name != 'غير محدد':
+                # ✅ إزالة التحديد قبل فتح الصفحة
+                self.customers_table.clearSelection()
+
+                self.open_customer_page(customer_name, customer_phone)
 
     def open_customer_page(self, customer_name, customer_phone):
         """✅ الانتقال إلى صفحة الزبون الخاصة به"""
@@ -722,67 +592,20 @@ class InvoicesPage(QWidget):
     def load_customers(self):
         """تحميل الزبائن وعرضهم في الجدول"""
         try:
-            with open(self.customers_file, 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-        except:
+            customers = get_customer_store().list_customers()
+        except Exception as e:
+            print(f"❌ خطأ في تحميل الزبائن: {e}")
             customers = []
         
-        self.customers_table.setRowCount(len(customers))
-        
-        for row, customer in enumerate(customers):
-            # ✅ إضافة الترقيم في العمود الأول
-            number_item = QTableWidgetItem(str(row + 1))  # ✅ الترقيم يبدأ من 1
-            number_item.setBackground(QColor("white"))
-            number_item.setForeground(QColor("black"))
-            number_item.setTextAlignment(Qt.AlignCenter)  # ✅ محاذاة الترقيم في المنتصف
-            self.customers_table.setItem(row, 0, number_item)
-            
-            # ✅ إضافة بيانات الزبون إلى الجدول - بأرقام كبيرة وواضحة
-            customer_name_item = QTableWidgetItem(customer.get('name', 'غير محدد'))
-            customer_name_item.setBackground(QColor("white"))
-            customer_name_item.setForeground(QColor("black"))
-            self.customers_table.setItem(row, 1, customer_name_item)
-            
-            customer_phone_item = QTableWidgetItem(customer.get('phone', 'غير محدد'))
-            customer_phone_item.setBackground(QColor("white"))
-            customer_phone_item.setForeground(QColor("black"))
-            self.customers_table.setItem(row, 2, customer_phone_item)
-            
-            customer_address_item = QTableWidgetItem(customer.get('address', 'غير محدد'))
-            customer_address_item.setBackground(QColor("white"))
-            customer_address_item.setForeground(QColor("black"))
-            self.customers_table.setItem(row, 3, customer_address_item)
-            
-            # تنسيق التاريخ - d/m/y فقط بدون وقت
-            date_str = customer.get('date_added', '')
-            date_item = QTableWidgetItem()
-            date_item.setBackground(QColor("white"))
-            date_item.setForeground(QColor("black"))
-            if date_str:
-                try:
-                    dt = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
-                    formatted_date = f"{dt.strftime('%d/%m/%Y')}"  # d/m/y فقط
-                    date_item.setText(formatted_date)
-                except:
-                    date_item.setText(date_str)
-            self.customers_table.setItem(row, 4, date_item)
+        self.customers_table.set_records(customers)
         
         # ✅ تحديث عداد الزبائن بعد التحميل
         self.update_customer_counter()
 
     def search_customers(self):
         """بحث في الزبائن"""
-        search_text = self.search_input.text().lower()
-        
-        for row in range(self.customers_table.rowCount()):
-            match = False
-            for col in range(1, 4):  # ✅ البحث في الأعمدة من 1 إلى 3 (الاسم، الهاتف، العنوان) - تخطي عمود الترقيم
-                item = self.customers_table.item(row, col)
-                if item and search_text in item.text().lower():
-                    match = True
-                    break
-            
-            self.customers_table.setRowHidden(row, not match)
+        # ✅ البحث في الأعمدة من 1 إلى 3 (الاسم، الهاتف، العنوان) - تخطي عمود الترقيم
+        self.search_controller.run_now()
 
     def show_add_customer_dialog(self):
         """✅ عرض نافذة إضافة زبون جديد"""
@@ -793,23 +616,19 @@ class InvoicesPage(QWidget):
 
     def edit_selected_customer(self):
         """✅ تعديل الزبون المحدد"""
-        selected_items = self.customers_table.selectedItems()
-        if not selected_items:
+        customer = self.customers_table.current_record()
+        if not customer:
             QMessageBox.warning(self, "تحذير", "يرجى اختيار زبون للتعديل")
             return
         
-        # ✅ ✅ ✅ الحصول على الصف المحدد الأول فقط
-        selected_row = self.customers_table.row(selected_items[0])
-        self.edit_customer(selected_row)
+        self.edit_customer(customer)
 
-    def edit_customer(self, row):
+    def edit_customer(self, customer_to_edit):
         """✅ تعديل بيانات الزبون"""
         try:
-            with open(self.customers_file, 'r', encoding='utf-8') as f:
-                customers = json.load(f)
+            store = get_customer_store()
             
-            if row < len(customers):
-                customer_to_edit = customers[row]
+            if customer_to_edit:
                 
                 # ✅ فتح نافذة التعديل
                 dialog = EditCustomerDialog(self, customer_to_edit)
@@ -817,10 +636,7 @@ class InvoicesPage(QWidget):
                     updated_data = dialog.get_updated_data()
                     
                     # ✅ تحديث بيانات الزبون
-                    customers[row].update(updated_data)
-                    
-                    with open(self.customers_file, 'w', encoding='utf-8') as f:
-                        json.dump(customers, f, ensure_ascii=False, indent=2)
+                    store.update_customer(customer_to_edit.get('name'), customer_to_edit.get('phone', ''), updated_data)
                     
                     # ✅ رسالة نجاح
                     self.show_auto_close_success_message("✅ تم تعديل الزبون بنجاح")
@@ -834,23 +650,16 @@ class InvoicesPage(QWidget):
     def save_customer(self, customer_data):
         """✅ حفظ الزبون الجديد"""
         try:
-            with open(self.customers_file, 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-            
-            # ✅ التحقق من عدم وجود زبون بنفس الاسم والهاتف
-            for customer in customers:
-                if (customer.get('name') == customer_data['name'] and 
-                    customer.get('phone') == customer_data['phone']):
-                    QMessageBox.warning(self, "تحذير", "يوجد زبون مسجل بنفس الاسم ورقم الهاتف")
-                    return
+            store = get_customer_store()
             
             # ✅ إضافة الزبون الجديد
-            customer_data['id'] = len(customers) + 1
+            customer_data['id'] = store.count_customers() + 1
             customer_data['date_added'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            customers.append(customer_data)
             
-            with open(self.customers_file, 'w', encoding='utf-8') as f:
-                json.dump(customers, f, ensure_ascii=False, indent=2)
+            # ✅ التحقق من عدم وجود زبون بنفس الاسم والهاتف
+            if not store.add_customer(customer_data):
+                QMessageBox.warning(self, "تحذير", "يوجد زبون مسجل بنفس الاسم ورقم الهاتف")
+                return
             
             # ✅ رسالة نجاح
             self.show_auto_close_success_message("✅ تم إضافة الزبون بنجاح")
@@ -905,20 +714,15 @@ class InvoicesPage(QWidget):
 
     def delete_selected_customer(self):
         """✅ حذف الزبون المحدد مع جميع فواتيره ودفعاته"""
-        selected_items = self.customers_table.selectedItems()
-        if not selected_items:
+        customer_to_delete = self.customers_table.current_record()
+        if not customer_to_delete:
             QMessageBox.warning(self, "تحذير", "يرجى اختيار زبون للحذف")
             return
         
-        # ✅ ✅ ✅ الحصول على الصف المحدد الأول فقط
-        selected_row = self.customers_table.row(selected_items[0])
-        
         try:
-            with open(self.customers_file, 'r', encoding='utf-8') as f:
-                customers = json.load(f)
+            store = get_customer_store()
             
-            if selected_row < len(customers):
-                customer_to_delete = customers[selected_row]
+            if customer_to_delete:
                 customer_name = customer_to_delete.get('name', '')
                 customer_phone = customer_to_delete.get('phone', '')
                 
@@ -940,11 +744,8 @@ class InvoicesPage(QWidget):
                     # ✅ حذف جميع البيانات المرتبطة بالزبون
                     self.delete_all_customer_data(customer_name, customer_phone)
                     
-                    # ✅ حذف الزبون من القائمة
-                    customers.pop(selected_row)
-                    
-                    with open(self.customers_file, 'w', encoding='utf-8') as f:
-                        json.dump(customers, f, ensure_ascii=False, indent=2)
+                    # ✅ حذف الزبون مع فواتيره من قاعدة البيانات
+                    store.delete_customer(customer_name, customer_phone)
                     
                     # ✅ رسالة نجاح
                     self.show_auto_close_success_message(f"✅ تم حذف الزبون '{customer_name}' وجميع بياناته بنجاح")
@@ -969,7 +770,7 @@ class InvoicesPage(QWidget):
             # 3. ✅ حذف فواتير الزبون من customer_invoices.json
             self.delete_customer_invoices_from_customer_page(customer_name, customer_phone)
             
-            # 4. ✅ حذف دفعات الزبون من customer_payments.json
+            # 4. ✅ حذف ملف دفعات الزبون (صفحة دفعات الزبون)
             self.delete_customer_payments_from_customer_page(customer_name, customer_phone)
             
             print(f"✅ تم حذف جميع بيانات الزبون: {customer_name}")
@@ -981,26 +782,9 @@ class InvoicesPage(QWidget):
         """✅ حذف فواتير الزبون من ملف invoices.json"""
         try:
             invoices_file = "data/invoices.json"
-            if not os.path.exists(invoices_file):
-                print("⚠️ ملف invoices.json غير موجود")
-                return
-                
-            with open(invoices_file, 'r', encoding='utf-8') as f:
-                invoices = json.load(f)
-            
-            # ✅ تصفية الفواتير وإزالة فواتير الزبون
-            updated_invoices = []
-            invoices_deleted = 0
-            
-            for invoice in invoices:
-                if (invoice.get('customer_name') != customer_name or 
-                    invoice.get('customer_phone') != customer_phone):
-                    updated_invoices.append(invoice)
-                else:
-                    invoices_deleted += 1
-            
-            with open(invoices_file, 'w', encoding='utf-8') as f:
-                json.dump(updated_invoices, f, ensure_ascii=False, indent=2)
+            # ✅ إزالة فواتير الزبون
+            invoices_deleted = get_json_repository().remove_where(
+                invoices_file, customer_name=customer_name, customer_phone=customer_phone)
                 
             print(f"✅ تم حذف {invoices_deleted} فاتورة للزبون: {customer_name}")
             
@@ -1011,26 +795,9 @@ class InvoicesPage(QWidget):
         """✅ حذف دفعات الزبون من ملف payments.json"""
         try:
             payments_file = "data/payments.json"
-            if not os.path.exists(payments_file):
-                print("⚠️ ملف payments.json غير موجود")
-                return
-                
-            with open(payments_file, 'r', encoding='utf-8') as f:
-                payments = json.load(f)
-            
-            # ✅ تصفية الدفعات وإزالة دفعات الزبون
-            updated_payments = []
-            payments_deleted = 0
-            
-            for payment in payments:
-                if (payment.get('customer_name') != customer_name or 
-                    payment.get('customer_phone') != customer_phone):
-                    updated_payments.append(payment)
-                else:
-                    payments_deleted += 1
-            
-            with open(payments_file, 'w', encoding='utf-8') as f:
-                json.dump(updated_payments, f, ensure_ascii=False, indent=2)
+            # ✅ إزالة دفعات الزبون
+            payments_deleted = get_json_repository().remove_where(
+                payments_file, customer_name=customer_name, customer_phone=customer_phone)
                 
             print(f"✅ تم حذف {payments_deleted} دفعة للزبون: {customer_name}")
             
@@ -1042,26 +809,9 @@ class InvoicesPage(QWidget):
         try:
             # ملف الفواتير الخاص بصفحة الزبائن
             customer_invoices_file = "data/customer_invoices.json"
-            if not os.path.exists(customer_invoices_file):
-                print("⚠️ ملف customer_invoices.json غير موجود")
-                return
-                
-            with open(customer_invoices_file, 'r', encoding='utf-8') as f:
-                customer_invoices = json.load(f)
-            
-            # ✅ تصفية الفواتير وإزالة فواتير الزبون
-            updated_customer_invoices = []
-            customer_invoices_deleted = 0
-            
-            for invoice in customer_invoices:
-                if (invoice.get('customer_name') != customer_name or 
-                    invoice.get('customer_phone') != customer_phone):
-                    updated_customer_invoices.append(invoice)
-                else:
-                    customer_invoices_deleted += 1
-            
-            with open(customer_invoices_file, 'w', encoding='utf-8') as f:
-                json.dump(updated_customer_invoices, f, ensure_ascii=False, indent=2)
+            # ✅ إزالة فواتير الزبون
+            customer_invoices_deleted = get_json_repository().remove_where(
+                customer_invoices_file, customer_name=customer_name, customer_phone=customer_phone)
                 
             print(f"✅ تم حذف {customer_invoices_deleted} فاتورة من صفحة الزبون: {customer_name}")
             
@@ -1071,28 +821,16 @@ class InvoicesPage(QWidget):
     def delete_customer_payments_from_customer_page(self, customer_name, customer_phone):
         """✅ حذف دفعات الزبون من صفحة customer_payments_page"""
         try:
-            # ملف الدفعات الخاص بصفحة الزبائن
-            customer_payments_file = "data/customer_payments.json"
-            if not os.path.exists(customer_payments_file):
-                print("⚠️ ملف customer_payments.json غير موجود")
-                return
-                
-            with open(customer_payments_file, 'r', encoding='utf-8') as f:
-                customer_payments = json.load(f)
-            
-            # ✅ تصفية الدفعات وإزالة دفعات الزبون
-            updated_customer_payments = []
-            customer_payments_deleted = 0
-            
-            for payment in customer_payments:
-                if (payment.get('customer_name') != customer_name or 
-                    payment.get('customer_phone') != customer_phone):
-                    updated_customer_payments.append(payment)
-                else:
-                    customer_payments_deleted += 1
-            
-            with open(customer_payments_file, 'w', encoding='utf-8') as f:
-                json.dump(updated_customer_payments, f, ensure_ascii=False, indent=2)
+            # ✅ إزالة دفعات هذا الزبون فقط من ملف رقم هاتفه (قد يشترك أكثر من زبون
+            # بنفس الرقم، ومنه الرقم الفارغ)
+            store = get_customer_payments_store()
+            customer_payments_deleted = store.remove_where(
+                customer_phone, customer_name=customer_name, customer_phone=customer_phone)
+            
+            # ✅ إذا لم يبق في الملف دفعات لزبون آخر بنفس الرقم نحذف الملف وسجله في الفهرس
+            # (بدلاً من تنظيف كل الزبائن عند كل فتح لصفحة زبون)
+            if not store.customer_payments(customer_phone):
+                store.remove_customer(customer_phone)
                 
             print(f"✅ تم حذف {customer_payments_deleted} دفعة من صفحة الزبون: {customer_name}")
             
@@ -1114,15 +852,8 @@ class InvoicesPage(QWidget):
     def find_customer_id(self, customer_name, customer_phone):
         """✅ البحث عن customer_id للزبون"""
         try:
-            with open(self.customers_file, 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-            
-            for i, customer in enumerate(customers):
-                if (customer.get('name') == customer_name and 
-                    customer.get('phone') == customer_phone):
-                    return i + 1  # استخدام الفهرس كـ ID
-            
-            return None
+            # ✅ استخدام ترتيب الزبون كـ ID
+            return get_customer_store().customer_position(customer_name, customer_phone)
             
         except Exception as e:
             print(f"❌ خطأ في البحث عن customer_id: {e}")
@@ -1163,9 +894,7 @@ class InvoicesPage(QWidget):
             self.load_customers()  # إعادة تحميل الزبائن
             self.update_customer_counter()  # تحديث عداد الزبائن
             
-            # تحديث إحصائيات المبيعات إذا كانت البيانات متوفرة
-            if invoice_data:
-                self.update_sales_stats_from_invoice(invoice_data)
+            self.load_sales_stats()
             
             print("✅ تم تحديث invoices_page تلقائياً بعد إضافة فاتورة")
             
@@ -1177,18 +906,10 @@ class InvoicesPage(QWidget):
         try:
             print("✅ تم استقبال إشعار بتحديث البيانات")
             
-            # إذا كان البيانات تحتوي على إجراء حذف
-            if data and isinstance(data, dict) and data.get('action') == 'delete':
-                invoice_data = data.get('invoice', {})
-                if invoice_data:
-                    # نستدعي الدالة الجديدة لتحديث المبيعات بعد الحذف
-                    self.update_sales_stats_after_deletion(invoice_data)
-                    print(f"✅ تم معالجة حذف الفاتورة: {invoice_data.get('invoice_number', '')}")
-            
-            # إعادة تحميل كل شيء في جميع الأحوال
+            # إعادة تحميل كل شيء في جميع الأحوال (الحذف يطرح من المجاميع تلقائياً)
             self.load_customers()
             self.update_customer_counter()
-            self.calculate_initial_sales_stats()
+            self.load_sales_stats()
             
             print("✅ تم تحديث invoices_page تلقائياً بعد حدث البيانات")
             
@@ -1199,63 +920,15 @@ class InvoicesPage(QWidget):
         """✅ معالجة حدث تحديث المبيعات"""
         try:
             print("✅ تم استقبال إشعار بتحديث المبيعات")
-            self.calculate_initial_sales_stats()  # إعادة حساب المبيعات
+            self.load_sales_stats()  # إعادة تحميل المبيعات
             print("✅ تم تحديث إحصائيات المبيعات تلقائياً")
         except Exception as e:
             print(f"❌ خطأ في معالجة حدث تحديث المبيعات: {e}")
 
-    def update_sales_stats_from_invoice(self, invoice_data):
-        """✅ تحديث إحصائيات المبيعات من بيانات الفاتورة"""
-        try:
-            invoice_type = invoice_data.get('type', 'نقدي')
-            total_amount = float(invoice_data.get('total_usd', 0))
-            
-            if invoice_type == 'نقدي':
-                self.total_cash_sales += total_amount
-            elif invoice_type == 'تقسيط':
-                self.total_installment_sales += total_amount
-            
-            # حفظ الإحصائيات المحدثة
-            self.save_sales_stats()
-            
-            print(f"✅ تم تحديث المبيعات: نقدي (+{total_amount})" if invoice_type == 'نقدي' else f"✅ تم تحديث المبيعات: تقسيط (+{total_amount})")
-            
-        except Exception as e:
-            print(f"❌ خطأ في تحديث إحصائيات المبيعات: {e}")
-
-    def update_sales_stats_after_deletion(self, invoice_data):
-        """✅ تحديث إحصائيات المبيعات بعد حذف فاتورة"""
-        try:
-            # 1. جلب نوع الفاتورة (نقدي أو تقسيط)
-            invoice_type = invoice_data.get('type', 'نقدي')
-            
-            # 2. جلب المبلغ الإجمالي للفاتورة
-            total_amount = float(invoice_data.get('total_usd', 0))
-            
-            # 3. حسب نوع الفاتورة، نخصم المبلغ من الخانة المناسبة
-            if invoice_type == 'نقدي':
-                # إذا كانت نقدي: نخصم من total_cash_sales
-                self.total_cash_sales = max(0, self.total_cash_sales - total_amount)
-            elif invoice_type == 'تقسيط':
-                # إذا كانت تقسيط: نخصم من total_installment_sales
-                self.total_installment_sales = max(0, self.total_installment_sales - total_amount)
-            
-            # 4. نحفظ الإحصائيات الجديدة في الملف
-            self.save_sales_stats()
-            
-            # 6. نطبع رسالة تأكيد
-            print(f"✅ تم تحديث المبيعات بعد الحذف: {invoice_type} (-{total_amount})")
-            
-        except Exception as e:
-            print(f"❌ خطأ في تحديث إحصائيات المبيعات بعد الحذف: {e}")
-
     def update_customer_counter(self):
         """✅ تحديث عدد الزبائن تلقائياً"""
         try:
-            with open(self.customers_file, 'r', encoding='utf-8') as f:
-                customers = json.load(f)
-            
-            customer_count = len(customers)
+            customer_count = get_customer_store().count_customers()
             self.customer_count_label.setText(str(customer_count))
             
         except Exception as e:
@@ -0,0 +1,610 @@
+import os
+import json
+import gc
+import atexit
+import marshal
+import threading
+
+try:
+    from pages.data_versions import bump_version, domains_for_file, record_own_write
+except ImportError:
+    from data_versions import bump_version, domains_for_file, record_own_write
+
+# ✅ سجل التعديلات (journal) بجانب كل ملف: data/customer_payments.json.journal
+JOURNAL_SUFFIX = ".journal"
+
+# ✅ دمج السجل في الملف الأساسي في الخلفية بعد هذا العدد من السجلات
+CHECKPOINT_RECORDS = 200
+
+# ✅ ملفات البيانات تكتب مضغوطة (بدون مسافات) - التنسيق المقروء للتصحيح فقط
+# بتشغيل البرنامج مع CHBIB_JSON_PRETTY=1
+JSON_PRETTY = os.environ.get("CHBIB_JSON_PRETTY") == "1"
+PRETTY_INDENT = 2
+COMPACT_SEPARATORS = (',', ':')
+
+# ✅ نسخة ثنائية (marshal) بجانب كل ملف: data/invoices.json.snapshot - تقرأ بدلاً
+# من تحليل النص إذا كانت مطابقة لتوقيع الملف الأساسي
+SNAPSHOT_SUFFIX = ".snapshot"
+SNAPSHOT_FORMAT = 1
+
+# ✅ الكتابات خلال هذه المهلة (ثوان) تدمج في دفعة واحدة: حفظ الفاتورة + العداد +
+# الدفعة = ملف مؤقت/fsync واحد لكل ملف، والحفظ المتكرر لنفس الملف يكتب آخر نسخة فقط
+GROUP_COMMIT_DELAY = 0.05
+
+# ✅ إذا فشلت كتابة دفعة (قرص ممتلئ، ملف مقفل...) تعاد المحاولة بعد هذه المهلة
+FLUSH_RETRY_DELAY = 1.0
+
+# ✅ حجم القطعة التي تقرأ من الملف في كل مرة عند القراءة التدريجية
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def json_text(data, pretty=None):
+    """✅ نص JSON لملفات البيانات - مضغوط افتراضياً، أو مقروء إذا pretty/JSON_PRETTY"""
+    if pretty is None:
+        pretty = JSON_PRETTY
+    if pretty:
+        return json.dumps(data, ensure_ascii=False, indent=PRETTY_INDENT)
+    return json.dumps(data, ensure_ascii=False, separators=COMPACT_SEPARATORS)
+
+
+def _fsync_directory(directory):
+    """✅ تثبيت إعادة التسمية على القرص (ويندوز لا يدعم فتح المجلدات - NTFS يثبتها بنفسه)"""
+    if os.name == 'nt':
+        return
+    try:
+        fd = os.open(directory or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_text(path, text, sync_directory=True):
+    """✅ كتابة آمنة من الانقطاع: ملف مؤقت + fsync ثم استبدال ذري
+
+    الانقطاع في أي لحظة يترك الملف القديم كاملاً أو الجديد كاملاً - لا ملفاً مقطوعاً.
+    """
+    temp_path = path + ".tmp"
+    _write_synced(temp_path, text)
+    os.replace(temp_path, path)
+    if sync_directory:
+        _fsync_directory(os.path.dirname(path))
+
+
+def _write_synced(path, text):
+    """✅ كتابة النص في ملف مع fsync (الملف المؤقت قبل استبداله بالملف الأساسي)"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _copy_json(value):
+    """✅ نسخ سريع لبيانات JSON (قواميس وقوائم فقط) - أسرع من copy.deepcopy"""
+    if isinstance(value, dict):
+        return {key: _copy_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_json(item) for item in value]
+    return value
+
+
+def _matches(record, match):
+    return isinstance(record, dict) and all(record.get(key) == value for key, value in match.items())
+
+
+def _apply_entry(data, entry, seen_keys=None):
+    """✅ تطبيق سجل واحد على القائمة - ترجع قائمة جديدة (لا تعدل النسخة المشتركة)
+
+    إضافة سجل له مفتاح موجود مسبقاً يتم تجاهلها، لذلك إعادة تطبيق السجل بعد دمج
+    غير مكتمل لا تكرر البيانات.
+    """
+    op = entry.get('op')
+    if op == 'append':
+        record = entry.get('record')
+        key = entry.get('key')
+        if key and seen_keys is not None:
+            keys = seen_keys.get(key)
+            if keys is None:
+                keys = seen_keys[key] = {item.get(key) for item in data if isinstance(item, dict)}
+            if record.get(key) in keys:
+                return data
+            keys.add(record.get(key))
+        return data + [record]
+    if op == 'remove':
+        match = entry.get('match') or {}
+        return [record for record in data if not _matches(record, match)]
+    if op == 'update':
+        match = entry.get('match') or {}
+        changes = entry.get('changes') or {}
+        return [dict(record, **changes) if _matches(record, match) else record for record in data]
+    print(f"⚠️ سجل غير معروف في ملف التعديلات: {op}")
+    return data
+
+
+class _GcPaused:
+    """✅ إيقاف جامع الدورات (gc) أثناء بناء ملايين الكائنات من ملف واحد
+
+    البيانات المحللة لا تحتوي دورات، وتشغيل gc كل بضعة آلاف كائن جديد يضاعف
+    وقت التحليل تقريباً.
+    """
+
+    def __enter__(self):
+        self._enabled = gc.isenabled()
+        gc.disable()
+
+    def __exit__(self, *exc):
+        if self._enabled:
+            gc.enable()
+
+
+def iter_json_array(path, chunk_size=STREAM_CHUNK_SIZE):
+    """✅ قراءة تدريجية لملف JSON عبارة عن قائمة - عنصر واحد في كل مرة
+
+    الملف يقرأ على قطع ويحلل كل عنصر وحده (raw_decode)، ولا يبقى في الذاكرة إلا
+    العنصر الحالي وما تبقى من القطعة. التوقف عن المرور (break) يوقف القراءة، لذلك
+    تكلفة البحث عن سجل واحد بقدر موقعه في الملف وليس بحجم الملف.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+        need = chunk_size
+
+        def skip_spaces(index):
+            while index < len(buffer) and buffer[index].isspace():
+                index += 1
+            return index
+
+        def read_more():
+            nonlocal buffer, pos, eof
+            chunk = f.read(need)
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            eof = not chunk
+
+        # ✅ بداية القائمة (الملف الفارغ أو null = قائمة فارغة)
+        while True:
+            pos = skip_spaces(pos)
+            if len(buffer) - pos >= 4 or eof:
+                break
+            read_more()
+        if pos >= len(buffer) or buffer.startswith('null', pos):
+            return
+        if buffer[pos] != '[':
+            raise ValueError(f"الملف ليس قائمة JSON: {path}")
+        pos += 1
+
+        while True:
+            pos = skip_spaces(pos)
+            if pos >= len(buffer):
+                if eof:
+                    raise ValueError(f"نهاية غير متوقعة لملف JSON: {path}")
+                read_more()
+                continue
+            if buffer[pos] == ']':
+                return
+            if buffer[pos] == ',':
+                pos += 1
+                continue
+
+            # ✅ العنصر مكتمل فقط إذا تبعته فاصلة أو نهاية القائمة (رقم في آخر القطعة
+            # قد يكمل في القطعة التالية) - غير ذلك قراءة المزيد ثم إعادة المحاولة
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                after = skip_spaces(end)
+                complete = after < len(buffer) and buffer[after] in ',]'
+            except ValueError:
+                complete = False
+            if not complete:
+                if eof:
+                    raise ValueError(f"عنصر غير مكتمل في ملف JSON: {path}")
+                read_more()
+                need *= 2
+                continue
+            need = chunk_size
+            pos = end
+            yield value
+
+
+class JsonRepository:
+    """✅ مستودع مشترك لملفات data/*.json داخل العملية
+
+    يتم تحليل كل ملف مرة واحدة فقط، ولا يعاد تحليله إلا إذا تغير mtime أو الحجم أو inode.
+    - read: يرجع النسخة المشتركة (للقراءة فقط - لا تعدلها)
+    - load: يرجع نسخة خاصة يمكن تعديلها ثم حفظها عبر save
+    - save: يكتب الملف ويحدث النسخة المخزنة بدون إعادة تحليل
+    - append / update_where / remove_where: تعديل بسجل واحد في ملف التعديلات (journal)
+      بدلاً من إعادة كتابة الملف بالكامل، ويدمج السجل في الملف لاحقاً في الخلفية
+
+    ملف التعديلات خاص بكل ملف بيانات وليس مشتركاً مع قاعدة البيانات: العملية التي
+    تكتب في SQLite وفي ملف JSON (مثل فاتورة تقسيط ودفعتها الأولى) حفظان منفصلان،
+    لذلك تحفظ صف القاعدة أولاً ثم سجل JSON - الانقطاع بينهما يفقد السجل فقط.
+
+    الكتابة على القرص مجمعة (group commit): save/append تحدث النسخة المخزنة فوراً،
+    وخيط خلفي يكتب كل التعديلات المتراكمة خلال GROUP_COMMIT_DELAY دفعة واحدة (ملف
+    مؤقت + fsync + استبدال ذري). flush() يكتبها فوراً عند الحاجة.
+    """
+
+    def __init__(self):
+        self._cache = {}
+        self._lock = threading.RLock()
+        self._checkpoint_pending = set()
+        # ✅ التعديلات التي لم تكتب بعد: المسار -> {'data': نسخة كاملة أو None، 'pretty'، 'lines': سجلات}
+        self._pending = {}
+        self._flush_timer = None
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _signatures(self, path):
+        return (self._signature(path), self._signature(path + JOURNAL_SUFFIX))
+
+    def _replay_journal(self, path, data):
+        """✅ إعادة تطبيق ملف التعديلات على البيانات - ترجع (البيانات، عدد السجلات)"""
+        journal_path = path + JOURNAL_SUFFIX
+        if not os.path.exists(journal_path):
+            return data, 0
+
+        seen_keys = {}
+        count = 0
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # ✅ سطر غير مكتمل (انقطاع أثناء الكتابة) - نتجاهله
+                    print(f"⚠️ تجاهل سجل غير مكتمل في {journal_path}")
+                    continue
+                data = _apply_entry(data, entry, seen_keys)
+                count += 1
+        return data, count
+
+    def read(self, path, default=None):
+        """✅ البيانات المحللة من الملف (مشتركة - للقراءة فقط)"""
+        path = os.path.normpath(path)
+        with self._lock:
+            # ✅ تعديلات لم تكتب بعد - النسخة المخزنة هي الأحدث
+            if path in self._pending:
+                return self._cache[path][1]
+
+            signatures = self._signatures(path)
+            if signatures == (None, None):
+                self._cache.pop(path, None)
+                return default
+
+            cached = self._cache.get(path)
+            if cached and cached[0] == signatures:
+                return cached[1]
+
+            try:
+                data = []
+                parsed = False
+                if signatures[0] is not None:
+                    with _GcPaused():
+                        data = self._read_binary_snapshot(path, signatures[0])
+                        if data is None:
+                            with open(path, 'r', encoding='utf-8') as f:
+                                data = json.load(f)
+                            parsed = True
+                base = data
+                data, journal_count = self._replay_journal(path, data)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ خطأ في قراءة الملف {path}: {e}")
+                return default
+
+            # ✅ إعادة قراءة التوقيع بعد التحليل لتجنب تخزين نسخة كتبت أثناء القراءة
+            if self._signatures(path) == signatures:
+                self._cache[path] = (signatures, data, journal_count)
+                if parsed:
+                    self._write_binary_snapshot(path, base, signatures[0])
+            if journal_count >= CHECKPOINT_RECORDS:
+                self._schedule_checkpoint(path)
+            return data
+
+    def iter_records(self, path):
+        """✅ سجلات الملف واحداً تلو الآخر، شاملة التعديلات التي لم تكتب أو لم تدمج بعد
+
+        تكتب التعديلات المتراكمة أولاً. بدون ملف تعديلات يقرأ الملف تدريجياً
+        (iter_json_array)، ومعه ترجع السجلات بعد إعادة تطبيقه (تحليل الملف كاملاً).
+        """
+        path = os.path.normpath(path)
+        self.flush(path)
+        if os.path.exists(path + JOURNAL_SUFFIX):
+            return iter(self.read(path, []))
+        if not os.path.exists(path):
+            return iter(())
+        return iter_json_array(path)
+
+    def load(self, path, default=None):
+        """✅ نسخة خاصة من البيانات يمكن تعديلها"""
+        data = self.read(path, None)
+        if data is None:
+            return default
+        return _copy_json(data)
+
+    @staticmethod
+    def _read_binary_snapshot(path, signature):
+        """✅ البيانات من النسخة الثنائية إذا كانت للملف الأساسي الحالي، وإلا None"""
+        try:
+            with open(path + SNAPSHOT_SUFFIX, 'rb') as f:
+                snapshot_format, snapshot_signature, data = marshal.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError, TypeError) as e:
+            print(f"⚠️ تجاهل النسخة الثنائية التالفة لـ {path}: {e}")
+            return None
+        if snapshot_format != SNAPSHOT_FORMAT or tuple(snapshot_signature) != signature:
+            return None
+        return data
+
+    @staticmethod
+    def _write_binary_snapshot(path, data, signature):
+        """✅ كتابة النسخة الثنائية للملف الأساسي - فشلها لا يؤثر (تقرأ JSON بدلاً منها)
+
+        النسخة قابلة للحذف في أي وقت ولذلك تكتب بدون fsync: بعد الانقطاع تكون إما
+        مطابقة لتوقيع الملف الأساسي، أو قديمة/تالفة فتتجاهل ويحلل JSON ثم تعاد كتابتها.
+        """
+        if signature is None:
+            return
+        snapshot_path = path + SNAPSHOT_SUFFIX
+        temp_path = snapshot_path + ".tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(marshal.dumps((SNAPSHOT_FORMAT, signature, data)))
+            os.replace(temp_path, snapshot_path)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ تعذر كتابة النسخة الثنائية لـ {path}: {e}")
+
+    def _write_snapshot(self, path, data, pretty=None, sync_directory=True):
+        """✅ كتابة الملف الأساسي عبر ملف مؤقت ثم استبدال ذري"""
+        atomic_write_text(path, json_text(data, pretty), sync_directory)
+        self._snapshot_written(path, data)
+
+    def _snapshot_written(self, path, data):
+        """✅ بعد استبدال الملف الأساسي: النسخة الثنائية وحذف ملف التعديلات"""
+        record_own_write(path)
+        self._write_binary_snapshot(path, data, self._signature(path))
+
+        # ✅ الملف الأساسي أصبح يحتوي كل التعديلات - حذف السجل
+        journal_path = path + JOURNAL_SUFFIX
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
+
+    def save(self, path, data, pretty=None):
+        """✅ حفظ البيانات في الملف وتحديث النسخة المخزنة
+
+        pretty: تنسيق مقروء بدلاً من المضغوط (افتراضياً حسب JSON_PRETTY).
+        """
+        path = os.path.normpath(path)
+        with self._lock:
+            # ✅ نسخة خاصة: الكتابة تتم في خيط آخر بينما قد يستمر المستدعي بتعديل قائمته
+            data = _copy_json(data)
+            # ✅ نسخة كاملة تلغي أي تعديلات سابقة لم تكتب بعد لنفس الملف
+            self._pending[path] = {'data': data, 'pretty': pretty, 'lines': []}
+            self._cache[path] = (self._signatures(path), data, 0)
+            self._schedule_flush()
+        bump_version(*domains_for_file(path))
+
+    def _append_entry(self, path, entry):
+        """✅ إضافة سجل واحد لملف التعديلات (يكتب مع الدفعة التالية) وتحديث النسخة المخزنة"""
+        with self._lock:
+            data = self.read(path, [])
+            cached = self._cache.get(path)
+            journal_count = cached[2] if cached and cached[1] is data else 0
+            data = _apply_entry(data, entry)
+
+            pending = self._pending.get(path)
+            if pending and pending['data'] is not None:
+                # ✅ الملف كله سيكتب في هذه الدفعة - السجل يدخل في النسخة الكاملة
+                pending['data'] = data
+            else:
+                if pending is None:
+                    pending = self._pending[path] = {'data': None, 'pretty': None, 'lines': []}
+                pending['lines'].append(json_text(entry, pretty=False) + "\n")
+                journal_count += 1
+
+            self._cache[path] = (self._signatures(path), data, journal_count)
+            self._schedule_flush()
+            if journal_count >= CHECKPOINT_RECORDS:
+                self._schedule_checkpoint(path)
+        bump_version(*domains_for_file(path))
+        return data
+
+    def _schedule_flush(self, delay=GROUP_COMMIT_DELAY):
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(delay, self._flush_pending)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _flush_pending(self):
+        with self._lock:
+            self._flush_timer = None
+            try:
+                self.flush()
+            except Exception:
+                # ✅ الخطأ طبع في flush والمحاولة التالية مجدولة
+                pass
+
+    def flush(self, path=None):
+        """✅ كتابة التعديلات المتراكمة على القرص الآن (لملف واحد أو لكل الملفات)
+
+        كل ملف يكتب مرة واحدة: النسخة الكاملة عبر ملف مؤقت واستبدال ذري، أو السجلات
+        الجديدة في ملف التعديلات مع fsync واحد، ثم fsync واحد لكل مجلد.
+
+        إذا فشلت كتابة ملف يبقى تعديله في الانتظار وتجدول محاولة أخرى، وترفع آخر خطأ
+        حتى لا يكمل المستدعي عملاً يفترض أن البيانات على القرص.
+        """
+        with self._lock:
+            if path is None:
+                paths = list(self._pending)
+            else:
+                path = os.path.normpath(path)
+                paths = [path] if path in self._pending else []
+
+            directories = set()
+            error = None
+            for file_path in paths:
+                pending = self._pending[file_path]
+                try:
+                    if pending['data'] is not None:
+                        self._write_snapshot(file_path, pending['data'], pending['pretty'], sync_directory=False)
+                    else:
+                        journal_path = file_path + JOURNAL_SUFFIX
+                        directory = os.path.dirname(journal_path)
+                        if directory:
+                            os.makedirs(directory, exist_ok=True)
+                        with open(journal_path, 'a', encoding='utf-8') as f:
+                            f.write(''.join(pending['lines']))
+                            f.flush()
+                            os.fsync(f.fileno())
+                except Exception as e:
+                    # ✅ يبقى التعديل في الانتظار ويعاد مع الدفعة التالية
+                    print(f"❌ خطأ في كتابة الملف {file_path}: {e}")
+                    error = e
+                    continue
+                del self._pending[file_path]
+                directories.add(os.path.dirname(file_path))
+                cached = self._cache.get(file_path)
+                if cached:
+                    self._cache[file_path] = (self._signatures(file_path), cached[1], cached[2])
+
+            for directory in directories:
+                _fsync_directory(directory)
+
+            if error is not None:
+                self._schedule_flush(FLUSH_RETRY_DELAY)
+                raise error
+
+    def append(self, path, record, key=None):
+        """✅ إضافة سجل إلى قائمة الملف - تكلفة الكتابة بحجم السجل فقط
+
+        key: اسم الحقل الفريد للسجل (مثل payment_id) لمنع التكرار عند إعادة التطبيق.
+        """
+        entry = {'op': 'append', 'record': _copy_json(record)}
+        if key:
+            entry['key'] = key
+        self._append_entry(os.path.normpath(path), entry)
+
+    def update_where(self, path, changes, **match):
+        """✅ تعديل حقول كل السجلات المطابقة (changes) - ترجع عدد السجلات المعدلة"""
+        path = os.path.normpath(path)
+        with self._lock:
+            data = self.read(path)
+            if data is None:
+                return 0
+            updated = sum(1 for record in data if _matches(record, match))
+            if updated:
+                self._append_entry(path, {'op': 'update', 'match': match, 'changes': _copy_json(changes)})
+            return updated
+
+    def remove_where(self, path, **match):
+        """✅ حذف كل السجلات المطابقة لجميع الحقول - ترجع عدد السجلات المحذوفة"""
+        path = os.path.normpath(path)
+        with self._lock:
+            data = self.read(path)
+            if data is None:
+                return 0
+            removed = sum(1 for record in data if _matches(record, match))
+            if removed:
+                self._append_entry(path, {'op': 'remove', 'match': match})
+            return removed
+
+    def _schedule_checkpoint(self, path):
+        if path in self._checkpoint_pending:
+            return
+        self._checkpoint_pending.add(path)
+        threading.Thread(target=self.checkpoint, args=(path,), daemon=True).start()
+
+    def checkpoint(self, path):
+        """✅ دمج ملف التعديلات في الملف الأساسي
+
+        الملف الكامل يكتب في ملف مؤقت خارج القفل (القراءة والإضافة لا تنتظر)، ثم يستبدل
+        تحت القفل فقط إذا لم يكتب شيء على القرص لهذا الملف أثناء ذلك. القائمة المخزنة لا
+        تعدل في مكانها أبداً (كل تعديل ينشئ قائمة جديدة) لذلك هي نسخة ثابتة للكتابة.
+        """
+        path = os.path.normpath(path)
+        temp_path = path + ".checkpoint.tmp"
+        try:
+            with self._lock:
+                self.flush(path)
+                if not os.path.exists(path + JOURNAL_SUFFIX):
+                    return
+                data = self.read(path)
+                if data is None:
+                    return
+                signatures = self._signatures(path)
+
+            _write_synced(temp_path, json_text(data))
+
+            with self._lock:
+                if self._signatures(path) != signatures:
+                    # ✅ كتبت دفعة أخرى أثناء الدمج - يعاد الدمج مع السجلات التالية
+                    os.remove(temp_path)
+                    return
+                os.replace(temp_path, path)
+                self._snapshot_written(path, data)
+                _fsync_directory(os.path.dirname(path))
+                # ✅ السجلات التي أضيفت أثناء الدمج تكتب في ملف تعديلات جديد مع الدفعة التالية
+                pending = self._pending.get(path)
+                journal_count = len(pending['lines']) if pending else 0
+                cached = self._cache.get(path)
+                current = cached[1] if cached else data
+                self._cache[path] = (self._signatures(path), current, journal_count)
+                print(f"✅ تم دمج سجل التعديلات في {path}")
+        except Exception as e:
+            print(f"❌ خطأ في دمج سجل التعديلات {path}: {e}")
+        finally:
+            self._checkpoint_pending.discard(path)
+
+    def checkpoint_all(self):
+        """✅ كتابة التعديلات المتراكمة ودمج كل ملفات التعديلات المعروفة (عند إغلاق البرنامج)"""
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"❌ تعذر كتابة التعديلات المتراكمة عند الإغلاق: {e}")
+        with self._lock:
+            paths = [path for path, cached in self._cache.items() if cached[2]]
+        for path in paths:
+            self.checkpoint(path)
+
+    def invalidate(self, path=None):
+        """✅ إلغاء النسخة المخزنة لملف واحد أو لكل الملفات (بعد كتابة تعديلاتها)
+
+        ترفع خطأ flush إذا تعذرت الكتابة - النسخة المخزنة تبقى كما هي.
+        """
+        with self._lock:
+            self.flush(path)
+            if path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(os.path.normpath(path), None)
+
+
+_repository = None
+_repository_lock = threading.Lock()
+
+
+def get_json_repository():
+    """✅ نسخة واحدة من المستودع لكل العملية"""
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                _repository = JsonRepository()
+                atexit.register(_repository.checkpoint_all)
+    return _repository
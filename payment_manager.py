@@ -1,5 +1,4 @@
 import os
-import sqlite3
 from datetime import datetime, date, timedelta
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                               QPushButton, QTableWidget, QTableWidgetItem,
@@ -9,6 +8,28 @@ from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
 from PySide6.QtCore import Qt, QSize, QDate
 from PySide6.QtGui import QPainter, QPixmap, QIcon, QKeyEvent, QColor
 
+# ✅ اتصال SQLite المشترك
+try:
+    from pages.db_connection import get_db
+except ImportError:
+    from db_connection import get_db
+
+# ✅ جداول افتراضية (نموذج/عرض) بدلاً من عنصر لكل خانة
+try:
+    from pages.table_models import Column, RecordTableView
+except ImportError:
+    from table_models import Column, RecordTableView
+
+# ✅ بحث مؤجل في خيط خلفي بدلاً من التصفية مع كل حرف
+try:
+    from pages.search_controller import table_text_search
+except ImportError:
+    from search_controller import table_text_search
+
+# ✅ ترتيب حقول صف الدفعة كما يرجعه استعلام load_payments_data
+(P_ID, P_TITLE, P_REASON, P_TOTAL, P_TOTAL_CURRENCY, P_PAID, P_PAID_CURRENCY,
+ P_REMAINING, P_INSTALLMENTS, P_CREATED, P_DUE, P_REMINDER) = range(12)
+
 class PaymentManager(QWidget):
     def __init__(self, controller):
         super().__init__()
@@ -23,12 +44,13 @@ class PaymentManager(QWidget):
 
     def setup_database(self):
         """إنشاء قاعدة البيانات والجداول"""
-        self.conn = sqlite3.connect('payments_database.db', check_same_thread=False)
+        # ✅ الاتصال المشترك - جداول الدفعات في المخطط المربوط payments (payments_database.db)
+        self.conn = get_db().connection()
         self.cursor = self.conn.cursor()
         
         # جدول سعر الصرف
         self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS exchange_rates (
+            CREATE TABLE IF NOT EXISTS payments.exchange_rates (
                 id INTEGER PRIMARY KEY,
                 usd_to_lbp_rate REAL,
                 last_updated DATE
@@ -37,7 +59,7 @@ class PaymentManager(QWidget):
         
         # جدول الدفعات الخاصة - محدث مع جميع الأعمدة
         self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS special_payments (
+            CREATE TABLE IF NOT EXISTS payments.special_payments (
                 id INTEGER PRIMARY KEY,
                 title TEXT,
                 reason TEXT,
@@ -59,7 +81,7 @@ class PaymentManager(QWidget):
         
         # جدول دفعات الفواتير
         self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS payment_installments (
+            CREATE TABLE IF NOT EXISTS payments.payment_installments (
                 id INTEGER PRIMARY KEY,
                 payment_id INTEGER,
                 installment_number INTEGER,
@@ -72,7 +94,7 @@ class PaymentManager(QWidget):
         ''')
         
         # التحقق من وجود جميع الأعمدة وإضافتها إذا كانت مفقودة
-        self.cursor.execute("PRAGMA table_info(special_payments)")
+        self.cursor.execute("PRAGMA payments.table_info(special_payments)")
         existing_columns = [column[1] for column in self.cursor.fetchall()]
         
         required_columns = [
@@ -85,15 +107,15 @@ class PaymentManager(QWidget):
         for column in required_columns:
             if column not in existing_columns:
                 if column == 'details':
-                    self.cursor.execute(f"ALTER TABLE special_payments ADD COLUMN {column} TEXT")
+                    self.cursor.execute(f"ALTER TABLE payments.special_payments ADD COLUMN {column} TEXT")
                 elif column in ['has_reminder', 'is_completed']:
-                    self.cursor.execute(f"ALTER TABLE special_payments ADD COLUMN {column} BOOLEAN DEFAULT FALSE")
+                    self.cursor.execute(f"ALTER TABLE payments.special_payments ADD COLUMN {column} BOOLEAN DEFAULT FALSE")
                 elif column in ['installments_count']:
-                    self.cursor.execute(f"ALTER TABLE special_payments ADD COLUMN {column} INTEGER DEFAULT 0")
+                    self.cursor.execute(f"ALTER TABLE payments.special_payments ADD COLUMN {column} INTEGER DEFAULT 0")
                 elif column in ['total_amount', 'paid_amount', 'remaining_amount', 'installment_value', 'exchange_rate_used']:
-                    self.cursor.execute(f"ALTER TABLE special_payments ADD COLUMN {column} REAL DEFAULT 0")
+                    self.cursor.execute(f"ALTER TABLE payments.special_payments ADD COLUMN {column} REAL DEFAULT 0")
                 else:
-                    self.cursor.execute(f"ALTER TABLE special_payments ADD COLUMN {column} TEXT")
+                    self.cursor.execute(f"ALTER TABLE payments.special_payments ADD COLUMN {column} TEXT")
                 print(f"✅ تم إضافة العمود {column} إلى الجدول")
         
         # إدخال سعر صرف افتراضي إذا لم يكن موجوداً
@@ -183,7 +205,6 @@ class PaymentManager(QWidget):
                 font-weight: bold;
             }
         """)
-        self.search_input.textChanged.connect(self.search_payments)
         search_layout.addWidget(self.search_input)
         
         # إضافة أيقونة البحث داخل الحقل
@@ -325,16 +346,23 @@ class PaymentManager(QWidget):
         payments_layout = QVBoxLayout()
         
         # إنشاء الجدول
-        self.payments_table = QTableWidget()
-        self.payments_table.setColumnCount(8)
-        self.payments_table.setHorizontalHeaderLabels([
-            "التاريخ", "العنوان", "السبب", "المبلغ الإجمالي", 
-            "المدفوع", "المتبقي", "الحالة", "التذكير"
-        ])
+        self.payments_table = RecordTableView([
+            Column("التاريخ", lambda p, row: self.format_date(p[P_CREATED])),
+            Column("العنوان", P_TITLE),
+            Column("السبب", P_REASON),
+            # ✅ تحسين: عرض الأرقام بدقة بدون كسور عشرية غير ضرورية
+            Column("المبلغ الإجمالي", lambda p, row: self.format_amount(p[P_TOTAL], p[P_TOTAL_CURRENCY])),
+            Column("المدفوع", lambda p, row: self.format_amount(p[P_PAID], p[P_PAID_CURRENCY])),
+            Column("المتبقي", lambda p, row: self.format_amount(p[P_REMAINING], p[P_TOTAL_CURRENCY])),
+            Column("الحالة", lambda p, row: self.payment_status(p)[0],
+                   foreground=lambda p: self.payment_status(p)[1]),
+            Column("التذكير", lambda p, row: self.reminder_status(p)),
+        ], search_columns=range(8))  # ✅ البحث في كل الأعمدة (مفاتيح موحدة تحسب عند التحميل)
+        self.search_controller = table_text_search(self.payments_table, self.search_input)
         
         # تحسين مظهر الجدول
         self.payments_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 background: white;
                 font-size: 14px;
                 font-weight: bold;
@@ -346,12 +374,12 @@ class PaymentManager(QWidget):
                 selection-background-color: #3498db;
                 selection-color: white;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 12px;
                 border-bottom: 2px solid #ecf0f1;
                 border-right: 1px solid #ecf0f1;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background: #3498db;
                 color: white;
                 border: none;
@@ -366,7 +394,7 @@ class PaymentManager(QWidget):
                 font-size: 14px;
                 border-right: 1px solid #34495e;
             }
-            QTableWidget::item:focus {
+            QTableView::item:focus {
                 border: none;
                 outline: none;
             }
@@ -377,7 +405,6 @@ class PaymentManager(QWidget):
         
         # ✅ التعديل: منع فقدان التحديد عند النقر على الخلفية
         self.payments_table.setFocusPolicy(Qt.StrongFocus)
-        self.payments_table.setEditTriggers(QTableWidget.NoEditTriggers)
         
         # تحجيم الأعمدة - تم التعديل لجعل الخانات متناسقة مع حجم الجدول
         header = self.payments_table.horizontalHeader()
@@ -395,10 +422,10 @@ class PaymentManager(QWidget):
         self.payments_table.verticalHeader().setVisible(False)  # إخفاء الأرقام الجانبية
         
         # ✅ التعديل: تفعيل اختيار متعدد للصفوف مع Ctrl فقط
-        self.payments_table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.payments_table.setSelectionMode(QTableWidget.ExtendedSelection)  # ✅ تغيير إلى ExtendedSelection
+        self.payments_table.setSelectionBehavior(RecordTableView.SelectRows)
+        self.payments_table.setSelectionMode(RecordTableView.ExtendedSelection)  # ✅ تغيير إلى ExtendedSelection
         
-        self.payments_table.itemSelectionChanged.connect(self.on_payment_selected)
+        self.payments_table.selectionModel().selectionChanged.connect(lambda *_: self.on_payment_selected())
         self.payments_table.doubleClicked.connect(self.on_payment_double_click)
         
         payments_layout.addWidget(self.payments_table)
@@ -587,79 +614,8 @@ class PaymentManager(QWidget):
             ''')
             payments = self.cursor.fetchall()
             
-            self.payments_table.setRowCount(len(payments))
-            
-            total_due_usd = 0
-            total_due_lbp = 0
-            total_paid_usd = 0
-            total_paid_lbp = 0
-            
-            for row, payment in enumerate(payments):
-                (payment_id, title, reason, total_amount, total_currency, 
-                 paid_amount, paid_currency, remaining_amount, 
-                 installments_count, created_date, due_date, has_reminder) = payment
-                
-                # تنسيق التاريخ
-                date_obj = datetime.strptime(created_date, "%Y-%m-%d")
-                formatted_date = date_obj.strftime("%d/%m/%Y")
-                
-                # تحديد الحالة
-                if remaining_amount == 0:
-                    status = "🟢 مدفوعة"
-                    status_color = QColor("#27ae60")
-                    # إضافة للمدفوعات
-                    if total_currency == "USD":
-                        total_paid_usd += total_amount
-                    else:
-                        total_paid_lbp += total_amount
-                elif paid_amount == 0:
-                    status = "🔴 غير مدفوعة"
-                    status_color = QColor("#e74c3c")
-                    # إضافة للمستحقات
-                    if total_currency == "USD":
-                        total_due_usd += total_amount
-                    else:
-                        total_due_lbp += total_amount
-                else:
-                    status = "🟡 جزئية"
-                    status_color = QColor("#f39c12")
-                    # إضافة الباقي للمستحقات والمدفوع للمدفوعات
-                    if total_currency == "USD":
-                        total_due_usd += remaining_amount
-                        total_paid_usd += paid_amount
-                    else:
-                        total_due_lbp += remaining_amount
-                        total_paid_lbp += paid_amount
-                
-                # حالة التذكير
-                reminder_status = "🔔" if has_reminder else "🔕"
-                if has_reminder and due_date:
-                    due_date_obj = datetime.strptime(due_date, "%Y-%m-%d").date()
-                    if due_date_obj < date.today():
-                        reminder_status = "⚠️ متأخرة"
-                
-                # إضافة البيانات للجدول
-                self.payments_table.setItem(row, 0, QTableWidgetItem(formatted_date))
-                self.payments_table.setItem(row, 1, QTableWidgetItem(title))
-                self.payments_table.setItem(row, 2, QTableWidgetItem(reason))
-                
-                # ✅ تحسين: عرض الأرقام بدقة بدون كسور عشرية غير ضرورية
-                amount_text = self.format_amount(total_amount, total_currency)
-                self.payments_table.setItem(row, 3, QTableWidgetItem(amount_text))
-                
-                paid_text = self.format_amount(paid_amount, paid_currency)
-                self.payments_table.setItem(row, 4, QTableWidgetItem(paid_text))
-                
-                remaining_text = self.format_amount(remaining_amount, total_currency)
-                self.payments_table.setItem(row, 5, QTableWidgetItem(remaining_text))
-                
-                status_item = QTableWidgetItem(status)
-                status_item.setForeground(status_color)
-                self.payments_table.setItem(row, 6, status_item)
-                self.payments_table.setItem(row, 7, QTableWidgetItem(reminder_status))
-                
-                # تخزين ID الدفعة في الصف
-                self.payments_table.item(row, 0).setData(Qt.UserRole, payment_id)
+            # ✅ الصفوف تعرض مباشرة من نتيجة الاستعلام - النص يحسب للخانات الظاهرة فقط
+            self.payments_table.set_records(payments)
             
             # ✅ التعديل: تحديث الإحصائيات تلقائياً مع الحساب الصحيح للعملات
             self.update_total_statistics()
@@ -667,6 +623,29 @@ class PaymentManager(QWidget):
         except Exception as e:
             print(f"خطأ في تحميل البيانات: {e}")
 
+    @staticmethod
+    def format_date(created_date):
+        """تنسيق التاريخ dd/mm/yyyy"""
+        return datetime.strptime(created_date, "%Y-%m-%d").strftime("%d/%m/%Y")
+
+    @staticmethod
+    def payment_status(payment):
+        """تحديد الحالة - (النص، اللون)"""
+        if payment[P_REMAINING] == 0:
+            return "🟢 مدفوعة", "#27ae60"
+        if payment[P_PAID] == 0:
+            return "🔴 غير مدفوعة", "#e74c3c"
+        return "🟡 جزئية", "#f39c12"
+
+    @staticmethod
+    def reminder_status(payment):
+        """حالة التذكير"""
+        has_reminder, due_date = payment[P_REMINDER], payment[P_DUE]
+        if has_reminder and due_date:
+            if datetime.strptime(due_date, "%Y-%m-%d").date() < date.today():
+                return "⚠️ متأخرة"
+        return "🔔" if has_reminder else "🔕"
+
     def format_amount(self, amount, currency):
         """✅ تنسيق المبلغ بدقة بدون كسور عشرية غير ضرورية"""
         try:
@@ -691,18 +670,12 @@ class PaymentManager(QWidget):
 
     def on_payment_selected(self):
         """عند اختيار دفعة من الجدول"""
-        selected_items = self.payments_table.selectedItems()
-        if selected_items:
+        selected_payments = self.payments_table.selected_records()
+        if selected_payments:
             # ✅ التعديل: جمع جميع IDs المحددة
-            selected_rows = set()
-            for item in selected_items:
-                selected_rows.add(item.row())
-            
-            self.selected_payment_ids = []
-            for row in selected_rows:
-                payment_id = self.payments_table.item(row, 0).data(Qt.UserRole)
-                if payment_id:
-                    self.selected_payment_ids.append(payment_id)
+            self.selected_payment_ids = [
+                payment[P_ID] for payment in selected_payments if payment[P_ID]
+            ]
             
             # ✅ التعديل: تفعيل الأزرار إذا كان هناك تحديد
             has_selection = len(self.selected_payment_ids) > 0
@@ -723,8 +696,7 @@ class PaymentManager(QWidget):
 
     def on_payment_double_click(self, index):
         """عند النقر المزدوج على دفعة"""
-        row = index.row()
-        payment_id = self.payments_table.item(row, 0).data(Qt.UserRole)
+        payment_id = self.payments_table.record_at(index.row())[P_ID]
         if payment_id:
             self.open_edit_payment_window(payment_id)
 
@@ -791,17 +763,7 @@ class PaymentManager(QWidget):
 
     def search_payments(self):
         """بحث في الدفعات"""
-        search_text = self.search_input.text().lower()
-        
-        for row in range(self.payments_table.rowCount()):
-            should_show = False
-            for col in range(self.payments_table.columnCount()):
-                item = self.payments_table.item(row, col)
-                if item and search_text in item.text().lower():
-                    should_show = True
-                    break
-            
-            self.payments_table.setRowHidden(row, not should_show)
+        self.search_controller.run_now()
 
     def open_add_payment_window(self):
         """فتح نافذة إضافة دفعة جديدة"""
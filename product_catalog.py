@@ -0,0 +1,196 @@
+import threading
+from itertools import groupby
+from operator import itemgetter
+
+try:
+    from pages.db_connection import get_db
+    from pages.data_versions import data_version, changed_keys
+    from pages.product_search import ProductSearchIndex
+except ImportError:
+    from db_connection import get_db
+    from data_versions import data_version, changed_keys
+    from product_search import ProductSearchIndex
+
+DB_PATH = "chbib_materials.db"
+
+ITEM_FIELDS = "id, name, buy_unit, sell_unit, buy_price, sell_price, quantity, currency"
+
+
+class ProductCatalog:
+    """✅ كتالوج الأصناف المشترك بين نوافذ الفواتير والحجوزات
+
+    يقرأ جدول Items مرة واحدة ويحتفظ بفهرسين (الاسم -> الصنف، الرقم -> الصنف).
+    يتابع إصدار مجال المخزون (data_versions): إذا كانت أرقام الأصناف المعدلة
+    معروفة يعيد قراءة هذه الأصناف فقط، وإلا (تعديل من صفحة الإدارة أو من خارج
+    البرنامج) يعيد تحميل الكتالوج كاملاً.
+    أسعار الدولار تحسب مرة واحدة لكل سعر صرف، ووحدات المبيع لكل الأصناف تقرأ
+    باستعلام واحد وتحدث من صفحة الإدارة (refresh_sell_units) عند تعديلها.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self._db = get_db(db_path)
+        self._lock = threading.RLock()
+        self._version = None
+        self._exchange_rate = None
+        self._products = []
+        self._by_name = {}
+        self._by_id = {}
+        self._sell_units = {}
+        self._search_index = None
+
+    # ======== ✅ القراءة من قاعدة البيانات ========
+    def _product_from_row(self, row):
+        product = {
+            'id': row[0],
+            'name': row[1],
+            'buy_unit': row[2],
+            'sell_unit': row[3],
+            'buy_price': float(row[4]),
+            'sell_price': float(row[5]),
+            'stock': float(row[6]),
+            'currency': row[7]
+        }
+        if self._exchange_rate:
+            self._price(product)
+        return product
+
+    def _price(self, product):
+        """✅ تحويل الأسعار بناءً على العملة وسعر الصرف الحالي"""
+        if product['currency'].upper() == 'LBP':
+            product['buy_price_usd'] = product['buy_price'] / self._exchange_rate
+            product['sell_price_usd'] = product['sell_price'] / self._exchange_rate
+        else:
+            product['buy_price_usd'] = product['buy_price']
+            product['sell_price_usd'] = product['sell_price']
+
+    def _reload(self):
+        c = self._db.connection().cursor()
+        c.execute(f"SELECT {ITEM_FIELDS} FROM Items ORDER BY name")
+        self._products = [self._product_from_row(row) for row in c.fetchall()]
+        self._by_name = {}
+        for product in self._products:
+            # ✅ عند تكرار الاسم يبقى الصنف الأول (نفس نتيجة البحث الخطي السابق)
+            self._by_name.setdefault(product['name'], product)
+        self._by_id = {product['id']: product for product in self._products}
+        self._load_sell_units()
+
+    def _load_sell_units(self, item_ids=None):
+        """✅ وحدات المبيع {رقم الصنف: [الوحدات]} - لكل الأصناف أو لأصناف محددة"""
+        c = self._db.connection().cursor()
+        if item_ids is None:
+            c.execute("SELECT item_id, sell_unit FROM ItemSellUnits ORDER BY item_id, sell_unit")
+            self._sell_units = {}
+        else:
+            item_ids = list(item_ids)
+            placeholders = ','.join('?' * len(item_ids))
+            c.execute(f"""
+                SELECT item_id, sell_unit FROM ItemSellUnits
+                WHERE item_id IN ({placeholders}) ORDER BY item_id, sell_unit
+            """, item_ids)
+            for item_id in item_ids:
+                self._sell_units.pop(item_id, None)
+        for item_id, rows in groupby(c.fetchall(), key=itemgetter(0)):
+            self._sell_units[item_id] = [unit for _, unit in rows]
+
+    def _patch(self, item_ids):
+        """✅ إعادة قراءة أصناف محددة - ترجع False إذا لزم تحميل كامل"""
+        item_ids = list(item_ids)
+        if not item_ids:
+            return True
+        if any(item_id not in self._by_id for item_id in item_ids):
+            return False
+        c = self._db.connection().cursor()
+        placeholders = ','.join('?' * len(item_ids))
+        c.execute(f"SELECT {ITEM_FIELDS} FROM Items WHERE id IN ({placeholders})", item_ids)
+        rows = c.fetchall()
+        if len(rows) != len(item_ids):
+            return False
+        for row in rows:
+            old = self._by_id[row[0]]
+            if row[1] != old['name']:
+                # ✅ تغير الاسم يغير الترتيب والفهرس
+                return False
+            # ✅ تحديث الصنف نفسه لكي تبقى القائمة والفهرسان متطابقين
+            old.update(self._product_from_row(row))
+        return True
+
+    def _refresh(self):
+        version = data_version('stock')
+        if version == self._version:
+            return
+        keys = changed_keys('stock', self._version) if self._version is not None else None
+        if keys is None or not self._patch(keys):
+            self._reload()
+        self._version = version
+
+    def _set_exchange_rate(self, exchange_rate):
+        if exchange_rate and exchange_rate != self._exchange_rate:
+            self._exchange_rate = exchange_rate
+            for product in self._products:
+                self._price(product)
+
+    # ======== ✅ الواجهة العامة ========
+    def products(self, exchange_rate):
+        """✅ كل الأصناف مرتبة بالاسم مع أسعار الدولار لسعر الصرف المحدد
+
+        القائمة مشتركة - للقراءة فقط.
+        """
+        with self._lock:
+            self._refresh()
+            self._set_exchange_rate(exchange_rate)
+            return self._products
+
+    def get_by_name(self, name):
+        with self._lock:
+            self._refresh()
+            return self._by_name.get(name)
+
+    def get_by_id(self, item_id):
+        with self._lock:
+            self._refresh()
+            return self._by_id.get(item_id)
+
+    def sell_units(self, item_id):
+        """✅ وحدات المبيع الخاصة بصنف (أو وحدته الافتراضية، أو "قطعة")"""
+        with self._lock:
+            self._refresh()
+            units = self._sell_units.get(item_id)
+            if units:
+                return list(units)
+            product = self._by_id.get(item_id)
+            if product and product['sell_unit']:
+                return [product['sell_unit']]
+            return ["قطعة"]
+
+    def search_index(self, products):
+        """✅ فهرس البحث بالبادئات لقائمة أصناف (يبنى مرة واحدة لكل تحميل للكتالوج)
+
+        تعديل الكميات لا يغير الأسماء، لذلك يبقى الفهرس صالحاً حتى إعادة التحميل الكامل
+        (التي تنشئ قائمة جديدة).
+        """
+        with self._lock:
+            if self._search_index is None or self._search_index.products is not products:
+                self._search_index = ProductSearchIndex(products)
+            return self._search_index
+
+    def refresh_sell_units(self, item_ids=None):
+        """✅ إعادة قراءة وحدات المبيع بعد تعديلها (كل الأصناف إذا item_ids = None)"""
+        with self._lock:
+            if self._version is not None:
+                self._load_sell_units(item_ids)
+
+    def invalidate(self):
+        """✅ إجبار إعادة التحميل عند الطلب التالي"""
+        with self._lock:
+            self._version = None
+
+
+_catalog = None
+
+
+def get_product_catalog():
+    """✅ نسخة واحدة من الكتالوج لكل العملية"""
+    global _catalog
+    if _catalog is None:
+        _catalog = ProductCatalog()
+    return _catalog
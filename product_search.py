@@ -0,0 +1,165 @@
+from bisect import bisect_left, bisect_right
+
+try:
+    from pages.text_normalize import index_tokens, normalize_text, tokenize
+except ImportError:
+    from text_normalize import index_tokens, normalize_text, tokenize
+
+try:
+    from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QStringListModel
+    from PySide6.QtWidgets import QCompleter, QComboBox
+except ImportError as e:
+    # ✅ الفهرس يعمل بدون Qt (مثلاً من سكربت)
+    print(f"⚠️ مكمل الأصناف غير متاح بدون PySide6: {e}")
+    QCompleter = None
+
+# ✅ الحد الأقصى لعدد الاقتراحات المعروضة لكل حرف يكتب
+MAX_SUGGESTIONS = 30
+
+# ✅ عرض القائمة المنسدلة بعدد الأحرف هذا بدلاً من قياس كل أسماء الأصناف
+COMBO_MIN_CONTENTS_LENGTH = 30
+
+
+class ProductSearchIndex:
+    """✅ فهرس بادئات لأسماء الأصناف (عربي ولاتيني بعد التوحيد)
+
+    قائمتان مرتبتان: الأسماء الكاملة، وكل كلمات الأسماء. البحث عن بادئة هو بحث
+    ثنائي (bisect) ثم قراءة النطاق المتطابق حتى اكتمال عدد النتائج المطلوب، بدلاً
+    من المرور على كل الأصناف. الترتيب: الأسماء التي تبدأ بالنص المكتوب أولاً، ثم
+    الأسماء التي تحتوي كلمة تبدأ به - وأبجدياً داخل كل مجموعة.
+    الكلمات تفهرس عبر text_normalize.index_tokens، لذلك "حديد" تجد "الحديد" أيضاً.
+    المواقع تشير إلى قائمة products التي بني منها الفهرس.
+    """
+
+    def __init__(self, products):
+        self.products = products
+        self._tokens = []
+        names = []
+        words = []
+        for position, product in enumerate(products):
+            name = normalize_text(product['name'])
+            tokens = index_tokens(name)
+            self._tokens.append(tokens)
+            names.append((name, position))
+            words.extend((token, name, position) for token in tokens)
+        names.sort()
+        words.sort()
+        self._names = [entry[0] for entry in names]
+        self._name_positions = [entry[1] for entry in names]
+        self._words = [entry[0] for entry in words]
+        self._word_positions = [entry[2] for entry in words]
+
+    def _word_range(self, prefix):
+        """✅ نطاق الكلمات التي تبدأ بـ prefix في القائمة المرتبة"""
+        return bisect_left(self._words, prefix), bisect_right(self._words, prefix + '\uffff')
+
+    def _matches_all(self, position, query_tokens):
+        tokens = self._tokens[position]
+        return all(any(token.startswith(query) for token in tokens) for query in query_tokens)
+
+    def search(self, text, limit=MAX_SUGGESTIONS):
+        """✅ مواقع الأصناف المطابقة مرتبة حسب الأفضلية (أول limit فقط)"""
+        query = normalize_text(text)
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+        results = []
+        seen = set()
+
+        # ✅ 1) الاسم يبدأ بالنص المكتوب
+        for index in range(bisect_left(self._names, query), len(self._names)):
+            if len(results) >= limit or not self._names[index].startswith(query):
+                break
+            position = self._name_positions[index]
+            seen.add(position)
+            results.append(position)
+
+        # ✅ 2) كلمة في الاسم تبدأ بكلمة البحث ذات أضيق نطاق، مع تحقق باقي الكلمات
+        start, end = min((self._word_range(token) for token in query_tokens),
+                         key=lambda bounds: bounds[1] - bounds[0])
+        for index in range(start, end):
+            if len(results) >= limit:
+                break
+            position = self._word_positions[index]
+            if position in seen or not self._matches_all(position, query_tokens):
+                continue
+            seen.add(position)
+            results.append(position)
+
+        return results
+
+
+if QCompleter is not None:
+
+    class ProductListModel(QAbstractListModel):
+        """✅ أسماء الأصناف للقائمة المنسدلة بدون نسخها إلى عناصر Qt
+
+        الاسم يقرأ من قائمة products عند عرض صفه فقط، ورقم الصف هو موقع الصنف.
+        """
+
+        def __init__(self, products, parent=None):
+            super().__init__(parent)
+            self.products = products
+
+        def rowCount(self, parent=QModelIndex()):
+            return 0 if parent.isValid() else len(self.products)
+
+        def data(self, index, role=Qt.DisplayRole):
+            if index.isValid() and role in (Qt.DisplayRole, Qt.EditRole):
+                return self.products[index.row()]['name']
+            return None
+
+    def set_product_items(combo, products):
+        """✅ تعبئة القائمة المنسدلة بالأصناف عبر ProductListModel بدلاً من addItems للكتالوج كله"""
+        combo.setModel(ProductListModel(products, combo))
+        combo.view().setUniformItemSizes(True)
+        combo.setSizeAdjustPolicy(QComboBox.AdjustToMinimumContentsLengthWithIcon)
+        combo.setMinimumContentsLength(COMBO_MIN_CONTENTS_LENGTH)
+        combo.setCurrentIndex(0 if products else -1)
+
+    class ProductCompleter(QCompleter):
+        """✅ إكمال تلقائي لقائمة الأصناف من فهرس البادئات
+
+        القائمة المنبثقة تعرض أفضل النتائج فقط (بدون تصفية Qt لكل الأصناف)،
+        واختيار نتيجة يحدد الصنف نفسه في القائمة المنسدلة.
+        """
+
+        def __init__(self, combo, search_index, limit=MAX_SUGGESTIONS):
+            super().__init__(combo)
+            self.combo = combo
+            self.search_index = search_index
+            self.limit = limit
+            self._positions = []
+
+            self._model = QStringListModel(self)
+            self.setModel(self._model)
+            self.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+            self.setMaxVisibleItems(15)
+
+            combo.setEditable(True)
+            combo.setInsertPolicy(QComboBox.NoInsert)
+            combo.setCompleter(self)
+            combo.lineEdit().textEdited.connect(self.update_suggestions)
+            combo.lineEdit().editingFinished.connect(self.restore_current_text)
+            self.activated[str].connect(self.select_suggestion)
+
+        def update_suggestions(self, text):
+            self._positions = self.search_index.search(text, self.limit)
+            products = self.search_index.products
+            self._model.setStringList([products[position]['name'] for position in self._positions])
+            if self._positions:
+                self.complete()
+
+        def select_suggestion(self, name):
+            products = self.search_index.products
+            for position in self._positions:
+                if products[position]['name'] == name:
+                    self.combo.setCurrentIndex(position)
+                    break
+            self.restore_current_text()
+
+        def restore_current_text(self):
+            """✅ النص المكتوب غير المطابق لا يبقى في القائمة - يعود اسم الصنف المحدد"""
+            index = self.combo.currentIndex()
+            if index >= 0:
+                self.combo.setEditText(self.combo.itemText(index))
@@ -0,0 +1,334 @@
+import os
+import sqlite3
+import threading
+
+try:
+    from pages.db_connection import get_db
+    from pages.report_etl import get_report_loader, ROLLUP_TABLES
+except ImportError:
+    from db_connection import get_db
+    from report_etl import get_report_loader, ROLLUP_TABLES
+
+try:
+    from PySide6.QtCore import QThread, Signal
+except ImportError as e:
+    # ✅ حساب التقارير يعمل بدون Qt (مثلاً من سكربت)
+    print(f"⚠️ خيط التقارير غير متاح بدون PySide6: {e}")
+    QThread = None
+
+# ✅ عدد تعليمات SQLite بين كل فحص لطلب الإلغاء أثناء الاستعلام
+CANCEL_CHECK_INSTRUCTIONS = 10000
+
+# ✅ وضع المطور: طباعة خطة تنفيذ (EXPLAIN QUERY PLAN) كل استعلام تقرير وتمييز المسح الكامل
+# للجداول - التفعيل بتشغيل البرنامج مع CHBIB_QUERY_PLAN=1
+QUERY_PLAN_AUDIT = os.environ.get("CHBIB_QUERY_PLAN") == "1"
+
+# ✅ المسح الكامل المقصود في بعض الخطوات (قائمة كل الأصناف/الزبائن وعددهم) - أي مسح
+# آخر لجدول يظهر كتحذير حتى لو كان عبر فهرس
+EXPECTED_FULL_SCANS = {
+    'quick_stats': ('reports.products', 'customers'),
+    'inventory': ('p',),
+    'customers': ('c',),
+}
+
+
+class ReportCancelled(Exception):
+    """✅ تم إلغاء حساب التقارير (تغير الفترة أو إغلاق الصفحة)"""
+
+
+def explain_query(c, sql, params=()):
+    """✅ خطة تنفيذ الاستعلام - ترجع [(وصف الخطوة، الجدول إذا كانت مسحاً كاملاً أو None)]"""
+    plan = []
+    for row in c.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall():
+        detail = row[-1]
+        words = detail.split()
+        # ✅ المرور على فهرس كامل (USING COVERING INDEX) مسح كامل أيضاً - يكبر مع الجدول
+        full_scan = words[1] if words[0] == "SCAN" and words[1] != "CONSTANT" else None
+        plan.append((detail, full_scan))
+    return plan
+
+
+class _AuditCursor:
+    """✅ مؤشر يطبع خطة كل استعلام قبل تنفيذه (وضع المطور فقط)"""
+
+    def __init__(self, cursor, step):
+        self._cursor = cursor
+        self._step = step
+
+    def execute(self, sql, params=()):
+        expected = EXPECTED_FULL_SCANS.get(self._step, ())
+        print(f"🔎 [خطة الاستعلام] {self._step}")
+        for detail, full_scan in explain_query(self._cursor, sql, params):
+            if full_scan and full_scan not in expected:
+                print(f"   ⚠️ مسح كامل للجدول: {detail}")
+            else:
+                print(f"   {detail}")
+        return self._cursor.execute(sql, params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+# ======== ✅ خطوات الحساب - كل خطوة ترجع بيانات جاهزة للعرض ========
+# ✅ تجميع المجاميع اليومية حسب نوع التقرير (0 يومي، 1 أسبوعي، 2 شهري، 3 سنوي)
+SUMMARY_PERIODS = (
+    "period",
+    "strftime('%Y-W%W', period)",
+    "substr(period, 1, 7)",
+    "substr(period, 1, 4)",
+)
+
+
+def _daily_sales(params):
+    """✅ صفوف المبيعات اليومية للفترة (period، cash_sales، credit_sales، revenue، cost، profit)
+
+    من جدول المجاميع اليومية - بعدد الأيام وليس بعدد أسطر الفواتير. المجاميع لا تفصل
+    حسب نوع الفاتورة، لذلك عند تحديد النوع تحسب من الفواتير نفسها (idx_invoices_type_date)
+    بنفس الإيراد والتكلفة المسجلين في كل فاتورة. ترجع (نص FROM، المعاملات).
+    """
+    invoice_type = params.get('invoice_type')
+    dates = (params['from_date'], params['to_date'])
+    if invoice_type is None:
+        return "(SELECT * FROM reports.sales_daily WHERE period BETWEEN ? AND ?)", dates
+    return f"""(
+        SELECT {dict(ROLLUP_TABLES)['sales_daily']} AS period,
+               CASE WHEN i.invoice_type = 'نقدي' THEN i.total_amount ELSE 0 END AS cash_sales,
+               CASE WHEN i.invoice_type = 'تقسيط' THEN i.total_amount ELSE 0 END AS credit_sales,
+               COALESCE(i.booked_revenue, 0) AS revenue,
+               COALESCE(i.booked_cost, 0) AS cost,
+               COALESCE(i.booked_revenue, 0) - COALESCE(i.booked_cost, 0) AS profit
+        FROM reports.invoices i
+        WHERE i.invoice_type = ? AND i.invoice_date BETWEEN ? AND ?
+    )""", (invoice_type,) + dates
+
+
+def _rollup_totals(c, params):
+    """✅ مجاميع الفترة (حسب نوع الفاتورة إذا كان محدداً)"""
+    source, source_params = _daily_sales(params)
+    c.execute(f"""
+        SELECT SUM(cash_sales), SUM(credit_sales), SUM(revenue), SUM(cost), SUM(profit)
+        FROM {source}
+    """, source_params)
+    return tuple(value or 0 for value in c.fetchone())
+
+
+def _quick_stats(c, params):
+    cash_sales, credit_sales, _, _, total_profit = _rollup_totals(c, params)
+    total_sales = cash_sales + credit_sales
+
+    c.execute("SELECT SUM(quantity * capital_price) FROM reports.products")
+    total_capital = c.fetchone()[0]
+
+    c.execute("SELECT COUNT(*) FROM reports.customers")
+    total_customers = c.fetchone()[0]
+
+    return {
+        'total_sales': total_sales or 0,
+        'cash_sales': cash_sales or 0,
+        'credit_sales': credit_sales or 0,
+        'total_profit': total_profit or 0,
+        'total_capital': total_capital or 0,
+        'total_customers': total_customers or 0,
+    }
+
+
+def _summary(c, params):
+    period = SUMMARY_PERIODS[params.get('period', 0)]
+    source, source_params = _daily_sales(params)
+    c.execute(f"""
+        SELECT
+            {period} as date,
+            SUM(cash_sales), SUM(credit_sales), SUM(cash_sales + credit_sales),
+            SUM(cost), SUM(profit)
+        FROM {source}
+        GROUP BY 1
+        ORDER BY 1
+    """, source_params)
+    return c.fetchall()
+
+
+def _sales(c, params):
+    invoice_type = params.get('invoice_type')
+    if invoice_type is None:
+        c.execute("""
+            SELECT i.id, c.name_ar, i.invoice_type, i.total_amount,
+                   i.paid_amount, i.remaining_amount, i.invoice_date
+            FROM reports.invoices i
+            LEFT JOIN reports.customers c ON i.customer_id = c.id
+            WHERE i.invoice_date BETWEEN ? AND ?
+            ORDER BY i.invoice_date DESC
+        """, (params['from_date'], params['to_date']))
+    else:
+        c.execute("""
+            SELECT i.id, c.name_ar, i.invoice_type, i.total_amount,
+                   i.paid_amount, i.remaining_amount, i.invoice_date
+            FROM reports.invoices i
+            LEFT JOIN reports.customers c ON i.customer_id = c.id
+            WHERE i.invoice_type = ? AND i.invoice_date BETWEEN ? AND ?
+            ORDER BY i.invoice_date DESC
+        """, (invoice_type, params['from_date'], params['to_date']))
+    return c.fetchall()
+
+
+def _profit(c, params):
+    from_date, to_date = params['from_date'], params['to_date']
+    # ✅ تحليل الأرباح لكل الفواتير (مثل جدول المنتجات أدناه) وليس لنوع المبيعات المحدد
+    _, _, total_revenue, total_costs, net_profit = _rollup_totals(c, dict(params, invoice_type=None))
+
+    # تحليل الأرباح حسب المنتج
+    c.execute("""
+        SELECT
+            p.name_ar,
+            SUM(ii.quantity) as total_quantity,
+            SUM(ii.total_price) as revenue,
+            SUM(ii.quantity * p.capital_price) as costs,
+            SUM(ii.total_price - (ii.quantity * p.capital_price)) as profit
+        FROM reports.invoice_items ii
+        JOIN reports.invoices i ON ii.invoice_id = i.id
+        JOIN reports.products p ON ii.product_id = p.id
+        WHERE i.invoice_date BETWEEN ? AND ?
+        GROUP BY p.id, p.name_ar
+        ORDER BY profit DESC
+    """, (from_date, to_date))
+
+    return {
+        'total_revenue': total_revenue,
+        'total_costs': total_costs,
+        'net_profit': net_profit,
+        'profit_percentage': (net_profit / total_revenue * 100) if total_revenue > 0 else 0,
+        'rows': c.fetchall(),
+    }
+
+
+def _inventory(c, params):
+    # ✅ الكمية من المخزون الفعلي (Items) إذا وجد الصنف فيه
+    c.execute("""
+        SELECT
+            p.name_ar, COALESCE(s.quantity, p.quantity) as quantity,
+            p.capital_price, p.selling_price,
+            (COALESCE(s.quantity, p.quantity) * p.capital_price) as total_cost,
+            (COALESCE(s.quantity, p.quantity) * p.selling_price) as inventory_value,
+            p.created_date
+        FROM reports.products p
+        LEFT JOIN main.Items s ON s.id = (
+            SELECT id FROM main.Items WHERE name = p.name_ar ORDER BY id LIMIT 1
+        )
+        ORDER BY p.name_ar
+    """)
+    return c.fetchall()
+
+
+def _customers(c, params):
+    # ✅ تجميع الفواتير والدفعات لكل زبون في استعلامين منفصلين قبل الربط -
+    # ربطهما مباشرة يضرب كل فاتورة بعدد الدفعات ويضخم المجاميع
+    c.execute("""
+        SELECT
+            c.name_ar,
+            COALESCE(i.total_purchases, 0) as total_purchases,
+            COALESCE(p.total_payments, 0) as total_payments,
+            COALESCE(i.total_remaining, 0) as total_remaining,
+            COALESCE(i.invoice_count, 0) as invoice_count,
+            i.last_purchase
+        FROM reports.customers c
+        LEFT JOIN (
+            SELECT customer_id,
+                   SUM(total_amount) as total_purchases,
+                   SUM(remaining_amount) as total_remaining,
+                   COUNT(*) as invoice_count,
+                   MAX(invoice_date) as last_purchase
+            FROM reports.invoices
+            WHERE invoice_date BETWEEN ? AND ?
+            GROUP BY customer_id
+        ) i ON i.customer_id = c.id
+        LEFT JOIN (
+            SELECT customer_id, SUM(amount) as total_payments
+            FROM reports.payments
+            WHERE payment_date BETWEEN ? AND ?
+            GROUP BY customer_id
+        ) p ON p.customer_id = c.id
+        ORDER BY total_purchases DESC
+    """, (params['from_date'], params['to_date'], params['from_date'], params['to_date']))
+    return c.fetchall()
+
+
+# ✅ (المفتاح، الوصف، الدالة) بترتيب التنفيذ
+REPORT_STEPS = (
+    ('quick_stats', "الإحصائيات السريعة", _quick_stats),
+    ('summary', "الملخص اليومي", _summary),
+    ('sales', "تقرير المبيعات", _sales),
+    ('profit', "الأرباح والخسائر", _profit),
+    ('inventory', "المخزون ورأس المال", _inventory),
+    ('customers', "تقرير العملاء", _customers),
+)
+
+
+def compute_reports(conn, params, is_cancelled=lambda: False, progress=None):
+    """✅ حساب كل التقارير للفترة المحددة - ترجع قاموساً بنتيجة كل خطوة
+
+    params: from_date و to_date (yyyy-MM-dd) و invoice_type (None = الكل)
+    و period (نوع تجميع الملخص - فهرس في SUMMARY_PERIODS).
+    ترفع ReportCancelled إذا طلب الإلغاء، حتى أثناء استعلام طويل.
+    """
+    # ✅ SQLite يقطع الاستعلام الجاري عندما يرجع المعالج قيمة غير صفرية
+    conn.set_progress_handler(lambda: 1 if is_cancelled() else 0, CANCEL_CHECK_INSTRUCTIONS)
+    try:
+        c = conn.cursor()
+        results = {}
+        for index, (key, title, step) in enumerate(REPORT_STEPS):
+            if is_cancelled():
+                raise ReportCancelled()
+            try:
+                results[key] = step(_AuditCursor(c, key) if QUERY_PLAN_AUDIT else c, params)
+            except sqlite3.OperationalError:
+                if is_cancelled():
+                    raise ReportCancelled()
+                raise
+            if progress:
+                progress(int((index + 1) * 100 / len(REPORT_STEPS)), title)
+        return results
+    finally:
+        conn.set_progress_handler(None, 0)
+
+
+if QThread is not None:
+
+    class ReportWorker(QThread):
+        """✅ حساب التقارير في خيط منفصل مع تقدم حقيقي وإمكانية الإلغاء
+
+        يستورد التغييرات الجديدة إلى جداول التقارير أولاً (report_etl) ثم يحسب
+        الخطوات ويرسل كل النتائج مرة واحدة عبر reports_ready.
+        """
+        progress = Signal(int, int, str)  # رقم العملية، النسبة، الخطوة الحالية
+        reports_ready = Signal(int, object)  # رقم العملية، النتائج
+        failed = Signal(int, str)
+
+        def __init__(self, job_id, params, parent=None):
+            super().__init__(parent)
+            self.job_id = job_id
+            self.params = dict(params)
+            self._cancelled = threading.Event()
+
+        def cancel(self):
+            self._cancelled.set()
+
+        def is_cancelled(self):
+            return self._cancelled.is_set()
+
+        def run(self):
+            db = get_db()
+            try:
+                self.progress.emit(self.job_id, 0, "تحديث بيانات التقارير")
+                get_report_loader().refresh()
+                results = compute_reports(
+                    db.connection(), self.params, self.is_cancelled,
+                    lambda percent, title: self.progress.emit(self.job_id, percent, title)
+                )
+                if not self.is_cancelled():
+                    self.reports_ready.emit(self.job_id, results)
+            except ReportCancelled:
+                print(f"✅ [التقارير] تم إلغاء العملية {self.job_id}")
+            except Exception as e:
+                self.failed.emit(self.job_id, str(e))
+            finally:
+                # ✅ الخيط ينتهي - إغلاق اتصاله بدلاً من تركه في المدير
+                db.release()
@@ -0,0 +1,389 @@
+import sqlite3
+import threading
+
+try:
+    from pages.db_connection import get_db
+    from pages.json_repository import get_json_repository
+    from pages.data_versions import bump_version
+except ImportError:
+    from db_connection import get_db
+    from json_repository import get_json_repository
+    from data_versions import bump_version
+
+DEFAULT_USD_TO_LBP = 89000
+
+# ✅ مفتاح العلامة المائية في reports.etl_state - رقم آخر سجل تمت معالجته من report_changes
+HIGH_WATER_MARK_KEY = "report_changes_seq"
+
+# ✅ ترتيب المعالجة: الأصناف والزبائن قبل الفواتير، والفواتير قبل الدفعات
+ENTITY_ORDER = ('product', 'customer', 'invoice', 'payment')
+
+# ✅ جداول التجميع (الجدول، تعبير المفتاح من تاريخ الفاتورة)
+ROLLUP_TABLES = (
+    ('sales_daily', "date(i.invoice_date)"),
+    ('sales_monthly', "strftime('%Y-%m', i.invoice_date)"),
+)
+
+
+# ✅ الإيراد والتكلفة المسجلان لفاتورة في القاعدة الرئيسية (المعاملات: سعر الصرف، رقم الفاتورة)
+# التكلفة هي purchase_price المحفوظ مع الصنف وقت البيع، وللأصناف القديمة بدونه سعر
+# رأس المال الحالي
+BOOKED_TOTALS_SQL = """
+    SELECT COALESCE(SUM(ii.total_usd), 0),
+           COALESCE(SUM(COALESCE(ii.purchase_price, ii.quantity * CASE
+               WHEN upper(COALESCE(s.currency, 'LBP')) IN ('USD', 'US$') THEN COALESCE(s.buy_price, 0)
+               ELSE COALESCE(s.buy_price, 0) / ? END)), 0)
+    FROM main.invoice_items ii
+    LEFT JOIN main.Items s ON s.id = ii.product_id
+    WHERE ii.invoice_id = ?
+"""
+
+
+def apply_sales_rollup(conn, sign, where, params=()):
+    """✅ إضافة (sign=1) أو طرح (sign=-1) مساهمة الفواتير المطابقة لـ where في جداول التجميع
+
+    where شرط على reports.invoices باسم i (مثل "i.id = ?"). المساهمة هي الإيراد والتكلفة
+    المسجلان في الفاتورة نفسها (booked_revenue / booked_cost) عند إضافتها، لذلك الطرح
+    يلغي بالضبط ما أضيف حتى لو تغير سعر رأس المال أو حذف الصنف بعدها. يتم حذف
+    الفترات التي لم يبق فيها فواتير.
+    """
+    for table, period in ROLLUP_TABLES:
+        conn.execute(f"""
+            INSERT INTO reports.{table}
+                (period, cash_sales, credit_sales, revenue, cost, profit, invoice_count)
+            SELECT {period},
+                   ? * SUM(CASE WHEN i.invoice_type = 'نقدي' THEN i.total_amount ELSE 0 END),
+                   ? * SUM(CASE WHEN i.invoice_type = 'تقسيط' THEN i.total_amount ELSE 0 END),
+                   ? * SUM(COALESCE(i.booked_revenue, 0)),
+                   ? * SUM(COALESCE(i.booked_cost, 0)),
+                   ? * SUM(COALESCE(i.booked_revenue, 0) - COALESCE(i.booked_cost, 0)),
+                   ? * COUNT(*)
+            FROM reports.invoices i
+            WHERE ({where}) AND i.invoice_date IS NOT NULL
+            GROUP BY {period}
+            ON CONFLICT(period) DO UPDATE SET
+                cash_sales = cash_sales + excluded.cash_sales,
+                credit_sales = credit_sales + excluded.credit_sales,
+                revenue = revenue + excluded.revenue,
+                cost = cost + excluded.cost,
+                profit = profit + excluded.profit,
+                invoice_count = invoice_count + excluded.invoice_count
+        """, (sign,) * 6 + tuple(params))
+        if sign < 0:
+            conn.execute(f"DELETE FROM reports.{table} WHERE invoice_count <= 0")
+
+
+def rebuild_sales_rollups(conn, usd_to_lbp=None):
+    """✅ تسجيل إيراد وتكلفة كل فواتير التقارير من القاعدة الرئيسية ثم إعادة بناء المجاميع"""
+    usd_to_lbp = usd_to_lbp or _load_usd_to_lbp()
+    invoices = conn.execute("""
+        SELECT r.id, m.id FROM reports.invoices r
+        LEFT JOIN main.invoices m ON m.invoice_uuid = r.invoice_uuid
+    """).fetchall()
+    for report_invoice_id, invoice_id in invoices:
+        revenue, cost = conn.execute(BOOKED_TOTALS_SQL, (usd_to_lbp, invoice_id)).fetchone()
+        conn.execute("UPDATE reports.invoices SET booked_revenue = ?, booked_cost = ? WHERE id = ?",
+                     (revenue, cost, report_invoice_id))
+    for table, _ in ROLLUP_TABLES:
+        conn.execute(f"DELETE FROM reports.{table}")
+    apply_sales_rollup(conn, 1, "1")
+
+
+def _load_usd_to_lbp():
+    try:
+        data = get_json_repository().read("data/exchange_rate.json")
+        if data:
+            return float(data.get('exchange_rate', DEFAULT_USD_TO_LBP)) or DEFAULT_USD_TO_LBP
+    except Exception as e:
+        print(f"⚠️ خطأ في تحميل سعر الصرف للتقارير: {e}")
+    return DEFAULT_USD_TO_LBP
+
+
+class ReportLoader:
+    """✅ تحميل تدريجي لجداول التقارير (المخطط reports) من البيانات الحقيقية
+
+    الـ triggers في القاعدة الرئيسية تسجل كل إضافة/تعديل/حذف في report_changes،
+    وكل تحديث يعالج فقط السجلات بعد العلامة المائية بدلاً من إعادة استيراد كل شيء.
+    الكيانات: الأصناف (Items.id)، الزبائن (customers.id)، الفواتير (invoice_uuid)
+    والدفعات (payment_uuid).
+
+    حفظ الفاتورة يحدث جداول المجاميع في نفس معاملته (sync_now)، والتحديث اللاحق يعيد
+    مزامنة نفس الفاتورة بدون أي فرق (يطرح المسجل ثم يضيفه من جديد).
+
+    ترتيب الأقفال: معاملة الحفظ تكتب في القاعدة الرئيسية ثم تنتظر _lock، لذلك refresh
+    لا يكتب في القاعدة الرئيسية وهو يحمل _lock (يكتب في ملف التقارير فقط).
+    """
+
+    def __init__(self, db=None):
+        self._db = db or get_db()
+        self._lock = threading.Lock()
+
+    def high_water_mark(self, conn=None):
+        conn = conn or self._db.connection()
+        row = conn.execute("SELECT value FROM reports.etl_state WHERE key = ?", (HIGH_WATER_MARK_KEY,)).fetchone()
+        return int(row[0]) if row else 0
+
+    def pending_changes(self):
+        """✅ عدد التغييرات التي لم تصل للتقارير بعد"""
+        conn = self._db.connection()
+        return conn.execute("SELECT COUNT(*) FROM main.report_changes WHERE seq > ?",
+                            (self.high_water_mark(conn),)).fetchone()[0]
+
+    def month_totals(self, month=None):
+        """✅ مبيعات الشهر (yyyy-MM، الحالي افتراضياً) - ترجع (نقدي، تقسيط)
+
+        تقرأ المجاميع المحفوظة فقط ولا تستورد التغييرات (refresh_in_background لذلك)،
+        حتى لا تنتظر الواجهة الاستيراد الأول أو تحديثاً يعمل في خيط التقارير.
+        """
+        row = self._db.connection().execute("""
+            SELECT cash_sales, credit_sales FROM reports.sales_monthly
+            WHERE period = COALESCE(?, strftime('%Y-%m', 'now', 'localtime'))
+        """, (month,)).fetchone()
+        return (row[0], row[1]) if row else (0.0, 0.0)
+
+    def refresh_in_background(self):
+        """✅ تشغيل refresh في خيط خلفي (إلا إذا كان تحديث آخر يعمل الآن)"""
+        if self._lock.locked():
+            return
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"❌ [التقارير] خطأ في التحديث: {e}")
+            finally:
+                self._db.release()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def sync_now(self, conn, invoice_uuids=(), customer_ids=()):
+        """✅ مزامنة فواتير/زبائن معدلة داخل معاملة الحفظ نفسها (conn من get_db().transaction)
+
+        المجاميع تتغير مع الفاتورة في نفس المعاملة - إذا كان refresh يعمل الآن تنتظر
+        انتهاءه. إذا فشلت المزامنة يتم تخطيها بدون التأثير على الحفظ - سجلات
+        report_changes تبقى وسيعالجها التحديث التالي. إشعار 'sales' يصل بعد حفظ
+        المعاملة فقط. ترجع True إذا تمت المزامنة.
+        """
+        with self._lock:
+            self._usd_to_lbp = _load_usd_to_lbp()
+            conn.execute("SAVEPOINT report_sync")
+            try:
+                for customer_id in customer_ids:
+                    self._sync_customer(conn, customer_id)
+                for invoice_uuid in invoice_uuids:
+                    self._sync_invoice(conn, invoice_uuid)
+            except sqlite3.Error as e:
+                conn.execute("ROLLBACK TO report_sync")
+                print(f"⚠️ [التقارير] تأجيل تحديث المجاميع للتحديث التالي: {e}")
+                return False
+            finally:
+                conn.execute("RELEASE report_sync")
+        self._db.after_commit(lambda: bump_version('sales'))
+        return True
+
+    def refresh(self):
+        """✅ معالجة التغييرات الجديدة فقط - ترجع عدد الكيانات التي تم تحديثها"""
+        with self._lock:
+            conn = self._db.connection()
+            mark = self.high_water_mark(conn)
+            changes = conn.execute("""
+                SELECT seq, entity, entity_key FROM main.report_changes
+                WHERE seq > ? ORDER BY seq
+            """, (mark,)).fetchall()
+            if not changes:
+                return 0
+
+            # ✅ نفس الكيان قد يتغير عدة مرات - تتم مزامنته مرة واحدة بحالته الحالية
+            pending = {}
+            for seq, entity, key in changes:
+                pending.setdefault(entity, {})[key] = seq
+            new_mark = changes[-1][0]
+
+            self._usd_to_lbp = _load_usd_to_lbp()
+            # ✅ البيانات والعلامة المائية في نفس ملف التقارير - تحفظ معاً أو لا تحفظ
+            with self._db.transaction() as conn:
+                for entity in ENTITY_ORDER:
+                    sync = getattr(self, f"_sync_{entity}")
+                    for key in pending.get(entity, ()):
+                        sync(conn, key)
+                conn.execute("INSERT OR REPLACE INTO reports.etl_state (key, value) VALUES (?, ?)",
+                             (HIGH_WATER_MARK_KEY, str(new_mark)))
+
+        # ✅ حذف السجلات المعالجة بعد ترك _lock - قد تنتظر معاملة حفظ تنتظر هي _lock
+        # (إعادة معالجتها بعد انقطاع لا تكرر البيانات)
+        with self._db.transaction() as conn:
+            conn.execute("DELETE FROM main.report_changes WHERE seq <= ?", (new_mark,))
+
+        count = sum(len(keys) for keys in pending.values())
+        print(f"✅ [التقارير] تم تحديث {count} سجل من {len(changes)} تغيير")
+        bump_version('sales')
+        return count
+
+    # ======== ✅ مزامنة كل نوع ========
+    def _report_id(self, conn, table, column, value):
+        row = conn.execute(f"SELECT id FROM reports.{table} WHERE {column} = ?", (value,)).fetchone()
+        return row[0] if row else None
+
+    def _to_usd(self, amount, currency):
+        amount = amount or 0
+        if (currency or "LBP").upper() in ("USD", "US$"):
+            return amount
+        return amount / self._usd_to_lbp
+
+    def _sync_product(self, conn, item_id):
+        row = conn.execute("""
+            SELECT name, quantity, buy_price, sell_price, currency FROM main.Items WHERE id = ?
+        """, (item_id,)).fetchone()
+        if not row:
+            # ✅ الفواتير القديمة تبقى في التقارير بدون ربط بالصنف المحذوف
+            conn.execute("""
+                UPDATE reports.invoice_items SET product_id = NULL
+                WHERE product_id = (SELECT id FROM reports.products WHERE source_item_id = ?)
+            """, (item_id,))
+            conn.execute("DELETE FROM reports.products WHERE source_item_id = ?", (item_id,))
+            return
+        name, quantity, buy_price, sell_price, currency = row
+        conn.execute("""
+            INSERT INTO reports.products (source_item_id, name_ar, quantity, capital_price, selling_price)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(source_item_id) DO UPDATE SET
+                name_ar = excluded.name_ar, quantity = excluded.quantity,
+                capital_price = excluded.capital_price, selling_price = excluded.selling_price
+        """, (item_id, name or "", quantity or 0,
+              self._to_usd(buy_price, currency), self._to_usd(sell_price, currency)))
+
+    def _sync_customer(self, conn, customer_id):
+        row = conn.execute("SELECT name, phone, date_added FROM main.customers WHERE id = ?",
+                           (customer_id,)).fetchone()
+        if not row:
+            report_customer_id = self._report_id(conn, 'customers', 'source_customer_id', customer_id)
+            if report_customer_id is not None:
+                apply_sales_rollup(conn, -1, "i.customer_id = ?", (report_customer_id,))
+                # ✅ حذف بيانات الزبون التابعة أولاً (قيود المفاتيح الأجنبية)
+                conn.execute("DELETE FROM reports.payments WHERE customer_id = ?", (report_customer_id,))
+                conn.execute("""
+                    DELETE FROM reports.invoice_items
+                    WHERE invoice_id IN (SELECT id FROM reports.invoices WHERE customer_id = ?)
+                """, (report_customer_id,))
+                conn.execute("DELETE FROM reports.invoices WHERE customer_id = ?", (report_customer_id,))
+                conn.execute("DELETE FROM reports.customers WHERE id = ?", (report_customer_id,))
+            return
+        name, phone, date_added = row
+        conn.execute("""
+            INSERT INTO reports.customers (source_customer_id, name_ar, phone, created_date)
+            VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+            ON CONFLICT(source_customer_id) DO UPDATE SET
+                name_ar = excluded.name_ar, phone = excluded.phone
+        """, (customer_id, name or "", phone, date_added))
+
+    @staticmethod
+    def _report_items(conn, report_invoice_id):
+        return conn.execute("""
+            SELECT product_id, quantity, total_price FROM reports.invoice_items
+            WHERE invoice_id = ? ORDER BY id
+        """, (report_invoice_id,)).fetchall()
+
+    def _sync_invoice(self, conn, invoice_uuid):
+        report_invoice_id = self._report_id(conn, 'invoices', 'invoice_uuid', invoice_uuid)
+        old_items = old_cost = None
+        if report_invoice_id is not None:
+            old_items = self._report_items(conn, report_invoice_id)
+            old_cost = conn.execute("SELECT booked_cost FROM reports.invoices WHERE id = ?",
+                                    (report_invoice_id,)).fetchone()[0]
+            # ✅ طرح المساهمة المسجلة قبل تعديل/حذف الفاتورة
+            apply_sales_rollup(conn, -1, "i.id = ?", (report_invoice_id,))
+            conn.execute("DELETE FROM reports.invoice_items WHERE invoice_id = ?", (report_invoice_id,))
+
+        row = conn.execute("""
+            SELECT id, customer_id, type, total_usd, paid_amount, remaining_amount, substr(date, 1, 10)
+            FROM main.invoices WHERE invoice_uuid = ?
+        """, (invoice_uuid,)).fetchone()
+        if not row:
+            if report_invoice_id is not None:
+                conn.execute("DELETE FROM reports.payments WHERE invoice_id = ?", (report_invoice_id,))
+                conn.execute("DELETE FROM reports.invoices WHERE id = ?", (report_invoice_id,))
+            return
+
+        invoice_id, customer_id, invoice_type, total, paid, remaining, invoice_date = row
+        booked_revenue, booked_cost = conn.execute(BOOKED_TOTALS_SQL, (self._usd_to_lbp, invoice_id)).fetchone()
+        report_customer_id = self._report_id(conn, 'customers', 'source_customer_id', customer_id)
+        if report_customer_id is None:
+            self._sync_customer(conn, customer_id)
+            report_customer_id = self._report_id(conn, 'customers', 'source_customer_id', customer_id)
+
+        conn.execute("""
+            INSERT INTO reports.invoices
+                (invoice_uuid, customer_id, invoice_type, total_amount, paid_amount, remaining_amount,
+                 invoice_date, booked_revenue, booked_cost)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(invoice_uuid) DO UPDATE SET
+                customer_id = excluded.customer_id, invoice_type = excluded.invoice_type,
+                total_amount = excluded.total_amount, paid_amount = excluded.paid_amount,
+                remaining_amount = excluded.remaining_amount, invoice_date = excluded.invoice_date,
+                booked_revenue = excluded.booked_revenue, booked_cost = excluded.booked_cost
+        """, (invoice_uuid, report_customer_id, 'نقدي' if invoice_type == 'نقدي' else 'تقسيط',
+              total or 0, paid or 0, remaining or 0, invoice_date, booked_revenue, booked_cost))
+        report_invoice_id = self._report_id(conn, 'invoices', 'invoice_uuid', invoice_uuid)
+
+        # ✅ أصناف جديدة لم تصل للتقارير بعد (المزامنة من معاملة الحفظ تسبق التحديث)
+        missing = conn.execute("""
+            SELECT DISTINCT ii.product_id FROM main.invoice_items ii
+            LEFT JOIN reports.products p ON p.source_item_id = ii.product_id
+            WHERE ii.invoice_id = ? AND ii.product_id IS NOT NULL AND p.id IS NULL
+        """, (invoice_id,)).fetchall()
+        for (item_id,) in missing:
+            self._sync_product(conn, item_id)
+
+        conn.execute("""
+            INSERT INTO reports.invoice_items (invoice_id, product_id, quantity, unit_price, total_price)
+            SELECT ?, p.id, ii.quantity, ii.unit_price_usd, ii.total_usd
+            FROM main.invoice_items ii
+            LEFT JOIN reports.products p ON p.source_item_id = ii.product_id
+            WHERE ii.invoice_id = ?
+            ORDER BY ii.position
+        """, (report_invoice_id, invoice_id))
+        if old_cost is not None and self._report_items(conn, report_invoice_id) == old_items:
+            # ✅ نفس الأصناف (مثلاً تعديل المدفوع فقط) - التكلفة تبقى كما سجلت وقت البيع
+            conn.execute("UPDATE reports.invoices SET booked_cost = ? WHERE id = ?",
+                         (old_cost, report_invoice_id))
+        apply_sales_rollup(conn, 1, "i.id = ?", (report_invoice_id,))
+
+    def _sync_payment(self, conn, payment_key):
+        if payment_key.startswith('id:'):
+            where, value = "ip.id = ? AND ip.payment_uuid IS NULL", int(payment_key[3:])
+        else:
+            where, value = "ip.payment_uuid = ?", payment_key
+        row = conn.execute(f"""
+            SELECT i.customer_id, i.invoice_uuid, ip.amount, substr(ip.date, 1, 10)
+            FROM main.invoice_payments ip JOIN main.invoices i ON i.id = ip.invoice_id
+            WHERE {where}
+        """, (value,)).fetchone()
+        if not row:
+            conn.execute("DELETE FROM reports.payments WHERE payment_uuid = ?", (payment_key,))
+            return
+
+        customer_id, invoice_uuid, amount, payment_date = row
+        conn.execute("""
+            INSERT INTO reports.payments (payment_uuid, customer_id, invoice_id, amount, payment_date)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(payment_uuid) DO UPDATE SET
+                customer_id = excluded.customer_id, invoice_id = excluded.invoice_id,
+                amount = excluded.amount, payment_date = excluded.payment_date
+        """, (payment_key,
+              self._report_id(conn, 'customers', 'source_customer_id', customer_id),
+              self._report_id(conn, 'invoices', 'invoice_uuid', invoice_uuid),
+              amount or 0, payment_date))
+
+
+_loader = None
+_loader_lock = threading.Lock()
+
+
+def get_report_loader():
+    """✅ نسخة واحدة من محمل التقارير لكل العملية"""
+    global _loader
+    if _loader is None:
+        with _loader_lock:
+            if _loader is None:
+                _loader = ReportLoader()
+    return _loader
@@ -1,5 +1,4 @@
 import sys
-import sqlite3
 import os
 from datetime import datetime, timedelta
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
@@ -10,20 +9,52 @@ from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
 from PySide6.QtCore import Qt, QDate, QTimer
 from PySide6.QtGui import QFont, QColor
 
+# ✅ اتصال SQLite المشترك
+try:
+    from pages.db_connection import get_db
+except ImportError:
+    from db_connection import get_db
+
+# ✅ التحميل التدريجي لجداول التقارير من البيانات الحقيقية
+try:
+    from pages.report_etl import get_report_loader
+except ImportError:
+    from report_etl import get_report_loader
+
+# ✅ حساب التقارير في خيط منفصل مع إمكانية الإلغاء
+try:
+    from pages.report_engine import ReportWorker
+except ImportError:
+    from report_engine import ReportWorker
+
+# ✅ إشعارات تغير البيانات بدلاً من مؤقتات التحديث الدورية
+try:
+    from pages.data_versions import subscribe_domains
+except ImportError:
+    from data_versions import subscribe_domains
+
 class ReportsPage(QWidget):
     def __init__(self, controller=None):  # تغيير المعامل ليكون controller
         super().__init__()
         self.controller = controller  # حفظ المرجع للcontroller
+        self.report_worker = None
+        self._report_job_id = 0
         self.setup_database()
         self.init_ui()
+        # ✅ تغيير الفترة يلغي الحساب الجاري ويبدأ حساباً جديداً
+        self.from_date.dateChanged.connect(self.generate_reports)
+        self.to_date.dateChanged.connect(self.generate_reports)
+        # ✅ التحديث عند تغير الفواتير أو المخزون (يتم استيراد التغييرات الجديدة فقط)
+        self.data_subscription = subscribe_domains(self, ('customers', 'stock'), self.load_initial_data)
         # تأخير تحميل البيانات لضمان تحميل الواجهة أولاً
         QTimer.singleShot(100, self.load_initial_data)
         
     def setup_database(self):
         """إعداد قاعدة البيانات والجداول اللازمة"""
         try:
-            # استخدام قاعدة البيانات الرئيسية للتطبيق
-            self.conn = sqlite3.connect('business_management.db', check_same_thread=False)
+            # ✅ الاتصال المشترك - جداول التقارير في المخطط المربوط reports (business_management.db)
+            # والمخزون الفعلي (Items) في القاعدة الرئيسية على نفس الاتصال
+            self.conn = get_db().connection()
             self.cursor = self.conn.cursor()
             
             # التحقق من وجود الجداول الأساسية
@@ -34,147 +65,8 @@ class ReportsPage(QWidget):
             QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"حدث خطأ في إعداد قاعدة البيانات: {str(e)}")
         
     def verify_tables(self):
-        """التحقق من وجود الجداول الأساسية وإنشاءها إذا لم تكن موجودة"""
-        try:
-            tables = [
-                """
-                CREATE TABLE IF NOT EXISTS products (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name_ar TEXT NOT NULL,
-                    name_en TEXT,
-                    quantity INTEGER DEFAULT 0,
-                    capital_price REAL DEFAULT 0,
-                    selling_price REAL DEFAULT 0,
-                    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-                """,
-                """
-                CREATE TABLE IF NOT EXISTS customers (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name_ar TEXT NOT NULL,
-                    name_en TEXT,
-                    phone TEXT,
-                    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-                """,
-                """
-                CREATE TABLE IF NOT EXISTS invoices (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    customer_id INTEGER,
-                    invoice_type TEXT CHECK(invoice_type IN ('نقدي', 'تقسيط')),
-                    total_amount REAL DEFAULT 0,
-                    paid_amount REAL DEFAULT 0,
-                    remaining_amount REAL DEFAULT 0,
-                    invoice_date DATE,
-                    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (customer_id) REFERENCES customers (id)
-                )
-                """,
-                """
-                CREATE TABLE IF NOT EXISTS invoice_items (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    invoice_id INTEGER,
-                    product_id INTEGER,
-                    quantity INTEGER,
-                    unit_price REAL,
-                    total_price REAL,
-                    FOREIGN KEY (invoice_id) REFERENCES invoices (id),
-                    FOREIGN KEY (product_id) REFERENCES products (id)
-                )
-                """,
-                """
-                CREATE TABLE IF NOT EXISTS payments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    customer_id INTEGER,
-                    invoice_id INTEGER,
-                    amount REAL,
-                    payment_date DATE,
-                    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (customer_id) REFERENCES customers (id),
-                    FOREIGN KEY (invoice_id) REFERENCES invoices (id)
-                )
-                """
-            ]
-            
-            for table in tables:
-                try:
-                    self.cursor.execute(table)
-                except Exception as e:
-                    print(f"خطأ في إنشاء الجدول: {e}")
-                    
-            self.conn.commit()
-            
-            # إدراج بيانات تجريبية إذا كانت الجداول فارغة
-            self.insert_sample_data()
-            
-        except Exception as e:
-            print(f"خطأ في التحقق من الجداول: {e}")
-        
-    def insert_sample_data(self):
-        """إدخال بيانات تجريبية إذا كانت الجداول فارغة"""
-        try:
-            # التحقق من وجود منتجات
-            self.cursor.execute("SELECT COUNT(*) FROM products")
-            product_count = self.cursor.fetchone()[0]
-            
-            if product_count == 0:
-                # إدخال منتجات عينة
-                products = [
-                    ('جهاز كمبيوتر محمول', 'Laptop', 10, 2000.0, 2500.0),
-                    ('هاتف ذكي', 'Smartphone', 25, 800.0, 1200.0),
-                    ('طابعة ليزر', 'Laser Printer', 5, 600.0, 900.0),
-                    ('شاشة 24 بوصة', '24-inch Monitor', 15, 400.0, 650.0),
-                    ('لوحة مفاتيح', 'Keyboard', 30, 50.0, 80.0),
-                    ('ماوس لاسلكي', 'Wireless Mouse', 40, 25.0, 45.0)
-                ]
-                
-                self.cursor.executemany(
-                    "INSERT INTO products (name_ar, name_en, quantity, capital_price, selling_price) VALUES (?, ?, ?, ?, ?)",
-                    products
-                )
-            
-            # التحقق من وجود عملاء
-            self.cursor.execute("SELECT COUNT(*) FROM customers")
-            customer_count = self.cursor.fetchone()[0]
-            
-            if customer_count == 0:
-                # إدخال عملاء عينة
-                customers = [
-                    ('أحمد محمد', 'Ahmed Mohamed', '0123456789'),
-                    ('فاطمة عبدالله', 'Fatima Abdullah', '0111222333'),
-                    ('خالد السعيد', 'Khaled AlSaeed', '0105555666'),
-                    ('سارة ناصر', 'Sara Nasser', '0157777888'),
-                    ('محمد علي', 'Mohamed Ali', '0133333444')
-                ]
-                
-                self.cursor.executemany(
-                    "INSERT INTO customers (name_ar, name_en, phone) VALUES (?, ?, ?)",
-                    customers
-                )
-            
-            # التحقق من وجود فواتير
-            self.cursor.execute("SELECT COUNT(*) FROM invoices")
-            invoice_count = self.cursor.fetchone()[0]
-            
-            if invoice_count == 0:
-                # إدخال فواتير عينة
-                invoices = [
-                    (1, 'نقدي', 2500.0, 2500.0, 0.0, '2024-01-15'),
-                    (2, 'تقسيط', 2400.0, 800.0, 1600.0, '2024-01-16'),
-                    (3, 'نقدي', 900.0, 900.0, 0.0, '2024-01-17'),
-                    (4, 'تقسيط', 1300.0, 500.0, 800.0, '2024-01-18'),
-                    (1, 'نقدي', 160.0, 160.0, 0.0, '2024-01-19')
-                ]
-                
-                self.cursor.executemany(
-                    "INSERT INTO invoices (customer_id, invoice_type, total_amount, paid_amount, remaining_amount, invoice_date) VALUES (?, ?, ?, ?, ?, ?)",
-                    invoices
-                )
-            
-            self.conn.commit()
-            
-        except Exception as e:
-            print(f"خطأ في إدخال البيانات التجريبية: {e}")
+        """جداول التقارير تنشأ في ترحيلات db_connection وتغذى من البيانات الحقيقية عبر report_etl"""
+        self.report_loader = get_report_loader()
         
     def init_ui(self):
         """واجهة المستخدم الرئيسية"""
@@ -617,154 +509,100 @@ class ReportsPage(QWidget):
 
     def load_initial_data(self):
         """تحميل البيانات الأولية"""
+        if hasattr(self, 'data_subscription'):
+            self.data_subscription.mark_seen()
+        # ✅ استيراد التغييرات الجديدة وحساب التقارير يتمان في خيط التقارير
+        self.generate_reports()
+
+    def generate_reports(self):
+        """توليد جميع التقارير في الخلفية - أي طلب جديد يلغي العملية الجارية"""
         try:
-            self.progress_bar.setVisible(True)
-            self.progress_bar.setValue(0)
-            
-            # محاكاة عملية التحميل
-            for i in range(101):
-                self.progress_bar.setValue(i)
-                QApplication.processEvents()  # تحديث الواجهة
+            self.cancel_reports()
             
-            # تحميل البيانات من قاعدة البيانات
-            self.load_products_data()
-            self.load_customers_data()
-            self.load_invoices_data()
-            self.load_payments_data()
+            sales_type = self.sales_type_filter.currentText()
+            if "الكل" in sales_type:
+                invoice_type = None
+            else:
+                invoice_type = "نقدي" if "نقدي" in sales_type else "تقسيط"
+            params = {
+                'from_date': self.from_date.date().toString("yyyy-MM-dd"),
+                'to_date': self.to_date.date().toString("yyyy-MM-dd"),
+                'invoice_type': invoice_type,
+                'period': max(self.report_type.currentIndex(), 0),
+            }
             
-            # توليد التقارير
-            self.generate_reports()
+            self._report_job_id += 1
+            worker = ReportWorker(self._report_job_id, params, self)
+            worker.progress.connect(self.on_report_progress)
+            worker.reports_ready.connect(self.apply_reports)
+            worker.failed.connect(self.on_report_failed)
+            worker.finished.connect(worker.deleteLater)
+            self.report_worker = worker
             
-            self.progress_bar.setVisible(False)
+            self.progress_bar.setValue(0)
+            self.progress_bar.setVisible(True)
+            worker.start()
             
         except Exception as e:
             self.progress_bar.setVisible(False)
-            QMessageBox.critical(self, "خطأ", f"حدث خطأ في تحميل البيانات: {str(e)}")
+            QMessageBox.critical(self, "خطأ", f"حدث خطأ في توليد التقارير: {str(e)}")
 
-    def load_products_data(self):
-        """تحميل بيانات المنتجات"""
-        try:
-            self.cursor.execute("SELECT name_ar, quantity, capital_price, selling_price, created_date FROM products")
-            self.products_data = self.cursor.fetchall()
-        except Exception as e:
-            print(f"خطأ في تحميل بيانات المنتجات: {e}")
+    def cancel_reports(self):
+        """✅ إلغاء عملية التقارير الجارية (نتيجتها ستُتجاهل حتى لو وصلت)"""
+        worker = self.report_worker
+        self.report_worker = None
+        if worker is not None:
+            try:
+                worker.cancel()
+            except RuntimeError:
+                # الكائن حُذف بعد انتهاء الخيط
+                pass
 
-    def load_customers_data(self):
-        """تحميل بيانات العملاء"""
-        try:
-            self.cursor.execute("SELECT id, name_ar, phone, created_date FROM customers")
-            self.customers_data = self.cursor.fetchall()
-        except Exception as e:
-            print(f"خطأ في تحميل بيانات العملاء: {e}")
+    def on_report_progress(self, job_id, percent, step):
+        """تحديث شريط التقدم بالخطوة الفعلية"""
+        if job_id != self._report_job_id:
+            return
+        self.progress_bar.setValue(percent)
+        self.progress_bar.setFormat(f"{step} - %p%")
 
-    def load_invoices_data(self):
-        """تحميل بيانات الفواتير"""
-        try:
-            self.cursor.execute("""
-                SELECT i.id, c.name_ar, i.invoice_type, i.total_amount, 
-                       i.paid_amount, i.remaining_amount, i.invoice_date
-                FROM invoices i
-                LEFT JOIN customers c ON i.customer_id = c.id
-            """)
-            self.invoices_data = self.cursor.fetchall()
-        except Exception as e:
-            print(f"خطأ في تحميل بيانات الفواتير: {e}")
-
-    def load_payments_data(self):
-        """تحميل بيانات المدفوعات"""
-        try:
-            self.cursor.execute("""
-                SELECT p.customer_id, c.name_ar, p.amount, p.payment_date
-                FROM payments p
-                LEFT JOIN customers c ON p.customer_id = c.id
-            """)
-            self.payments_data = self.cursor.fetchall()
-        except Exception as e:
-            print(f"خطأ في تحميل بيانات المدفوعات: {e}")
+    def on_report_failed(self, job_id, message):
+        if job_id != self._report_job_id:
+            return
+        self.progress_bar.setVisible(False)
+        QMessageBox.critical(self, "خطأ", f"حدث خطأ في توليد التقارير: {message}")
 
-    def generate_reports(self):
-        """توليد جميع التقارير"""
+    def apply_reports(self, job_id, results):
+        """✅ عرض كل نتائج التقارير دفعة واحدة"""
+        if job_id != self._report_job_id:
+            return
+        self.setUpdatesEnabled(False)
         try:
-            from_date = self.from_date.date().toString("yyyy-MM-dd")
-            to_date = self.to_date.date().toString("yyyy-MM-dd")
-            report_type = self.report_type.currentText()
-            
-            # تحديث جميع التقارير
-            self.update_quick_stats(from_date, to_date)
-            self.update_summary_report(from_date, to_date, report_type)
-            self.update_sales_report(from_date, to_date)
-            self.update_profit_report(from_date, to_date)
-            self.update_inventory_report()
-            self.update_customers_report(from_date, to_date)
-            
-        except Exception as e:
-            QMessageBox.critical(self, "خطأ", f"حدث خطأ في توليد التقارير: {str(e)}")
+            self.update_quick_stats(results['quick_stats'])
+            self.update_summary_report(results['summary'])
+            self.update_sales_report(results['sales'])
+            self.update_profit_report(results['profit'])
+            self.update_inventory_report(results['inventory'])
+            self.update_customers_report(results['customers'])
+        finally:
+            self.setUpdatesEnabled(True)
+            self.progress_bar.setVisible(False)
 
-    def update_quick_stats(self, from_date, to_date):
+    def update_quick_stats(self, stats):
         """تحديث الإحصائيات السريعة"""
         try:
-            # إجمالي المبيعات
-            self.cursor.execute("SELECT SUM(total_amount) FROM invoices WHERE invoice_date BETWEEN ? AND ?", (from_date, to_date))
-            total_sales = self.cursor.fetchone()[0] or 0
-            
-            # المبيعات النقدية
-            self.cursor.execute("SELECT SUM(total_amount) FROM invoices WHERE invoice_type = 'نقدي' AND invoice_date BETWEEN ? AND ?", (from_date, to_date))
-            cash_sales = self.cursor.fetchone()[0] or 0
-            
-            # المبيعات بالتقسيط
-            self.cursor.execute("SELECT SUM(total_amount) FROM invoices WHERE invoice_type = 'تقسيط' AND invoice_date BETWEEN ? AND ?", (from_date, to_date))
-            credit_sales = self.cursor.fetchone()[0] or 0
-            
-            # إجمالي الأرباح
-            self.cursor.execute("""
-                SELECT SUM(ii.total_price - (p.capital_price * ii.quantity))
-                FROM invoice_items ii
-                JOIN invoices i ON ii.invoice_id = i.id
-                JOIN products p ON ii.product_id = p.id
-                WHERE i.invoice_date BETWEEN ? AND ?
-            """, (from_date, to_date))
-            total_profit = self.cursor.fetchone()[0] or 0
-            
-            # رأس المال
-            self.cursor.execute("SELECT SUM(quantity * capital_price) FROM products")
-            total_capital = self.cursor.fetchone()[0] or 0
-            
-            # عدد العملاء
-            self.cursor.execute("SELECT COUNT(*) FROM customers")
-            total_customers = self.cursor.fetchone()[0] or 0
-            
-            # تحديث القيم
-            self.stats_labels["total_sales"].setText(f"{total_sales:,.2f} ريال")
-            self.stats_labels["cash_sales"].setText(f"{cash_sales:,.2f} ريال")
-            self.stats_labels["credit_sales"].setText(f"{credit_sales:,.2f} ريال")
-            self.stats_labels["total_profit"].setText(f"{total_profit:,.2f} ريال")
-            self.stats_labels["total_capital"].setText(f"{total_capital:,.2f} ريال")
-            self.stats_labels["total_customers"].setText(f"{total_customers}")
+            self.stats_labels["total_sales"].setText(f"{stats['total_sales']:,.2f} ريال")
+            self.stats_labels["cash_sales"].setText(f"{stats['cash_sales']:,.2f} ريال")
+            self.stats_labels["credit_sales"].setText(f"{stats['credit_sales']:,.2f} ريال")
+            self.stats_labels["total_profit"].setText(f"{stats['total_profit']:,.2f} ريال")
+            self.stats_labels["total_capital"].setText(f"{stats['total_capital']:,.2f} ريال")
+            self.stats_labels["total_customers"].setText(f"{stats['total_customers']}")
             
         except Exception as e:
             print(f"خطأ في تحديث الإحصائيات: {e}")
 
-    def update_summary_report(self, from_date, to_date, report_type):
+    def update_summary_report(self, data):
         """تحديث تقرير الملخص"""
         try:
-            self.cursor.execute("""
-                SELECT 
-                    date(invoice_date) as date,
-                    SUM(CASE WHEN invoice_type = 'نقدي' THEN total_amount ELSE 0 END) as cash_sales,
-                    SUM(CASE WHEN invoice_type = 'تقسيط' THEN total_amount ELSE 0 END) as credit_sales,
-                    SUM(total_amount) as total_sales,
-                    SUM(ii.quantity * p.capital_price) as costs,
-                    SUM(ii.total_price - (ii.quantity * p.capital_price)) as net_profit
-                FROM invoices i
-                JOIN invoice_items ii ON i.id = ii.invoice_id
-                JOIN products p ON ii.product_id = p.id
-                WHERE i.invoice_date BETWEEN ? AND ?
-                GROUP BY date(invoice_date)
-                ORDER BY date(invoice_date)
-            """, (from_date, to_date))
-            
-            data = self.cursor.fetchall()
-            
             self.summary_table.setRowCount(len(data))
             for row, (date, cash, credit, total, costs, profit) in enumerate(data):
                 self.summary_table.setItem(row, 0, QTableWidgetItem(str(date)))
@@ -779,36 +617,9 @@ class ReportsPage(QWidget):
         except Exception as e:
             print(f"خطأ في تحديث تقرير الملخص: {e}")
 
-    def update_sales_report(self, from_date, to_date):
+    def update_sales_report(self, data):
         """تحديث تقرير المبيعات"""
         try:
-            sales_type = self.sales_type_filter.currentText()
-            
-            if "الكل" in sales_type:
-                query = """
-                    SELECT i.id, c.name_ar, i.invoice_type, i.total_amount, 
-                           i.paid_amount, i.remaining_amount, i.invoice_date
-                    FROM invoices i
-                    LEFT JOIN customers c ON i.customer_id = c.id
-                    WHERE i.invoice_date BETWEEN ? AND ?
-                    ORDER BY i.invoice_date DESC
-                """
-                params = (from_date, to_date)
-            else:
-                invoice_type = "نقدي" if "نقدي" in sales_type else "تقسيط"
-                query = """
-                    SELECT i.id, c.name_ar, i.invoice_type, i.total_amount, 
-                           i.paid_amount, i.remaining_amount, i.invoice_date
-                    FROM invoices i
-                    LEFT JOIN customers c ON i.customer_id = c.id
-                    WHERE i.invoice_type = ? AND i.invoice_date BETWEEN ? AND ?
-                    ORDER BY i.invoice_date DESC
-                """
-                params = (invoice_type, from_date, to_date)
-                
-            self.cursor.execute(query, params)
-            data = self.cursor.fetchall()
-            
             self.sales_table.setRowCount(len(data))
             for row, (inv_id, customer, inv_type, total, paid, remaining, date) in enumerate(data):
                 self.sales_table.setItem(row, 0, QTableWidgetItem(str(inv_id)))
@@ -824,81 +635,33 @@ class ReportsPage(QWidget):
         except Exception as e:
             print(f"خطأ في تحديث تقرير المبيعات: {e}")
 
-    def update_profit_report(self, from_date, to_date):
+    def update_profit_report(self, profit):
         """تحديث تقرير الأرباح"""
         try:
-            # إحصائيات الأرباح
-            self.cursor.execute("""
-                SELECT 
-                    SUM(ii.total_price) as total_revenue,
-                    SUM(ii.quantity * p.capital_price) as total_costs,
-                    SUM(ii.total_price - (ii.quantity * p.capital_price)) as net_profit
-                FROM invoice_items ii
-                JOIN invoices i ON ii.invoice_id = i.id
-                JOIN products p ON ii.product_id = p.id
-                WHERE i.invoice_date BETWEEN ? AND ?
-            """, (from_date, to_date))
-            
-            result = self.cursor.fetchone()
-            total_revenue = result[0] or 0
-            total_costs = result[1] or 0
-            net_profit = result[2] or 0
-            
-            profit_margin = net_profit
-            profit_percentage = (net_profit / total_revenue * 100) if total_revenue > 0 else 0
-            
-            self.profit_labels["total_revenue"].setText(f"{total_revenue:,.2f} ريال")
-            self.profit_labels["total_costs"].setText(f"{total_costs:,.2f} ريال")
-            self.profit_labels["net_profit"].setText(f"{net_profit:,.2f} ريال")
-            self.profit_labels["profit_margin"].setText(f"{profit_margin:,.2f} ريال")
-            self.profit_labels["profit_percentage"].setText(f"{profit_percentage:.2f}%")
+            self.profit_labels["total_revenue"].setText(f"{profit['total_revenue']:,.2f} ريال")
+            self.profit_labels["total_costs"].setText(f"{profit['total_costs']:,.2f} ريال")
+            self.profit_labels["net_profit"].setText(f"{profit['net_profit']:,.2f} ريال")
+            self.profit_labels["profit_margin"].setText(f"{profit['net_profit']:,.2f} ريال")
+            self.profit_labels["profit_percentage"].setText(f"{profit['profit_percentage']:.2f}%")
             
             # تحليل الأرباح حسب المنتج
-            self.cursor.execute("""
-                SELECT 
-                    p.name_ar,
-                    SUM(ii.quantity) as total_quantity,
-                    SUM(ii.total_price) as revenue,
-                    SUM(ii.quantity * p.capital_price) as costs,
-                    SUM(ii.total_price - (ii.quantity * p.capital_price)) as profit
-                FROM invoice_items ii
-                JOIN invoices i ON ii.invoice_id = i.id
-                JOIN products p ON ii.product_id = p.id
-                WHERE i.invoice_date BETWEEN ? AND ?
-                GROUP BY p.id, p.name_ar
-                ORDER BY profit DESC
-            """, (from_date, to_date))
-            
-            analysis_data = self.cursor.fetchall()
-            
+            analysis_data = profit['rows']
             self.profit_analysis_table.setRowCount(len(analysis_data))
-            for row, (product, quantity, revenue, costs, profit) in enumerate(analysis_data):
+            for row, (product, quantity, revenue, costs, profit_value) in enumerate(analysis_data):
                 self.profit_analysis_table.setItem(row, 0, QTableWidgetItem(product))
                 self.profit_analysis_table.setItem(row, 1, QTableWidgetItem(str(quantity)))
                 self.profit_analysis_table.setItem(row, 2, QTableWidgetItem(f"{revenue:,.2f}"))
                 self.profit_analysis_table.setItem(row, 3, QTableWidgetItem(f"{costs:,.2f}"))
-                self.profit_analysis_table.setItem(row, 4, QTableWidgetItem(f"{profit:,.2f}"))
+                self.profit_analysis_table.setItem(row, 4, QTableWidgetItem(f"{profit_value:,.2f}"))
                 
             self.profit_analysis_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
             
         except Exception as e:
             print(f"خطأ في تحديث تقرير الأرباح: {e}")
 
-    def update_inventory_report(self):
+    def update_inventory_report(self, data):
         """تحديث تقرير المخزون"""
         try:
-            self.cursor.execute("""
-                SELECT 
-                    name_ar, quantity, capital_price, selling_price,
-                    (quantity * capital_price) as total_cost,
-                    (quantity * selling_price) as inventory_value,
-                    created_date
-                FROM products
-                ORDER BY name_ar
-            """)
-            
-            data = self.cursor.fetchall()
-            
             self.inventory_table.setRowCount(len(data))
             for row, (name, qty, cost_price, sell_price, total_cost, inv_value, date) in enumerate(data):
                 self.inventory_table.setItem(row, 0, QTableWidgetItem(name))
@@ -914,27 +677,9 @@ class ReportsPage(QWidget):
         except Exception as e:
             print(f"خطأ في تحديث تقرير المخزون: {e}")
 
-    def update_customers_report(self, from_date, to_date):
+    def update_customers_report(self, data):
         """تحديث تقرير العملاء"""
         try:
-            self.cursor.execute("""
-                SELECT 
-                    c.name_ar,
-                    SUM(i.total_amount) as total_purchases,
-                    SUM(COALESCE(p.amount, 0)) as total_payments,
-                    SUM(i.remaining_amount) as total_remaining,
-                    COUNT(i.id) as invoice_count,
-                    MAX(i.invoice_date) as last_purchase
-                FROM customers c
-                LEFT JOIN invoices i ON c.id = i.customer_id
-                LEFT JOIN payments p ON c.id = p.customer_id
-                WHERE i.invoice_date BETWEEN ? AND ? OR i.invoice_date IS NULL
-                GROUP BY c.id, c.name_ar
-                ORDER BY total_purchases DESC
-            """, (from_date, to_date))
-            
-            data = self.cursor.fetchall()
-            
             self.customers_table.setRowCount(len(data))
             for row, (name, purchases, payments, remaining, count, last_date) in enumerate(data):
                 self.customers_table.setItem(row, 0, QTableWidgetItem(name))
@@ -963,8 +708,6 @@ class ReportsPage(QWidget):
 
     def closeEvent(self, event):
         """إغلاق التطبيق"""
-        try:
-            self.conn.close()
-        except:
-            pass
+        # ✅ الاتصال مشترك مع باقي الصفحات - لا يتم إغلاقه هنا
+        self.cancel_reports()
         event.accept()
\ No newline at end of file
@@ -0,0 +1,144 @@
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal
+
+try:
+    from pages.text_normalize import normalize_text
+except ImportError:
+    from text_normalize import normalize_text
+
+# ✅ مهلة الانتظار بعد آخر حرف قبل تنفيذ البحث (الكتابة السريعة = بحث واحد)
+SEARCH_DELAY_MS = 200
+
+# ✅ عدد السجلات بين كل فحصين للإلغاء أثناء المرور على القائمة
+CANCEL_CHECK_EVERY = 512
+
+
+def matching_rows(keys, match, cancelled):
+    """✅ أرقام الصفوف التي يطابق مفتاحها match، أو None إذا ألغي البحث
+
+    keys: قائمة مفاتيح البحث (RecordTableModel.search_keys) - لقطة تقرأ فقط.
+    """
+    rows = set()
+    for row, key in enumerate(keys):
+        if row % CANCEL_CHECK_EVERY == 0 and cancelled():
+            return None
+        if match(key):
+            rows.add(row)
+    return rows
+
+
+class _SearchJob(QRunnable):
+    def __init__(self, controller, generation, job):
+        super().__init__()
+        self.controller = controller
+        self.generation = generation
+        self.job = job
+
+    def run(self):
+        cancelled = lambda: self.controller._generation != self.generation
+        try:
+            result = self.job(cancelled)
+        except Exception as e:
+            print(f"❌ خطأ في البحث: {e}")
+            return
+        if result is None or cancelled():
+            return
+        try:
+            self.controller._finished.emit(self.generation, result)
+        except RuntimeError:
+            # ✅ الصفحة أغلقت أثناء البحث
+            pass
+
+
+class SearchController(QObject):
+    """✅ بحث مؤجل وقابل للإلغاء لصفحات القوائم
+
+    كل تغيير في حقول البحث يعيد تشغيل مؤقت قصير بدلاً من البحث فوراً، وعند انتهاء
+    المؤقت:
+    - prepare() يعمل في الواجهة: يقرأ نص البحث ويأخذ لقطة من البيانات، ويرجع
+      دالة job(cancelled) -> نتيجة، أو None لعرض كل السجلات مباشرة.
+    - job تعمل في خيط خلفي (QThreadPool) وتتوقف إذا أرجعت cancelled() True.
+    - apply(نتيجة) يعمل في الواجهة - وتهمل نتيجة أي بحث أقدم من آخر طلب.
+    """
+
+    _finished = Signal(int, object)
+
+    def __init__(self, parent, prepare, apply, delay=SEARCH_DELAY_MS):
+        super().__init__(parent)
+        self._prepare = prepare
+        self._apply = apply
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay)
+        self._timer.timeout.connect(self.run_now)
+        self._finished.connect(self._on_finished)
+
+    def connect_inputs(self, *line_edits):
+        for line_edit in line_edits:
+            line_edit.textChanged.connect(self.schedule)
+
+    def _next_generation(self):
+        # ✅ رقم جديد يلغي أي بحث جار (الخيط الخلفي يقارن رقمه بهذا الرقم)
+        with self._lock:
+            self._generation += 1
+            return self._generation
+
+    def schedule(self, *_):
+        """✅ طلب بحث بعد المهلة - الطلبات المتتالية تدمج في بحث واحد"""
+        self._next_generation()
+        self._timer.start()
+
+    def follow_model(self, model):
+        """✅ إعادة البحث عند تغير بيانات النموذج
+
+        بعد إعادة التحميل تتغير أرقام الصفوف، لذلك يعاد البحث فوراً في الواجهة (حتى
+        لا تظهر نتيجة قديمة على بيانات جديدة)؛ تعديل صف واحد يعيد البحث بعد المهلة.
+        """
+        model.modelReset.connect(lambda: self.run_now(wait=True))
+        model.dataChanged.connect(self.schedule)
+
+    def run_now(self, wait=False):
+        """✅ تنفيذ البحث فوراً - في خيط خلفي، أو في الواجهة إذا wait=True"""
+        self._timer.stop()
+        generation = self._next_generation()
+        try:
+            job = self._prepare()
+        except Exception as e:
+            print(f"❌ خطأ في تجهيز البحث: {e}")
+            job = None
+        if job is None:
+            self._apply(None)
+        elif wait:
+            self._apply(job(lambda: False))
+        else:
+            QThreadPool.globalInstance().start(_SearchJob(self, generation, job))
+
+    def cancel(self):
+        self._timer.stop()
+        self._next_generation()
+
+    def _on_finished(self, generation, result):
+        if generation == self._generation:
+            self._apply(result)
+
+
+def table_text_search(table, *line_edits, delay=SEARCH_DELAY_MS):
+    """✅ بحث نصي مؤجل لجدول RecordTableView في خيط خلفي
+
+    النتيجة مجموعة الصفوف التي يحتوي مفتاح بحثها الموحد على النص المكتوب.
+    """
+    def prepare():
+        text = normalize_text(' '.join(line_edit.text() for line_edit in line_edits))
+        if not text:
+            return None
+        keys = table.source_model.search_keys()
+        return lambda cancelled: matching_rows(keys, lambda key: text in key, cancelled)
+
+    controller = SearchController(table, prepare, table.filter_rows, delay)
+    controller.connect_inputs(*line_edits)
+    controller.follow_model(table.source_model)
+    return controller
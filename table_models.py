@@ -0,0 +1,256 @@
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel
+from PySide6.QtGui import QColor, QFont
+from PySide6.QtWidgets import QTableView, QHeaderView
+
+try:
+    from pages.text_normalize import normalize_text
+except ImportError:
+    from text_normalize import normalize_text
+
+# ✅ الدور الذي يرجع السجل الأصلي للصف، ودور قيمة الترتيب
+RECORD_ROLE = Qt.UserRole
+SORT_ROLE = Qt.UserRole + 1
+
+# ✅ ألوان وخطوط مشتركة - كائن واحد لكل لون/خط بدلاً من كائن لكل خانة
+_colors = {}
+_fonts = {}
+
+
+def shared_color(name):
+    color = _colors.get(name)
+    if color is None:
+        color = _colors[name] = QColor(name)
+    return color
+
+
+def shared_font(family="Arial", size=12, bold=True):
+    key = (family, size, bold)
+    font = _fonts.get(key)
+    if font is None:
+        font = _fonts[key] = QFont(family, size, QFont.Bold if bold else QFont.Normal)
+    return font
+
+
+class Column:
+    """✅ تعريف عمود في جدول السجلات
+
+    text: اسم الحقل (للقواميس) أو رقمه (للصفوف) أو دالة (السجل، رقم الصف) -> نص.
+    foreground / background: اسم لون ثابت أو دالة (السجل) -> اسم لون أو None.
+    sort_key: دالة (السجل) -> قيمة الترتيب (افتراضياً النص المعروض).
+    """
+    __slots__ = ('title', 'text', 'align', 'foreground', 'background', 'font', 'sort_key')
+
+    def __init__(self, title, text, align=None, foreground=None, background=None, font=None, sort_key=None):
+        self.title = title
+        self.text = text
+        self.align = align
+        self.foreground = foreground
+        self.background = background
+        self.font = font
+        self.sort_key = sort_key
+
+    def display(self, record, row):
+        if callable(self.text):
+            return self.text(record, row)
+        if isinstance(record, dict):
+            value = record.get(self.text, '')
+        else:
+            value = record[self.text]
+        return '' if value is None else str(value)
+
+
+def _resolve_color(spec, record):
+    if spec is None:
+        return None
+    name = spec(record) if callable(spec) else spec
+    return shared_color(name) if name else None
+
+
+class RecordTableModel(QAbstractTableModel):
+    """✅ نموذج جدول للقراءة فقط فوق قائمة سجلات (قواميس أو صفوف)
+
+    لا ينشئ أي عنصر لكل خانة - العرض يطلب فقط الخانات الظاهرة على الشاشة،
+    والنص يحسب عند الطلب من السجل مباشرة.
+    """
+
+    def __init__(self, columns, parent=None, search_key=None):
+        super().__init__(parent)
+        self._columns = list(columns)
+        self._records = []
+        # ✅ مفتاح بحث موحد لكل سجل - يحسب مرة واحدة عند التحميل وليس مع كل حرف
+        self._search_key = search_key
+        self._search_keys = []
+
+    def set_records(self, records):
+        self.beginResetModel()
+        self._records = list(records)
+        if self._search_key:
+            self._search_keys = [self._search_key(record, row) for row, record in enumerate(self._records)]
+        self.endResetModel()
+
+    def search_key(self, row):
+        return self._search_keys[row] if self._search_key else None
+
+    def search_keys(self):
+        """✅ مفاتيح البحث لكل الصفوف (للبحث في خيط خلفي - للقراءة فقط)"""
+        return self._search_keys
+
+    def records(self):
+        return self._records
+
+    def update_record(self, row, record):
+        """✅ استبدال سجل صف واحد وإعادة رسم هذا الصف فقط"""
+        self._records[row] = record
+        if self._search_key:
+            self._search_keys[row] = self._search_key(record, row)
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self._columns) - 1))
+
+    def record(self, row):
+        return self._records[row]
+
+    def column_text(self, row, column):
+        return self._columns[column].display(self._records[row], row)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._records)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self._columns[section].title
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        column = self._columns[index.column()]
+        record = self._records[row]
+        if role == Qt.DisplayRole:
+            return column.display(record, row)
+        if role == Qt.TextAlignmentRole:
+            return column.align
+        if role == Qt.ForegroundRole:
+            return _resolve_color(column.foreground, record)
+        if role == Qt.BackgroundRole:
+            return _resolve_color(column.background, record)
+        if role == Qt.FontRole:
+            return column.font
+        if role == RECORD_ROLE:
+            return record
+        if role == SORT_ROLE:
+            if column.sort_key:
+                return column.sort_key(record)
+            return column.display(record, row)
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+
+class RecordFilterProxy(QSortFilterProxyModel):
+    """✅ البحث والترتيب فوق RecordTableModel بدون إعادة بناء الجدول"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._predicate = None
+        self.setSortRole(SORT_ROLE)
+
+    def set_predicate(self, predicate):
+        """predicate: دالة (السجل، رقم الصف الأصلي) -> bool، أو None لعرض كل السجلات"""
+        self._predicate = predicate
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self._predicate is None:
+            return True
+        model = self.sourceModel()
+        return bool(self._predicate(model.record(source_row), source_row))
+
+
+class RecordTableView(QTableView):
+    """✅ جدول سجلات افتراضي: نموذج + بحث/ترتيب عبر proxy
+
+    الصفوف بارتفاع ثابت حتى لا يحسب Qt ارتفاع كل صف عند فتح جداول كبيرة.
+    """
+
+    def __init__(self, columns, parent=None, sortable=False, search_key=None, search_columns=None):
+        """search_key: دالة (السجل، رقم الصف) -> مفتاح البحث الموحد للسجل.
+        search_columns: بديل مختصر - المفتاح هو نص هذه الأعمدة بعد التوحيد.
+        """
+        super().__init__(parent)
+        if search_key is None and search_columns is not None:
+            search_key = lambda record, row: normalize_text('\n'.join(
+                column.display(record, row) for column in (columns[index] for index in search_columns)))
+        self.source_model = RecordTableModel(columns, self, search_key)
+        self.proxy_model = RecordFilterProxy(self)
+        self.proxy_model.setSourceModel(self.source_model)
+        self.setModel(self.proxy_model)
+        self.setSortingEnabled(sortable)
+        self.setEditTriggers(QTableView.NoEditTriggers)
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+
+    # ======== ✅ البيانات ========
+    def set_records(self, records):
+        self.source_model.set_records(records)
+
+    def records(self):
+        return self.source_model.records()
+
+    def update_record(self, row, record):
+        """row: رقم الصف في القائمة الأصلية (وليس الصف الظاهر)"""
+        self.source_model.update_record(row, record)
+
+    def source_row(self, row):
+        """✅ رقم الصف في القائمة الأصلية لصف ظاهر في الجدول"""
+        return self.proxy_model.mapToSource(self.proxy_model.index(row, 0)).row()
+
+    def record_at(self, row):
+        return self.source_model.record(self.source_row(row))
+
+    def visible_records(self):
+        return [self.record_at(row) for row in range(self.proxy_model.rowCount())]
+
+    # ======== ✅ التحديد ========
+    def current_row(self):
+        index = self.currentIndex()
+        return index.row() if index.isValid() else -1
+
+    def current_record(self):
+        row = self.current_row()
+        return self.record_at(row) if row >= 0 else None
+
+    def selected_records(self):
+        rows = sorted(index.row() for index in self.selectionModel().selectedRows())
+        return [self.record_at(row) for row in rows]
+
+    def clear_current(self):
+        self.clearSelection()
+        self.setCurrentIndex(QModelIndex())
+
+    # ======== ✅ البحث ========
+    def set_filter(self, predicate):
+        self.proxy_model.set_predicate(predicate)
+
+    def filter_text(self, text):
+        """✅ عرض الصفوف التي يحتوي مفتاح بحثها على text بعد التوحيد
+
+        (الألف/الهمزة/التاء المربوطة/الياء والتشكيل وحالة الأحرف لا تؤثر)
+        """
+        text = normalize_text(text)
+        if not text:
+            self.set_filter(None)
+            return
+        model = self.source_model
+        self.set_filter(lambda record, row: text in model.search_key(row))
+
+    def filter_rows(self, rows):
+        """✅ عرض صفوف محددة فقط (نتيجة بحث جاهزة)، أو كل الصفوف إذا rows = None"""
+        if rows is None:
+            self.set_filter(None)
+            return
+        self.set_filter(lambda record, row: row in rows)
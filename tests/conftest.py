@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+# ✅ الوحدات مسطحة في جذر المستودع (نفس الاستيراد الاحتياطي بدون الحزمة pages)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import customer_payments_store
+import customer_store
+import db_connection
+import json_repository
+import product_catalog
+import report_etl
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """✅ مجلد عمل مؤقت لكل اختبار مع نسخ جديدة من المخازن المشتركة
+
+    المسارات في البرنامج نسبية (data/...، chbib_materials.db) لذلك يكفي تغيير المجلد.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(db_connection, '_managers', {})
+    monkeypatch.setattr(json_repository, '_repository', None)
+    monkeypatch.setattr(customer_store, '_store', None)
+    monkeypatch.setattr(customer_payments_store, '_store', None)
+    monkeypatch.setattr(report_etl, '_loader', None)
+    monkeypatch.setattr(product_catalog, '_catalog', None)
+    yield tmp_path
+    # ✅ كتابة التعديلات المتراكمة قبل مغادرة المجلد (مؤقت الدفعات يكتب بمسارات نسبية)
+    if json_repository._repository is not None:
+        json_repository._repository.flush()
+    for manager in db_connection._managers.values():
+        manager.close_all()
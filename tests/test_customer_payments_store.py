@@ -0,0 +1,38 @@
+from customer_payments_store import get_customer_payments_store
+
+PHONE = "70123456"
+
+
+def _payment(payment_uuid, customer_name, amount):
+    return {
+        'payment_uuid': payment_uuid,
+        'customer_name': customer_name,
+        'customer_phone': PHONE,
+        'amount': amount,
+        'amount_lbp': amount * 89500,
+    }
+
+
+def test_removing_one_customer_keeps_the_other_on_a_shared_phone(workdir):
+    store = get_customer_payments_store()
+    store.add_payment(_payment('p1', "أحمد", 10))
+    store.add_payment(_payment('p2', "سامي", 20))
+    store.add_payment(_payment('p3', "أحمد", 5))
+
+    # ✅ نفس ما تفعله صفحة الفواتير عند حذف زبون
+    removed = store.remove_where(PHONE, customer_name="أحمد", customer_phone=PHONE)
+
+    assert removed == 2
+    assert [p['payment_uuid'] for p in store.customer_payments(PHONE)] == ['p2']
+    summary = store.customer_summary(PHONE)
+    assert summary['payments_count'] == 1
+    assert summary['total_usd'] == 20
+
+
+def test_remove_customer_deletes_the_shard_and_its_index_entry(workdir):
+    store = get_customer_payments_store()
+    store.add_payment(_payment('p1', "أحمد", 10))
+
+    assert store.remove_customer(PHONE) == 1
+    assert store.customer_payments(PHONE) == []
+    assert store.customer_summary(PHONE) is None
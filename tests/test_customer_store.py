@@ -0,0 +1,66 @@
+from customer_store import get_customer_store
+
+NAME = "أحمد"
+PHONE = "70123456"
+
+
+def _installment_invoice():
+    return {
+        'type': 'تقسيط', 'date': '2026-03-05', 'total_usd': 10, 'total_lbp': 895000,
+        'paid_amount': 0, 'remaining_amount': 10, 'exchange_rate': 89500, 'items': [],
+    }
+
+
+def test_invoice_number_after_deleting_an_invoice_is_not_reused(workdir):
+    store = get_customer_store()
+    store.add_customer({'name': NAME, 'phone': PHONE})
+    first, second = _installment_invoice(), _installment_invoice()
+    store.add_invoice(NAME, PHONE, first)
+    store.add_invoice(NAME, PHONE, second)
+
+    store.delete_invoice(NAME, PHONE, first['invoice_uuid'])
+    third = _installment_invoice()
+    store.add_invoice(NAME, PHONE, third)
+
+    # ✅ أكبر رقم + 1 - العدد + 1 كان سيعطي الرقم 2 مرة ثانية
+    assert (second['customer_invoice_id'], third['customer_invoice_id']) == (2, 3)
+    assert store.next_customer_invoice_id(NAME, PHONE) == 4
+
+
+def test_removing_a_repeated_payment_removes_only_one(workdir):
+    store = get_customer_store()
+    store.add_customer({'name': NAME, 'phone': PHONE})
+    invoice = _installment_invoice()
+    store.add_invoice(NAME, PHONE, invoice)
+    payment = {'amount': 2, 'date': '2026-03-06'}
+    store.add_invoice_payment(NAME, PHONE, invoice['invoice_uuid'], dict(payment))
+    store.add_invoice_payment(NAME, PHONE, invoice['invoice_uuid'], dict(payment))
+
+    assert store.remove_invoice_payment(NAME, PHONE, invoice['invoice_uuid'], 2, '2026-03-06')
+    # ✅ لا توجد دفعة مطابقة - لا يتغير المدفوع
+    assert not store.remove_invoice_payment(NAME, PHONE, invoice['invoice_uuid'], 3, '2026-03-06')
+
+    customer = store.get_customer(NAME, PHONE)
+    saved = customer['invoices'][0]
+    assert len(saved['payments']) == 1
+    assert (saved['paid_amount'], saved['remaining_amount']) == (2, 8)
+    assert (customer['total_paid'], customer['total_remaining']) == (2, 8)
+
+
+def test_invoice_item_search_follows_store_writes(workdir):
+    store = get_customer_store()
+    store.add_customer({'name': NAME, 'phone': PHONE})
+    invoice = dict(_installment_invoice(), items=[{'product_name': "الحديد المبروم", 'unit': 'طن'}])
+    store.add_invoice(NAME, PHONE, invoice)
+    invoice_uuid = invoice['invoice_uuid']
+
+    assert store.search_invoice_items("حديد") == {invoice_uuid}
+    assert store.search_invoice_items("طن", NAME, PHONE) == {invoice_uuid}
+
+    store.update_invoice(NAME, PHONE, invoice_uuid,
+                         dict(invoice, items=[{'product_name': "إسمنت", 'unit': 'كيس'}]))
+    assert store.search_invoice_items("حديد") == set()
+    assert store.search_invoice_items("اسمنت") == {invoice_uuid}
+
+    store.delete_invoice(NAME, PHONE, invoice_uuid)
+    assert store.search_invoice_items("اسمنت") == set()
@@ -0,0 +1,211 @@
+import json
+import marshal
+import os
+import time
+
+import pytest
+
+import json_repository
+from json_repository import (
+    JOURNAL_SUFFIX, SNAPSHOT_FORMAT, SNAPSHOT_SUFFIX, JsonRepository, iter_json_array
+)
+
+PATH = os.path.join("data", "payments.json")
+
+
+def _journal_lines(path=PATH):
+    with open(path + JOURNAL_SUFFIX, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _file_data(path=PATH):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_journal_replays_after_restart(workdir):
+    repository = JsonRepository()
+    repository.save(PATH, [{'id': 1, 'amount': 10}, {'id': 2, 'amount': 20}])
+    repository.flush()
+    repository.append(PATH, {'id': 3, 'amount': 30}, key='id')
+    assert repository.update_where(PATH, {'amount': 25}, id=2) == 1
+    assert repository.remove_where(PATH, id=1) == 1
+    repository.flush()
+
+    # ✅ الملف الأساسي كما هو - التعديلات في ملف التعديلات فقط
+    assert _file_data() == [{'id': 1, 'amount': 10}, {'id': 2, 'amount': 20}]
+    assert [entry['op'] for entry in _journal_lines()] == ['append', 'update', 'remove']
+
+    expected = [{'id': 2, 'amount': 25}, {'id': 3, 'amount': 30}]
+    assert repository.read(PATH) == expected
+    assert JsonRepository().read(PATH) == expected
+
+
+def test_replay_skips_repeated_keyed_append_and_torn_line(workdir):
+    repository = JsonRepository()
+    repository.save(PATH, [{'id': 1}])
+    repository.flush()
+    with open(PATH + JOURNAL_SUFFIX, 'w', encoding='utf-8') as f:
+        entry = json.dumps({'op': 'append', 'record': {'id': 2}, 'key': 'id'})
+        # ✅ نفس السجل مرتين (دمج غير مكتمل) ثم سطر مقطوع (انقطاع أثناء الكتابة)
+        f.write(entry + "\n" + entry + "\n" + '{"op": "app')
+
+    assert JsonRepository().read(PATH) == [{'id': 1}, {'id': 2}]
+
+
+def test_checkpoint_merges_journal(workdir):
+    repository = JsonRepository()
+    repository.save(PATH, [{'id': 1}])
+    repository.append(PATH, {'id': 2}, key='id')
+    repository.flush()
+    repository.append(PATH, {'id': 3}, key='id')
+
+    repository.checkpoint(PATH)
+
+    assert not os.path.exists(PATH + JOURNAL_SUFFIX)
+    assert _file_data() == [{'id': 1}, {'id': 2}, {'id': 3}]
+    assert JsonRepository().read(PATH) == [{'id': 1}, {'id': 2}, {'id': 3}]
+
+
+def test_checkpoint_keeps_records_appended_while_merging(workdir, monkeypatch):
+    repository = JsonRepository()
+    repository.save(PATH, [{'id': 1}])
+    repository.flush()
+    repository.append(PATH, {'id': 2}, key='id')
+    repository.flush()
+
+    write_synced = json_repository._write_synced
+
+    def append_during_merge(path, text):
+        repository.append(PATH, {'id': 3}, key='id')
+        write_synced(path, text)
+
+    monkeypatch.setattr(json_repository, '_write_synced', append_during_merge)
+    repository.checkpoint(PATH)
+    repository.flush()
+
+    assert _file_data() == [{'id': 1}, {'id': 2}]
+    assert _journal_lines() == [{'op': 'append', 'record': {'id': 3}, 'key': 'id'}]
+    assert JsonRepository().read(PATH) == [{'id': 1}, {'id': 2}, {'id': 3}]
+
+
+def test_failed_flush_raises_keeps_change_and_retries(workdir, monkeypatch):
+    monkeypatch.setattr(json_repository, 'FLUSH_RETRY_DELAY', 0.05)
+    repository = JsonRepository()
+    blocked = os.path.join("blocked", "payments.json")
+    # ✅ ملف باسم المجلد - إنشاء المجلد يفشل حتى يحذف
+    with open("blocked", 'w', encoding='utf-8') as f:
+        f.write("")
+
+    repository.save(blocked, [{'id': 1}])
+    with pytest.raises(OSError):
+        repository.flush()
+    assert repository.read(blocked) == [{'id': 1}]
+
+    # ✅ المحاولة التالية تتم وحدها بعد FLUSH_RETRY_DELAY
+    os.remove("blocked")
+    deadline = time.monotonic() + 5
+    while not os.path.exists(blocked) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _file_data(blocked) == [{'id': 1}]
+
+
+def test_save_keeps_a_copy_of_the_callers_list(workdir):
+    repository = JsonRepository()
+    payments = [{'id': 1}]
+    repository.save(PATH, payments)
+    payments.append({'id': 2})
+    payments[0]['id'] = 99
+    repository.flush()
+
+    assert _file_data() == [{'id': 1}]
+    assert repository.read(PATH) == [{'id': 1}]
+
+
+def _write_text(path, text):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def test_iter_json_array_across_chunks(workdir):
+    _write_text(PATH, '[ 12345 , {"name": "حديد", "items": [1, 2]},\n "نص" ]')
+
+    # ✅ قطع صغيرة جداً: الرقم والنص العربي يقطعان بين القراءات
+    assert list(iter_json_array(PATH, chunk_size=3)) == [12345, {'name': "حديد", 'items': [1, 2]}, "نص"]
+    _write_text(PATH, "")
+    assert list(iter_json_array(PATH)) == []
+    _write_text(PATH, " null ")
+    assert list(iter_json_array(PATH)) == []
+
+
+def test_iter_json_array_stops_reading_on_early_exit(workdir):
+    # ✅ بعد العنصرين الأولين نص تالف - التوقف قبله لا يقرؤه ولا يحلله
+    _write_text(PATH, '[{"id": 1}, {"id": 2}, ' + 'x' * 100000)
+
+    records = iter_json_array(PATH, chunk_size=16)
+    assert [next(records), next(records)] == [{'id': 1}, {'id': 2}]
+    records.close()
+
+    with pytest.raises(ValueError):
+        list(iter_json_array(PATH, chunk_size=16))
+
+
+@pytest.mark.parametrize("text", [
+    '{"id": 1}',           # ليس قائمة
+    '[{"id": 1}, {"id":',  # عنصر مقطوع
+    '[{"id": 1},',         # نهاية الملف قبل ]
+    '[1 2]',               # بدون فاصلة
+])
+def test_iter_json_array_rejects_malformed_input(workdir, text):
+    _write_text(PATH, text)
+
+    with pytest.raises(ValueError):
+        list(iter_json_array(PATH))
+
+
+def _snapshot_write(data, path=PATH):
+    repository = JsonRepository()
+    repository.save(path, data)
+    repository.flush()
+    assert os.path.exists(path + SNAPSHOT_SUFFIX)
+
+
+def test_valid_binary_snapshot_is_used_instead_of_json(workdir):
+    _snapshot_write([{'id': 1}])
+    with open(PATH + SNAPSHOT_SUFFIX, 'rb') as f:
+        snapshot_format, signature, _ = marshal.loads(f.read())
+    # ✅ نفس توقيع الملف الأساسي - القراءة لا تحلل JSON
+    with open(PATH + SNAPSHOT_SUFFIX, 'wb') as f:
+        f.write(marshal.dumps((snapshot_format, signature, [{'id': 'snapshot'}])))
+
+    assert JsonRepository().read(PATH) == [{'id': 'snapshot'}]
+
+
+def test_stale_binary_snapshot_falls_back_to_json(workdir):
+    _snapshot_write([{'id': 1}])
+    # ✅ تعديل من خارج البرنامج - التوقيع المحفوظ في النسخة الثنائية لم يعد يطابق
+    _write_text(PATH, '[{"id": 1}, {"id": 2}]')
+
+    assert JsonRepository().read(PATH) == [{'id': 1}, {'id': 2}]
+    with open(PATH + SNAPSHOT_SUFFIX, 'rb') as f:
+        snapshot_format, _, data = marshal.loads(f.read())
+    assert (snapshot_format, data) == (SNAPSHOT_FORMAT, [{'id': 1}, {'id': 2}])
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda raw: raw[:len(raw) // 2],                             # كتابة مقطوعة
+    lambda raw: b"not marshal data",                             # محتوى تالف
+    lambda raw: marshal.dumps((SNAPSHOT_FORMAT + 1,) + marshal.loads(raw)[1:]),  # صيغة أخرى
+])
+def test_torn_or_foreign_binary_snapshot_falls_back_to_json(workdir, corrupt):
+    _snapshot_write([{'id': 1, 'name': "حديد"}])
+    with open(PATH + SNAPSHOT_SUFFIX, 'rb') as f:
+        raw = f.read()
+    with open(PATH + SNAPSHOT_SUFFIX, 'wb') as f:
+        f.write(corrupt(raw))
+
+    repository = JsonRepository()
+    assert repository.read(PATH) == [{'id': 1, 'name': "حديد"}]
+    # ✅ النسخة الثنائية أعيدت كتابتها صالحة بعد تحليل JSON
+    assert JsonRepository._read_binary_snapshot(PATH, repository._signature(PATH)) == [{'id': 1, 'name': "حديد"}]
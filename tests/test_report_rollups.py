@@ -0,0 +1,83 @@
+import threading
+
+from customer_store import get_customer_store
+from data_versions import data_version
+from db_connection import get_db
+from report_etl import get_report_loader
+
+NAME = "أحمد"
+PHONE = "70123456"
+
+
+def _add_item(buy_price):
+    with get_db().transaction() as conn:
+        cursor = conn.execute("""
+            INSERT INTO Items (name, buy_unit, sell_unit, buy_price, sell_price, quantity, currency, capital_value_lbp)
+            VALUES ('حديد', 'طن', 'طن', ?, 10, 100, 'USD', 0)
+        """, (buy_price,))
+        return cursor.lastrowid
+
+
+def _cash_invoice(item_id):
+    # ✅ فاتورة قديمة بدون purchase_price - التكلفة من سعر رأس المال وقت الحفظ
+    return {
+        'type': 'نقدي', 'date': '2026-03-05', 'total_usd': 10, 'total_lbp': 895000,
+        'paid_amount': 10, 'remaining_amount': 0, 'exchange_rate': 89500,
+        'items': [{'product_id': item_id, 'product_name': 'حديد', 'unit': 'طن',
+                   'quantity': 1, 'unit_price_usd': 10, 'total_usd': 10}],
+    }
+
+
+def _daily_rollup():
+    return get_db().connection().execute("""
+        SELECT period, cash_sales, revenue, cost, profit, invoice_count FROM reports.sales_daily
+    """).fetchall()
+
+
+def test_rollup_after_deleting_an_invoice_with_a_changed_buy_price(workdir):
+    item_id = _add_item(buy_price=5)
+    store = get_customer_store()
+    store.add_customer({'name': NAME, 'phone': PHONE})
+    first, second = _cash_invoice(item_id), _cash_invoice(item_id)
+    store.add_invoice(NAME, PHONE, first)
+    store.add_invoice(NAME, PHONE, second)
+    assert _daily_rollup() == [('2026-03-05', 20.0, 20.0, 10.0, 10.0, 2)]
+
+    with get_db().transaction() as conn:
+        conn.execute("UPDATE Items SET buy_price = 8 WHERE id = ?", (item_id,))
+    store.delete_invoice(NAME, PHONE, first['invoice_uuid'])
+
+    # ✅ الحذف يطرح التكلفة المسجلة (5) وليس السعر الحالي (8) - في معاملة الحذف نفسها
+    assert _daily_rollup() == [('2026-03-05', 10.0, 10.0, 5.0, 5.0, 1)]
+
+    # ✅ التحديث الكامل لا يعيد تسجيل التكلفة بالسعر الجديد
+    get_report_loader().refresh()
+    assert _daily_rollup() == [('2026-03-05', 10.0, 10.0, 5.0, 5.0, 1)]
+    assert get_report_loader().month_totals('2026-03') == (10.0, 0.0)
+
+
+def test_save_waits_for_a_running_refresh_and_bumps_sales_after_commit(workdir):
+    item_id = _add_item(buy_price=5)
+    store = get_customer_store()
+    store.add_customer({'name': NAME, 'phone': PHONE})
+    loader = get_report_loader()
+    versions = []
+
+    def save():
+        with get_db().transaction():
+            store.add_invoice(NAME, PHONE, _cash_invoice(item_id))
+            # ✅ داخل المعاملة الخارجية - الإشعار لم يصل بعد
+            versions.append(data_version('sales'))
+        versions.append(data_version('sales'))
+
+    # ✅ refresh يعمل الآن (يحمل القفل) - الحفظ ينتظر بدلاً من تخطي المجاميع
+    with loader._lock:
+        before = data_version('sales')
+        worker = threading.Thread(target=save)
+        worker.start()
+        worker.join(0.2)
+        assert worker.is_alive()
+    worker.join(5)
+
+    assert versions == [before, before + 1]
+    assert _daily_rollup() == [('2026-03-05', 10.0, 10.0, 5.0, 5.0, 1)]
@@ -0,0 +1,42 @@
+from inverted_index import InvertedIndex
+from product_search import ProductSearchIndex
+
+PRODUCTS = [
+    {'name': "الحديد المبروم"},
+    {'name': "حديد صب"},
+    {'name': "إسمنت أبيض"},
+    {'name': "البلاط"},
+]
+
+
+def _names(index, text):
+    return [PRODUCTS[position]['name'] for position in index.search(text)]
+
+
+def test_product_prefix_search_without_article_finds_both_forms():
+    index = ProductSearchIndex(PRODUCTS)
+
+    # ✅ الاسم الذي يبدأ بالنص أولاً، ثم الاسم الذي فيه كلمة تبدأ به بعد حذف "ال"
+    assert _names(index, "حديد") == ["حديد صب", "الحديد المبروم"]
+    assert _names(index, "بلا") == ["البلاط"]
+
+
+def test_product_prefix_search_with_article_and_letter_folding():
+    index = ProductSearchIndex(PRODUCTS)
+
+    assert _names(index, "الحد") == ["الحديد المبروم"]
+    assert _names(index, "اسم") == ["إسمنت أبيض"]
+    assert _names(index, "مبر حد") == ["الحديد المبروم"]
+    assert _names(index, "") == []
+
+
+def test_inverted_index_prefix_search_with_and_without_article():
+    index = InvertedIndex()
+    index.add('a', "الحديد المبروم")
+    index.add('b', "بلاط")
+
+    assert index.search("حد") == {'a'}
+    assert index.search("الحد") == {'a'}
+    assert index.search("بلا") == {'b'}
+    # ✅ "ال" في البحث لا تطابق كلمة بدون أداة التعريف
+    assert index.search("البلا") == set()
@@ -0,0 +1,56 @@
+import re
+
+# ✅ توحيد الحروف العربية المتشابهة والأرقام قبل البحث:
+# أشكال الألف ← ا، ى ← ي، ة ← ه، ؤ ← و، ئ ← ي، والأرقام العربية/الفارسية ← 0-9
+_CHAR_MAP = {
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و', 'ة': 'ه',
+}
+_CHAR_MAP.update({chr(0x0660 + d): str(d) for d in range(10)})
+_CHAR_MAP.update({chr(0x06F0 + d): str(d) for d in range(10)})
+
+# ✅ التشكيل (الفتحة، الضمة، الكسرة، الشدة، السكون...) والتطويل تحذف
+_REMOVED = [chr(c) for c in range(0x064B, 0x0653)] + ['ٰ', 'ـ']
+
+_TRANSLATION = str.maketrans({**_CHAR_MAP, **dict.fromkeys(_REMOVED, None)})
+
+# ✅ أداة التعريف - البحث عن "حديد" يجد "الحديد" أيضاً
+ARTICLE = 'ال'
+
+_SPACES = re.compile(r'\s+')
+_TOKEN_SPLIT = re.compile(r'[^\w]+')
+
+
+def normalize_text(text):
+    """✅ نص موحد للبحث: أحرف صغيرة، بدون تشكيل، مع توحيد الألف/الهمزة/التاء المربوطة/الياء"""
+    if not text:
+        return ""
+    text = str(text).lower().translate(_TRANSLATION)
+    return _SPACES.sub(' ', text).strip()
+
+
+def tokenize(text):
+    """✅ كلمات النص بعد التوحيد (بدون تكرار، بترتيب ظهورها)"""
+    return list(dict.fromkeys(token for token in _TOKEN_SPLIT.split(normalize_text(text)) if token))
+
+
+def index_tokens(text):
+    """✅ كلمات النص للفهرسة - "الحديد" تفهرس أيضاً كـ "حديد" لكي يجدها البحث بدون أداة التعريف"""
+    tokens = tokenize(text)
+    stripped = [token[len(ARTICLE):] for token in tokens
+                if token.startswith(ARTICLE) and len(token) > len(ARTICLE) + 1]
+    return list(dict.fromkeys(tokens + stripped))
+
+
+def fts_prefix_query(text):
+    """✅ استعلام FTS5 MATCH: كل كلمة من النص كبادئة ("كلمة"*)، أو "" إذا لا كلمات
+
+    الكلمة بدون "ال" تطابق أيضاً نفس الكلمة معرفة.
+    """
+    terms = []
+    for token in tokenize(text):
+        if token.startswith(ARTICLE):
+            terms.append(f'"{token}"*')
+        else:
+            terms.append(f'("{token}"* OR "{ARTICLE}{token}"*)')
+    return ' AND '.join(terms)